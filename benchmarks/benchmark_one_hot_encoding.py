@@ -0,0 +1,127 @@
+"""Benchmark of the one-hot encoding of PostProcessor.process_feature_attributes on
+synthetic categorical columns. The previous encoder, which computes the value
+counts twice per attribute and assigns the get_dummies columns of each attribute
+to df_x one at a time, is kept here as the baseline. The process pool mode
+(max_workers) is run with one worker process per core.
+
+Run with: python benchmarks/benchmark_one_hot_encoding.py
+"""
+import os
+import sys
+import timeit
+import warnings
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from one_click_analysis.feature_processing.attributes.attribute import AttributeType
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    DummyAttribute,
+)
+from one_click_analysis.feature_processing.post_processing import PostProcessor
+
+NUM_ROWS = 1_000_000
+NUM_ATTRIBUTES = 50
+NUM_VALUES = 8
+MIN_COUNTS_PERC = 0.01
+MAX_COUNTS_PERC = 0.99
+
+
+def create_data(num_rows: int, num_attributes: int, num_values: int):
+    rng = np.random.default_rng(0)
+    # Skewed value distributions, so that some values fall below the min count
+    probs = 1 / np.arange(1, num_values + 1) ** 2
+    probs = probs / probs.sum()
+    values = np.array([f"value {i}" for i in range(num_values)], dtype=object)
+    df_x = pd.DataFrame(
+        {
+            f"attribute {j}": values[rng.choice(num_values, size=num_rows, p=probs)]
+            for j in range(num_attributes)
+        }
+    )
+    df_target = pd.DataFrame({"target": rng.random(num_rows)})
+    attributes = [
+        DummyAttribute(
+            query="",
+            attribute_name=name,
+            attribute_type=AttributeType.OTHER,
+            process_config=None,
+            is_feature=True,
+        )
+        for name in df_x.columns
+    ]
+    return df_x, df_target, attributes
+
+
+def encode_baseline(df_x: pd.DataFrame, attributes: List, min_counts, max_counts):
+    for attr in attributes:
+        col_name = attr.attribute_name
+        df_x.loc[
+            (
+                df_x[col_name].value_counts(dropna=False)[df_x[col_name]].values
+                <= min_counts
+            )
+            | (
+                df_x[col_name].value_counts(dropna=False)[df_x[col_name]].values
+                >= max_counts
+            ),
+            col_name,
+        ] = np.nan
+        df_attr_cols = pd.get_dummies(df_x[col_name], prefix=col_name, prefix_sep=" = ")
+        df_x.drop(col_name, axis=1, inplace=True)
+        df_x[df_attr_cols.columns] = df_attr_cols
+    return df_x
+
+
+def benchmark(num_rows: int, num_attributes: int, num_values: int):
+    df_x, df_target, attributes = create_data(num_rows, num_attributes, num_values)
+
+    def run_post_processor(max_workers: int = 1):
+        pp = PostProcessor(
+            df_x=df_x.copy(),
+            df_target=df_target,
+            attributes=attributes,
+            target_attributes=[],
+            min_counts_perc=MIN_COUNTS_PERC,
+            max_counts_perc=MAX_COUNTS_PERC,
+            max_workers=max_workers,
+        )
+        pp.process_feature_attributes(attributes)
+        return pp.df_x
+
+    def run_baseline():
+        # The baseline fragments df_x, which is what the benchmark shows
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+            return encode_baseline(
+                df_x.copy(),
+                attributes,
+                round(MIN_COUNTS_PERC * num_rows),
+                round(MAX_COUNTS_PERC * num_rows),
+            )
+
+    num_workers = os.cpu_count() or 1
+    df_new = run_post_processor()
+    df_baseline = run_baseline()
+    pd.testing.assert_frame_equal(df_new, df_baseline)
+    pd.testing.assert_frame_equal(run_post_processor(num_workers), df_baseline)
+
+    new_time = min(timeit.repeat(run_post_processor, number=1, repeat=3))
+    pool_time = min(
+        timeit.repeat(lambda: run_post_processor(num_workers), number=1, repeat=3)
+    )
+    baseline_time = min(timeit.repeat(run_baseline, number=1, repeat=3))
+    print(
+        f"{num_rows:>9} rows x {num_attributes} attributes "
+        f"({len(df_new.columns)} columns): baseline {baseline_time:7.2f} s, "
+        f"single pass {new_time:7.2f} s, speedup {baseline_time / new_time:5.1f}x, "
+        f"{num_workers} worker processes {pool_time:7.2f} s, speedup "
+        f"{baseline_time / pool_time:5.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    # Optionally pass a smaller number of rows, e.g. for a quick check
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_ROWS
+    benchmark(num_rows, NUM_ATTRIBUTES, NUM_VALUES)
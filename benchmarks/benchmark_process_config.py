@@ -0,0 +1,111 @@
+"""Benchmark of the creation of a ProcessConfig and of the column lookups on
+synthetic datamodels with many tables. With indexed lookups, the time per table
+stays constant when the number of tables grows.
+
+Run with: python benchmarks/benchmark_process_config.py
+"""
+import timeit
+from typing import Dict
+from typing import List
+
+from one_click_analysis.process_config.process_config import ProcessConfig
+
+NUM_TABLES = [125, 250, 500, 1000]
+NUM_COLUMNS = 30
+COLUMN_TYPES = ["STRING", "INTEGER", "FLOAT", "DATETIME", "BOOLEAN"]
+
+
+class SyntheticTable:
+    """Stand-in for a pycelonis DatamodelTable"""
+
+    def __init__(self, name: str, columns: List[Dict[str, str]]):
+        self.name = name
+        self.id = f"id_{name}"
+        self.columns = columns
+
+
+class SyntheticTableCollection(list):
+    """List of tables with the linear find of the pycelonis collections"""
+
+    def find(self, id_or_name: str) -> SyntheticTable:
+        for table in self:
+            if table.id == id_or_name or table.name == id_or_name:
+                return table
+        raise KeyError(id_or_name)
+
+
+class SyntheticDatamodel:
+    """Stand-in for a pycelonis Datamodel with num_tables tables. A third of the
+    tables are activity tables, a third their case tables and a third other
+    tables."""
+
+    def __init__(self, num_tables: int):
+        self.id = f"synthetic_{num_tables}"
+        num_processes = num_tables // 3
+        self.tables = SyntheticTableCollection()
+        process_configurations = []
+        foreign_keys = []
+        for i in range(num_processes):
+            activity_table = self._add_table(
+                f"ACTIVITIES_{i}", ["CASE_ID", "ACTIVITY", "EVENTTIME", "SORTING"]
+            )
+            case_table = self._add_table(f"CASES_{i}", ["CASE_ID"])
+            process_configurations.append(
+                {
+                    "activityTableId": activity_table.id,
+                    "caseTableId": case_table.id,
+                    "caseIdColumn": "CASE_ID",
+                    "activityColumn": "ACTIVITY",
+                    "timestampColumn": "EVENTTIME",
+                    "sortingColumn": "SORTING",
+                }
+            )
+            foreign_keys.append(
+                {
+                    "sourceTableId": case_table.id,
+                    "targetTableId": activity_table.id,
+                    "columns": [
+                        {"sourceColumnName": "CASE_ID", "targetColumnName": "CASE_ID"}
+                    ],
+                }
+            )
+        for i in range(num_tables - 2 * num_processes):
+            self._add_table(f"OTHER_{i}", ["ID"])
+        self.data = {
+            "processConfigurations": process_configurations,
+            "foreignKeys": foreign_keys,
+        }
+
+    def _add_table(self, name: str, key_columns: List[str]) -> SyntheticTable:
+        columns = [{"name": c, "type": "STRING"} for c in key_columns] + [
+            {"name": f"COL_{j}", "type": COLUMN_TYPES[j % len(COLUMN_TYPES)]}
+            for j in range(NUM_COLUMNS)
+        ]
+        table = SyntheticTable(name, columns)
+        self.tables.append(table)
+        return table
+
+
+def benchmark(num_tables: int, repeat: int = 3):
+    dm = SyntheticDatamodel(num_tables)
+    init_time = min(timeit.repeat(lambda: ProcessConfig(dm), number=1, repeat=repeat))
+    process_config = ProcessConfig(dm)
+    table_strs = list(process_config.table_dict)
+
+    def lookup_columns():
+        for table_str in table_strs:
+            process_config.get_categorical_numerical_column_names(table_str)
+            process_config.get_categorical_numerical_columns(table_str)
+
+    lookup_time = min(timeit.repeat(lookup_columns, number=1, repeat=repeat))
+    print(
+        f"{num_tables:>6} tables: init {init_time * 1000:8.1f} ms "
+        f"({init_time / num_tables * 1e6:6.1f} us/table), column lookups "
+        f"{lookup_time * 1000:8.1f} ms ({lookup_time / num_tables * 1e6:6.1f} "
+        f"us/table)"
+    )
+
+
+if __name__ == "__main__":
+    for n in NUM_TABLES:
+        benchmark(n)
@@ -1,5 +1,9 @@
+from pathlib import Path
 from typing import List
+from typing import Optional
+from typing import Union
 
+import pandas as pd
 from IPython.display import display
 from ipywidgets import Tab
 from ipywidgets import widgets
@@ -11,6 +15,8 @@ from one_click_analysis.configuration.configurations import DatePickerConfig
 from one_click_analysis.configuration.configurations import IsClosedConfig
 from one_click_analysis.configuration.configurator import Configurator
 from one_click_analysis.configuration.configurator_view import ConfiguratorView
+from one_click_analysis.feature_processing.attributes.attribute import Attribute
+from one_click_analysis.feature_processing.attributes.feature import Feature
 from one_click_analysis.feature_processing.processors.analysis_processors import (
     CaseDurationProcessor,
 )
@@ -20,21 +26,36 @@ from one_click_analysis.gui.overview_screen import OverviewScreenCaseDuration
 from one_click_analysis.gui.statistical_analysis_screen import (
     StatisticalAnalysisScreen,
 )
+from one_click_analysis.process_config.process_config_cache import (
+    ProcessConfigCache,
+)
+from one_click_analysis.query_cache import QueryCache
+from one_click_analysis.snapshot import load_snapshot
 
 
 class AnalysisCaseDuration:
     """Analysis of potential effects on case duration."""
 
-    def __init__(self, login=None):
+    def __init__(
+        self,
+        login: Optional[dict] = None,
+        query_cache: Optional[QueryCache] = None,
+        metadata_cache: Optional[ProcessConfigCache] = None,
+    ):
         """
 
         :param datamodel: datamodel name or id
         :param celonis_login: dict with login information
+        :param query_cache: QueryCache to persist query results across sessions
+        :param metadata_cache: ProcessConfigCache to persist the datamodel metadata
+        across sessions
         """
 
         self.activity_table_str = None
         self.datamodel = None
         self.login = login
+        self.query_cache = query_cache
+        self.metadata_cache = metadata_cache
         self.dm = None
         self.process_config = None
         self.case_duration_processor = None
@@ -99,7 +120,11 @@ class AnalysisCaseDuration:
         """
         self.configurator = Configurator()
         config_dm = DatamodelConfig(
-            configurator=self.configurator, celonis_login=self.login, required=True
+            configurator=self.configurator,
+            celonis_login=self.login,
+            query_cache=self.query_cache,
+            metadata_cache=self.metadata_cache,
+            required=True,
         )
         config_activity_table = ActivityTableConfig(
             configurator=self.configurator,
@@ -223,43 +248,107 @@ class AnalysisCaseDuration:
         self.case_duration_processor.process()
 
         # 3. Create the GUI
+        self._create_result_screens(
+            df_x=self.case_duration_processor.df_x,
+            df_target=self.case_duration_processor.df_target,
+            features=self.case_duration_processor.features,
+            target_features=self.case_duration_processor.target_features,
+            attributes=self.case_duration_processor.used_static_attributes
+            + self.case_duration_processor.used_dynamic_attributes,
+            timestamp_column=self.case_duration_processor.df_timestamp_column,
+            num_cases=self.case_duration_processor.num_cases,
+        )
+
+        # Create tabs
+        self.update_tabs(
+            [
+                self.description_view.description_box,
+                self.config_view.configurator_box,
+                self.overview_screen.overview_box,
+                self.stat_analysis_screen.statistical_analysis_box,
+                self.dec_rule_screen.decision_rule_box,
+            ]
+        )
+
+    def save_snapshot(self, path: Union[str, Path]):
+        """Save the results of run_analysis so that they can be shown again with
+        run_from_snapshot.
+
+        :param path: directory of the snapshot
+        """
+        self.case_duration_processor.save_snapshot(path)
+
+    def run_from_snapshot(self, path: Union[str, Path]):
+        """Show the results of a snapshot without extracting the data again. Only
+        the description and the result tabs are shown, so no datamodel is needed.
+
+        :param path: directory of a snapshot saved with save_snapshot
+        """
+        analysis_snapshot = load_snapshot(path)
+        self._create_description()
+        self._create_result_screens(
+            df_x=analysis_snapshot.df_x,
+            df_target=analysis_snapshot.df_target,
+            features=analysis_snapshot.features,
+            target_features=analysis_snapshot.target_features,
+            attributes=analysis_snapshot.attributes,
+            timestamp_column=analysis_snapshot.properties["df_timestamp_column"],
+            num_cases=analysis_snapshot.properties["num_cases"],
+        )
+        self.tabs = self.create_tabs(
+            [
+                self.description_view.description_box,
+                self.overview_screen.overview_box,
+                self.stat_analysis_screen.statistical_analysis_box,
+                self.dec_rule_screen.decision_rule_box,
+            ],
+            tab_names=[name for name in self.tab_names if name != "Configurations"],
+        )
+        display(self.tabs)
 
+    def _create_result_screens(
+        self,
+        df_x: pd.DataFrame,
+        df_target: pd.DataFrame,
+        features: List[Feature],
+        target_features: List[Feature],
+        attributes: List[Attribute],
+        timestamp_column: str,
+        num_cases: int,
+    ):
+        """Create the overview, statistical analysis and decision rule screens."""
         # Create overview box
         self.overview_screen = OverviewScreenCaseDuration(
-            self.case_duration_processor.df_x,
-            self.case_duration_processor.df_target,
-            self.case_duration_processor.features,
-            self.case_duration_processor.target_features,
-            self.case_duration_processor.df_timestamp_column,
-            self.case_duration_processor.num_cases,
-        )
-        attributes = (
-            self.case_duration_processor.used_static_attributes
-            + self.case_duration_processor.used_dynamic_attributes
+            df_x,
+            df_target,
+            features,
+            target_features,
+            timestamp_column,
+            num_cases,
         )
 
         # Ceate statistical analysis tab
         self.stat_analysis_screen = StatisticalAnalysisScreen(
-            self.case_duration_processor.df_x,
-            self.case_duration_processor.df_target,
+            df_x,
+            df_target,
             attributes,
-            self.case_duration_processor.features,
-            self.case_duration_processor.target_features,
-            self.case_duration_processor.df_timestamp_column,
+            features,
+            target_features,
+            timestamp_column,
             datapoint_str="Cases",
         )
         self.stat_analysis_screen.create_statistical_screen()
 
         # Create decision rule miner box
-        df_combined = self.case_duration_processor.df_x
-        df_combined[
-            self.case_duration_processor.df_target.columns.tolist()
-        ] = self.case_duration_processor.df_target
+        # df_x is also used by the other screens (and may be a snapshot's frame),
+        # so the target columns are added to a copy
+        df_combined = df_x.copy()
+        df_combined[df_target.columns.tolist()] = df_target
 
         self.dec_rule_screen = DecisionRulesScreen(
             df_combined,
-            features=self.case_duration_processor.features,
-            target_features=self.case_duration_processor.target_features,
+            features=features,
+            target_features=target_features,
             attributes=attributes,
         )
         self.dec_rule_screen.create_decision_rule_screen()
@@ -281,27 +370,21 @@ class AnalysisCaseDuration:
         # )
         # self.expert_screen.create_expert_box()
 
-        # Create tabs
-        self.update_tabs(
-            [
-                self.description_view.description_box,
-                self.config_view.configurator_box,
-                self.overview_screen.overview_box,
-                self.stat_analysis_screen.statistical_analysis_box,
-                self.dec_rule_screen.decision_rule_box,
-            ]
-        )
-        # out.close()
-        # del out
-        # display(self.tabs)
-
-    def create_tabs(self, tab_contents: List[widgets.widget.Widget]):
+    def create_tabs(
+        self,
+        tab_contents: List[widgets.widget.Widget],
+        tab_names: Optional[List[str]] = None,
+    ):
         """Create the tabs for the GUI.
 
+        :param tab_contents: widgets of the tabs
+        :param tab_names: titles of the tabs. Defaults to self.tab_names
         :return:
         """
+        if tab_names is None:
+            tab_names = self.tab_names
         tab = Tab(tab_contents)
-        for i, el in enumerate(self.tab_names):
+        for i, el in enumerate(tab_names):
             tab.set_title(i, el)
 
         return tab
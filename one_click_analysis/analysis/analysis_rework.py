@@ -22,21 +22,35 @@ from one_click_analysis.gui.overview_screen import OverviewScreenRework
 from one_click_analysis.gui.statistical_analysis_screen import (
     StatisticalAnalysisScreen,
 )
+from one_click_analysis.process_config.process_config_cache import (
+    ProcessConfigCache,
+)
+from one_click_analysis.query_cache import QueryCache
 
 
 class AnalysisRework:
     """Analysis of potential effects on case duration."""
 
-    def __init__(self, login: Optional[dict] = None):
+    def __init__(
+        self,
+        login: Optional[dict] = None,
+        query_cache: Optional[QueryCache] = None,
+        metadata_cache: Optional[ProcessConfigCache] = None,
+    ):
         """
 
         :param datamodel: datamodel name or id
         :param celonis_login: dict with login information
+        :param query_cache: QueryCache to persist query results across sessions
+        :param metadata_cache: ProcessConfigCache to persist the datamodel metadata
+        across sessions
         """
 
         self.activity_table_str = None
         self.datamodel = None
         self.login = login
+        self.query_cache = query_cache
+        self.metadata_cache = metadata_cache
         self.dm = None
         self.process_config = None
         self.rework_processor = None
@@ -100,7 +114,11 @@ class AnalysisRework:
         """
         self.configurator = Configurator()
         config_dm = DatamodelConfig(
-            configurator=self.configurator, celonis_login=self.login, required=True
+            configurator=self.configurator,
+            celonis_login=self.login,
+            query_cache=self.query_cache,
+            metadata_cache=self.metadata_cache,
+            required=True,
         )
         config_activity_table = ActivityTableConfig(
             configurator=self.configurator,
@@ -188,11 +206,15 @@ class AnalysisRework:
         )
         display(self.tabs)
 
-    def run_analysis(self, out: widgets.Output):
-        # Reset fp from a previous run
-        out.append_stdout("\nFetching data and preprocessing...")
+    def _create_processor(
+        self, rework_activity: Optional[str] = None
+    ) -> ReworkProcessor:
+        """Create the ReworkProcessor from the configurations.
 
-        # Get configurations
+        :param rework_activity: activity. If None, the processor can only profile
+        the rework of all activities.
+        :return: ReworkProcessor
+        """
         datepicker_configs = self.configurator.config_dict.get("datepicker")
         if datepicker_configs is not None:
             start_date = datepicker_configs.get("date_start")
@@ -208,23 +230,26 @@ class AnalysisRework:
             "activity_table_str"
         ]
         is_closed_query = self.configurator.config_dict["is_closed"]["pql_query"]
-        rework_activity = self.configurator.config_dict["multi_activities"]["activity"]
 
-        used_static_attribute_descriptors = self.configurator.config_dict[
-            "attribute_selection"
-        ]["static_attributes"]
-        used_dynamic_attribute_descriptors = self.configurator.config_dict[
-            "attribute_selection"
-        ]["dynamic_attributes"]
-        considered_activity_table_cols = self.configurator.config_dict[
-            "attribute_selection"
-        ]["activity_table_cols"]
-        considered_case_level_table_cols = self.configurator.config_dict[
-            "attribute_selection"
-        ]["case_level_table_cols"]
+        # The attribute selection is not needed for profiling the rework
+        attribute_selection_configs = (
+            self.configurator.config_dict.get("attribute_selection") or {}
+        )
+        used_static_attribute_descriptors = attribute_selection_configs.get(
+            "static_attributes", []
+        )
+        used_dynamic_attribute_descriptors = attribute_selection_configs.get(
+            "dynamic_attributes", []
+        )
+        considered_activity_table_cols = attribute_selection_configs.get(
+            "activity_table_cols", []
+        )
+        considered_case_level_table_cols = attribute_selection_configs.get(
+            "case_level_table_cols", {}
+        )
         time_unit = "DAYS"
 
-        self.rework_processor = ReworkProcessor(
+        return ReworkProcessor(
             process_config=self.process_config,
             activity_table_str=activity_table_str,
             used_static_attribute_descriptors=used_static_attribute_descriptors,
@@ -237,6 +262,37 @@ class AnalysisRework:
             start_date=start_date,
             end_date=end_date,
         )
+
+    def scan_rework(self):
+        """Profile the rework of all activities. Only the datamodel, activity
+        table, closed cases and date configurations are needed. The detailed
+        analysis of a selected activity is run with run_analysis_for_activity.
+
+        :return: DataFrame with one row per activity, ranked by the number of cases
+        with rework
+        """
+        self.scan_processor = self._create_processor()
+        return self.scan_processor.scan_rework()
+
+    def run_analysis_for_activity(self, rework_activity: str, out: widgets.Output):
+        """Run the detailed analysis of an activity, e.g. one that was selected
+        from the result of scan_rework.
+
+        :param rework_activity: activity
+        :param out: output widget for the progress messages
+        """
+        self.configurator.config_dict["multi_activities"] = {
+            "activity": rework_activity
+        }
+        self.run_analysis(out)
+
+    def run_analysis(self, out: widgets.Output):
+        # Reset fp from a previous run
+        out.append_stdout("\nFetching data and preprocessing...")
+
+        # Get configurations
+        rework_activity = self.configurator.config_dict["multi_activities"]["activity"]
+        self.rework_processor = self._create_processor(rework_activity)
         self.rework_processor.process()
         out.append_stdout("\nDone")
 
@@ -251,7 +307,7 @@ class AnalysisRework:
             self.rework_processor.features,
             self.rework_processor.target_features,
             self.rework_processor.df_timestamp_column,
-            time_aggregation=time_unit,
+            time_aggregation=self.rework_processor.time_unit,
             case_duration_col_name=self.rework_processor.case_duration_attribute.attribute_name,  # noqa
             num_cases=self.rework_processor.num_cases,
         )
@@ -22,21 +22,35 @@ from one_click_analysis.gui.overview_screen import OverviewScreenRoutingDecision
 from one_click_analysis.gui.statistical_analysis_screen import (
     StatisticalAnalysisScreen,
 )
+from one_click_analysis.process_config.process_config_cache import (
+    ProcessConfigCache,
+)
+from one_click_analysis.query_cache import QueryCache
 
 
 class AnalysisRoutingDecisions:
     """Analysis of potential effects on case duration."""
 
-    def __init__(self, login: Optional[dict] = None):
+    def __init__(
+        self,
+        login: Optional[dict] = None,
+        query_cache: Optional[QueryCache] = None,
+        metadata_cache: Optional[ProcessConfigCache] = None,
+    ):
         """
 
         :param datamodel: datamodel name or id
         :param celonis_login: dict with login information
+        :param query_cache: QueryCache to persist query results across sessions
+        :param metadata_cache: ProcessConfigCache to persist the datamodel metadata
+        across sessions
         """
 
         self.activity_table_str = None
         self.datamodel = None
         self.login = login
+        self.query_cache = query_cache
+        self.metadata_cache = metadata_cache
         self.dm = None
         self.process_config = None
         self.routing_decision_processor = None
@@ -111,7 +125,11 @@ class AnalysisRoutingDecisions:
         """
         self.configurator = Configurator()
         config_dm = DatamodelConfig(
-            configurator=self.configurator, celonis_login=self.login, required=True
+            configurator=self.configurator,
+            celonis_login=self.login,
+            query_cache=self.query_cache,
+            metadata_cache=self.metadata_cache,
+            required=True,
         )
         config_activity_table = ActivityTableConfig(
             configurator=self.configurator,
@@ -201,10 +219,18 @@ class AnalysisRoutingDecisions:
         )
         display(self.tabs)
 
-    def run_analysis(self):
-        # Reset fp from a previous run
-
-        # Get configurations
+    def _create_processor(
+        self,
+        source_activity: Optional[str] = None,
+        target_activities: Optional[List[str]] = None,
+    ) -> RoutingDecisionProcessor:
+        """Create the RoutingDecisionProcessor from the configurations.
+
+        :param source_activity: source activity. If None, the processor can only
+        scan all decision points.
+        :param target_activities: target activities
+        :return: RoutingDecisionProcessor
+        """
         datepicker_configs = self.configurator.config_dict.get("datepicker")
         if datepicker_configs is not None:
             start_date = datepicker_configs.get("date_start")
@@ -220,26 +246,26 @@ class AnalysisRoutingDecisions:
             "activity_table_str"
         ]
         is_closed_query = self.configurator.config_dict["is_closed"]["pql_query"]
-        source_activity = self.configurator.config_dict["decisions"]["source_activity"]
-        target_activities = self.configurator.config_dict["decisions"][
-            "target_activities"
-        ]
 
-        used_static_attribute_descriptors = self.configurator.config_dict[
-            "attribute_selection"
-        ]["static_attributes"]
-        used_dynamic_attribute_descriptors = self.configurator.config_dict[
-            "attribute_selection"
-        ]["dynamic_attributes"]
-        considered_activity_table_cols = self.configurator.config_dict[
-            "attribute_selection"
-        ]["activity_table_cols"]
-        considered_case_level_table_cols = self.configurator.config_dict[
-            "attribute_selection"
-        ]["case_level_table_cols"]
+        # The attribute selection is not needed for scanning all decision points
+        attribute_selection_configs = (
+            self.configurator.config_dict.get("attribute_selection") or {}
+        )
+        used_static_attribute_descriptors = attribute_selection_configs.get(
+            "static_attributes", []
+        )
+        used_dynamic_attribute_descriptors = attribute_selection_configs.get(
+            "dynamic_attributes", []
+        )
+        considered_activity_table_cols = attribute_selection_configs.get(
+            "activity_table_cols", []
+        )
+        considered_case_level_table_cols = attribute_selection_configs.get(
+            "case_level_table_cols", {}
+        )
         time_unit = "DAYS"
 
-        self.routing_decision_processor = RoutingDecisionProcessor(
+        return RoutingDecisionProcessor(
             process_config=self.process_config,
             activity_table_str=activity_table_str,
             used_static_attribute_descriptors=used_static_attribute_descriptors,
@@ -253,6 +279,54 @@ class AnalysisRoutingDecisions:
             start_date=start_date,
             end_date=end_date,
         )
+
+    def scan_decision_points(self, min_share: float = 0.05, min_count: int = 1):
+        """Compute the decision distributions of all decision points. Only the
+        datamodel, activity table, closed cases and date configurations are
+        needed. The detailed analysis of a selected decision point is run with
+        run_analysis_for_decision.
+
+        :param min_share: minimum share of the outgoing transitions of an activity
+        that a successor needs to count as a target of the decision
+        :param min_count: minimum number of decisions of a decision point
+        :return: DecisionScan
+        """
+        self.scan_processor = self._create_processor()
+        return self.scan_processor.scan_decision_points(
+            min_share=min_share, min_count=min_count
+        )
+
+    def run_analysis_for_decision(
+        self, source_activity: str, target_activities: Optional[List[str]] = None
+    ):
+        """Run the detailed analysis of a decision point, e.g. one that was
+        selected from the result of scan_decision_points.
+
+        :param source_activity: source activity of the decision
+        :param target_activities: target activities. If None, the targets found
+        by scan_decision_points are used.
+        """
+        if target_activities is None:
+            target_activities = self.scan_processor.decision_scan.target_activities[
+                source_activity
+            ]
+        self.configurator.config_dict["decisions"] = {
+            "source_activity": source_activity,
+            "target_activities": target_activities,
+        }
+        self.run_analysis()
+
+    def run_analysis(self):
+        # Reset fp from a previous run
+
+        # Get configurations
+        source_activity = self.configurator.config_dict["decisions"]["source_activity"]
+        target_activities = self.configurator.config_dict["decisions"][
+            "target_activities"
+        ]
+        self.routing_decision_processor = self._create_processor(
+            source_activity, target_activities
+        )
         self.routing_decision_processor.process()
 
         # 3. Create the GUI
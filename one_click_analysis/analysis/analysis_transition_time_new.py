@@ -22,21 +22,35 @@ from one_click_analysis.gui.overview_screen import OverviewScreenTransitionTime
 from one_click_analysis.gui.statistical_analysis_screen import (
     StatisticalAnalysisScreen,
 )
+from one_click_analysis.process_config.process_config_cache import (
+    ProcessConfigCache,
+)
+from one_click_analysis.query_cache import QueryCache
 
 
 class AnalysisTransitionTime:
     """Analysis of potential effects on case duration."""
 
-    def __init__(self, login: Optional[dict] = None):
+    def __init__(
+        self,
+        login: Optional[dict] = None,
+        query_cache: Optional[QueryCache] = None,
+        metadata_cache: Optional[ProcessConfigCache] = None,
+    ):
         """
 
         :param datamodel: datamodel name or id
         :param celonis_login: dict with login information
+        :param query_cache: QueryCache to persist query results across sessions
+        :param metadata_cache: ProcessConfigCache to persist the datamodel metadata
+        across sessions
         """
 
         self.activity_table_str = None
         self.datamodel = None
         self.login = login
+        self.query_cache = query_cache
+        self.metadata_cache = metadata_cache
         self.dm = None
         self.process_config = None
         self.transition_time_processor = None
@@ -101,7 +115,11 @@ class AnalysisTransitionTime:
         """
         self.configurator = Configurator()
         config_dm = DatamodelConfig(
-            configurator=self.configurator, celonis_login=self.login, required=True
+            configurator=self.configurator,
+            celonis_login=self.login,
+            query_cache=self.query_cache,
+            metadata_cache=self.metadata_cache,
+            required=True,
         )
         config_activity_table = ActivityTableConfig(
             configurator=self.configurator,
@@ -191,10 +209,18 @@ class AnalysisTransitionTime:
         )
         display(self.tabs)
 
-    def run_analysis(self):
-        # Reset fp from a previous run
-
-        # Get configurations
+    def _create_processor(
+        self,
+        source_activity: Optional[str] = None,
+        target_activity: Optional[str] = None,
+    ) -> TransitionTimeProcessor:
+        """Create the TransitionTimeProcessor from the configurations.
+
+        :param source_activity: source activity. If None, the processor can only
+        scan all transitions.
+        :param target_activity: target activity
+        :return: TransitionTimeProcessor
+        """
         datepicker_configs = self.configurator.config_dict.get("datepicker")
         if datepicker_configs is not None:
             start_date = datepicker_configs.get("date_start")
@@ -211,24 +237,25 @@ class AnalysisTransitionTime:
         ]
         is_closed_query = self.configurator.config_dict["is_closed"]["pql_query"]
 
-        source_activity = self.configurator.config_dict["transition"]["source_activity"]
-        target_activity = self.configurator.config_dict["transition"]["target_activity"]
-
-        used_static_attribute_descriptors = self.configurator.config_dict[
-            "attribute_selection"
-        ]["static_attributes"]
-        used_dynamic_attribute_descriptors = self.configurator.config_dict[
-            "attribute_selection"
-        ]["dynamic_attributes"]
-        considered_activity_table_cols = self.configurator.config_dict[
-            "attribute_selection"
-        ]["activity_table_cols"]
-        considered_case_level_table_cols = self.configurator.config_dict[
-            "attribute_selection"
-        ]["case_level_table_cols"]
+        # The attribute selection is not needed for scanning all transitions
+        attribute_selection_configs = (
+            self.configurator.config_dict.get("attribute_selection") or {}
+        )
+        used_static_attribute_descriptors = attribute_selection_configs.get(
+            "static_attributes", []
+        )
+        used_dynamic_attribute_descriptors = attribute_selection_configs.get(
+            "dynamic_attributes", []
+        )
+        considered_activity_table_cols = attribute_selection_configs.get(
+            "activity_table_cols", []
+        )
+        considered_case_level_table_cols = attribute_selection_configs.get(
+            "case_level_table_cols", {}
+        )
         time_unit = "DAYS"
 
-        self.transition_time_processor = TransitionTimeProcessor(
+        return TransitionTimeProcessor(
             process_config=self.process_config,
             activity_table_str=activity_table_str,
             used_static_attribute_descriptors=used_static_attribute_descriptors,
@@ -242,6 +269,44 @@ class AnalysisTransitionTime:
             start_date=start_date,
             end_date=end_date,
         )
+
+    def scan_transitions(self, min_count: int = 1, sort_by: str = "p90"):
+        """Rank all directly-follows transitions by their durations. Only the
+        datamodel, activity table, closed cases and date configurations are
+        needed. The detailed analysis of a selected pair is run with
+        run_analysis_for_transition.
+
+        :param min_count: minimum number of occurrences of a transition
+        :param sort_by: column by which the transitions are ranked (descending)
+        :return: DataFrame with count, case count, mean, median and 90th
+        percentile of the durations of each transition
+        """
+        return self._create_processor().scan_transitions(
+            min_count=min_count, sort_by=sort_by
+        )
+
+    def run_analysis_for_transition(self, source_activity: str, target_activity: str):
+        """Run the detailed analysis of a transition, e.g. one that was selected
+        from the result of scan_transitions.
+
+        :param source_activity: source activity of the transition
+        :param target_activity: target activity of the transition
+        """
+        self.configurator.config_dict["transition"] = {
+            "source_activity": source_activity,
+            "target_activity": target_activity,
+        }
+        self.run_analysis()
+
+    def run_analysis(self):
+        # Reset fp from a previous run
+
+        # Get configurations
+        source_activity = self.configurator.config_dict["transition"]["source_activity"]
+        target_activity = self.configurator.config_dict["transition"]["target_activity"]
+        self.transition_time_processor = self._create_processor(
+            source_activity, target_activity
+        )
         self.transition_time_processor.process()
 
         # 3. Create the GUI
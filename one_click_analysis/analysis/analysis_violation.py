@@ -1,5 +1,6 @@
 from typing import Any
 from typing import List
+from typing import Optional
 
 from IPython.display import display
 from ipywidgets import HTML
@@ -15,6 +16,10 @@ from one_click_analysis.configuration.configurations import IsClosedConfig
 from one_click_analysis.configuration.configurator import Configurator
 from one_click_analysis.configuration.configurator_view import ConfiguratorView
 from one_click_analysis.gui.description_screen import DescriptionScreen
+from one_click_analysis.process_config.process_config_cache import (
+    ProcessConfigCache,
+)
+from one_click_analysis.query_cache import QueryCache
 from one_click_analysis.violation_processing.gui.violation_selection import (
     ViolationSelectionScreen,
 )
@@ -28,16 +33,26 @@ from one_click_analysis.violation_processing.violation_processor import (
 class AnalysisViolation:
     """Analysis of potential effects on case duration."""
 
-    def __init__(self, login=None):
+    def __init__(
+        self,
+        login: Optional[dict] = None,
+        query_cache: Optional[QueryCache] = None,
+        metadata_cache: Optional[ProcessConfigCache] = None,
+    ):
         """
 
         :param datamodel: datamodel name or id
         :param celonis_login: dict with login information
+        :param query_cache: QueryCache to persist query results across sessions
+        :param metadata_cache: ProcessConfigCache to persist the datamodel metadata
+        across sessions
         """
 
         self.activity_table_str = None
         self.datamodel = None
         self.login = login
+        self.query_cache = query_cache
+        self.metadata_cache = metadata_cache
         self.dm = None
         self.process_config = None
         self.case_duration_processor = None
@@ -90,7 +105,11 @@ class AnalysisViolation:
         """
         self.configurator = Configurator()
         config_dm = DatamodelConfig(
-            configurator=self.configurator, celonis_login=self.login, required=True
+            configurator=self.configurator,
+            celonis_login=self.login,
+            query_cache=self.query_cache,
+            metadata_cache=self.metadata_cache,
+            required=True,
         )
         config_activity_table = ActivityTableConfig(
             configurator=self.configurator,
@@ -0,0 +1,445 @@
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from pycelonis.celonis_api.pql import pql
+
+from one_click_analysis.extraction_scheduler import ExtractionScheduler
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    ActivityOccurenceAttribute,
+)
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    ReworkOccurrenceAttribute,
+)
+from one_click_analysis.feature_processing.event_sequences import create_filter_key
+from one_click_analysis.feature_processing.event_sequences import (
+    event_sequence_registry,
+)
+from one_click_analysis.feature_processing.event_sequences import flatten_filters
+from one_click_analysis.feature_processing.rework_profile import get_rework_profile
+from one_click_analysis.feature_processing.rework_profile import ReworkProfile
+from one_click_analysis.feature_processing.transition_matrix import (
+    get_transition_matrix,
+)
+from one_click_analysis.feature_processing.transition_matrix import (
+    TransitionMatrix,
+)
+from one_click_analysis.process_config.process_config import ProcessConfig
+
+
+@dataclass
+class ActivityCounts:
+    """Number of cases and per-activity case and rework counts of an activity
+    table for a set of filters"""
+
+    number_cases: int
+    # activity -> number of cases in which the activity occurs
+    case_counts: Dict[str, int]
+    # activity -> number of cases in which the activity occurs more than once
+    rework_counts: Dict[str, int]
+
+
+def query_activity_counts(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    activities: List[str],
+    filters: List[pql.PQLFilter],
+) -> ActivityCounts:
+    """Query the number of cases and the per-activity case and rework counts in a
+    single query.
+
+    :param process_config: ProcessConfig object
+    :param activity_table_str: name of the activity table
+    :param activities: activities for which the counts are queried
+    :param filters: filters of the query
+    :return: ActivityCounts
+    """
+    case_table_str = process_config.table_dict[activity_table_str].case_table_str
+    pql_query = pql.PQL()
+    pql_query.add(
+        pql.PQLColumn(name="number_cases", query=f'COUNT_TABLE("{case_table_str}")')
+    )
+    for i, act in enumerate(activities):
+        occurrence_attr = ActivityOccurenceAttribute(
+            process_config=process_config,
+            activity_table_str=activity_table_str,
+            activity=act,
+        )
+        pql_query.add(
+            pql.PQLColumn(
+                name=f"case_count_{i}",
+                query="SUM(" + occurrence_attr.pql_query.query + ")",
+            )
+        )
+        rework_attr = ReworkOccurrenceAttribute(
+            process_config=process_config,
+            activity_table_str=activity_table_str,
+            activity=act,
+        )
+        pql_query.add(
+            pql.PQLColumn(
+                name=f"rework_count_{i}",
+                query="SUM(" + rework_attr.pql_query.query + ")",
+            )
+        )
+    pql_query.add(flatten_filters(filters))
+    df = process_config.dm.get_data_frame(pql_query)
+    return ActivityCounts(
+        number_cases=int(df["number_cases"].values[0]),
+        case_counts={
+            act: int(df[f"case_count_{i}"].values[0])
+            for i, act in enumerate(activities)
+        },
+        rework_counts={
+            act: int(df[f"rework_count_{i}"].values[0])
+            for i, act in enumerate(activities)
+        },
+    )
+
+
+def query_transition_case_counts(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    source_activity: str,
+    activities: List[str],
+    filters: List[pql.PQLFilter],
+) -> Dict[str, int]:
+    """Query the number of cases in which each activity directly follows
+    source_activity in a single query.
+
+    :param process_config: ProcessConfig object
+    :param activity_table_str: name of the activity table
+    :param source_activity: source activity of the transitions
+    :param activities: target activities of the transitions
+    :param filters: filters of the query
+    :return: dictionary from target activity to number of cases
+    """
+    activity_table = process_config.table_dict[activity_table_str]
+    activity_col = f'"{activity_table_str}"."{activity_table.activity_col_str}"'
+    source_str = source_activity.replace("'", "''")
+    pql_query = pql.PQL()
+    for i, act in enumerate(activities):
+        act_str = act.replace("'", "''")
+        pql_query.add(
+            pql.PQLColumn(
+                name=f"case_count_{i}",
+                query=f"""
+                SUM(CASE WHEN PU_SUM("{activity_table.case_table_str}",
+                    CASE WHEN {activity_col} = '{source_str}'
+                    AND ACTIVITY_LEAD({activity_col}) = '{act_str}'
+                    THEN 1 ELSE 0 END) >= 1 THEN 1 ELSE 0 END)
+                """,
+            )
+        )
+    pql_query.add(flatten_filters(filters))
+    df = process_config.dm.get_data_frame(pql_query)
+    return {
+        act: int(df[f"case_count_{i}"].values[0]) for i, act in enumerate(activities)
+    }
+
+
+class ActivityPrefetcher:
+    """Fetches the activities and the activity counts of the selected activity
+    table in background threads while the user works on the next configurations.
+    The configurations get the results from this shared cache and only wait if a
+    fetch is still running. The activities are kept per activity table, the other
+    results only for the current filters.
+
+    The counts are aggregated by the PQL engine. With prefetch_event_sequences,
+    the TransitionMatrix and the ReworkProfile are prefetched instead and the
+    counts are taken from them. They need the event sequences, which hold the
+    event log in memory, but are shared with the processors."""
+
+    def __init__(self, max_workers: int = 2, prefetch_event_sequences: bool = False):
+        """
+        :param max_workers: maximum number of concurrent fetches
+        :param prefetch_event_sequences: whether the counts are taken from the
+        TransitionMatrix and the ReworkProfile, which are built from the event
+        sequences. Else they are queried with aggregate queries.
+        """
+        self.scheduler = ExtractionScheduler(max_workers=max_workers)
+        self.prefetch_event_sequences = prefetch_event_sequences
+        self._futures: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        # (process_config, activity_table_str, filters) of the current filters
+        self._current_filters: Optional[Tuple] = None
+
+    def prefetch(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: List[pql.PQLFilter],
+    ):
+        """Start fetching the activities and the activity counts for the filters,
+        or with prefetch_event_sequences, the TransitionMatrix and the
+        ReworkProfile. The results of the previous filters are removed if the
+        filters changed.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: current filters of the configurator
+        """
+        self._set_current_filters(process_config, activity_table_str, filters)
+        self._get_activities_future(process_config, activity_table_str)
+        if not self.prefetch_event_sequences:
+            self._get_counts_future(process_config, activity_table_str, filters)
+            return
+        self._get_derived_future(
+            get_transition_matrix, process_config, activity_table_str, filters
+        )
+        self._get_derived_future(
+            get_rework_profile, process_config, activity_table_str, filters
+        )
+
+    def get_activities(
+        self, process_config: ProcessConfig, activity_table_str: str
+    ) -> List[str]:
+        """Get the sorted activities of the process model of an activity table.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :return: sorted list of activities
+        """
+        return self._get_activities_future(process_config, activity_table_str).result()
+
+    def get_activity_counts(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: List[pql.PQLFilter],
+    ) -> ActivityCounts:
+        """Get the number of cases and per-activity case and rework counts from
+        the aggregate query.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: filters of the counts
+        :return: ActivityCounts
+        """
+        return self._get_counts_future(
+            process_config, activity_table_str, filters
+        ).result()
+
+    def get_rework_case_counts(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: List[pql.PQLFilter],
+    ) -> Dict[str, int]:
+        """Get the number of cases with rework of each activity.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: filters of the counts
+        :return: dictionary from activity to number of cases
+        """
+        activities = self.get_activities(process_config, activity_table_str)
+        if not self.prefetch_event_sequences:
+            return self.get_activity_counts(
+                process_config, activity_table_str, filters
+            ).rework_counts
+        rework_profile = self.get_rework_profile(
+            process_config, activity_table_str, filters
+        )
+        return {act: rework_profile.get_rework_case_count(act) for act in activities}
+
+    def get_transition_case_counts(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: List[pql.PQLFilter],
+        source_activity: str,
+    ) -> Dict[str, int]:
+        """Get the number of cases in which each activity directly follows
+        source_activity.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: filters of the counts
+        :param source_activity: source activity of the transitions
+        :return: dictionary from target activity to number of cases
+        """
+        activities = self.get_activities(process_config, activity_table_str)
+        if not self.prefetch_event_sequences:
+            self._set_current_filters(process_config, activity_table_str, filters)
+            return self._get_future(
+                (
+                    "transition_counts",
+                    id(process_config),
+                    activity_table_str,
+                    create_filter_key(filters),
+                    source_activity,
+                ),
+                query_transition_case_counts,
+                process_config,
+                activity_table_str,
+                source_activity,
+                activities,
+                filters,
+            ).result()
+        transition_matrix = self.get_transition_matrix(
+            process_config, activity_table_str, filters
+        )
+        return {
+            act: transition_matrix.get_case_count(source_activity, act)
+            for act in activities
+        }
+
+    def get_transition_matrix(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: List[pql.PQLFilter],
+    ) -> TransitionMatrix:
+        """Get the directly-follows matrix of an activity table.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: filters of the matrix
+        :return: TransitionMatrix
+        """
+        return self._get_derived_future(
+            get_transition_matrix, process_config, activity_table_str, filters
+        ).result()
+
+    def get_rework_profile(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: List[pql.PQLFilter],
+    ) -> ReworkProfile:
+        """Get the rework of all activities of an activity table.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: filters of the profile
+        :return: ReworkProfile
+        """
+        return self._get_derived_future(
+            get_rework_profile, process_config, activity_table_str, filters
+        ).result()
+
+    def clear(self):
+        """Remove all results, e.g. when another datamodel is selected"""
+        with self._lock:
+            self._futures = {}
+            self._current_filters = None
+
+    def _set_current_filters(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: List[pql.PQLFilter],
+    ):
+        """Remove the results of the previous filters from the prefetcher and the
+        event_sequence_registry if the filters changed."""
+        filter_set = (
+            id(process_config),
+            activity_table_str,
+            create_filter_key(filters),
+        )
+        with self._lock:
+            previous = self._current_filters
+            self._current_filters = (
+                process_config,
+                activity_table_str,
+                flatten_filters(filters),
+            )
+            if previous is None:
+                return
+            previous_set = (
+                id(previous[0]),
+                previous[1],
+                create_filter_key(previous[2]),
+            )
+            if previous_set == filter_set:
+                return
+            self._futures = {
+                key: future
+                for key, future in self._futures.items()
+                if key[1:4] != previous_set
+            }
+        event_sequence_registry.evict(*previous)
+
+    def _get_future(self, key: Tuple, fn, *args) -> Future:
+        """Get the future of key and submit fn if there is none. Failed fetches
+        are submitted again."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None or (future.done() and future.exception() is not None):
+                future = self.scheduler.submit(fn, *args)
+                self._futures[key] = future
+            return future
+
+    def _get_activities_future(
+        self, process_config: ProcessConfig, activity_table_str: str
+    ) -> Future:
+        return self._get_future(
+            ("activities", id(process_config), activity_table_str),
+            _fetch_activities,
+            process_config,
+            activity_table_str,
+        )
+
+    def _get_counts_future(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: List[pql.PQLFilter],
+    ) -> Future:
+        self._set_current_filters(process_config, activity_table_str, filters)
+        activities_future = self._get_activities_future(
+            process_config, activity_table_str
+        )
+
+        def fetch_counts():
+            return query_activity_counts(
+                process_config,
+                activity_table_str,
+                activities_future.result(),
+                filters,
+            )
+
+        return self._get_future(
+            (
+                "counts",
+                id(process_config),
+                activity_table_str,
+                create_filter_key(filters),
+            ),
+            fetch_counts,
+        )
+
+    def _get_derived_future(
+        self,
+        get_fn: Callable,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: List[pql.PQLFilter],
+    ) -> Future:
+        # The results are shared with the processors through the
+        # event_sequence_registry, so the prefetcher only needs to build them in
+        # the background
+        self._set_current_filters(process_config, activity_table_str, filters)
+        return self._get_future(
+            (
+                get_fn.__name__,
+                id(process_config),
+                activity_table_str,
+                create_filter_key(filters),
+            ),
+            get_fn,
+            process_config,
+            activity_table_str,
+            filters,
+        )
+
+
+def _fetch_activities(process_config: ProcessConfig, activity_table_str: str):
+    activity_table = process_config.table_dict[activity_table_str]
+    return sorted(activity_table.process_model.activities)
@@ -18,7 +18,6 @@ from ipywidgets import VBox
 from ipywidgets import widgets
 from pycelonis import get_celonis
 from pycelonis.celonis_api.errors import PyCelonisNotFoundError
-from pycelonis.celonis_api.pql import pql
 from pycelonis.celonis_api.pql.pql import PQLColumn
 from pycelonis.celonis_api.pql.pql import PQLFilter
 
@@ -27,10 +26,11 @@ from one_click_analysis.configuration.configurator import Configurator
 from one_click_analysis.feature_processing.attributes.attribute import (
     AttributeDescriptor,
 )
-from one_click_analysis.feature_processing.attributes.static_attributes import (
-    ReworkOccurrenceAttribute,
-)
 from one_click_analysis.process_config.process_config import ProcessConfig
+from one_click_analysis.process_config.process_config_cache import (
+    ProcessConfigCache,
+)
+from one_click_analysis.query_cache import QueryCache
 
 
 class Configuration(abc.ABC):
@@ -136,6 +136,9 @@ class Configuration(abc.ABC):
         configurations yet. It should write the configs and filters to the
         configurator and call the update methods subsequent configurations"""
         self.update_configurator()
+        # The filters may have changed, so prefetch the counts for the new filters
+        # while the subsequent configurations are built
+        self.configurator.prefetch()
         for sub_config in self.subsequent_configurations:
             sub_config.update()
 
@@ -384,6 +387,8 @@ class DatamodelConfig(Configuration):
         config_identifier: str = "datamodel",
         additional_prerequsit_config_ids: Optional[List[str]] = None,
         celonis_login: Optional[Dict[str, str]] = None,
+        query_cache: Optional[QueryCache] = None,
+        metadata_cache: Optional[ProcessConfigCache] = None,
         **kwargs,
     ):
         if "title" in kwargs:
@@ -400,6 +405,8 @@ class DatamodelConfig(Configuration):
             **kwargs,
         )
         self.celonis_login = celonis_login
+        self.query_cache = query_cache
+        self.metadata_cache = metadata_cache
         self.celonis = self._get_celonis()
         # Initialize config box
         self._create_config_box()
@@ -433,7 +440,11 @@ class DatamodelConfig(Configuration):
             try:
                 dm = self.celonis.datamodels.find(text_str)
                 self.config["datamodel"] = dm
-                self.config["process_config"] = ProcessConfig(datamodel=dm)
+                self.config["process_config"] = ProcessConfig(
+                    datamodel=dm,
+                    query_cache=self.query_cache,
+                    metadata_cache=self.metadata_cache,
+                )
                 self.apply()
             except PyCelonisNotFoundError:
                 return
@@ -526,6 +537,9 @@ class ActivityTableConfig(Configuration):
             if dropdown.value is None:
                 return
             self.config["activity_table_str"] = dropdown.value
+            self.configurator.set_prefetch_activity_table(
+                process_config, dropdown.value
+            )
             self.apply()
 
         apply_button.on_click(on_apply_clicked)
@@ -969,14 +983,19 @@ class TransitionConfig(Configuration):
             '<div style="line-height:140%; margin-top: 0px; margin-bottom: 0px; '
             'font-size: 14px;">Pick a target activity</div>'
         )
-        activity_table = process_config.table_dict[activity_table_str]
-        activities = activity_table.process_model.activities
-        # Sort activities
-        activities = sorted(activities)
+        activities = self.configurator.prefetcher.get_activities(
+            process_config, activity_table_str
+        )
 
         def on_source_activity_clicked(b):
             selected_source_activity = b.new
             self.config["source_activity"] = selected_source_activity
+            # Show the most frequent successors of the source activity first
+            selected_target_activity = self.config.get("target_activity")
+            target_activity_selection.options = self._get_target_activity_options(
+                process_config, activity_table_str, selected_source_activity, activities
+            )
+            target_activity_selection.value = selected_target_activity
 
         # Source Activity
         source_activity_selection = Select(
@@ -1034,6 +1053,37 @@ class TransitionConfig(Configuration):
         )
         self.config_box = box_config
 
+    def _get_target_activity_options(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        source_activity: Optional[str],
+        activities: List[str],
+    ) -> List[Tuple[str, str]]:
+        """Get the options of the target activity selection sorted by the number of
+        cases in which they directly follow the source activity.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param source_activity: selected source activity
+        :param activities: all activities
+        :return: list of (label, activity) tuples
+        """
+        if source_activity is None:
+            return [(act, act) for act in activities]
+        case_counts = self.configurator.prefetcher.get_transition_case_counts(
+            process_config,
+            activity_table_str,
+            self.configurator.get_all_filters(),
+            source_activity,
+        )
+        sorted_activities = sorted(
+            activities, key=lambda act: case_counts[act], reverse=True
+        )
+        return [
+            (act + "(" + str(case_counts[act]) + ")", act) for act in sorted_activities
+        ]
+
     @property
     def local_requirement_met(self) -> bool:
         if (
@@ -1118,10 +1168,9 @@ class DecisionConfig(Configuration):
             '<div style="line-height:140%; margin-top: 0px; margin-bottom: 0px; '
             'font-size: 14px;">Pick target activities</div>'
         )
-        activity_table = process_config.table_dict[activity_table_str]
-        activities = activity_table.process_model.activities
-        # Sort activities
-        activities = sorted(activities)
+        activities = self.configurator.prefetcher.get_activities(
+            process_config, activity_table_str
+        )
 
         def on_source_activity_clicked(b):
             self.selected_source_activity = b.new
@@ -1280,14 +1329,13 @@ class ReworkActivitySelection(Configuration):
             '<div style="line-height:140%; margin-top: 0px; margin-bottom: 0px; '
             'font-size: 14px;">Pick activity (Cases with rework on activity)</div>'
         )
-        activity_table = process_config.table_dict[activity_table_str]
-        activities = activity_table.process_model.activities
-        # Sort activities
-        activities = sorted(activities)
+        activities = self.configurator.prefetcher.get_activities(
+            process_config, activity_table_str
+        )
 
         # Get number of cases with rework for each activity
-        activity_rework_dict = self._get_number_reworks(
-            activities, process_config, activity_table
+        activity_rework_dict = self.configurator.prefetcher.get_rework_case_counts(
+            process_config, activity_table_str, self.configurator.get_all_filters()
         )
         # Sort activities by number of rework cases
         activities = [
@@ -1388,28 +1436,6 @@ class ReworkActivitySelection(Configuration):
         )
         self.config_box = box_config
 
-    def _get_number_reworks(
-        self, activities, process_config: ProcessConfig, activity_table
-    ) -> dict:
-        """Get dictionary of activities and number of cases with rework on activity"""
-
-        filters = self.configurator.get_all_filters()
-        pql_query = pql.PQL()
-        for act in activities:
-            rework_attr = ReworkOccurrenceAttribute(
-                process_config=process_config,
-                activity_table_str=activity_table.table_str,
-                activity=act,
-            )
-            query = "SUM(" + rework_attr.pql_query.query + ")"
-            pql_query.add(PQLColumn(name=act, query=query))
-        pql_query.add(filters)
-        df = process_config.dm.get_data_frame(pql_query)
-        act_dict = {}
-        for act in activities:
-            act_dict[act] = df[act].values[0]
-        return act_dict
-
     @property
     def local_requirement_met(self) -> bool:
         if self.config.get("activity") is not None:
@@ -1507,10 +1533,9 @@ class IsClosedConfig(Configuration):
             "activities:</div>"
         )
 
-        activity_table = process_config.table_dict[activity_table_str]
-        activities = activity_table.process_model.activities
-        # Sort activities
-        activities = sorted(activities)
+        activities = self.configurator.prefetcher.get_activities(
+            process_config, activity_table_str
+        )
 
         # Target Activities
         selected_activities = []
@@ -1,18 +1,34 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from pycelonis.celonis_api.pql import pql
 
+from one_click_analysis.configuration.activity_prefetcher import ActivityPrefetcher
+from one_click_analysis.process_config.process_config import ProcessConfig
+
 
 class Configurator:
     """Class that holds the configurations"""
 
-    def __init__(self):
+    def __init__(self, prefetch_event_sequences: bool = False):
+        """
+        :param prefetch_event_sequences: whether the activity counts are taken
+        from the results that are built from the event sequences (e.g. the
+        TransitionMatrix), which are prefetched in the background. They hold the
+        event log in memory. Else the counts are queried with aggregate queries.
+        """
         # Dictionary that holds configurations. It is structured as follows:
         # {"configuration_identifier_str": "some_config_key": config_value}
         self.config_dict: Dict[str : Dict[str:Any]] = {}
         # Dictionary that holds filters. It is structured as follows:
         # {"configuration_identifier_str": [PQLFilter1, PQLFilter2, ...]
         self.filter_dict: Dict[str : List[pql.PQLFilter]] = {}
+        # Shared cache of activities and activity counts that are fetched in the
+        # background once an activity table is selected
+        self.prefetcher = ActivityPrefetcher(
+            prefetch_event_sequences=prefetch_event_sequences
+        )
+        self._prefetch_process_config: Optional[ProcessConfig] = None
+        self._prefetch_activity_table_str: Optional[str] = None
 
     def get_all_filters(self) -> List[pql.PQLFilter]:
         """Get all filters stored in filter_dict as a list"""
@@ -20,3 +36,27 @@ class Configurator:
         for filters in self.filter_dict.values():
             all_filters.append(filters)
         return all_filters
+
+    def set_prefetch_activity_table(
+        self, process_config: ProcessConfig, activity_table_str: str
+    ):
+        """Set the activity table whose activities and activity counts are
+        prefetched, and start prefetching them.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the selected activity table
+        """
+        self._prefetch_process_config = process_config
+        self._prefetch_activity_table_str = activity_table_str
+        self.prefetch()
+
+    def prefetch(self):
+        """Start prefetching for the current filters, if an activity table is
+        selected"""
+        if self._prefetch_activity_table_str is None:
+            return
+        self.prefetcher.prefetch(
+            self._prefetch_process_config,
+            self._prefetch_activity_table_str,
+            self.get_all_filters(),
+        )
@@ -122,6 +122,16 @@ class DecisionRuleMiner:
         """create DataFrame used for training"""
         label_df = self._gen_label_df()
         df_train = self.df[self.attribute_labels]
+        # RIPPER needs dense columns. Only the used attributes are densified.
+        sparse_cols = [
+            col
+            for col in self.attribute_labels
+            if isinstance(df_train[col].dtype, pd.SparseDtype)
+        ]
+        if sparse_cols:
+            df_train = df_train.assign(
+                **{col: df_train[col].sparse.to_dense() for col in sparse_cols}
+            )
         df_train[self.preprocessed_label_col] = label_df[self.preprocessed_label_col]
         return df_train
 
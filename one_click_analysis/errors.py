@@ -54,3 +54,37 @@ class WrongFeatureTypeError(Exception):
             f"feature '{feature_col_name}' is: {datatype}"
         )
         super().__init__(message)
+
+
+class PQLParseError(Exception):
+    """Raised when a PQL string cannot be parsed by the local backend"""
+
+    def __init__(self, query: str, position: int, reason: str):
+        message = (
+            f"Could not parse PQL query at position {position} ({reason}): "
+            f"{query.strip()}"
+        )
+        super().__init__(message)
+
+
+class PQLNotSupportedError(Exception):
+    """Raised when the local backend encounters a PQL construct it cannot
+    evaluate"""
+
+    def __init__(self, construct: str):
+        message = (
+            f"The PQL construct '{construct}' is not supported by the local backend"
+        )
+        super().__init__(message)
+
+
+class SnapshotVersionError(Exception):
+    """Raised when a snapshot was written in a format version that cannot be
+    loaded"""
+
+    def __init__(self, path: str, version, supported_version):
+        message = (
+            f"The snapshot at '{path}' has format version {version}, but only "
+            f"version {supported_version} is supported"
+        )
+        super().__init__(message)
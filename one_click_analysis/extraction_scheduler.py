@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Optional
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class ExtractionScheduler:
+    """Runs independent extractions concurrently in a thread pool. Extractions are
+    I/O bound (they wait for the PQL engine), so a batch of them takes roughly as
+    long as its longest extraction.
+
+    The threads of a batch passed to run() are stopped when the batch is done, so
+    schedulers can be kept by long-lived objects without holding threads. Only
+    submit() uses a pool that lives until shutdown().
+
+    Extractions may themselves call run() on the same scheduler (e.g. extract_dfs
+    inside a batch of a processor). The number of extractions that run at the
+    same time is bounded by max_workers over all nested batches: an extraction
+    that waits for its nested batch gives its slot to the nested extractions."""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        :param max_workers: maximum number of concurrent extractions. With 1, all
+        extractions are run one after the other in the calling thread.
+        """
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(max(max_workers, 1))
+        self._local = threading.local()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule an extraction.
+
+        :param fn: function that runs the extraction
+        :param args: positional arguments of fn
+        :param kwargs: keyword arguments of fn
+        :return: Future with the result of fn
+        """
+        if self.max_workers <= 1:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="extraction"
+            )
+        return self._executor.submit(self._run_in_slot, fn, *args, **kwargs)
+
+    def run(self, *calls: Callable[[], Any]) -> List[Any]:
+        """Run extractions concurrently and wait for all of them.
+
+        :param calls: functions without arguments (e.g. functools.partial objects)
+        :return: results in the order of calls. If an extraction fails, the
+        remaining ones are cancelled and its exception is raised.
+        """
+        if self.max_workers <= 1 or len(calls) <= 1:
+            return [call() for call in calls]
+        holds_slot = getattr(self._local, "holds_slot", False)
+        if holds_slot:
+            # Called from one of our extractions. Free its slot while it waits
+            self._slots.release()
+        try:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(calls)),
+                thread_name_prefix="extraction",
+            ) as executor:
+                futures = [executor.submit(self._run_in_slot, call) for call in calls]
+                try:
+                    return [future.result() for future in futures]
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            if holds_slot:
+                self._slots.acquire()
+
+    def _run_in_slot(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn once one of the max_workers slots is free"""
+        with self._slots:
+            self._local.holds_slot = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.holds_slot = False
+
+    def shutdown(self):
+        """Stop the worker threads of submit()"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
@@ -0,0 +1,183 @@
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from one_click_analysis.feature_processing.event_sequences import EventSequences
+from one_click_analysis.feature_processing.transition_matrix import (
+    TransitionMatrix,
+)
+
+
+@dataclass
+class DecisionScan:
+    """Decision distributions of several decision points"""
+
+    # One row per decision point with the columns source_activity, count (number
+    # of decisions), num_targets and entropy (in bits) of the decision
+    # distribution, sorted by entropy
+    df_decision_points: pd.DataFrame
+    # One row per decision point and target with the columns source_activity,
+    # target_activity (None if no target follows), count and share
+    df_distributions: pd.DataFrame
+    # Target activities of each decision point
+    target_activities: Dict[str, List[str]]
+
+
+def get_decision_points(
+    transition_matrix: TransitionMatrix, min_share: float = 0.05
+) -> Dict[str, List[str]]:
+    """Get the activities that are directly followed by more than one activity.
+
+    :param transition_matrix: TransitionMatrix of the cases
+    :param min_share: minimum share of the outgoing transitions of an activity
+    that a successor needs to count as a target of the decision
+    :return: dictionary with keys=decision point activities and values=target
+    activities sorted by the number of transitions
+    """
+    decision_points = {}
+    for activity in transition_matrix.activities:
+        successors = transition_matrix.get_successors(activity).drop(
+            transition_matrix.process_end_str, errors="ignore"
+        )
+        successors = successors[successors >= min_share * successors.sum()]
+        if len(successors) > 1:
+            decision_points[activity] = successors.index.tolist()
+    return decision_points
+
+
+def compute_decision_distributions(
+    sequences: EventSequences,
+    decision_points: Dict[str, List[str]],
+    min_count: int = 1,
+) -> DecisionScan:
+    """Compute the decision distribution of each decision point with the same
+    semantics as RoutingDecisionProcessor: the decision of an occurrence of the
+    source activity is the next target activity that eventually follows it in the
+    case. If the source activity is not a target, repeated occurrences without a
+    target in between only count once.
+
+    :param sequences: EventSequences of the cases
+    :param decision_points: dictionary with keys=source activities and
+    values=target activities
+    :param min_count: minimum number of decisions of a decision point
+    :return: DecisionScan
+    """
+    num_events = len(sequences.activity_codes)
+    num_activities = len(sequences.activities)
+    positions = {act: i for i, act in enumerate(sequences.activities)}
+    activity_codes = sequences.activity_codes
+    case_positions = sequences.case_positions
+    event_positions = np.arange(num_events)
+
+    point_rows = []
+    distribution_rows = []
+    target_activities = {}
+    for source_activity, targets in decision_points.items():
+        if source_activity not in positions:
+            continue
+        targets = [t for t in targets if t in positions]
+        source_code = positions[source_activity]
+        is_target_code = np.zeros(num_activities, dtype=bool)
+        is_target_code[[positions[t] for t in targets]] = True
+        is_target = is_target_code[activity_codes]
+
+        # Position of the next target event after each event (num_events if there
+        # is none), found with a reverse running minimum
+        target_positions = np.where(is_target, event_positions, num_events)
+        next_target = np.full(num_events, num_events)
+        if num_events:
+            next_target[:-1] = np.minimum.accumulate(target_positions[::-1])[::-1][1:]
+        source_positions = np.flatnonzero(activity_codes == source_code)
+        decision_positions = next_target[source_positions]
+        has_decision = decision_positions < num_events
+        has_decision[has_decision] = (
+            case_positions[decision_positions[has_decision]]
+            == case_positions[source_positions[has_decision]]
+        )
+
+        if not is_target_code[source_code] and len(source_positions):
+            # Keep an occurrence if it is the first of its case or a target occurred
+            # since the previous occurrence
+            is_first = np.ones(len(source_positions), dtype=bool)
+            is_first[1:] = (
+                case_positions[source_positions[1:]]
+                != case_positions[source_positions[:-1]]
+            ) | (decision_positions[:-1] < source_positions[1:])
+            decision_positions = decision_positions[is_first]
+            has_decision = has_decision[is_first]
+
+        # Code num_activities stands for "no target follows"
+        decision_codes = np.full(len(decision_positions), num_activities)
+        decision_codes[has_decision] = activity_codes[decision_positions[has_decision]]
+        counts = np.bincount(decision_codes, minlength=num_activities + 1)
+        total = int(counts.sum())
+        if total < min_count:
+            continue
+        target_activities[source_activity] = targets
+        shares = counts / total
+        nonzero = shares[shares > 0]
+        point_rows.append(
+            {
+                "source_activity": source_activity,
+                "count": total,
+                "num_targets": len(targets),
+                "entropy": float(-(nonzero * np.log2(nonzero)).sum()),
+            }
+        )
+        for code in np.flatnonzero(counts):
+            distribution_rows.append(
+                {
+                    "source_activity": source_activity,
+                    "target_activity": sequences.activities[code]
+                    if code < num_activities
+                    else None,
+                    "count": int(counts[code]),
+                    "share": shares[code],
+                }
+            )
+
+    df_decision_points = pd.DataFrame(
+        point_rows, columns=["source_activity", "count", "num_targets", "entropy"]
+    )
+    df_decision_points = df_decision_points.sort_values(
+        "entropy", ascending=False, kind="mergesort"
+    ).reset_index(drop=True)
+    df_distributions = pd.DataFrame(
+        distribution_rows,
+        columns=["source_activity", "target_activity", "count", "share"],
+    )
+    return DecisionScan(
+        df_decision_points=df_decision_points,
+        df_distributions=df_distributions,
+        target_activities=target_activities,
+    )
+
+
+def scan_decision_points(
+    sequences: EventSequences,
+    min_share: float = 0.05,
+    min_count: int = 1,
+    decision_points: Optional[Dict[str, List[str]]] = None,
+) -> DecisionScan:
+    """Find all decision points of the cases and compute their decision
+    distributions.
+
+    :param sequences: EventSequences of the cases
+    :param min_share: minimum share of the outgoing transitions of an activity
+    that a successor needs to count as a target of the decision
+    :param min_count: minimum number of decisions of a decision point
+    :param decision_points: decision points with their target activities. If
+    None, they are taken from the directly-follows transitions.
+    :return: DecisionScan
+    """
+    if decision_points is None:
+        decision_points = get_decision_points(
+            TransitionMatrix(sequences), min_share=min_share
+        )
+    return compute_decision_distributions(
+        sequences, decision_points, min_count=min_count
+    )
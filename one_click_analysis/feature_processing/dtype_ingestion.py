@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype
+from pandas.api.types import is_float_dtype
+from pandas.api.types import is_integer_dtype
+from pandas.api.types import is_object_dtype
+
+_INT_DTYPES = [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32, np.int64]
+
+
+@dataclass
+class MemoryReport:
+    """Memory footprint of a DataFrame before and after compact_dtypes"""
+
+    before_bytes: int
+    after_bytes: int
+    # column name -> (old dtype, new dtype) of the converted columns
+    conversions: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+
+    @property
+    def reduction_factor(self) -> float:
+        if self.after_bytes == 0:
+            return 1.0
+        return self.before_bytes / self.after_bytes
+
+    def __str__(self):
+        return (
+            f"Memory: {self.before_bytes / 1024**2:.2f} MB -> "
+            f"{self.after_bytes / 1024**2:.2f} MB "
+            f"({self.reduction_factor:.1f}x smaller, "
+            f"{len(self.conversions)} columns converted)"
+        )
+
+
+def compact_dtypes(
+    df: pd.DataFrame,
+    float_rtol: float = 1e-6,
+    max_category_ratio: float = 0.5,
+) -> Tuple[pd.DataFrame, MemoryReport]:
+    """Convert the columns of an extracted DataFrame to compact dtypes:
+    - string columns to Categorical if at most max_category_ratio of the values are
+    distinct
+    - columns with only 0 and 1 to uint8
+    - integral columns without NaN to the smallest integer type
+    - other float columns to float32 if the relative error is at most float_rtol
+
+    :param df: DataFrame as returned by the extraction
+    :param float_rtol: maximum relative error of a conversion to float32
+    :param max_category_ratio: maximum ratio of distinct values to rows of a string
+    column that is converted to Categorical
+    :return: DataFrame with compact dtypes and the MemoryReport
+    """
+    before_bytes = int(df.memory_usage(deep=True).sum())
+    new_cols = {}
+    conversions = {}
+    for col_name in df.columns:
+        col = df[col_name]
+        new_col = _compact_column(col, float_rtol, max_category_ratio)
+        if new_col is not None and new_col.dtype != col.dtype:
+            new_cols[col_name] = new_col
+            conversions[col_name] = (str(col.dtype), str(new_col.dtype))
+    if new_cols:
+        # The unconverted columns are shared with the input DataFrame
+        df = df.copy(deep=False)
+        for col_name, new_col in new_cols.items():
+            df[col_name] = new_col
+    after_bytes = int(df.memory_usage(deep=True).sum())
+    return df, MemoryReport(before_bytes, after_bytes, conversions)
+
+
+def _compact_column(col: pd.Series, float_rtol: float, max_category_ratio: float):
+    """Compact version of col or None if it cannot be compacted"""
+    if is_object_dtype(col.dtype):
+        non_null = col.dropna()
+        if len(non_null.index) == 0 or not non_null.map(type).eq(str).all():
+            return None
+        if col.nunique(dropna=True) > max_category_ratio * len(col.index):
+            return None
+        return col.astype("category")
+    if is_bool_dtype(col.dtype):
+        return col.astype(np.uint8)
+    if not (is_integer_dtype(col.dtype) or is_float_dtype(col.dtype)):
+        return None
+    values = col.to_numpy()
+    if values.dtype == object:
+        # Nullable integer column with missing values
+        return None
+    if is_float_dtype(col.dtype):
+        if np.isnan(values).any() or not np.array_equal(values, np.round(values)):
+            if col.dtype == np.float32:
+                return None
+            return _to_float32(col, values, float_rtol)
+    if len(values) == 0:
+        return None
+    min_val, max_val = values.min(), values.max()
+    for dtype in _INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= min_val and max_val <= info.max:
+            return col.astype(dtype)
+    return None
+
+
+def _to_float32(col: pd.Series, values: np.ndarray, float_rtol: float):
+    """Convert to float32 if the values are close enough"""
+    with np.errstate(over="ignore", invalid="ignore"):
+        values_32 = values.astype(np.float32)
+    if np.allclose(values, values_32, rtol=float_rtol, atol=0, equal_nan=True):
+        return col.astype(np.float32)
+    return None
@@ -0,0 +1,348 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from pycelonis.celonis_api.pql.pql import PQL
+from pycelonis.celonis_api.pql.pql import PQLColumn
+from pycelonis.celonis_api.pql.pql import PQLFilter
+
+from one_click_analysis import utils
+from one_click_analysis.process_config.process_config import ProcessConfig
+
+
+@dataclass
+class EventSequences:
+    """Integer-coded event sequences of the cases of an activity table. The events
+    are sorted by case and by their position in the case."""
+
+    # Sorted activities. Events refer to them by their position.
+    activities: List[str]
+    # Case id of each case
+    case_ids: np.ndarray
+    # Timestamp of the first event of each case
+    case_starts: np.ndarray
+    # Position of the case of each event in case_ids
+    case_positions: np.ndarray
+    # Position of the activity of each event in activities
+    activity_codes: np.ndarray
+    # Timestamp of each event
+    timestamps: np.ndarray
+
+    @property
+    def number_cases(self) -> int:
+        return len(self.case_ids)
+
+    @property
+    def is_case_start(self) -> np.ndarray:
+        """Whether an event is the first event of its case"""
+        is_case_start = np.ones(len(self.case_positions), dtype=bool)
+        is_case_start[1:] = self.case_positions[1:] != self.case_positions[:-1]
+        return is_case_start
+
+    @property
+    def is_case_end(self) -> np.ndarray:
+        """Whether an event is the last event of its case"""
+        is_case_end = np.ones(len(self.case_positions), dtype=bool)
+        is_case_end[:-1] = self.case_positions[1:] != self.case_positions[:-1]
+        return is_case_end
+
+    def select_cases(self, case_mask: np.ndarray) -> "EventSequences":
+        """Get the sequences of a subset of the cases. The activity codes are kept,
+        so results of the subset can be compared with the ones of all cases.
+
+        :param case_mask: boolean array with one entry per case
+        :return: EventSequences of the selected cases
+        """
+        new_case_positions = np.cumsum(case_mask) - 1
+        event_mask = case_mask[self.case_positions]
+        return EventSequences(
+            activities=self.activities,
+            case_ids=self.case_ids[case_mask],
+            case_starts=self.case_starts[case_mask],
+            case_positions=new_case_positions[self.case_positions[event_mask]],
+            activity_codes=self.activity_codes[event_mask],
+            timestamps=self.timestamps[event_mask],
+        )
+
+    def select_period(
+        self, start: Optional[Any] = None, end: Optional[Any] = None
+    ) -> "EventSequences":
+        """Get the sequences of the cases that started in a period.
+
+        :param start: cases that started before start are removed. If None, there
+        is no lower bound.
+        :param end: cases that started at or after end are removed. If None, there
+        is no upper bound.
+        :return: EventSequences of the selected cases
+        """
+        case_mask = np.ones(self.number_cases, dtype=bool)
+        if start is not None:
+            case_mask &= self.case_starts >= np.datetime64(pd.Timestamp(start))
+        if end is not None:
+            case_mask &= self.case_starts < np.datetime64(pd.Timestamp(end))
+        return self.select_cases(case_mask)
+
+
+def build_event_sequences(df_events: pd.DataFrame) -> EventSequences:
+    """Encode extracted events.
+
+    :param df_events: DataFrame with the columns case_id, event_index (position
+    of the event in its case), activity and timestamp
+    :return: EventSequences
+    """
+    df_events = df_events[df_events["activity"].notnull()]
+    df_events = df_events.sort_values(["case_id", "event_index"], kind="mergesort")
+    activity_codes, activities = pd.factorize(df_events["activity"], sort=True)
+    case_positions, case_ids = pd.factorize(df_events["case_id"], sort=True)
+    timestamps = pd.to_datetime(df_events["timestamp"]).to_numpy()
+    is_case_start = np.ones(len(case_positions), dtype=bool)
+    is_case_start[1:] = case_positions[1:] != case_positions[:-1]
+    return EventSequences(
+        activities=list(activities),
+        case_ids=np.asarray(case_ids),
+        case_starts=timestamps[is_case_start],
+        case_positions=case_positions.astype(np.int64),
+        activity_codes=activity_codes.astype(np.int64),
+        timestamps=timestamps,
+    )
+
+
+def extract_event_sequences(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    filters: Optional[List[PQLFilter]] = None,
+    chunksize: int = 10000,
+) -> EventSequences:
+    """Query the events of all cases with a single query and encode them.
+
+    :param process_config: the ProcessConfig object
+    :param activity_table_str: name of the activity table
+    :param filters: filters that are applied to the query
+    :param chunksize: chunksize for the query
+    :return: EventSequences
+    """
+    activity_table = process_config.table_dict[activity_table_str]
+    activity_col = f'"{activity_table_str}"."{activity_table.activity_col_str}"'
+    query = PQL()
+    query.add(
+        PQLColumn(
+            name="case_id",
+            query=f'"{activity_table_str}"."{activity_table.caseid_col_str}"',
+        )
+    )
+    query.add(
+        PQLColumn(name="event_index", query=f"INDEX_ACTIVITY_ORDER({activity_col})")
+    )
+    query.add(PQLColumn(name="activity", query=activity_col))
+    query.add(
+        PQLColumn(
+            name="timestamp",
+            query=f'"{activity_table_str}"."{activity_table.eventtime_col_str}"',
+        )
+    )
+    for f in flatten_filters(filters):
+        query.add(f)
+    df_events = process_config.dm.get_data_frame(query, chunksize=chunksize)
+    return build_event_sequences(df_events)
+
+
+class EventSequenceRegistry:
+    """Holds the EventSequences per (datamodel, activity table, filters) and the
+    results derived from them (e.g. the TransitionMatrix), so that the
+    configurations and processors that need them share a single extraction.
+
+    EventSequences hold event-level arrays, so only the results of the
+    max_filter_sets most recently used sets of filters are kept."""
+
+    def __init__(self, max_filter_sets: int = 3):
+        """
+        :param max_filter_sets: maximum number of (datamodel, activity table,
+        filters) sets whose results are kept
+        """
+        self.max_filter_sets = max_filter_sets
+        # set key -> (datamodel, {result name -> result}), least recently used
+        # first. The datamodel is kept so that its id in the key is not reused.
+        self._results: "OrderedDict[Tuple, Tuple[Any, Dict[str, Any]]]" = OrderedDict()
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_event_sequences(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: Optional[List[PQLFilter]] = None,
+        chunksize: int = 10000,
+    ) -> EventSequences:
+        """Get the EventSequences and extract them if they do not exist yet.
+
+        :param process_config: the ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: filters of the extraction
+        :param chunksize: chunksize for the query
+        :return: EventSequences
+        """
+        return self._get(
+            "event_sequences",
+            process_config,
+            activity_table_str,
+            filters,
+            lambda: extract_event_sequences(
+                process_config, activity_table_str, filters, chunksize
+            ),
+        )
+
+    def get_derived(
+        self,
+        name: str,
+        build_fn: Callable[[EventSequences], Any],
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: Optional[List[PQLFilter]] = None,
+        chunksize: int = 10000,
+    ) -> Any:
+        """Get a result that is computed from the EventSequences and compute it if
+        it does not exist yet.
+
+        :param name: name of the result
+        :param build_fn: function that computes the result from the EventSequences
+        :param process_config: the ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: filters of the extraction
+        :param chunksize: chunksize for the query
+        :return: result of build_fn
+        """
+        return self._get(
+            name,
+            process_config,
+            activity_table_str,
+            filters,
+            lambda: build_fn(
+                self.get_event_sequences(
+                    process_config, activity_table_str, filters, chunksize
+                )
+            ),
+        )
+
+    def evict(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: Optional[List[PQLFilter]] = None,
+    ):
+        """Remove the results of a set of filters, e.g. when the filters of the
+        configurator changed.
+
+        :param process_config: the ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: filters of the extraction
+        """
+        set_key = self._create_set_key(process_config, activity_table_str, filters)
+        with self._lock:
+            self._remove(set_key)
+
+    def clear(self):
+        """Remove all results, e.g. after the datamodel was reloaded"""
+        with self._lock:
+            self._results = OrderedDict()
+            self._key_locks = {}
+
+    def __len__(self) -> int:
+        """Number of sets of filters with results"""
+        return len(self._results)
+
+    @staticmethod
+    def _create_set_key(
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: Optional[List[PQLFilter]],
+    ) -> Tuple:
+        dm = process_config.dm
+        return (
+            id(dm),
+            getattr(dm, "data_version", None),
+            activity_table_str,
+            create_filter_key(filters),
+        )
+
+    def _remove(self, set_key: Tuple):
+        self._results.pop(set_key, None)
+        for key in [key for key in self._key_locks if key[1:] == set_key]:
+            del self._key_locks[key]
+
+    def _get(
+        self,
+        name: str,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: Optional[List[PQLFilter]],
+        build: Callable[[], Any],
+    ) -> Any:
+        set_key = self._create_set_key(process_config, activity_table_str, filters)
+        with self._lock:
+            key_lock = self._key_locks.setdefault((name,) + set_key, threading.Lock())
+        # Concurrent requests for the same result wait for the first one
+        with key_lock:
+            with self._lock:
+                entry = self._results.get(set_key)
+                if entry is not None and name in entry[1]:
+                    self._results.move_to_end(set_key)
+                    return entry[1][name]
+            result = build()
+            with self._lock:
+                entry = self._results.setdefault(set_key, (process_config.dm, {}))
+                entry[1][name] = result
+                self._results.move_to_end(set_key)
+                while len(self._results) > self.max_filter_sets:
+                    self._remove(next(iter(self._results)))
+        return result
+
+
+event_sequence_registry = EventSequenceRegistry()
+
+
+def get_event_sequences(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    filters: Optional[List[PQLFilter]] = None,
+    chunksize: int = 10000,
+) -> EventSequences:
+    """Get the shared EventSequences of an activity table for a set of filters.
+
+    :param process_config: the ProcessConfig object
+    :param activity_table_str: name of the activity table
+    :param filters: filters of the extraction
+    :param chunksize: chunksize for the query
+    :return: EventSequences
+    """
+    return event_sequence_registry.get_event_sequences(
+        process_config, activity_table_str, filters, chunksize
+    )
+
+
+def create_filter_key(filters: Optional[List[PQLFilter]]) -> Tuple[str, ...]:
+    """Create a hashable key of filters that does not depend on their order and
+    whitespace.
+
+    :param filters: filters, possibly nested in lists
+    :return: tuple of the normalized filter queries
+    """
+    return tuple(sorted(" ".join(f.query.split()) for f in flatten_filters(filters)))
+
+
+def flatten_filters(filters) -> List[PQLFilter]:
+    """Flatten nested filter lists as returned by Configurator.get_all_filters"""
+    flat_filters = []
+    for f in utils.make_list(filters):
+        if isinstance(f, (list, tuple)):
+            flat_filters.extend(flatten_filters(f))
+        elif f is not None:
+            flat_filters.append(f)
+    return flat_filters
@@ -1,5 +1,8 @@
+import copy
+import functools
 from typing import Any
 from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Tuple
@@ -13,7 +16,11 @@ from pycelonis.celonis_api.pql.pql import PQLColumn
 from pycelonis.celonis_api.pql.pql import PQLFilter
 
 from one_click_analysis import utils
+from one_click_analysis.extraction_scheduler import ExtractionScheduler
 from one_click_analysis.feature_processing.attributes.attribute import AttributeDataType
+from one_click_analysis.feature_processing.attributes.dynamic_attributes import (
+    ActivityCountAttribute,
+)
 from one_click_analysis.feature_processing.attributes.dynamic_attributes import (
     ActivityDurationAttribute,
 )
@@ -65,6 +72,9 @@ from one_click_analysis.feature_processing.attributes.static_attributes import (
 from one_click_analysis.feature_processing.attributes.static_attributes import (
     WorkInProgressAttribute,
 )
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    WorkInProgressCaseStartAttribute,
+)
 from one_click_analysis.feature_processing.post_processing import PostProcessor
 from one_click_analysis.process_config.process_config import ActivityTable
 from one_click_analysis.process_config.process_config import ProcessConfig
@@ -72,6 +82,25 @@ from one_click_analysis.statistics.statistics_computer import StatisticsComputer
 
 pd.options.mode.chained_assignment = None
 
+# Attributes that can be computed from the pivoted activity counts of the cases
+ACTIVITY_PIVOT_ATTRIBUTE_TYPES = (
+    ActivityOccurenceAttribute,
+    StaticActivityCountAttribute,
+)
+# Attributes that can be computed from the cumulative activity counts of the events
+CUMULATIVE_COUNT_ATTRIBUTE_TYPES = (
+    PreviousActivityOccurrenceAttribute,
+    ActivityCountAttribute,
+)
+# Attributes whose values depend on the other cases in the filtered event log, so
+# they cannot be extracted in case chunks (see extract_dfs_chunked)
+CROSS_CASE_ATTRIBUTE_TYPES = (
+    WorkInProgressAttribute,
+    WorkInProgressCaseStartAttribute,
+)
+# Name of the helper column that identifies the events in dynamic extractions
+EVENT_INDEX_COL = "_event_index"
+
 
 def date_filter_PQL(
     process_config: ProcessConfig,
@@ -176,22 +205,23 @@ def gen_static_activity_occurence_attributes(
     is_feature: bool = True,
     is_class_feature: bool = False,
     filters=None,
+    metadata_planner: Optional["MetadataQueryPlanner"] = None,
 ) -> List[ActivityOccurenceAttribute]:
     """Generates the static ActivitiyOccurenceAttributes. If no activities are
     given, all activities are used and it's checked for min and max values. If
-    activities are given, it is not checked for min and max occurences."""
+    activities are given, it is not checked for min and max occurences. If a
+    metadata_planner is given, the valid activities are taken from it instead of
+    querying them with filters."""
 
     if activities is None:
-        activity_table = process_config.table_dict[activity_table_str]
-
-        activities = get_valid_vals(
-            table_name=activity_table_str,
-            column_names=[activity_table.activity_col_str],
+        activities = _get_valid_activities(
             process_config=process_config,
+            activity_table_str=activity_table_str,
             min_vals=min_vals,
             max_vals=max_vals,
             filters=filters,
-        )[activity_table.activity_col_str]
+            metadata_planner=metadata_planner,
+        )
 
     activity_occ_attributes = []
     for activity in activities:
@@ -216,16 +246,242 @@ def extract_dfs(
     target_variable: PQLColumn,
     filters: List[PQLFilter],
     key_activities: Optional[List[str]] = None,
+    activity_pivot: bool = False,
+    local_cumulative_counts: bool = False,
+    column_batch_size: Optional[int] = None,
+    max_workers: int = 1,
+    scheduler: Optional[ExtractionScheduler] = None,
+    chunksize: int = 10000,
 ) -> Tuple[Any, ...]:
-    """Extract dfs from datamodel using the ProcessModel object"""
+    """Extract dfs from datamodel using the ProcessModel object
+
+    If activity_pivot is True, the ActivityOccurenceAttributes and
+    StaticActivityCountAttributes are not queried as one column each. Instead, the
+    activity counts of all cases are queried once and pivoted locally into the same
+    columns.
+
+    If local_cumulative_counts is True, the same is done for the
+    PreviousActivityOccurrenceAttributes and ActivityCountAttributes. The activity
+    sequences are queried once and the running counts are computed locally. With
+    key_activities, the extractor only extracts the events of the key activities,
+    so the sequences are restricted to them as well.
+
+    If column_batch_size is given, the static attributes are split into batches of
+    at most column_batch_size columns that are extracted as separate queries and
+    joined on the case. With max_workers > 1, all queries are run concurrently.
+    If a scheduler is given, the queries are run with it instead, so that an
+    extraction inside a batch of the scheduler shares its max_workers.
+    """
     activity_table = process_config.table_dict[activity_table_str]
-    process_model = activity_table.process_model
-    # Get PQLColumns from the attributes
+    # Work on a copy so that concurrent extractions with different filters and key
+    # activities do not interfere
+    process_model = copy.copy(activity_table.process_model)
+    pivot_attributes = []
+    if activity_pivot:
+        pivot_attributes = [
+            attr
+            for attr in static_attributes
+            if isinstance(attr, ACTIVITY_PIVOT_ATTRIBUTE_TYPES)
+        ]
+        static_attributes = [
+            attr for attr in static_attributes if attr not in pivot_attributes
+        ]
+    cumulative_attributes = []
+    if local_cumulative_counts:
+        cumulative_attributes = [
+            attr
+            for attr in dynamic_attributes
+            if isinstance(attr, CUMULATIVE_COUNT_ATTRIBUTE_TYPES)
+        ]
+        dynamic_attributes = [
+            attr for attr in dynamic_attributes if attr not in cumulative_attributes
+        ]
     process_model.global_filters = filters
     process_model.key_activities = key_activities
-    static_attributes_pql = [attr.pql_query for attr in static_attributes]
-    if dynamic_attributes:
-        dynamic_attributes_pql = [attr.pql_query for attr in dynamic_attributes]
+    # The first batch of static attributes is extracted together with the dynamic
+    # attributes, the other batches are extracted separately and joined on the case
+    static_batches = [static_attributes]
+    if column_batch_size is not None and len(static_attributes) > column_batch_size:
+        static_batches = [
+            static_attributes[i : i + column_batch_size]
+            for i in range(0, len(static_attributes), column_batch_size)
+        ]
+    # Get PQLColumns from the attributes
+    dynamic_attributes_pql = [attr.pql_query for attr in dynamic_attributes]
+    if cumulative_attributes:
+        # Needed to join the locally computed counts to the extracted events
+        dynamic_attributes_pql.append(
+            PQLColumn(
+                name=EVENT_INDEX_COL,
+                query=f'INDEX_ACTIVITY_ORDER("{activity_table_str}"."'
+                f'{activity_table.activity_col_str}")',
+            )
+        )
+    calls = [
+        functools.partial(
+            _run_extractor,
+            process_config=process_config,
+            process_model=process_model,
+            target_variable=target_variable,
+            is_closed_indicator=is_closed_indicator,
+            static_attributes_pql=[attr.pql_query for attr in batch],
+            dynamic_attributes_pql=dynamic_attributes_pql if i == 0 else [],
+        )
+        for i, batch in enumerate(static_batches)
+    ]
+    if pivot_attributes:
+        calls.append(
+            functools.partial(
+                extract_activity_counts,
+                process_config=process_config,
+                activity_table_str=activity_table_str,
+                filters=filters,
+                chunksize=chunksize,
+            )
+        )
+    if cumulative_attributes:
+        calls.append(
+            functools.partial(
+                extract_activity_sequences,
+                process_config=process_config,
+                activity_table_str=activity_table_str,
+                filters=filters,
+                key_activities=key_activities,
+                chunksize=chunksize,
+            )
+        )
+    if scheduler is not None:
+        results = scheduler.run(*calls)
+    else:
+        with ExtractionScheduler(max_workers=max_workers) as scheduler:
+            results = scheduler.run(*calls)
+
+    if cumulative_attributes:
+        df_sequences = results.pop()
+    if pivot_attributes:
+        df_activity_counts = results.pop()
+    df_x, df_y = results[0]
+    if len(results) > 1:
+        df_x = join_static_batches(df_x, [df_batch for df_batch, _ in results[1:]])
+    if pivot_attributes:
+        df_x = add_activity_pivot_columns(df_x, df_activity_counts, pivot_attributes)
+    if cumulative_attributes:
+        df_cumulative_counts = compute_cumulative_activity_counts(
+            df_sequences,
+            activities=list(dict.fromkeys(a.activity for a in cumulative_attributes)),
+        )
+        df_x = add_cumulative_activity_columns(
+            df_x, df_cumulative_counts, cumulative_attributes
+        )
+    # df_y is a Series object. Make it a DataFrame
+    df_y = pd.DataFrame(df_y)
+    return df_x, df_y
+
+
+def extract_dfs_chunked(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    static_attributes: List[StaticAttribute],
+    dynamic_attributes: List[DynamicAttribute],
+    is_closed_indicator: PQLColumn,
+    target_variable: PQLColumn,
+    filters: List[PQLFilter],
+    case_chunk_size: int = 10000,
+    chunksize: int = 10000,
+    **kwargs,
+) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """Generator variant of extract_dfs. The case ids are split into lists of at
+    most case_chunk_size ids and the DataFrames are extracted and yielded list by
+    list, so only one chunk has to be held in memory. Each chunk is filtered on its
+    explicit case ids, so every case is in exactly one chunk, independent of how
+    PQL orders the case ids. As the filter also restricts the other cases, the
+    attributes in CROSS_CASE_ATTRIBUTE_TYPES are not supported.
+
+    :param case_chunk_size: maximum number of cases per chunk
+    :param chunksize: chunksize for the queries
+    :param kwargs: further arguments of extract_dfs
+    :return: iterator over the aligned (df_x, df_y) chunks
+    """
+    cross_case_attributes = [
+        attr.attribute_name
+        for attr in static_attributes
+        if isinstance(attr, CROSS_CASE_ATTRIBUTE_TYPES)
+    ]
+    if cross_case_attributes:
+        raise ValueError(
+            f"The attributes {cross_case_attributes} depend on the other cases and "
+            f"cannot be extracted in case chunks"
+        )
+    activity_table = process_config.table_dict[activity_table_str]
+    case_ids = get_case_ids(
+        process_config=process_config,
+        activity_table_str=activity_table_str,
+        filters=filters,
+        chunksize=chunksize,
+    )
+    caseid_col = f'"{activity_table_str}"."{activity_table.caseid_col_str}"'
+    for start in range(0, len(case_ids), case_chunk_size):
+        chunk_ids = case_ids[start : start + case_chunk_size]
+        case_filter = PQLFilter(
+            f"{caseid_col} IN ({', '.join(_pql_literal(i) for i in chunk_ids)})"
+        )
+        yield extract_dfs(
+            process_config=process_config,
+            activity_table_str=activity_table_str,
+            static_attributes=static_attributes,
+            dynamic_attributes=dynamic_attributes,
+            is_closed_indicator=is_closed_indicator,
+            target_variable=target_variable,
+            filters=list(filters) + [case_filter],
+            chunksize=chunksize,
+            **kwargs,
+        )
+
+
+def get_case_ids(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    filters: Optional[List[PQLFilter]] = None,
+    chunksize: int = 10000,
+) -> List[Any]:
+    """Get the distinct case ids of the activity table
+
+    :param process_config: the ProcessConfig object
+    :param activity_table_str: name of the activity table
+    :param filters: filters that are applied to the query
+    :param chunksize: chunksize for the query
+    :return: list of the distinct case ids in the order of the query result
+    """
+    activity_table = process_config.table_dict[activity_table_str]
+    query = PQL()
+    query.add(
+        PQLColumn(
+            name="case_id",
+            query=f'DISTINCT "{activity_table_str}"."{activity_table.caseid_col_str}"',
+        )
+    )
+    df = get_df_with_filters(process_config.dm, filters, query, chunksize=chunksize)
+    return df["case_id"].dropna().unique().tolist()
+
+
+def _pql_literal(value: Any) -> str:
+    """PQL literal of a case id"""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return str(value)
+    value = str(value).replace("'", "''")
+    return f"'{value}'"
+
+
+def _run_extractor(
+    process_config: ProcessConfig,
+    process_model,
+    target_variable: PQLColumn,
+    is_closed_indicator: PQLColumn,
+    static_attributes_pql: List[PQLColumn],
+    dynamic_attributes_pql: List[PQLColumn],
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """Extract the attributes with the extractors of prediction_builder"""
+    if dynamic_attributes_pql:
         extractor = PQLExtractor(
             process_model=process_model,
             target_variable=target_variable,
@@ -233,9 +489,6 @@ def extract_dfs(
             static_features=static_attributes_pql,
             dynamic_features=dynamic_attributes_pql,
         )
-        df_x, df_y = extractor.get_closed_cases(
-            process_config.dm, only_last_state=False
-        )
     else:
         extractor = StaticPQLExtractor(
             process_model=process_model,
@@ -243,12 +496,202 @@ def extract_dfs(
             is_closed_indicator=is_closed_indicator,
             static_features=static_attributes_pql,
         )
-        df_x, df_y = extractor.get_closed_cases(
-            process_config.dm, only_last_state=False
+    return extractor.get_closed_cases(process_config.dm, only_last_state=False)
+
+
+def join_static_batches(
+    df_x: pd.DataFrame, df_batches: List[pd.DataFrame]
+) -> pd.DataFrame:
+    """Join separately extracted batches of static attributes to df_x on the case.
+
+    :param df_x: DataFrame of the first batch. The first index level are the case
+    ids.
+    :param df_batches: DataFrames of the other batches with the case ids as index
+    :return: df_x with the columns of all batches
+    """
+    case_ids = df_x.index.get_level_values(0)
+    df_batch = pd.concat(
+        [df.sort_index() for df in df_batches], axis=1, join="outer"
+    ).sort_index()
+    if (
+        len(df_batch.index) > 0
+        and case_ids.is_monotonic_increasing
+        and df_batch.index.is_unique
+    ):
+        # Both sides are sorted, so the lookup can use binary search
+        positions = df_batch.index.searchsorted(case_ids)
+        positions = np.minimum(positions, len(df_batch.index) - 1)
+        df_batch = df_batch.iloc[positions]
+        df_batch.loc[df_batch.index != case_ids, :] = np.nan
+    else:
+        df_batch = df_batch.reindex(case_ids)
+    df_batch.index = df_x.index
+    return pd.concat([df_x, df_batch], axis=1)
+
+
+def extract_activity_counts(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    filters: Optional[List[PQLFilter]] = None,
+    chunksize: int = 10000,
+) -> pd.DataFrame:
+    """Query the number of occurrences of each activity in each case with a single
+    query and pivot the result.
+
+    :param process_config: the ProcessConfig object
+    :param activity_table_str: name of the activity table
+    :param filters: filters that are applied to the query
+    :param chunksize: chunksize for the query
+    :return: DataFrame with the case ids as index and one column per activity
+    """
+    activity_table = process_config.table_dict[activity_table_str]
+    caseid_col = f'"{activity_table_str}"."{activity_table.caseid_col_str}"'
+    activity_col = f'"{activity_table_str}"."{activity_table.activity_col_str}"'
+    query = PQL()
+    query.add(PQLColumn(name="case_id", query=caseid_col))
+    query.add(PQLColumn(name="activity", query=activity_col))
+    query.add(PQLColumn(name="count", query=f"COUNT({activity_col})"))
+    df = get_df_with_filters(process_config.dm, filters, query, chunksize=chunksize)
+    return df.pivot(index="case_id", columns="activity", values="count")
+
+
+def add_activity_pivot_columns(
+    df_x: pd.DataFrame,
+    df_activity_counts: pd.DataFrame,
+    attributes: List[StaticAttribute],
+) -> pd.DataFrame:
+    """Add the columns of ActivityOccurenceAttributes and
+    StaticActivityCountAttributes to df_x from the pivoted activity counts.
+
+    :param df_x: DataFrame from the extractor. The first index level are the case
+    ids.
+    :param df_activity_counts: DataFrame from extract_activity_counts
+    :param attributes: ActivityOccurenceAttributes and StaticActivityCountAttributes
+    :return: df_x with one new column per attribute
+    """
+    activities = list(dict.fromkeys(attr.activity for attr in attributes))
+    counts = df_activity_counts.reindex(
+        index=df_x.index.get_level_values(0), columns=activities
+    ).fillna(0)
+    new_cols = {}
+    for attr in attributes:
+        activity_counts = counts[attr.activity].to_numpy(dtype=int)
+        if isinstance(attr, ActivityOccurenceAttribute):
+            new_cols[attr.attribute_name] = (activity_counts >= 1).astype(int)
+        else:
+            new_cols[attr.attribute_name] = activity_counts
+    return pd.concat([df_x, pd.DataFrame(new_cols, index=df_x.index)], axis=1)
+
+
+def extract_activity_sequences(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    filters: Optional[List[PQLFilter]] = None,
+    key_activities: Optional[List[str]] = None,
+    chunksize: int = 10000,
+) -> pd.DataFrame:
+    """Query the activity sequences of all cases with a single query.
+
+    :param process_config: the ProcessConfig object
+    :param activity_table_str: name of the activity table
+    :param filters: filters that are applied to the query
+    :param key_activities: if given, only the events of these activities are
+    queried, as in the extraction of the dynamic attributes with key activities
+    :param chunksize: chunksize for the query
+    :return: DataFrame with the columns case_id, event_index (position of the event
+    in its case, starting at 1) and activity
+    """
+    activity_table = process_config.table_dict[activity_table_str]
+    activity_col = f'"{activity_table_str}"."{activity_table.activity_col_str}"'
+    query = PQL()
+    query.add(
+        PQLColumn(
+            name="case_id",
+            query=f'"{activity_table_str}"."{activity_table.caseid_col_str}"',
+        )
+    )
+    query.add(
+        PQLColumn(name="event_index", query=f"INDEX_ACTIVITY_ORDER({activity_col})")
+    )
+    query.add(PQLColumn(name="activity", query=activity_col))
+    filters = list(filters) if filters is not None else []
+    if key_activities is not None:
+        filters.append(
+            PQLFilter(
+                f"{activity_col} IN "
+                f"({', '.join(_pql_literal(act) for act in key_activities)})"
+            )
         )
-    # df_y is a Series object. Make it a DataFrame
-    df_y = pd.DataFrame(df_y)
-    return df_x, df_y
+    return get_df_with_filters(process_config.dm, filters, query, chunksize=chunksize)
+
+
+def compute_cumulative_activity_counts(
+    df_sequences: pd.DataFrame, activities: List[str]
+) -> pd.DataFrame:
+    """Compute for each event how often each activity occurred in its case up to and
+    including the event. This is the same as RUNNING_SUM(CASE WHEN activity = 'X'
+    THEN 1 ELSE 0 END, PARTITION BY (case)).
+
+    :param df_sequences: DataFrame from extract_activity_sequences
+    :param activities: activities for which the counts are computed
+    :return: DataFrame with index (case_id, event_index) and one int32 column per
+    activity
+    """
+    df_sequences = df_sequences.sort_values(
+        ["case_id", "event_index"], kind="mergesort"
+    )
+    activity_codes = pd.Categorical(
+        df_sequences["activity"], categories=activities
+    ).codes
+    num_events = len(df_sequences.index)
+    indicators = np.zeros((num_events, len(activities)), dtype=np.int32)
+    has_code = activity_codes >= 0
+    indicators[np.flatnonzero(has_code), activity_codes[has_code]] = 1
+    counts = indicators.cumsum(axis=0, dtype=np.int32)
+    # Subtract the counts before the first event of each case
+    case_ids = df_sequences["case_id"].to_numpy()
+    is_case_start = np.ones(num_events, dtype=bool)
+    is_case_start[1:] = case_ids[1:] != case_ids[:-1]
+    case_start_positions = np.flatnonzero(is_case_start)
+    case_lengths = np.diff(np.append(case_start_positions, num_events))
+    offsets = counts[case_start_positions] - indicators[case_start_positions]
+    counts -= np.repeat(offsets, case_lengths, axis=0)
+    index = pd.MultiIndex.from_arrays(
+        [case_ids, df_sequences["event_index"].to_numpy()],
+        names=["case_id", "event_index"],
+    )
+    return pd.DataFrame(counts, index=index, columns=activities)
+
+
+def add_cumulative_activity_columns(
+    df_x: pd.DataFrame,
+    df_cumulative_counts: pd.DataFrame,
+    attributes: List[DynamicAttribute],
+) -> pd.DataFrame:
+    """Add the columns of PreviousActivityOccurrenceAttributes and
+    ActivityCountAttributes to df_x from the cumulative activity counts and remove
+    the EVENT_INDEX_COL helper column.
+
+    :param df_x: DataFrame from the extractor. The first index level are the case
+    ids.
+    :param df_cumulative_counts: DataFrame from compute_cumulative_activity_counts
+    :param attributes: PreviousActivityOccurrenceAttributes and
+    ActivityCountAttributes
+    :return: df_x with one new column per attribute
+    """
+    event_index = pd.MultiIndex.from_arrays(
+        [df_x.index.get_level_values(0), df_x[EVENT_INDEX_COL].to_numpy()]
+    )
+    counts = df_cumulative_counts.reindex(event_index).fillna(0)
+    new_cols = {}
+    for attr in attributes:
+        activity_counts = counts[attr.activity].to_numpy(dtype=int)
+        if isinstance(attr, PreviousActivityOccurrenceAttribute):
+            new_cols[attr.attribute_name] = (activity_counts >= 1).astype(int)
+        else:
+            new_cols[attr.attribute_name] = activity_counts
+    df_x = df_x.drop(columns=EVENT_INDEX_COL)
+    return pd.concat([df_x, pd.DataFrame(new_cols, index=df_x.index)], axis=1)
 
 
 def get_valid_vals(
@@ -670,22 +1113,21 @@ def gen_dynamic_activity_occurence_attributes(
     is_feature: bool = True,
     is_class_feature: bool = False,
     filters: Optional[List[PQLFilter]] = None,
+    metadata_planner: Optional["MetadataQueryPlanner"] = None,
 ) -> List[PreviousActivityOccurrenceAttribute]:
     """Generates the dynamic PreviousActivityOccurrenceAttributes. If no
     activities are given, all activities are used and it's checked for min and
     max values. If activities are given, it is not checked for min and max
     occurences."""
-    activity_table = process_config.table_dict[activity_table_str]
     if activities is None:
-        activities_dict = get_valid_vals(
-            table_name=activity_table.table_str,
-            column_names=[activity_table.activity_col_str],
+        activities = _get_valid_activities(
             process_config=process_config,
+            activity_table_str=activity_table_str,
             min_vals=min_vals,
             max_vals=max_vals,
             filters=filters,
+            metadata_planner=metadata_planner,
         )
-    activities = activities_dict[activity_table.activity_col_str]
     activity_occ_attributes = []
     for activity in activities:
         attr = PreviousActivityOccurrenceAttribute(
@@ -708,20 +1150,19 @@ def gen_static_activity_count_attributes(
     is_feature: bool = True,
     is_class_feature: bool = False,
     filters: Optional[List[PQLFilter]] = None,
+    metadata_planner: Optional["MetadataQueryPlanner"] = None,
 ) -> List[PreviousActivityOccurrenceAttribute]:
     """Generates the static StaticActivityCountAttribute. All activities are used and
     it's checked for min and
     max values."""
-    activity_table = process_config.table_dict[activity_table_str]
-    activities_dict = get_valid_vals(
-        table_name=activity_table.table_str,
-        column_names=[activity_table.activity_col_str],
+    activities = _get_valid_activities(
         process_config=process_config,
+        activity_table_str=activity_table_str,
         min_vals=min_vals,
         max_vals=max_vals,
         filters=filters,
+        metadata_planner=metadata_planner,
     )
-    activities = activities_dict[activity_table.activity_col_str]
     activity_count_attributes = []
     for activity in activities:
         attr = StaticActivityCountAttribute(
@@ -767,6 +1208,191 @@ def get_number_cases(
     return num_cases
 
 
+class MetadataQueryPlanner:
+    """Collects the metadata that a processor needs before the extraction (the
+    number of cases and the case counts of column values) for one set of filters.
+    Requests are deduplicated and fetched together in execute(), so that e.g. the
+    activity occurrence, activity count and dynamic occurrence attributes share a
+    single query for the valid activities instead of one query each."""
+
+    def __init__(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        filters: Optional[List[PQLFilter]] = None,
+        chunksize: int = 10000,
+        scheduler: Optional[ExtractionScheduler] = None,
+    ):
+        """
+        :param process_config: the ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param filters: filters that are applied to all queries
+        :param chunksize: chunksize for the queries
+        :param scheduler: ExtractionScheduler that runs the pending queries
+        concurrently. If None, they are run one after the other.
+        """
+        self.process_config = process_config
+        self.activity_table_str = activity_table_str
+        self.filters = list(filters) if filters is not None else []
+        self.chunksize = chunksize
+        self.scheduler = scheduler or ExtractionScheduler(max_workers=1)
+        self.number_queries = 0
+        self._number_cases = None
+        self._number_cases_requested = False
+        self._pending_value_counts = []
+        # (table name, column name) -> DataFrame with columns 'value' and 'count'
+        self._value_counts = {}
+
+    def request_number_cases(self):
+        """Request the number of cases for the next execute()"""
+        self._number_cases_requested = True
+
+    def request_valid_vals(self, table_name: str, column_names: List[str]):
+        """Request the case counts of the values of columns for the next
+        execute()
+
+        :param table_name: name of the table
+        :param column_names: names of the columns
+        """
+        for column_name in column_names:
+            key = (table_name, column_name)
+            if key not in self._value_counts and key not in self._pending_value_counts:
+                self._pending_value_counts.append(key)
+
+    def request_activities(self):
+        """Request the case counts of the activities for the next execute()"""
+        activity_table = self.process_config.table_dict[self.activity_table_str]
+        self.request_valid_vals(
+            self.activity_table_str, [activity_table.activity_col_str]
+        )
+
+    def execute(self):
+        """Fetch all pending requests"""
+        query_number_cases = self._number_cases_requested and self._number_cases is None
+        calls = [
+            functools.partial(self._query_value_counts, table_name, column_name)
+            for table_name, column_name in self._pending_value_counts
+        ]
+        if query_number_cases:
+            calls.append(self._query_number_cases)
+        results = self.scheduler.run(*calls)
+        self.number_queries += len(calls)
+        if query_number_cases:
+            self._number_cases = results.pop()
+        for key, df in zip(self._pending_value_counts, results):
+            self._value_counts[key] = df
+        self._pending_value_counts = []
+
+    def _query_number_cases(self) -> int:
+        activity_table = self.process_config.table_dict[self.activity_table_str]
+        pql_str = (
+            f'COUNT(DISTINCT "{self.activity_table_str}".'
+            f'"{activity_table.caseid_col_str}")'
+        )
+        query = PQL()
+        query.add(PQLColumn(name="number_cases", query=pql_str))
+        df = get_df_with_filters(
+            self.process_config.dm, self.filters, query, chunksize=self.chunksize
+        )
+        return df["number_cases"].values[0]
+
+    def _query_value_counts(self, table_name: str, column_name: str) -> pd.DataFrame:
+        """Query the distinct values of a column with the number of cases in which
+        they occur."""
+        table = self.process_config.table_dict[table_name]
+        if isinstance(table, ActivityTable):
+            target_table_str = table.case_table_str
+        else:
+            target_table_str = table_name
+        query = PQL()
+        query.add(
+            PQLColumn(name="value", query=f'DISTINCT("{table_name}"."{column_name}")')
+        )
+        query.add(PQLColumn(name="count", query=f'COUNT_TABLE("{target_table_str}")'))
+        df = get_df_with_filters(
+            self.process_config.dm, self.filters, query, chunksize=self.chunksize
+        )
+        return df
+
+    def get_number_cases(self) -> int:
+        """Get the number of cases
+
+        :return: number of cases
+        """
+        if self._number_cases is None:
+            self.request_number_cases()
+            self.execute()
+        return self._number_cases
+
+    def get_min_max_attribute_counts(
+        self, min_counts_perc: float, max_counts_perc: float
+    ) -> Tuple[int, int]:
+        """Compute the minimum and maximum required attribute counts from the
+        number of cases.
+
+        :param min_counts_perc: minimum count percentage
+        :param max_counts_perc: maximum count percentage
+        :return: minimum and maximum attribute counts
+        """
+        num_cases = self.get_number_cases()
+        return round(num_cases * min_counts_perc), round(num_cases * max_counts_perc)
+
+    def get_valid_vals(
+        self,
+        table_name: str,
+        column_names: List[str],
+        min_vals: int = 0,
+        max_vals: int = np.inf,
+    ) -> Dict[str, List[Any]]:
+        """Get values of columns that occur in enough cases. Same as get_valid_vals
+        but the counts are only queried once per column.
+
+        :param table_name: name of the table
+        :param column_names: names of the columns
+        :param min_vals: minimum number of cases
+        :param max_vals: maximum number of cases
+        :return: dictionary with keys=column names and values: List of the valid
+        values in the column.
+        """
+        self.request_valid_vals(table_name, column_names)
+        self.execute()
+        valid_vals_dict = {}
+        for column_name in column_names:
+            df = self._value_counts[(table_name, column_name)]
+            valid_vals_dict[column_name] = df[
+                (df["count"] >= min_vals) & (df["count"] <= max_vals)
+            ]["value"].values.tolist()
+        return valid_vals_dict
+
+
+def _get_valid_activities(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    min_vals: int,
+    max_vals: int,
+    filters: Optional[List[PQLFilter]],
+    metadata_planner: Optional[MetadataQueryPlanner],
+) -> List[str]:
+    """Get the activities that occur in enough cases, from the metadata_planner if
+    it is given."""
+    activity_table = process_config.table_dict[activity_table_str]
+    if metadata_planner is not None:
+        return metadata_planner.get_valid_vals(
+            table_name=activity_table_str,
+            column_names=[activity_table.activity_col_str],
+            min_vals=min_vals,
+            max_vals=max_vals,
+        )[activity_table.activity_col_str]
+    return get_valid_vals(
+        table_name=activity_table_str,
+        column_names=[activity_table.activity_col_str],
+        process_config=process_config,
+        min_vals=min_vals,
+        max_vals=max_vals,
+        filters=filters,
+    )[activity_table.activity_col_str]
+
+
 def is_closed_all_cases():
     """Create is-closed Query when all cases shall be seen as closed"""
     pql_query = "MATCH_ACTIVITIES(EXCLUDING_ALL [])"
@@ -1,3 +1,13 @@
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from multiprocessing import shared_memory
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Tuple
@@ -5,8 +15,12 @@ from typing import Union
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import is_bool_dtype
+from pandas.api.types import is_categorical_dtype
+from pandas.api.types import is_integer_dtype
 from pandas.api.types import is_numeric_dtype
 from pandas.core.dtypes.common import is_string_dtype
+from scipy import sparse
 
 from one_click_analysis import utils
 from one_click_analysis.errors import WrongFeatureTypeError
@@ -17,6 +31,14 @@ from one_click_analysis.feature_processing.attributes.attribute import (
 from one_click_analysis.feature_processing.attributes.feature import Feature
 
 
+# Value of the column of the values that are encoded together (see PostProcessor).
+# If an attribute has a value OTHER_VALUE itself, a suffix is added (see
+# _get_other_value).
+OTHER_VALUE = "OTHER"
+# Prefix of the values of the columns of hashed attributes
+HASH_VALUE_PREFIX = "hash bucket "
+
+
 class PostProcessor:
     """Post processes a dataframe and generates a list of Feature objects."""
 
@@ -30,6 +52,11 @@ class PostProcessor:
         invalid_target_replacement: Optional[str] = None,
         min_counts_perc: float = 0.0,
         max_counts_perc: float = 1.0,
+        sparse_features: bool = False,
+        max_categories: Optional[int] = None,
+        other_bucket: bool = False,
+        hash_width: Optional[int] = None,
+        max_workers: int = 1,
     ):
         """
 
@@ -47,6 +74,22 @@ class PostProcessor:
         values, if they shall be replaced. If a value already
         :param min_counts_perc:
         :param max_counts_perc:
+        :param sparse_features: if True, the one-hot encoded feature columns are
+        stored as sparse columns, so that their memory scales with the number of
+        ones instead of rows x columns
+        :param max_categories: maximum number of value columns per categorical
+        attribute. Only the most frequent values get a column. If None, the number
+        is not limited.
+        :param other_bucket: if True, the values that get no column because they
+        occur too rarely or exceed max_categories are encoded together in the
+        column OTHER_VALUE (with a suffix if OTHER_VALUE is a value of the
+        attribute)
+        :param hash_width: if not None, the values of a categorical attribute are
+        hashed into hash_width columns instead (max_categories and other_bucket
+        are ignored)
+        :param max_workers: number of worker processes that encode the categorical
+        attributes (see _ProcessPoolEncoder). With 1, they are encoded in this
+        process.
         """
         self.df_x = df_x
         self.df_target = df_target
@@ -54,6 +97,11 @@ class PostProcessor:
         self.target_attributes = utils.make_list(target_attributes)
         self.valid_target_values = valid_target_values
         self.invalid_target_replacement = invalid_target_replacement
+        self.sparse_features = sparse_features
+        self.max_categories = max_categories
+        self.other_bucket = other_bucket
+        self.hash_width = hash_width
+        self.max_workers = max_workers
         self.min_counts, self.max_counts = self.compute_min_max_attribute_counts_PQL(
             min_counts_perc, max_counts_perc
         )
@@ -81,54 +129,130 @@ class PostProcessor:
             raise WrongFeatureTypeError(attr.attribute_name, attr_datatype)
 
     def process_feature_attributes(self, attributes: List[Attribute]):
-        feature_list = []
+        """Create the features and one-hot encode the categorical attributes that
+        are not encoded yet. Every categorical column is factorized once, values
+        with too few or too many occurrences are dropped on the code histogram, and
+        the indicator columns of all attributes are written into one preallocated
+        block (a sparse matrix if self.sparse_features) that replaces the original
+        columns of df_x.
+
+        With max_workers > 1, the attributes are factorized and the block is filled
+        in worker processes (see _ProcessPoolEncoder).
+
+        :param attributes: attributes of df_x
+        :return: list of features
+        """
+        encoded_names = []
         for attr in attributes:
             if not attr.is_feature:
                 continue
             self.validate_attr_datatype(attr)
-            # OHE if categorical and not yet encoded
-            if attr.data_type == AttributeDataType.CATEGORICAL and is_string_dtype(
+            if attr.data_type == AttributeDataType.CATEGORICAL and _is_string_column(
                 self.df_x[attr.attribute_name]
             ):
-                # Remove too few and too many occurences (set them to np.nan)
-                self.df_x.loc[
-                    (
-                        self.df_x[attr.attribute_name]
-                        .value_counts(dropna=False)[self.df_x[attr.attribute_name]]
-                        .values
-                        <= self.min_counts
-                    )
-                    | (
-                        self.df_x[attr.attribute_name]
-                        .value_counts(dropna=False)[self.df_x[attr.attribute_name]]
-                        .values
-                        >= self.max_counts
-                    ),
-                    attr.attribute_name,
-                ] = np.nan
+                encoded_names.append(attr.attribute_name)
+        encode_kwargs = dict(
+            min_counts=self.min_counts,
+            max_counts=self.max_counts,
+            max_categories=self.max_categories,
+            other_bucket=self.other_bucket,
+            hash_width=self.hash_width,
+        )
 
-                # One hot encode
-                prefix = attr.attribute_name
-                prefix_sep = " = "
-                df_attr_cols = pd.get_dummies(
-                    self.df_x[attr.attribute_name],
-                    prefix=prefix,
-                    prefix_sep=prefix_sep,
+        if self.max_workers > 1 and len(encoded_names) > 1 and len(self.df_x.index):
+            with _ProcessPoolEncoder(
+                self.df_x, encoded_names, self.max_workers, **encode_kwargs
+            ) as encoder:
+                self.df_x, feature_list = self._replace_encoded_columns(
+                    self.df_x,
+                    attributes,
+                    encoder.encode(),
+                    fill_block=None if self.sparse_features else encoder.fill_block,
                 )
+            return feature_list
 
-                # update target df
-                self._update_df(df=self.df_x, new_cols_df=df_attr_cols, attr=attr)
+        # attribute name -> (codes of the rows, kept values) of the attributes that
+        # are one-hot encoded
+        encodings = {
+            name: _encode_categorical(self.df_x[name], **encode_kwargs)
+            for name in encoded_names
+        }
+        self.df_x, feature_list = self._replace_encoded_columns(
+            self.df_x, attributes, encodings
+        )
+        return feature_list
+
+    def _replace_encoded_columns(
+        self,
+        df_x: pd.DataFrame,
+        attributes: List[Attribute],
+        encodings: Dict[str, Tuple[np.ndarray, List]],
+        fill_block: Optional[Callable[[Dict[str, int], int], np.ndarray]] = None,
+    ) -> Tuple[pd.DataFrame, List[Feature]]:
+        """Replace the columns of the one-hot encoded attributes with the indicator
+        columns of their kept values and create the features of all attributes.
 
+        :param df_x: DataFrame with the attribute columns
+        :param attributes: attributes of df_x
+        :param encodings: attribute name -> (codes of the rows, kept values) of the
+        attributes that are one-hot encoded
+        :param fill_block: function that creates the dense (columns, rows) block from
+        the position of the first column of each attribute and the number of
+        columns. If None, the block is filled here.
+        :return: df_x with the indicator columns and the features
+        """
+        feature_list = []
+        prefix_sep = " = "
+        num_rows = len(df_x.index)
+        num_cols = sum(len(values) for _, values in encodings.values())
+        # attribute name -> position of the first column of the attribute in the
+        # block
+        block_offsets = {}
+        block_cols = []
+        for attr in attributes:
+            if not attr.is_feature:
+                continue
+            if attr.attribute_name in encodings:
+                _, values = encodings[attr.attribute_name]
+                block_offsets[attr.attribute_name] = len(block_cols)
+                prefix = attr.attribute_name + prefix_sep
+                attr_cols = [f"{prefix}{value}" for value in values]
+                block_cols += attr_cols
                 features_attr = self._create_features(
-                    df=df_attr_cols, attr=attr, prefix=prefix + prefix_sep
+                    df=pd.DataFrame(columns=attr_cols), attr=attr, prefix=prefix
                 )
-                feature_list = feature_list + features_attr
             else:
                 features_attr = self._create_features(
-                    df=pd.DataFrame(self.df_x[attr.attribute_name]), attr=attr
+                    df=pd.DataFrame(columns=[attr.attribute_name]), attr=attr
                 )
-                feature_list = feature_list + features_attr
-        return feature_list
+            feature_list = feature_list + features_attr
+
+        if encodings:
+            if self.sparse_features:
+                positions = [
+                    _indicator_positions(codes, block_offsets[name])
+                    for name, (codes, _) in encodings.items()
+                ]
+                block_rows = np.concatenate([rows for rows, _ in positions])
+                matrix = sparse.csc_matrix(
+                    (
+                        np.ones(len(block_rows), dtype=np.uint8),
+                        (block_rows, np.concatenate([cols for _, cols in positions])),
+                    ),
+                    shape=(num_rows, num_cols),
+                )
+                df_block = _create_sparse_df(matrix, df_x.index, block_cols)
+            else:
+                if fill_block is None:
+                    # Filled as (columns, rows), which is how pandas stores the block
+                    block = np.zeros((num_cols, num_rows), dtype=np.uint8)
+                    for name, (codes, _) in encodings.items():
+                        _fill_block(block, codes, block_offsets[name])
+                else:
+                    block = fill_block(block_offsets, num_cols)
+                df_block = pd.DataFrame(block.T, index=df_x.index, columns=block_cols)
+            df_x = pd.concat([df_x.drop(columns=list(encodings)), df_block], axis=1)
+        return df_x, feature_list
 
     def process_target_attributes(self):
         """One-hot-encode the target feature"""
@@ -233,6 +357,577 @@ class PostProcessor:
         return min_counts, max_counts
 
 
+class ChunkedPostProcessor(PostProcessor):
+    """PostProcessor for DataFrames that are extracted in chunks (e.g. with
+    extract_dfs_chunked). The value counts of the categorical attributes are
+    collected from all chunks with fit_chunk first. Then every chunk is transformed
+    with transform_chunk, so that all chunks get the same one-hot encoded columns
+    as PostProcessor would create for the concatenated chunks.
+    """
+
+    def __init__(
+        self,
+        attributes: List[Attribute],
+        target_attributes: Union[Attribute, List[Attribute]],
+        valid_target_values: Optional[List[str]] = None,
+        invalid_target_replacement: Optional[str] = None,
+        min_counts_perc: float = 0.0,
+        max_counts_perc: float = 1.0,
+        sparse_features: bool = False,
+        max_categories: Optional[int] = None,
+        other_bucket: bool = False,
+        hash_width: Optional[int] = None,
+    ):
+        """See PostProcessor for the parameters."""
+        self.attributes = attributes
+        self.target_attributes = utils.make_list(target_attributes)
+        self.valid_target_values = valid_target_values
+        self.invalid_target_replacement = invalid_target_replacement
+        self.min_counts_perc = min_counts_perc
+        self.max_counts_perc = max_counts_perc
+        self.sparse_features = sparse_features
+        self.max_categories = max_categories
+        self.other_bucket = other_bucket
+        self.hash_width = hash_width
+        self.num_rows = 0
+        self.min_counts = None
+        self.max_counts = None
+        # attribute name -> value counts over all chunks of the attributes that are
+        # one-hot encoded
+        self.value_counts: Dict[str, pd.Series] = {}
+        self.target_value_counts: Dict[str, pd.Series] = {}
+        # attribute name -> (all values, column position of each value) of the
+        # attributes that are one-hot encoded
+        self.value_codes: Dict[str, Tuple[pd.Index, np.ndarray]] = {}
+        self.kept_values: Dict[str, List] = {}
+        # attribute name -> categories that get a one-hot encoded target column
+        self.target_categories: Dict[str, List] = {}
+        self.features = None
+        self.target_features = None
+
+    def fit_chunk(self, df_x: pd.DataFrame, df_target: pd.DataFrame):
+        """Collect the value counts of a chunk
+
+        :param df_x: chunk of df_x
+        :param df_target: chunk of df_target
+        """
+        self.num_rows += len(df_target.index)
+        for attr in self.attributes:
+            if not attr.is_feature:
+                continue
+            self.validate_attr_datatype(attr)
+            col = df_x[attr.attribute_name]
+            if attr.data_type == AttributeDataType.CATEGORICAL and (
+                _is_string_column(col) or attr.attribute_name in self.value_counts
+            ):
+                codes, values = _factorize(col, self.hash_width)
+                counts = np.bincount(codes[codes >= 0], minlength=len(values))
+                self.value_counts[attr.attribute_name] = _add_value_counts(
+                    self.value_counts.get(attr.attribute_name),
+                    pd.Series(counts, index=values),
+                )
+        for target_attr in self.target_attributes:
+            self.validate_attr_datatype(target_attr)
+            target_col_name = target_attr.attribute_name
+            col = df_target[target_col_name]
+            if target_attr.data_type == AttributeDataType.CATEGORICAL and (
+                not is_numeric_dtype(col) or target_col_name in self.target_value_counts
+            ):
+                self.target_value_counts[target_col_name] = _add_value_counts(
+                    self.target_value_counts.get(target_col_name),
+                    self._replace_invalid_target_values(col).value_counts(),
+                )
+
+    def finish_fit(self):
+        """Select the one-hot encoded columns and create the features after all
+        chunks were passed to fit_chunk."""
+        self.min_counts = round(self.min_counts_perc * self.num_rows)
+        self.max_counts = round(self.max_counts_perc * self.num_rows)
+        encodings = {}
+        for name, counts in self.value_counts.items():
+            if self.hash_width is None:
+                # Same order as the sorted factorization of PostProcessor
+                counts = counts[counts > 0]
+                counts = counts.reindex(
+                    pd.factorize(counts.index.to_numpy(dtype=object), sort=True)[1]
+                )
+            else:
+                counts = counts.reindex(
+                    [f"{HASH_VALUE_PREFIX}{i}" for i in range(self.hash_width)],
+                    fill_value=0,
+                )
+            values = counts.index.to_numpy(dtype=object)
+            value_codes, kept_values = _select_values(
+                values,
+                counts.to_numpy(dtype=np.int64),
+                self.min_counts,
+                self.max_counts,
+                max_categories=self.max_categories,
+                other_bucket=self.other_bucket,
+                hash_width=self.hash_width,
+            )
+            self.value_codes[name] = (pd.Index(values), value_codes)
+            self.kept_values[name] = kept_values
+            encodings[name] = (np.empty(0, dtype=np.int64), kept_values)
+        _, self.features = self._replace_encoded_columns(
+            pd.DataFrame(columns=[attr.attribute_name for attr in self.attributes]),
+            self.attributes,
+            encodings,
+        )
+
+        self.target_categories = {
+            name: list(pd.factorize(counts.index.to_numpy(dtype=object), sort=True)[1])
+            for name, counts in self.target_value_counts.items()
+        }
+        self.target_features = []
+        for target_attr in self.target_attributes:
+            target_col_name = target_attr.attribute_name
+            if target_col_name in self.target_categories:
+                self.target_features += self._create_features(
+                    df=_one_hot_encode(
+                        pd.Series([], dtype=object),
+                        self.target_categories[target_col_name],
+                        prefix=target_col_name,
+                    ),
+                    attr=target_attr,
+                    prefix=target_col_name + " = ",
+                )
+            else:
+                self.target_features += self._create_features(
+                    df=pd.DataFrame(columns=[target_col_name]), attr=target_attr
+                )
+
+    def transform_chunk(
+        self, df_x: pd.DataFrame, df_target: pd.DataFrame
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """One-hot encode a chunk with the values selected in finish_fit.
+
+        :param df_x: chunk of df_x
+        :param df_target: chunk of df_target
+        :return: processed chunks of df_x and df_target
+        """
+        for target_attr in self.target_attributes:
+            target_col_name = target_attr.attribute_name
+            if target_col_name not in self.target_categories:
+                continue
+            df_target_cols = _one_hot_encode(
+                self._replace_invalid_target_values(df_target[target_col_name]),
+                self.target_categories[target_col_name],
+                prefix=target_col_name,
+            )
+            self._update_df(df=df_target, new_cols_df=df_target_cols, attr=target_attr)
+
+        encodings = {}
+        for name, (values, value_codes) in self.value_codes.items():
+            codes, chunk_values = _factorize(df_x[name], self.hash_width)
+            if self.hash_width is None:
+                # Column position of the values of the chunk
+                chunk_value_codes = value_codes[values.get_indexer(chunk_values)]
+            else:
+                chunk_value_codes = value_codes
+            is_value = codes >= 0
+            codes[is_value] = chunk_value_codes[codes[is_value]]
+            encodings[name] = (codes, self.kept_values[name])
+        df_x, _ = self._replace_encoded_columns(df_x, self.attributes, encodings)
+        return df_x, df_target
+
+    def process_chunks(
+        self,
+        chunk_factory: Callable[[], Iterable[Tuple[pd.DataFrame, pd.DataFrame]]],
+    ) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """Fit on all chunks and then yield the transformed chunks. The chunks are
+        iterated twice, so chunk_factory has to return a new iterator with the same
+        chunks on every call (e.g. a function that calls extract_dfs_chunked, whose
+        queries are answered from a QueryCache the second time).
+
+        :param chunk_factory: function that returns an iterator over the chunks
+        :return: iterator over the processed (df_x, df_target) chunks
+        """
+        for df_x, df_target in chunk_factory():
+            self.fit_chunk(df_x, df_target)
+        self.finish_fit()
+        for df_x, df_target in chunk_factory():
+            yield self.transform_chunk(df_x, df_target)
+
+    def _replace_invalid_target_values(self, col: pd.Series) -> pd.Series:
+        if not self.valid_target_values:
+            return col
+        replacement = (
+            np.nan
+            if self.invalid_target_replacement is None
+            else self.invalid_target_replacement
+        )
+        return col.where(col.isin(self.valid_target_values), replacement)
+
+
+def _is_string_column(col: pd.Series) -> bool:
+    """Whether col contains strings, also as Categorical (see compact_dtypes)"""
+    if is_categorical_dtype(col.dtype):
+        return is_string_dtype(col.cat.categories.dtype)
+    return is_string_dtype(col)
+
+
+def _remove_unused_categories(col: pd.Series) -> pd.Series:
+    """Remove categories without values, so that get_dummies creates no empty
+    columns for them"""
+    if is_categorical_dtype(col.dtype):
+        return col.cat.remove_unused_categories()
+    return col
+
+
+def _encode_categorical(
+    col: pd.Series,
+    min_counts: int,
+    max_counts: int,
+    max_categories: Optional[int] = None,
+    other_bucket: bool = False,
+    hash_width: Optional[int] = None,
+) -> Tuple[np.ndarray, List]:
+    """Factorize col and drop the values that occur at most min_counts or at least
+    max_counts times. See PostProcessor for max_categories, other_bucket and
+    hash_width.
+
+    :param col: column to factorize
+    :param min_counts: values with at most min_counts occurrences are dropped
+    :param max_counts: values with at least max_counts occurrences are dropped
+    :param max_categories: maximum number of kept values
+    :param other_bucket: whether to fold the values that are dropped because of
+    min_counts or max_categories into one other value (see _get_other_value)
+    :param hash_width: number of hash buckets, if the values are hashed
+    :return: codes of the rows (-1 for NaN and dropped values) and the kept values
+    in the column order of get_dummies
+    """
+    codes, values = _factorize(col, hash_width)
+    if len(values) == 0:
+        return codes, []
+    counts = np.bincount(codes[codes >= 0], minlength=len(values))
+    value_codes, kept_values = _select_values(
+        values,
+        counts,
+        min_counts,
+        max_counts,
+        max_categories=max_categories,
+        other_bucket=other_bucket,
+        hash_width=hash_width,
+    )
+    codes = np.where(codes >= 0, value_codes[codes], -1)
+    return codes, kept_values
+
+
+def _factorize(
+    col: pd.Series, hash_width: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Factorize col with sorted values, or into hash buckets.
+
+    :param col: column to factorize
+    :param hash_width: number of hash buckets, if the values are hashed
+    :return: codes of the rows (-1 for NaN) and the values (bucket names if
+    hashed)
+    """
+    codes, values = pd.factorize(_remove_unused_categories(col), sort=True)
+    values = np.asarray(values, dtype=object)
+    if hash_width is not None and len(values) > 0:
+        # Map the values to their buckets. hash_array is stable across sessions.
+        value_buckets = (pd.util.hash_array(values) % hash_width).astype(np.int64)
+        codes = np.where(codes >= 0, value_buckets[codes], -1)
+        values = np.array(
+            [f"{HASH_VALUE_PREFIX}{i}" for i in range(hash_width)], dtype=object
+        )
+    return codes, values
+
+
+def _select_values(
+    values: np.ndarray,
+    counts: np.ndarray,
+    min_counts: int,
+    max_counts: int,
+    max_categories: Optional[int] = None,
+    other_bucket: bool = False,
+    hash_width: Optional[int] = None,
+) -> Tuple[np.ndarray, List]:
+    """Select the values of an attribute that get an indicator column from their
+    counts. See _encode_categorical for the parameters.
+
+    :param values: values of the attribute as returned by _factorize
+    :param counts: number of rows with each value
+    :return: column position of each value (-1 if it gets no column) and the kept
+    values
+    """
+    is_kept = (counts > min_counts) & (counts < max_counts)
+    # Values that are dropped because of min_counts or max_categories
+    is_tail = (counts > 0) & (counts <= min_counts)
+    if (
+        hash_width is None
+        and max_categories is not None
+        and is_kept.sum() > max_categories
+    ):
+        kept_positions = np.flatnonzero(is_kept)
+        order = np.argsort(-counts[kept_positions], kind="stable")
+        tail_positions = kept_positions[order[max_categories:]]
+        is_kept[tail_positions] = False
+        is_tail[tail_positions] = True
+    is_other = (
+        is_tail if other_bucket and hash_width is None else np.zeros_like(is_tail)
+    )
+    # The other column has to fulfill the count thresholds as well
+    if not min_counts < counts[is_other].sum() < max_counts:
+        is_other = np.zeros_like(is_tail)
+
+    value_codes = np.where(is_kept, np.cumsum(is_kept) - 1, -1)
+    kept_values = list(values[is_kept])
+    if is_other.any():
+        value_codes[is_other] = len(kept_values)
+        kept_values.append(_get_other_value(values))
+    return value_codes, kept_values
+
+
+class _ProcessPoolEncoder:
+    """Encodes categorical columns of a DataFrame in worker processes. The
+    factorization and the filling of the indicator block are GIL-bound numpy and
+    pandas work, so threads do not run them in parallel.
+
+    The workers are forked where possible, so that they inherit the columns instead
+    of receiving a pickled copy. They write the codes of the rows into a shared
+    memory buffer of (attributes, rows) and fill the column ranges of their
+    attributes in a shared (columns, rows) block, so only the kept values are sent
+    back to this process.
+    """
+
+    def __init__(
+        self,
+        df_x: pd.DataFrame,
+        names: List[str],
+        max_workers: int,
+        **encode_kwargs,
+    ):
+        """
+
+        :param df_x: DataFrame with the columns
+        :param names: names of the columns that are encoded
+        :param max_workers: number of worker processes
+        :param encode_kwargs: arguments of _encode_categorical
+        """
+        self.names = names
+        self.num_rows = len(df_x.index)
+        self.max_workers = max_workers
+        self.encode_kwargs = encode_kwargs
+        self.columns = [df_x[name] for name in names]
+        self._codes_memory = None
+        self._codes = None
+        self._executor = None
+
+    def __enter__(self):
+        shape = (len(self.names), self.num_rows)
+        self._codes_memory = shared_memory.SharedMemory(
+            create=True, size=int(np.prod(shape)) * np.dtype(np.int32).itemsize
+        )
+        self._codes = np.ndarray(shape, dtype=np.int32, buffer=self._codes_memory.buf)
+        self._executor = ProcessPoolExecutor(
+            max_workers=min(self.max_workers, len(self.names)),
+            mp_context=_get_mp_context(),
+            initializer=_init_worker,
+            initargs=(self.columns, self._codes_memory.name, shape),
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._executor.shutdown()
+        # The view has to be released before the memory is closed
+        self._codes = None
+        self._codes_memory.close()
+        self._codes_memory.unlink()
+
+    def encode(self) -> Dict[str, Tuple[np.ndarray, List]]:
+        """Encode the columns with _encode_categorical
+
+        :return: column name -> (codes of the rows, kept values)
+        """
+        kept_values = self._executor.map(
+            functools.partial(_encode_in_worker, **self.encode_kwargs),
+            range(len(self.names)),
+        )
+        return {
+            name: (self._codes[i].astype(np.int64), values)
+            for i, (name, values) in enumerate(zip(self.names, kept_values))
+        }
+
+    def fill_block(self, block_offsets: Dict[str, int], num_cols: int) -> np.ndarray:
+        """Fill the (columns, rows) indicator block from the codes of encode
+
+        :param block_offsets: column name -> position of the first column of the
+        attribute in the block
+        :param num_cols: number of columns of the block
+        :return: block
+        """
+        shape = (num_cols, self.num_rows)
+        if num_cols == 0:
+            return np.zeros(shape, dtype=np.uint8)
+        block_memory = shared_memory.SharedMemory(
+            create=True, size=num_cols * self.num_rows
+        )
+        try:
+            shared_block = np.ndarray(shape, dtype=np.uint8, buffer=block_memory.buf)
+            shared_block[:] = 0
+            list(
+                self._executor.map(
+                    functools.partial(
+                        _fill_block_in_worker,
+                        block_name=block_memory.name,
+                        shape=shape,
+                    ),
+                    range(len(self.names)),
+                    [block_offsets[name] for name in self.names],
+                )
+            )
+            block = shared_block.copy()
+            del shared_block
+        finally:
+            block_memory.close()
+            block_memory.unlink()
+        return block
+
+
+# Columns and codes buffer of a worker process of _ProcessPoolEncoder
+_worker_state = {}
+
+
+def _get_mp_context():
+    """Fork the workers where possible, so that they inherit the columns"""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def _init_worker(columns: List[pd.Series], codes_name: str, shape: Tuple[int, int]):
+    codes_memory = shared_memory.SharedMemory(name=codes_name)
+    _worker_state["columns"] = columns
+    _worker_state["codes_memory"] = codes_memory
+    _worker_state["codes"] = np.ndarray(shape, dtype=np.int32, buffer=codes_memory.buf)
+
+
+def _encode_in_worker(i: int, **encode_kwargs) -> List:
+    """Encode the i-th column and write its codes into the shared codes buffer
+
+    :return: kept values
+    """
+    codes, values = _encode_categorical(_worker_state["columns"][i], **encode_kwargs)
+    _worker_state["codes"][i] = codes
+    return values
+
+
+def _fill_block_in_worker(i: int, offset: int, block_name: str, shape: Tuple[int, int]):
+    """Set the ones of the i-th column in the shared block"""
+    block_memory = shared_memory.SharedMemory(name=block_name)
+    try:
+        block = np.ndarray(shape, dtype=np.uint8, buffer=block_memory.buf)
+        _fill_block(block, _worker_state["codes"][i], offset)
+        del block
+    finally:
+        block_memory.close()
+
+
+def _indicator_positions(
+    codes: np.ndarray, offset: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the rows and the block columns of the ones of an encoded attribute.
+
+    :param codes: codes of the rows as returned by _encode_categorical
+    :param offset: position of the first column of the attribute in the block
+    :return: row positions and column positions
+    """
+    rows = np.flatnonzero(codes >= 0)
+    return rows, offset + codes[rows]
+
+
+def _fill_block(block: np.ndarray, codes: np.ndarray, offset: int):
+    """Set the ones of an encoded attribute in a (columns, rows) block"""
+    rows, positions = _indicator_positions(codes, offset)
+    block[positions, rows] = 1
+
+
+def _add_value_counts(counts: Optional[pd.Series], chunk_counts: pd.Series):
+    """Add the value counts of a chunk to counts"""
+    if counts is None:
+        return chunk_counts
+    return counts.add(chunk_counts, fill_value=0)
+
+
+def _one_hot_encode(col: pd.Series, categories: List, prefix: str) -> pd.DataFrame:
+    """One-hot encode col with one column per category. Values that are not in
+    categories are encoded with zeros in all columns."""
+    df_dummies = pd.get_dummies(
+        pd.Categorical(col, categories=categories),
+        prefix=prefix,
+        prefix_sep=" = ",
+    )
+    df_dummies.index = col.index
+    return df_dummies
+
+
+def _get_other_value(values: np.ndarray) -> str:
+    """Get a name for the other value that is not a value of the attribute, so
+    that the other column cannot be mistaken for the column of a real value.
+
+    :param values: all values of the attribute
+    :return: OTHER_VALUE or OTHER_VALUE with the first free suffix " (i)"
+    """
+    values = set(values)
+    other_value = OTHER_VALUE
+    i = 1
+    while other_value in values:
+        other_value = f"{OTHER_VALUE} ({i})"
+        i += 1
+    return other_value
+
+
+def _create_sparse_df(
+    matrix: sparse.spmatrix, index: pd.Index, columns: List[str]
+) -> pd.DataFrame:
+    """Create a DataFrame with sparse uint8 columns from a sparse matrix.
+
+    :param matrix: sparse matrix with the values 0 and 1
+    :param index: index of the DataFrame
+    :param columns: column names
+    :return: DataFrame with SparseDtype columns
+    """
+    df = pd.DataFrame.sparse.from_spmatrix(matrix, index=index)
+    # from_spmatrix uses an int fill value, with which row selections (e.g. in
+    # remove_nan) upcast the columns to int64
+    df = pd.DataFrame(
+        {
+            i: pd.arrays.SparseArray(
+                col.array.sp_values,
+                sparse_index=col.array.sp_index,
+                fill_value=np.uint8(0),
+            )
+            for i, col in df.items()
+        },
+        index=index,
+    )
+    df.columns = columns
+    return df
+
+
+@dataclass
+class NanReport:
+    """What remove_nan did"""
+
+    num_rows: int
+    # Number of rows removed because of NaN values in the target features
+    num_removed_rows: int = 0
+    # Columns removed because too many of their values are NaN
+    removed_columns: List[str] = field(default_factory=list)
+    # column name -> value that replaced the NaN values of the column
+    imputed_columns: Dict[str, float] = field(default_factory=dict)
+
+    def __str__(self):
+        return (
+            f"NaN values: removed {self.num_removed_rows} of {self.num_rows} rows, "
+            f"removed {len(self.removed_columns)} columns, imputed "
+            f"{len(self.imputed_columns)} columns"
+        )
+
+
 def remove_nan(
     df_x: pd.DataFrame,
     df_target: pd.DataFrame,
@@ -250,27 +945,74 @@ def remove_nan(
     For target feature: if target feature(s) value is nan, remove whole row. If not
     too many NaN value, replace nan values with the median value
     """
-    # Get column names with nan values
+    df_x, df_target, _ = remove_nan_with_report(
+        df_x, df_target, features, target_features, th_remove_col=th_remove_col
+    )
+    return df_x, df_target
+
+
+def remove_nan_with_report(
+    df_x: pd.DataFrame,
+    df_target: pd.DataFrame,
+    features: List[Feature],
+    target_features: List[Feature],
+    th_remove_col: float = 0.3,
+) -> Tuple[pd.DataFrame, pd.DataFrame, NanReport]:
+    """remove_nan with masks over all columns at once instead of a loop over the
+    columns. Removed features are also removed from the features list.
+
+    :param df_x: DataFrame with the features
+    :param df_target: DataFrame with the target features, with the same rows as
+    df_x
+    :param features: features of df_x
+    :param target_features: target features of df_target
+    :param th_remove_col: feature columns with more NaN values than th_remove_col
+    times the number of rows are removed
+    :return: df_x, df_target and the NanReport
+    """
+    report = NanReport(num_rows=len(df_x.index))
+
+    # Remove the rows with NaN values in the target features
+    target_cols = [f.df_column_name for f in target_features]
+    is_target_nan = df_target[target_cols].isna().any(axis=1).to_numpy()
+    if is_target_nan.any():
+        keep_positions = np.flatnonzero(~is_target_nan)
+        df_x = df_x.take(keep_positions)
+        df_target = df_target.take(keep_positions)
+        report.num_removed_rows = int(is_target_nan.sum())
+
+    # Only columns whose dtype can hold NaN values are checked
     feature_dict = {f.df_column_name: f for f in features}
-    target_feature_dict = {f.df_column_name: f for f in target_features}
-    # remove rows with nan values in df_target
-    df_target_only_features = df_target[list(target_feature_dict.keys())]
-    indices_nan = np.where(pd.isnull(df_target_only_features).any(1))[0]
-    df_x = df_x[~df_x.index.isin(indices_nan)]
-    df_target = df_target[~df_target.index.isin(indices_nan)]
-    cols_with_nan = df_x.columns[df_x.isna().any()].tolist()
-
-    for col in cols_with_nan:
-        if feature_dict.get(col) is None:
-            continue
-        if df_x[col].isna().sum() > len(df_x.index) * th_remove_col:
-            df_x.drop(col, axis=1, inplace=True)
-            features.remove(feature_dict[col])
-            continue
+    nan_cols = [
+        col
+        for col, dtype in df_x.dtypes.items()
+        if col in feature_dict
+        and not is_integer_dtype(dtype)
+        and not is_bool_dtype(dtype)
+    ]
+    nan_counts = df_x[nan_cols].isna().sum()
+    nan_counts = nan_counts[nan_counts > 0]
 
-        if feature_dict[col].datatype == AttributeDataType.CATEGORICAL:
-            df_x[col] = df_x[col].fillna(value=0)
+    too_many_nans = nan_counts > len(df_x.index) * th_remove_col
+    report.removed_columns = nan_counts.index[too_many_nans].tolist()
+    if report.removed_columns:
+        df_x = df_x.drop(columns=report.removed_columns)
+        removed_columns = set(report.removed_columns)
+        features[:] = [f for f in features if f.df_column_name not in removed_columns]
 
-        if feature_dict[col].datatype == AttributeDataType.NUMERICAL:
-            df_x[col] = df_x[col].fillna(value=df_x[col].median())
-    return df_x, df_target
+    impute_cols = nan_counts.index[~too_many_nans]
+    numerical_cols = [
+        col
+        for col in impute_cols
+        if feature_dict[col].datatype == AttributeDataType.NUMERICAL
+    ]
+    fill_values = dict(df_x[numerical_cols].median())
+    for col in impute_cols:
+        if feature_dict[col].datatype == AttributeDataType.CATEGORICAL:
+            fill_values[col] = 0
+    if fill_values:
+        # Filled in place in the blocks of df_x. Setting the columns one by one
+        # would split the blocks for every column.
+        df_x.fillna(value=fill_values, inplace=True)
+    report.imputed_columns = fill_values
+    return df_x, df_target, report
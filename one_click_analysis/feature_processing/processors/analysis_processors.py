@@ -1,16 +1,27 @@
 import abc
+import functools
 import timeit
+from pathlib import Path
+from typing import Callable
 from typing import Dict
+from typing import Iterable
 from typing import List
 from typing import Optional
+from typing import Tuple
+from typing import Union
 
 import pandas as pd
 from pycelonis.celonis_api.pql import pql
 
+from one_click_analysis import snapshot
+from one_click_analysis.extraction_scheduler import DEFAULT_MAX_WORKERS
+from one_click_analysis.extraction_scheduler import ExtractionScheduler
+from one_click_analysis.feature_processing import dtype_ingestion
 from one_click_analysis.feature_processing import feature_processor_new
 from one_click_analysis.feature_processing import post_processing
 from one_click_analysis.feature_processing.attributes import dynamic_attributes
 from one_click_analysis.feature_processing.attributes import static_attributes
+from one_click_analysis.feature_processing.attributes.attribute import Attribute
 from one_click_analysis.feature_processing.attributes.attribute import (
     AttributeDescriptor,
 )
@@ -27,8 +38,25 @@ from one_click_analysis.feature_processing.attributes.static_attributes import (
 from one_click_analysis.feature_processing.attributes.static_attributes import (
     DummyAttribute,
 )
+from one_click_analysis.feature_processing.decision_scan import DecisionScan
+from one_click_analysis.feature_processing.decision_scan import scan_decision_points
+from one_click_analysis.feature_processing.event_sequences import (
+    get_event_sequences,
+)
+from one_click_analysis.feature_processing.post_processing import (
+    ChunkedPostProcessor,
+)
 from one_click_analysis.feature_processing.post_processing import PostProcessor
+from one_click_analysis.feature_processing.rework_profile import get_rework_profile
+from one_click_analysis.feature_processing.transition_matrix import (
+    compute_transition_durations,
+)
+from one_click_analysis.incremental_refresh import IncrementalState
+from one_click_analysis.incremental_refresh import IncrementalStore
 from one_click_analysis.process_config.process_config import ProcessConfig
+from one_click_analysis.statistics.statistics_computer import (
+    ChunkedStatisticsComputer,
+)
 from one_click_analysis.statistics.statistics_computer import StatisticsComputer
 
 
@@ -56,6 +84,44 @@ class UseCaseProcessor(abc.ABC):
         self.min_attr_count_perc = kwargs.get("min_attr_count_perc", 0.02)
         self.max_attr_count_perc = kwargs.get("max_attr_count_perc", 0.98)
         self.th_remove_col = kwargs.get("th_remove_col", 0.3)
+        # Extract activity occurrence and count attributes from one pivoted query
+        self.activity_pivot = kwargs.get("activity_pivot", False)
+        # Compute previous activity occurrence and count attributes locally
+        self.local_cumulative_counts = kwargs.get("local_cumulative_counts", False)
+        # Number of extractions that are run concurrently
+        self.max_workers = kwargs.get("max_workers", DEFAULT_MAX_WORKERS)
+        self.scheduler = ExtractionScheduler(max_workers=self.max_workers)
+        # Maximum number of static attributes per extraction query
+        self.column_batch_size = kwargs.get("column_batch_size", None)
+        # Convert the extracted df_x to compact dtypes before post processing. The
+        # post processing and statistics give the same results on them
+        self.compact_dtypes = kwargs.get("compact_dtypes", True)
+        # Store the one-hot encoded features as sparse columns
+        self.sparse_features = kwargs.get("sparse_features", False)
+        # Bound the number of one-hot encoded columns per categorical attribute (see
+        # PostProcessor)
+        self.max_categories = kwargs.get("max_categories", None)
+        self.other_bucket = kwargs.get("other_bucket", False)
+        self.hash_width = kwargs.get("hash_width", None)
+        # Number of worker processes that encode the categorical attributes (see
+        # PostProcessor)
+        self.post_processing_max_workers = kwargs.get("post_processing_max_workers", 1)
+        self.memory_report: Optional[dtype_ingestion.MemoryReport] = None
+        self.nan_report: Optional[post_processing.NanReport] = None
+        # Only extract the cases with events after the watermark of the data
+        # stored in the IncrementalStore and merge them into the stored data
+        self.incremental_store: Optional[IncrementalStore] = kwargs.get(
+            "incremental_store", None
+        )
+        self._incremental_state: Optional[IncrementalState] = None
+        # Extract, post process and compute the statistics in chunks of at most
+        # case_chunk_size cases, so that the raw extracted columns are only held
+        # in memory for one chunk (only used by CaseDurationProcessor)
+        self.case_chunk_size = kwargs.get("case_chunk_size", None)
+        if self.case_chunk_size is not None and self.incremental_store is not None:
+            raise ValueError(
+                "case_chunk_size cannot be combined with an incremental_store"
+            )
         self.df_x = None
         self.df_target = None
         self.target_features = None
@@ -66,6 +132,166 @@ class UseCaseProcessor(abc.ABC):
         self.num_cases = None
         self.used_static_attributes = []
         self.used_dynamic_attributes = []
+        self.metadata_planner = None
+
+    def _create_metadata_planner(self) -> feature_processor_new.MetadataQueryPlanner:
+        """Create a MetadataQueryPlanner for the current filters. The number of
+        cases and the valid activities are then only queried once per process()
+        call. If activity attributes are used, both are fetched concurrently."""
+        planner = feature_processor_new.MetadataQueryPlanner(
+            process_config=self.process_config,
+            activity_table_str=self.activity_table_str,
+            filters=self.filters,
+            chunksize=self.chunksize,
+            scheduler=self.scheduler,
+        )
+        planner.request_number_cases()
+        used_attribute_types = [
+            descriptor.attribute_type
+            for descriptor in self.used_static_attribute_descriptors
+            + self.used_dynamic_attribute_descriptors
+        ]
+        if any(
+            attribute_type in used_attribute_types
+            for attribute_type in [
+                static_attributes.ActivityOccurenceAttribute,
+                static_attributes.StaticActivityCountAttribute,
+                dynamic_attributes.PreviousActivityOccurrenceAttribute,
+            ]
+        ):
+            planner.request_activities()
+        planner.execute()
+        return planner
+
+    def _get_extraction_filters(
+        self, target_variable: pql.PQLColumn
+    ) -> List[pql.PQLFilter]:
+        """Get the filters for the extraction of df_x and df_target. With an
+        incremental_store, these also restrict the extraction to the cases after
+        the stored watermark.
+
+        :param target_variable: PQLColumn of the target variable
+        :return: list of filters
+        """
+        if self.incremental_store is None:
+            return self.filters
+        if self._incremental_state is None:
+            attributes = self.used_static_attributes + self.used_dynamic_attributes
+            key = IncrementalStore.create_key(
+                dm_id=self.process_config.dm.id,
+                activity_table_str=self.activity_table_str,
+                processor_name=type(self).__name__,
+                queries=[attr.pql_query.query for attr in attributes]
+                + [target_variable.query],
+                filters=self.filters,
+            )
+            self._incremental_state = self.incremental_store.begin(
+                process_config=self.process_config,
+                activity_table_str=self.activity_table_str,
+                key=key,
+                filters=self.filters,
+                chunksize=self.chunksize,
+            )
+        return self.filters + self._incremental_state.filters
+
+    def _ingest_extracted_dfs(self):
+        """Prepare the extracted df_x and df_target for post processing. In
+        incremental mode, they are merged into the stored data first."""
+        if self._incremental_state is None:
+            self._compact_df_x()
+            return
+        self.df_x, self.df_target = self.incremental_store.merge(
+            self._incremental_state, self.df_x, self.df_target
+        )
+        self._compact_df_x()
+        self.incremental_store.save(self._incremental_state, self.df_x, self.df_target)
+        self._incremental_state = None
+
+    def _compact_df_x(self):
+        """Convert df_x to compact dtypes and store the memory footprint before and
+        after the conversion in self.memory_report."""
+        if not self.compact_dtypes:
+            return
+        self.df_x, self.memory_report = dtype_ingestion.compact_dtypes(self.df_x)
+
+    def _process_chunks(
+        self,
+        chunk_factory: Callable[[], Iterable[Tuple[pd.DataFrame, pd.DataFrame]]],
+        attributes: List[Attribute],
+        target_attribute: Attribute,
+    ):
+        """Post process the chunks and compute the statistics with
+        ChunkedPostProcessor and ChunkedStatisticsComputer. Sets df_x, df_target,
+        features and target_features to the same results as PostProcessor and
+        StatisticsComputer on the concatenated chunks.
+
+        :param chunk_factory: function that returns an iterator over the extracted
+        (df_x, df_target) chunks (see ChunkedPostProcessor.process_chunks)
+        :param attributes: attributes of df_x
+        :param target_attribute: target attribute
+        """
+
+        def compacted_chunks():
+            for df_x, df_target in chunk_factory():
+                if self.compact_dtypes:
+                    df_x, _ = dtype_ingestion.compact_dtypes(df_x)
+                yield df_x, df_target
+
+        pp = ChunkedPostProcessor(
+            attributes=attributes,
+            target_attributes=target_attribute,
+            valid_target_values=None,
+            invalid_target_replacement=None,
+            min_counts_perc=self.min_attr_count_perc,
+            max_counts_perc=self.max_attr_count_perc,
+            sparse_features=self.sparse_features,
+            max_categories=self.max_categories,
+            other_bucket=self.other_bucket,
+            hash_width=self.hash_width,
+        )
+        chunks = []
+        statistics_computer = None
+        for df_x, df_target in pp.process_chunks(compacted_chunks):
+            if statistics_computer is None:
+                statistics_computer = ChunkedStatisticsComputer(
+                    features=pp.features, target_features=pp.target_features
+                )
+            statistics_computer.fit_chunk(df_x, df_target)
+            chunks.append((df_x, df_target))
+        if not chunks:
+            raise ValueError("No cases were extracted")
+        statistics_computer.finish_fit()
+        for df_x, df_target in chunks:
+            statistics_computer.update(df_x, df_target)
+        statistics_computer.compute_all_statistics()
+
+        self.features = pp.features
+        self.target_features = pp.target_features
+        self.df_x = pd.concat([df_x for df_x, _ in chunks])
+        self.df_target = pd.concat([df_target for _, df_target in chunks])
+        # The chunks may have been compacted to different dtypes
+        self._compact_df_x()
+
+    def save_snapshot(self, path: Union[str, Path]):
+        """Save the processed data so that the GUI screens can be rebuilt with
+        snapshot.load_snapshot without extracting the data again.
+
+        :param path: directory of the snapshot
+        """
+        snapshot.save_snapshot(
+            path,
+            df_x=self.df_x,
+            df_target=self.df_target,
+            features=self.features,
+            target_features=self.target_features,
+            attributes=self.used_static_attributes + self.used_dynamic_attributes,
+            properties={
+                "processor": type(self).__name__,
+                "activity_table_str": self.activity_table_str,
+                "df_timestamp_column": self.df_timestamp_column,
+                "num_cases": self.num_cases,
+            },
+        )
 
     def _create_is_closed_filter(self, is_closed_query: pql.PQLColumn) -> pql.PQLFilter:
         """Create IS_CLOSED PQLFilter object"""
@@ -186,22 +412,13 @@ class CaseDurationProcessor(UseCaseProcessor):
         )
         self.filters = self.filters + date_filters
 
-        self.num_cases = feature_processor_new.get_number_cases(
-            process_config=self.process_config,
-            activity_table_str=self.activity_table_str,
-            filters=self.filters,
-        )
-
+        self.metadata_planner = self._create_metadata_planner()
+        self.num_cases = self.metadata_planner.get_number_cases()
         (
             min_attr_count,
             max_attr_count,
-        ) = feature_processor_new.compute_min_max_attribute_counts_PQL(
-            self.min_attr_count_perc,
-            self.max_attr_count_perc,
-            process_config=self.process_config,
-            activity_table_name=self.activity_table_str,
-            chunksize=self.chunksize,
-            filters=self.filters,
+        ) = self.metadata_planner.get_min_max_attribute_counts(
+            self.min_attr_count_perc, self.max_attr_count_perc
         )
 
         self.used_static_attributes = self._gen_static_attr_list(
@@ -221,38 +438,71 @@ class CaseDurationProcessor(UseCaseProcessor):
         # Define a default target variable
         target_variable = target_attribute.pql_query
 
-        # Get DataFrames
-        self.df_x, self.df_target = feature_processor_new.extract_dfs(
+        extraction_kwargs = dict(
             process_config=self.process_config,
             activity_table_str=self.activity_table_str,
             static_attributes=self.used_static_attributes,
             dynamic_attributes=[],
             is_closed_indicator=self.is_closed_query,
             target_variable=target_variable,
-            filters=self.filters,
-        )
-
-        pp = PostProcessor(
-            df_x=self.df_x,
-            df_target=self.df_target,
-            attributes=self.used_static_attributes,
-            target_attributes=target_attribute,
-            valid_target_values=None,
-            invalid_target_replacement=None,
-            min_counts_perc=self.min_attr_count_perc,
-            max_counts_perc=self.max_attr_count_perc,
+            filters=self._get_extraction_filters(target_variable),
+            activity_pivot=self.activity_pivot,
+            local_cumulative_counts=self.local_cumulative_counts,
+            column_batch_size=self.column_batch_size,
+            scheduler=self.scheduler,
+            chunksize=self.chunksize,
         )
+        if self.case_chunk_size is not None:
+            self._process_chunks(
+                functools.partial(
+                    feature_processor_new.extract_dfs_chunked,
+                    case_chunk_size=self.case_chunk_size,
+                    **extraction_kwargs,
+                ),
+                attributes=self.used_static_attributes,
+                target_attribute=target_attribute,
+            )
+        else:
+            # Get DataFrames
+            self.df_x, self.df_target = feature_processor_new.extract_dfs(
+                **extraction_kwargs
+            )
 
-        self.df_x, self.df_target, self.target_features, self.features = pp.process()
-
-        statistics_computer = StatisticsComputer(
-            features=self.features,
-            target_features=self.target_features,
-            df_x=self.df_x,
-            df_target=self.df_target,
-        )
-        statistics_computer.compute_all_statistics()
-        self.df_x, self.df_target = post_processing.remove_nan(
+            self._ingest_extracted_dfs()
+            pp = PostProcessor(
+                df_x=self.df_x,
+                df_target=self.df_target,
+                attributes=self.used_static_attributes,
+                target_attributes=target_attribute,
+                valid_target_values=None,
+                invalid_target_replacement=None,
+                min_counts_perc=self.min_attr_count_perc,
+                max_counts_perc=self.max_attr_count_perc,
+                sparse_features=self.sparse_features,
+                max_categories=self.max_categories,
+                other_bucket=self.other_bucket,
+                hash_width=self.hash_width,
+                max_workers=self.post_processing_max_workers,
+            )
+            (
+                self.df_x,
+                self.df_target,
+                self.target_features,
+                self.features,
+            ) = pp.process()
+
+            statistics_computer = StatisticsComputer(
+                features=self.features,
+                target_features=self.target_features,
+                df_x=self.df_x,
+                df_target=self.df_target,
+            )
+            statistics_computer.compute_all_statistics()
+        (
+            self.df_x,
+            self.df_target,
+            self.nan_report,
+        ) = post_processing.remove_nan_with_report(
             df_x=self.df_x,
             df_target=self.df_target,
             features=self.features,
@@ -340,6 +590,7 @@ class CaseDurationProcessor(UseCaseProcessor):
                     min_vals=min_attr_count,
                     max_vals=max_attr_count,
                     filters=self.filters,
+                    metadata_planner=self.metadata_planner,
                 )
             )
             static_attributes_list = static_attributes_list + activity_occ_attributes
@@ -356,6 +607,7 @@ class CaseDurationProcessor(UseCaseProcessor):
                     min_vals=min_attr_count,
                     max_vals=max_attr_count,
                     filters=self.filters,
+                    metadata_planner=self.metadata_planner,
                 )
             )
             static_attributes_list = static_attributes_list + activity_count_attributes
@@ -399,7 +651,12 @@ class CaseDurationProcessor(UseCaseProcessor):
 
 
 class TransitionTimeProcessor(UseCaseProcessor):
-    """Feature Processor for the transition time (bottle neck) use case."""
+    """Feature Processor for the transition time (bottle neck) use case.
+
+    Without source_activity and target_activity, the processor can only be used
+    in scan mode: scan_transitions() ranks all directly-follows transitions by
+    their durations and for_transition() creates the processor for the detailed
+    analysis of a selected pair."""
 
     # attributes that can be used for this use case
     start_activity_attr_descriptor = AttributeDescriptor(
@@ -456,8 +713,8 @@ class TransitionTimeProcessor(UseCaseProcessor):
         considered_activity_table_cols: List[str],
         considered_case_level_table_cols: Dict[str, List[str]],
         is_closed_query: pql.PQLColumn,
-        source_activity: str,
-        target_activity: str,
+        source_activity: Optional[str] = None,
+        target_activity: Optional[str] = None,
         time_unit="DAYS",
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
@@ -479,15 +736,73 @@ class TransitionTimeProcessor(UseCaseProcessor):
         self.end_date = end_date
         self.source_activity = source_activity
         self.target_activity = target_activity
+        self.kwargs = kwargs
+        self.df_transition_scan = None
 
-    def process(self):
-        date_filters = feature_processor_new.date_filter_PQL(
+    def _get_date_filters(self) -> List[pql.PQLFilter]:
+        return feature_processor_new.date_filter_PQL(
             process_config=self.process_config,
             activity_table_str=self.activity_table_str,
             start_date=self.start_date,
             end_date=self.end_date,
         )
-        self.filters = self.filters + date_filters
+
+    def scan_transitions(
+        self, min_count: int = 1, sort_by: str = "p90"
+    ) -> pd.DataFrame:
+        """Compute count, mean, median and 90th percentile of the durations of all
+        directly-follows transitions from a single extraction of the event
+        sequences and rank the transitions.
+
+        :param min_count: minimum number of occurrences of a transition
+        :param sort_by: column by which the transitions are ranked (descending)
+        :return: DataFrame with one row per transition (see
+        compute_transition_durations)
+        """
+        sequences = get_event_sequences(
+            self.process_config,
+            self.activity_table_str,
+            self.filters + self._get_date_filters(),
+            chunksize=self.chunksize,
+        )
+        self.df_transition_scan = compute_transition_durations(
+            sequences, time_unit=self.time_unit, min_count=min_count, sort_by=sort_by
+        )
+        return self.df_transition_scan
+
+    def for_transition(
+        self, source_activity: str, target_activity: str
+    ) -> "TransitionTimeProcessor":
+        """Create a processor with the same configuration for the detailed analysis
+        of one transition.
+
+        :param source_activity: source activity of the transition
+        :param target_activity: target activity of the transition
+        :return: TransitionTimeProcessor
+        """
+        return TransitionTimeProcessor(
+            process_config=self.process_config,
+            activity_table_str=self.activity_table_str,
+            used_static_attribute_descriptors=self.used_static_attribute_descriptors,
+            used_dynamic_attribute_descriptors=self.used_dynamic_attribute_descriptors,
+            considered_activity_table_cols=self.considered_activity_table_cols,
+            considered_case_level_table_cols=self.considered_case_level_table_cols,
+            is_closed_query=self.is_closed_query,
+            source_activity=source_activity,
+            target_activity=target_activity,
+            time_unit=self.time_unit,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            **self.kwargs,
+        )
+
+    def process(self):
+        if self.source_activity is None or self.target_activity is None:
+            raise ValueError(
+                "process() needs a source_activity and a target_activity. Use "
+                "scan_transitions() to rank all transitions."
+            )
+        self.filters = self.filters + self._get_date_filters()
 
         self.num_cases = feature_processor_new.get_number_cases(
             process_config=self.process_config,
@@ -503,16 +818,12 @@ class TransitionTimeProcessor(UseCaseProcessor):
 
         self.filters = self.filters + [prev_activity_filter]
 
+        self.metadata_planner = self._create_metadata_planner()
         (
             min_attr_count,
             max_attr_count,
-        ) = feature_processor_new.compute_min_max_attribute_counts_PQL(
-            self.min_attr_count_perc,
-            self.max_attr_count_perc,
-            process_config=self.process_config,
-            activity_table_name=self.activity_table_str,
-            chunksize=self.chunksize,
-            filters=self.filters,
+        ) = self.metadata_planner.get_min_max_attribute_counts(
+            self.min_attr_count_perc, self.max_attr_count_perc
         )
 
         self.used_static_attributes = self._gen_static_attr_list(
@@ -554,9 +865,15 @@ class TransitionTimeProcessor(UseCaseProcessor):
             + [target_attribute_for_dyn],
             is_closed_indicator=self.is_closed_query,
             target_variable=target_variable,
-            filters=self.filters,
+            filters=self._get_extraction_filters(target_variable),
+            activity_pivot=self.activity_pivot,
+            local_cumulative_counts=self.local_cumulative_counts,
+            column_batch_size=self.column_batch_size,
+            scheduler=self.scheduler,
+            chunksize=self.chunksize,
         )
 
+        self._ingest_extracted_dfs()
         pp = PostProcessor(
             df_x=self.df_x,
             df_target=self.df_target,
@@ -566,6 +883,11 @@ class TransitionTimeProcessor(UseCaseProcessor):
             invalid_target_replacement=None,
             min_counts_perc=self.min_attr_count_perc,
             max_counts_perc=self.max_attr_count_perc,
+            sparse_features=self.sparse_features,
+            max_categories=self.max_categories,
+            other_bucket=self.other_bucket,
+            hash_width=self.hash_width,
+            max_workers=self.post_processing_max_workers,
         )
 
         self.df_x, self.df_target, self.target_features, self.features = pp.process()
@@ -577,7 +899,11 @@ class TransitionTimeProcessor(UseCaseProcessor):
             df_target=self.df_target,
         )
         statistics_computer.compute_all_statistics()
-        self.df_x, self.df_target = post_processing.remove_nan(
+        (
+            self.df_x,
+            self.df_target,
+            self.nan_report,
+        ) = post_processing.remove_nan_with_report(
             df_x=self.df_x,
             df_target=self.df_target,
             features=self.features,
@@ -689,6 +1015,7 @@ class TransitionTimeProcessor(UseCaseProcessor):
                     is_feature=True,
                     is_class_feature=False,
                     filters=self.filters,
+                    metadata_planner=self.metadata_planner,
                 )
             )
             dynamic_attributes_list = (
@@ -699,7 +1026,12 @@ class TransitionTimeProcessor(UseCaseProcessor):
 
 
 class RoutingDecisionProcessor(UseCaseProcessor):
-    """Feature Processor for the transition time (bottle neck) use case."""
+    """Feature Processor for the routing decision use case.
+
+    Without source_activity and target_activities, the processor can only be used
+    in scan mode: scan_decision_points() computes the decision distributions of
+    all decision points and for_decision() creates the processor for the detailed
+    analysis of a selected one."""
 
     # attributes that can be used for this use case
     start_activity_attr_descriptor = AttributeDescriptor(
@@ -753,8 +1085,8 @@ class RoutingDecisionProcessor(UseCaseProcessor):
         considered_activity_table_cols: List[str],
         considered_case_level_table_cols: Dict[str, List[str]],
         is_closed_query: pql.PQLColumn,
-        source_activity: str,
-        target_activities: List[str],
+        source_activity: Optional[str] = None,
+        target_activities: Optional[List[str]] = None,
         time_unit="DAYS",
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
@@ -779,38 +1111,91 @@ class RoutingDecisionProcessor(UseCaseProcessor):
         self.case_duration_attribute: Optional[
             static_attributes.CaseDurationAttribute
         ] = None
+        self.kwargs = kwargs
+        self.decision_scan: Optional[DecisionScan] = None
 
-    def process(self):
-        date_filters = feature_processor_new.date_filter_PQL(
+    def _get_date_filters(self) -> List[pql.PQLFilter]:
+        return feature_processor_new.date_filter_PQL(
             process_config=self.process_config,
             activity_table_str=self.activity_table_str,
             start_date=self.start_date,
             end_date=self.end_date,
         )
-        self.filters = self.filters + date_filters
 
-        is_closed_indicator = feature_processor_new.all_cases_closed_query(
+    def scan_decision_points(
+        self, min_share: float = 0.05, min_count: int = 1
+    ) -> DecisionScan:
+        """Find all activities that are directly followed by more than one activity
+        and compute their decision distributions from a single extraction of the
+        event sequences.
+
+        :param min_share: minimum share of the outgoing transitions of an activity
+        that a successor needs to count as a target of the decision
+        :param min_count: minimum number of decisions of a decision point
+        :return: DecisionScan with the decision points ranked by the entropy of
+        their decision distributions
+        """
+        sequences = get_event_sequences(
+            self.process_config,
+            self.activity_table_str,
+            self.filters + self._get_date_filters(),
+            chunksize=self.chunksize,
+        )
+        self.decision_scan = scan_decision_points(
+            sequences, min_share=min_share, min_count=min_count
+        )
+        return self.decision_scan
+
+    def for_decision(
+        self, source_activity: str, target_activities: Optional[List[str]] = None
+    ) -> "RoutingDecisionProcessor":
+        """Create a processor with the same configuration for the detailed analysis
+        of one decision point.
+
+        :param source_activity: source activity of the decision
+        :param target_activities: target activities. If None, the targets found
+        by scan_decision_points are used.
+        :return: RoutingDecisionProcessor
+        """
+        if target_activities is None:
+            target_activities = self.decision_scan.target_activities[source_activity]
+        return RoutingDecisionProcessor(
             process_config=self.process_config,
             activity_table_str=self.activity_table_str,
-            name="IS_CLOSED",
+            used_static_attribute_descriptors=self.used_static_attribute_descriptors,
+            used_dynamic_attribute_descriptors=self.used_dynamic_attribute_descriptors,
+            considered_activity_table_cols=self.considered_activity_table_cols,
+            considered_case_level_table_cols=self.considered_case_level_table_cols,
+            is_closed_query=self.is_closed_query,
+            source_activity=source_activity,
+            target_activities=target_activities,
+            time_unit=self.time_unit,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            **self.kwargs,
         )
 
-        self.num_cases = feature_processor_new.get_number_cases(
+    def process(self):
+        if self.source_activity is None or not self.target_activities:
+            raise ValueError(
+                "process() needs a source_activity and target_activities. Use "
+                "scan_decision_points() to find the decision points."
+            )
+        self.filters = self.filters + self._get_date_filters()
+
+        is_closed_indicator = feature_processor_new.all_cases_closed_query(
             process_config=self.process_config,
             activity_table_str=self.activity_table_str,
-            filters=self.filters,
+            name="IS_CLOSED",
         )
 
+        self.metadata_planner = self._create_metadata_planner()
+        self.num_cases = self.metadata_planner.get_number_cases()
         (
             min_attr_count,
             max_attr_count,
-        ) = feature_processor_new.compute_min_max_attribute_counts_PQL(
-            self.min_attr_count_perc,
-            self.max_attr_count_perc,
-            process_config=self.process_config,
-            activity_table_name=self.activity_table_str,
-            chunksize=self.chunksize,
-            filters=self.filters,
+        ) = self.metadata_planner.get_min_max_attribute_counts(
+            self.min_attr_count_perc, self.max_attr_count_perc
         )
 
         self.used_static_attributes = self._gen_static_attr_list(
@@ -845,7 +1230,8 @@ class RoutingDecisionProcessor(UseCaseProcessor):
             is_class_feature=False,
         )
         target_attribute_for_dyn.attribute_name = "temp_attr"
-        df_x, _ = feature_processor_new.extract_dfs(
+        extract_features = functools.partial(
+            feature_processor_new.extract_dfs,
             process_config=self.process_config,
             activity_table_str=self.activity_table_str,
             key_activities=key_activities,
@@ -854,7 +1240,12 @@ class RoutingDecisionProcessor(UseCaseProcessor):
             + [target_attribute_for_dyn],
             is_closed_indicator=is_closed_indicator,
             target_variable=target_variable,
-            filters=self.filters,
+            filters=self._get_extraction_filters(target_variable),
+            activity_pivot=self.activity_pivot,
+            local_cumulative_counts=self.local_cumulative_counts,
+            column_batch_size=self.column_batch_size,
+            scheduler=self.scheduler,
+            chunksize=self.chunksize,
         )
 
         # Now get the real target features.
@@ -862,7 +1253,8 @@ class RoutingDecisionProcessor(UseCaseProcessor):
         # Get DataFrame. Need to add [target_attribute] to dynamic_attributes in case
         # that there are no dynamic features. Then one would get an error.
 
-        _, df_target = feature_processor_new.extract_dfs(
+        extract_targets = functools.partial(
+            feature_processor_new.extract_dfs,
             process_config=self.process_config,
             activity_table_str=self.activity_table_str,
             key_activities=key_activities,
@@ -870,7 +1262,11 @@ class RoutingDecisionProcessor(UseCaseProcessor):
             dynamic_attributes=[target_attribute_for_dyn],
             is_closed_indicator=is_closed_indicator,
             target_variable=target_variable,
-            filters=self.filters,
+            filters=self._get_extraction_filters(target_variable),
+        )
+        # Both extractions are independent, so they are run concurrently
+        (df_x, _), (_, df_target) = self.scheduler.run(
+            extract_features, extract_targets
         )
         start = timeit.default_timer()
         # Create the true targets
@@ -880,6 +1276,7 @@ class RoutingDecisionProcessor(UseCaseProcessor):
         self.df_x = self._get_final_df_x(df_x, self.df_target)
         stop = timeit.default_timer()
         print("Time for creating the real dataframes: ", stop - start)
+        self._ingest_extracted_dfs()
         pp = PostProcessor(
             df_x=self.df_x,
             df_target=self.df_target,
@@ -889,6 +1286,11 @@ class RoutingDecisionProcessor(UseCaseProcessor):
             invalid_target_replacement=None,
             min_counts_perc=self.min_attr_count_perc,
             max_counts_perc=self.max_attr_count_perc,
+            sparse_features=self.sparse_features,
+            max_categories=self.max_categories,
+            other_bucket=self.other_bucket,
+            hash_width=self.hash_width,
+            max_workers=self.post_processing_max_workers,
         )
 
         self.df_x, self.df_target, self.target_features, self.features = pp.process()
@@ -900,7 +1302,11 @@ class RoutingDecisionProcessor(UseCaseProcessor):
             df_target=self.df_target,
         )
         statistics_computer.compute_all_statistics()
-        self.df_x, self.df_target = post_processing.remove_nan(
+        (
+            self.df_x,
+            self.df_target,
+            self.nan_report,
+        ) = post_processing.remove_nan_with_report(
             df_x=self.df_x,
             df_target=self.df_target,
             features=self.features,
@@ -1126,6 +1532,7 @@ class RoutingDecisionProcessor(UseCaseProcessor):
                     is_feature=True,
                     is_class_feature=False,
                     filters=self.filters,
+                    metadata_planner=self.metadata_planner,
                 )
             )
             dynamic_attributes_list = (
@@ -1136,7 +1543,12 @@ class RoutingDecisionProcessor(UseCaseProcessor):
 
 
 class ReworkProcessor(UseCaseProcessor):
-    """Feature Processor for the case duration use case."""
+    """Feature Processor for the rework use case.
+
+    If rework_activity is None, the processor can only profile the rework of all
+    activities with scan_rework(). for_activity() creates the processor for the
+    detailed analysis of one of them.
+    """
 
     # attributes that can be used for this use case
     work_in_progress_attr_descriptor = AttributeDescriptor(
@@ -1186,7 +1598,7 @@ class ReworkProcessor(UseCaseProcessor):
         considered_activity_table_cols: List[str],
         considered_case_level_table_cols: Dict[str, List[str]],
         is_closed_query: pql.PQLColumn,
-        rework_activity: str,
+        rework_activity: Optional[str] = None,
         time_unit="DAYS",
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
@@ -1207,15 +1619,61 @@ class ReworkProcessor(UseCaseProcessor):
         self.time_unit = time_unit
         self.start_date = start_date
         self.end_date = end_date
+        self.kwargs = kwargs
+        self.rework_profile = None
 
-    def process(self):
-        date_filters = feature_processor_new.date_filter_PQL(
+    def _get_date_filters(self) -> List[pql.PQLFilter]:
+        return feature_processor_new.date_filter_PQL(
             process_config=self.process_config,
             activity_table_str=self.activity_table_str,
             start_date=self.start_date,
             end_date=self.end_date,
         )
-        self.filters = self.filters + date_filters
+
+    def scan_rework(self) -> pd.DataFrame:
+        """Compute the rework of all activities from a single extraction of the
+        event sequences.
+
+        :return: DataFrame with one row per activity, ranked by the number of cases
+        with rework (see ReworkProfile.to_df)
+        """
+        self.rework_profile = get_rework_profile(
+            self.process_config,
+            self.activity_table_str,
+            self.filters + self._get_date_filters(),
+            chunksize=self.chunksize,
+        )
+        return self.rework_profile.to_df()
+
+    def for_activity(self, rework_activity: str) -> "ReworkProcessor":
+        """Create a processor with the same configuration for the detailed analysis
+        of one activity.
+
+        :param rework_activity: activity
+        :return: ReworkProcessor
+        """
+        return ReworkProcessor(
+            process_config=self.process_config,
+            activity_table_str=self.activity_table_str,
+            used_static_attribute_descriptors=self.used_static_attribute_descriptors,
+            used_dynamic_attribute_descriptors=self.used_dynamic_attribute_descriptors,
+            considered_activity_table_cols=self.considered_activity_table_cols,
+            considered_case_level_table_cols=self.considered_case_level_table_cols,
+            is_closed_query=self.is_closed_query,
+            rework_activity=rework_activity,
+            time_unit=self.time_unit,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            **self.kwargs,
+        )
+
+    def process(self):
+        if self.rework_activity is None:
+            raise ValueError(
+                "process() needs a rework_activity. Use scan_rework() to profile the "
+                "rework of all activities."
+            )
+        self.filters = self.filters + self._get_date_filters()
 
         is_closed_indicator = feature_processor_new.all_cases_closed_query(
             process_config=self.process_config,
@@ -1234,16 +1692,12 @@ class ReworkProcessor(UseCaseProcessor):
         )
         self.filters.append(filter_activity_occurrence)
 
+        self.metadata_planner = self._create_metadata_planner()
         (
             min_attr_count,
             max_attr_count,
-        ) = feature_processor_new.compute_min_max_attribute_counts_PQL(
-            self.min_attr_count_perc,
-            self.max_attr_count_perc,
-            process_config=self.process_config,
-            activity_table_name=self.activity_table_str,
-            chunksize=self.chunksize,
-            filters=self.filters,
+        ) = self.metadata_planner.get_min_max_attribute_counts(
+            self.min_attr_count_perc, self.max_attr_count_perc
         )
 
         self.used_static_attributes = self._gen_static_attr_list(
@@ -1263,9 +1717,15 @@ class ReworkProcessor(UseCaseProcessor):
             dynamic_attributes=[],
             is_closed_indicator=is_closed_indicator,
             target_variable=target_variable,
-            filters=self.filters,
+            filters=self._get_extraction_filters(target_variable),
+            activity_pivot=self.activity_pivot,
+            local_cumulative_counts=self.local_cumulative_counts,
+            column_batch_size=self.column_batch_size,
+            scheduler=self.scheduler,
+            chunksize=self.chunksize,
         )
 
+        self._ingest_extracted_dfs()
         pp = PostProcessor(
             df_x=self.df_x,
             df_target=self.df_target,
@@ -1275,6 +1735,11 @@ class ReworkProcessor(UseCaseProcessor):
             invalid_target_replacement=None,
             min_counts_perc=self.min_attr_count_perc,
             max_counts_perc=self.max_attr_count_perc,
+            sparse_features=self.sparse_features,
+            max_categories=self.max_categories,
+            other_bucket=self.other_bucket,
+            hash_width=self.hash_width,
+            max_workers=self.post_processing_max_workers,
         )
 
         self.df_x, self.df_target, self.target_features, self.features = pp.process()
@@ -1286,7 +1751,11 @@ class ReworkProcessor(UseCaseProcessor):
             df_target=self.df_target,
         )
         statistics_computer.compute_all_statistics()
-        self.df_x, self.df_target = post_processing.remove_nan(
+        (
+            self.df_x,
+            self.df_target,
+            self.nan_report,
+        ) = post_processing.remove_nan_with_report(
             df_x=self.df_x,
             df_target=self.df_target,
             features=self.features,
@@ -1478,22 +1947,13 @@ class StartActivityProcessor(UseCaseProcessor):
         )
         self.filters = self.filters + date_filters
 
-        self.num_cases = feature_processor_new.get_number_cases(
-            process_config=self.process_config,
-            activity_table_str=self.activity_table_str,
-            filters=self.filters,
-        )
-
+        self.metadata_planner = self._create_metadata_planner()
+        self.num_cases = self.metadata_planner.get_number_cases()
         (
             min_attr_count,
             max_attr_count,
-        ) = feature_processor_new.compute_min_max_attribute_counts_PQL(
-            self.min_attr_count_perc,
-            self.max_attr_count_perc,
-            process_config=self.process_config,
-            activity_table_name=self.activity_table_str,
-            chunksize=self.chunksize,
-            filters=self.filters,
+        ) = self.metadata_planner.get_min_max_attribute_counts(
+            self.min_attr_count_perc, self.max_attr_count_perc
         )
 
         self.used_static_attributes = self._gen_static_attr_list(
@@ -1528,9 +1988,15 @@ class StartActivityProcessor(UseCaseProcessor):
             dynamic_attributes=[],
             is_closed_indicator=self.is_closed_query,
             target_variable=target_variable,
-            filters=self.filters,
+            filters=self._get_extraction_filters(target_variable),
+            activity_pivot=self.activity_pivot,
+            local_cumulative_counts=self.local_cumulative_counts,
+            column_batch_size=self.column_batch_size,
+            scheduler=self.scheduler,
+            chunksize=self.chunksize,
         )
 
+        self._ingest_extracted_dfs()
         pp = PostProcessor(
             df_x=self.df_x,
             df_target=self.df_target,
@@ -1540,6 +2006,11 @@ class StartActivityProcessor(UseCaseProcessor):
             invalid_target_replacement=None,
             min_counts_perc=self.min_attr_count_perc,
             max_counts_perc=self.max_attr_count_perc,
+            sparse_features=self.sparse_features,
+            max_categories=self.max_categories,
+            other_bucket=self.other_bucket,
+            hash_width=self.hash_width,
+            max_workers=self.post_processing_max_workers,
         )
 
         self.df_x, self.df_target, self.target_features, self.features = pp.process()
@@ -1551,7 +2022,11 @@ class StartActivityProcessor(UseCaseProcessor):
             df_target=self.df_target,
         )
         statistics_computer.compute_all_statistics()
-        self.df_x, self.df_target = post_processing.remove_nan(
+        (
+            self.df_x,
+            self.df_target,
+            self.nan_report,
+        ) = post_processing.remove_nan_with_report(
             df_x=self.df_x,
             df_target=self.df_target,
             features=self.features,
@@ -1611,7 +2086,7 @@ class StartActivityProcessor(UseCaseProcessor):
                     columns=self.considered_activity_table_cols,
                     is_feature=True,
                     is_class_feature=False,
-                    suffix=""
+                    suffix="",
                 )
             )
             dynamic_attributes_list = (
@@ -1690,22 +2165,13 @@ class ActivityProcessor(UseCaseProcessor):
         )
         self.filters = self.filters + date_filters
 
-        self.num_cases = feature_processor_new.get_number_cases(
-            process_config=self.process_config,
-            activity_table_str=self.activity_table_str,
-            filters=self.filters,
-        )
-
+        self.metadata_planner = self._create_metadata_planner()
+        self.num_cases = self.metadata_planner.get_number_cases()
         (
             min_attr_count,
             max_attr_count,
-        ) = feature_processor_new.compute_min_max_attribute_counts_PQL(
-            self.min_attr_count_perc,
-            self.max_attr_count_perc,
-            process_config=self.process_config,
-            activity_table_name=self.activity_table_str,
-            chunksize=self.chunksize,
-            filters=self.filters,
+        ) = self.metadata_planner.get_min_max_attribute_counts(
+            self.min_attr_count_perc, self.max_attr_count_perc
         )
 
         self.used_static_attributes = self._gen_static_attr_list(
@@ -1734,9 +2200,15 @@ class ActivityProcessor(UseCaseProcessor):
             dynamic_attributes=[],
             is_closed_indicator=self.is_closed_query,
             target_variable=target_variable,
-            filters=self.filters,
+            filters=self._get_extraction_filters(target_variable),
+            activity_pivot=self.activity_pivot,
+            local_cumulative_counts=self.local_cumulative_counts,
+            column_batch_size=self.column_batch_size,
+            scheduler=self.scheduler,
+            chunksize=self.chunksize,
         )
 
+        self._ingest_extracted_dfs()
         pp = PostProcessor(
             df_x=self.df_x,
             df_target=self.df_target,
@@ -1746,6 +2218,11 @@ class ActivityProcessor(UseCaseProcessor):
             invalid_target_replacement=None,
             min_counts_perc=self.min_attr_count_perc,
             max_counts_perc=self.max_attr_count_perc,
+            sparse_features=self.sparse_features,
+            max_categories=self.max_categories,
+            other_bucket=self.other_bucket,
+            hash_width=self.hash_width,
+            max_workers=self.post_processing_max_workers,
         )
 
         self.df_x, self.df_target, self.target_features, self.features = pp.process()
@@ -1757,7 +2234,11 @@ class ActivityProcessor(UseCaseProcessor):
             df_target=self.df_target,
         )
         statistics_computer.compute_all_statistics()
-        self.df_x, self.df_target = post_processing.remove_nan(
+        (
+            self.df_x,
+            self.df_target,
+            self.nan_report,
+        ) = post_processing.remove_nan_with_report(
             df_x=self.df_x,
             df_target=self.df_target,
             features=self.features,
@@ -1900,11 +2381,8 @@ class TransitionProcessor(UseCaseProcessor):
         )
         self.filters = self.filters + date_filters
 
-        self.num_cases = feature_processor_new.get_number_cases(
-            process_config=self.process_config,
-            activity_table_str=self.activity_table_str,
-            filters=self.filters,
-        )
+        self.metadata_planner = self._create_metadata_planner()
+        self.num_cases = self.metadata_planner.get_number_cases()
 
         # prev_activity_filter = feature_processor_new.filter_prev_activity(
         #     prev_activity=self.source_activity,
@@ -1917,13 +2395,8 @@ class TransitionProcessor(UseCaseProcessor):
         (
             min_attr_count,
             max_attr_count,
-        ) = feature_processor_new.compute_min_max_attribute_counts_PQL(
-            self.min_attr_count_perc,
-            self.max_attr_count_perc,
-            process_config=self.process_config,
-            activity_table_name=self.activity_table_str,
-            chunksize=self.chunksize,
-            filters=self.filters,
+        ) = self.metadata_planner.get_min_max_attribute_counts(
+            self.min_attr_count_perc, self.max_attr_count_perc
         )
 
         self.used_static_attributes = self._gen_static_attr_list(
@@ -1965,9 +2438,15 @@ class TransitionProcessor(UseCaseProcessor):
             + [target_attribute_for_dyn],
             is_closed_indicator=self.is_closed_query,
             target_variable=target_variable,
-            filters=self.filters,
+            filters=self._get_extraction_filters(target_variable),
+            activity_pivot=self.activity_pivot,
+            local_cumulative_counts=self.local_cumulative_counts,
+            column_batch_size=self.column_batch_size,
+            scheduler=self.scheduler,
+            chunksize=self.chunksize,
         )
 
+        self._ingest_extracted_dfs()
         pp = PostProcessor(
             df_x=self.df_x,
             df_target=self.df_target,
@@ -1977,6 +2456,11 @@ class TransitionProcessor(UseCaseProcessor):
             invalid_target_replacement=None,
             min_counts_perc=self.min_attr_count_perc,
             max_counts_perc=self.max_attr_count_perc,
+            sparse_features=self.sparse_features,
+            max_categories=self.max_categories,
+            other_bucket=self.other_bucket,
+            hash_width=self.hash_width,
+            max_workers=self.post_processing_max_workers,
         )
 
         self.df_x, self.df_target, self.target_features, self.features = pp.process()
@@ -1988,7 +2472,11 @@ class TransitionProcessor(UseCaseProcessor):
             df_target=self.df_target,
         )
         statistics_computer.compute_all_statistics()
-        self.df_x, self.df_target = post_processing.remove_nan(
+        (
+            self.df_x,
+            self.df_target,
+            self.nan_report,
+        ) = post_processing.remove_nan_with_report(
             df_x=self.df_x,
             df_target=self.df_target,
             features=self.features,
@@ -2082,6 +2570,7 @@ class TransitionProcessor(UseCaseProcessor):
                     is_feature=True,
                     is_class_feature=False,
                     filters=self.filters,
+                    metadata_planner=self.metadata_planner,
                 )
             )
             dynamic_attributes_list = (
@@ -2180,22 +2669,13 @@ class IncompleteCaseProcessor(UseCaseProcessor):
         )
         self.filters = self.filters + date_filters
 
-        self.num_cases = feature_processor_new.get_number_cases(
-            process_config=self.process_config,
-            activity_table_str=self.activity_table_str,
-            filters=self.filters,
-        )
-
+        self.metadata_planner = self._create_metadata_planner()
+        self.num_cases = self.metadata_planner.get_number_cases()
         (
             min_attr_count,
             max_attr_count,
-        ) = feature_processor_new.compute_min_max_attribute_counts_PQL(
-            self.min_attr_count_perc,
-            self.max_attr_count_perc,
-            process_config=self.process_config,
-            activity_table_name=self.activity_table_str,
-            chunksize=self.chunksize,
-            filters=self.filters,
+        ) = self.metadata_planner.get_min_max_attribute_counts(
+            self.min_attr_count_perc, self.max_attr_count_perc
         )
 
         self.used_static_attributes = self._gen_static_attr_list(
@@ -2224,9 +2704,15 @@ class IncompleteCaseProcessor(UseCaseProcessor):
             dynamic_attributes=[],
             is_closed_indicator=self.is_closed_query,
             target_variable=target_variable,
-            filters=self.filters,
+            filters=self._get_extraction_filters(target_variable),
+            activity_pivot=self.activity_pivot,
+            local_cumulative_counts=self.local_cumulative_counts,
+            column_batch_size=self.column_batch_size,
+            scheduler=self.scheduler,
+            chunksize=self.chunksize,
         )
 
+        self._ingest_extracted_dfs()
         pp = PostProcessor(
             df_x=self.df_x,
             df_target=self.df_target,
@@ -2236,6 +2722,11 @@ class IncompleteCaseProcessor(UseCaseProcessor):
             invalid_target_replacement=None,
             min_counts_perc=self.min_attr_count_perc,
             max_counts_perc=self.max_attr_count_perc,
+            sparse_features=self.sparse_features,
+            max_categories=self.max_categories,
+            other_bucket=self.other_bucket,
+            hash_width=self.hash_width,
+            max_workers=self.post_processing_max_workers,
         )
 
         self.df_x, self.df_target, self.target_features, self.features = pp.process()
@@ -2247,7 +2738,11 @@ class IncompleteCaseProcessor(UseCaseProcessor):
             df_target=self.df_target,
         )
         statistics_computer.compute_all_statistics()
-        self.df_x, self.df_target = post_processing.remove_nan(
+        (
+            self.df_x,
+            self.df_target,
+            self.nan_report,
+        ) = post_processing.remove_nan_with_report(
             df_x=self.df_x,
             df_target=self.df_target,
             features=self.features,
@@ -0,0 +1,144 @@
+from typing import List
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pycelonis.celonis_api.pql.pql import PQLFilter
+from scipy import sparse
+
+from one_click_analysis.feature_processing.event_sequences import (
+    event_sequence_registry,
+)
+from one_click_analysis.feature_processing.event_sequences import EventSequences
+from one_click_analysis.process_config.process_config import ProcessConfig
+
+
+class ReworkProfile:
+    """Rework of all activities of an activity table, computed from the number of
+    occurrences of each (case, activity) pair. An activity is reworked in a case
+    if it occurs more than once, as in ReworkOccurrenceAttribute."""
+
+    def __init__(self, sequences: EventSequences):
+        """
+        :param sequences: EventSequences of the cases
+        """
+        self.activities = sequences.activities
+        self.case_ids = sequences.case_ids
+        self.positions = {act: i for i, act in enumerate(self.activities)}
+        # case_activity_counts[i, j]: number of occurrences of activity j in case i
+        self.case_activity_counts = sparse.coo_matrix(
+            (
+                np.ones(len(sequences.activity_codes), dtype=np.int64),
+                (sequences.case_positions, sequences.activity_codes),
+            ),
+            shape=(sequences.number_cases, len(self.activities)),
+        ).tocsr()
+        self.case_activity_counts.sum_duplicates()
+
+        counts = self.case_activity_counts.data
+        activity_codes = self.case_activity_counts.indices
+        num_activities = len(self.activities)
+        self.occurrence_counts = np.bincount(
+            activity_codes, weights=counts, minlength=num_activities
+        ).astype(np.int64)
+        self.case_counts = np.bincount(activity_codes, minlength=num_activities)
+        # Number of cases with rework of each activity
+        self.rework_case_counts = np.bincount(
+            activity_codes[counts > 1], minlength=num_activities
+        )
+        # Number of repeated executions (occurrences after the first one)
+        self.rework_counts = self.occurrence_counts - self.case_counts
+
+    @property
+    def number_cases(self) -> int:
+        return len(self.case_ids)
+
+    def get_rework_case_count(self, activity: str) -> int:
+        """Get the number of cases in which an activity is reworked.
+
+        :param activity: activity
+        :return: number of cases. 0 if the activity does not occur.
+        """
+        if activity not in self.positions:
+            return 0
+        return int(self.rework_case_counts[self.positions[activity]])
+
+    def to_df(self) -> pd.DataFrame:
+        """Get the rework profile of all activities.
+
+        :return: DataFrame with the columns activity, case_count,
+        rework_case_count, rework_case_share (of all cases), rework_count and
+        mean_reworks (repeated executions per case with rework), sorted by
+        rework_case_count
+        """
+        rework_case_counts = self.rework_case_counts
+        df = pd.DataFrame(
+            {
+                "activity": self.activities,
+                "case_count": self.case_counts,
+                "rework_case_count": rework_case_counts,
+                "rework_case_share": rework_case_counts / max(self.number_cases, 1),
+                "rework_count": self.rework_counts,
+                "mean_reworks": np.divide(
+                    self.rework_counts,
+                    rework_case_counts,
+                    out=np.zeros(len(self.activities)),
+                    where=rework_case_counts > 0,
+                ),
+            }
+        )
+        return df.sort_values(
+            "rework_case_count", ascending=False, kind="mergesort"
+        ).reset_index(drop=True)
+
+    def get_case_rework_df(
+        self, activities: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Get the number of repeated executions of activities per case.
+
+        :param activities: activities of the columns. If None, all activities are
+        used.
+        :return: DataFrame with the case ids as index and one column per activity
+        """
+        if activities is None:
+            activities = self.activities
+        case_reworks = self.case_activity_counts.copy()
+        case_reworks.data = np.maximum(case_reworks.data - 1, 0)
+        columns = []
+        for act in activities:
+            if act in self.positions:
+                column = case_reworks[:, self.positions[act]].toarray().ravel()
+            else:
+                column = np.zeros(self.number_cases, dtype=np.int64)
+            columns.append(column)
+        values = (
+            np.column_stack(columns)
+            if columns
+            else np.zeros((self.number_cases, 0), dtype=np.int64)
+        )
+        return pd.DataFrame(values, index=self.case_ids, columns=activities)
+
+
+def get_rework_profile(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    filters: Optional[List[PQLFilter]] = None,
+    chunksize: int = 10000,
+) -> ReworkProfile:
+    """Get the shared ReworkProfile of an activity table for a set of filters. It
+    is built from the shared event sequences (see event_sequence_registry).
+
+    :param process_config: the ProcessConfig object
+    :param activity_table_str: name of the activity table
+    :param filters: filters of the extraction
+    :param chunksize: chunksize for the query
+    :return: ReworkProfile
+    """
+    return event_sequence_registry.get_derived(
+        "rework_profile",
+        ReworkProfile,
+        process_config,
+        activity_table_str,
+        filters,
+        chunksize,
+    )
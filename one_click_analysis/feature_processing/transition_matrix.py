@@ -0,0 +1,307 @@
+from typing import Any
+from typing import List
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pycelonis.celonis_api.pql.pql import PQLFilter
+from scipy import sparse
+
+from one_click_analysis.feature_processing.event_sequences import (
+    event_sequence_registry,
+)
+from one_click_analysis.feature_processing.event_sequences import EventSequences
+from one_click_analysis.process_config.process_config import ProcessConfig
+
+PROCESS_START = "PROCESS_START"
+PROCESS_END = "PROCESS_END"
+TIME_UNIT_SECONDS = {
+    "SECONDS": 1,
+    "MINUTES": 60,
+    "HOURS": 3600,
+    "DAYS": 86400,
+}
+
+
+class TransitionMatrix:
+    """Directly-follows matrix of the cases of an activity table. Rows are the
+    source activities and columns the target activities of the transitions. The
+    activities are integer coded as in the EventSequences, followed by a
+    PROCESS_START and a PROCESS_END row / column for the first and last
+    activities of the cases.
+
+    The matrix keeps the EventSequences it was built from, so subsets of the
+    cases (e.g. of a period) are computed locally without a new query."""
+
+    def __init__(
+        self,
+        sequences: EventSequences,
+        process_start_str: str = PROCESS_START,
+        process_end_str: str = PROCESS_END,
+    ):
+        """
+        :param sequences: EventSequences of the cases
+        :param process_start_str: name of the source of the first transition of
+        each case
+        :param process_end_str: name of the target of the last transition of each
+        case
+        """
+        if process_start_str in sequences.activities:
+            raise ValueError("process_start_str must not be a name of an activity.")
+        if process_end_str in sequences.activities:
+            raise ValueError("process_end_str must not be a name of an activity.")
+        self.sequences = sequences
+        self.process_start_str = process_start_str
+        self.process_end_str = process_end_str
+        self.labels = sequences.activities + [process_start_str, process_end_str]
+        self.positions = {label: i for i, label in enumerate(self.labels)}
+        self.transition_counts, self.case_counts = self._count_transitions()
+
+    def _count_transitions(self):
+        """Count the transitions and the cases with each transition."""
+        sequences = self.sequences
+        num_labels = len(self.labels)
+        start_code = num_labels - 2
+        end_code = num_labels - 1
+        activity_codes = sequences.activity_codes
+        # Each event is the target of a transition from the previous event of its
+        # case or from PROCESS_START. The last events are also the source of a
+        # transition to PROCESS_END.
+        source_codes = np.empty_like(activity_codes)
+        source_codes[1:] = activity_codes[:-1]
+        source_codes[sequences.is_case_start] = start_code
+        is_case_end = sequences.is_case_end
+        source_codes = np.concatenate([source_codes, activity_codes[is_case_end]])
+        target_codes = np.concatenate(
+            [activity_codes, np.full(is_case_end.sum(), end_code)]
+        )
+        case_positions = np.concatenate(
+            [sequences.case_positions, sequences.case_positions[is_case_end]]
+        )
+
+        shape = (num_labels, num_labels)
+        transition_counts = sparse.coo_matrix(
+            (np.ones(len(source_codes), dtype=np.int64), (source_codes, target_codes)),
+            shape=shape,
+        ).tocsr()
+        case_transitions = np.unique(
+            (case_positions * num_labels + source_codes) * num_labels + target_codes
+        )
+        case_source_codes = case_transitions // num_labels % num_labels
+        case_target_codes = case_transitions % num_labels
+        case_counts = sparse.coo_matrix(
+            (
+                np.ones(len(case_transitions), dtype=np.int64),
+                (case_source_codes, case_target_codes),
+            ),
+            shape=shape,
+        ).tocsr()
+        return transition_counts, case_counts
+
+    @property
+    def activities(self) -> List[str]:
+        return self.sequences.activities
+
+    @property
+    def number_cases(self) -> int:
+        return self.sequences.number_cases
+
+    def get_transition_count(self, source: str, target: str) -> int:
+        """Get the number of times target directly follows source.
+
+        :param source: source activity, or process_start_str
+        :param target: target activity, or process_end_str
+        :return: number of transitions. 0 if an activity does not occur.
+        """
+        if source not in self.positions or target not in self.positions:
+            return 0
+        return int(
+            self.transition_counts[self.positions[source], self.positions[target]]
+        )
+
+    def get_case_count(self, source: str, target: str) -> int:
+        """Get the number of cases in which target directly follows source.
+
+        :param source: source activity, or process_start_str
+        :param target: target activity, or process_end_str
+        :return: number of cases. 0 if an activity does not occur.
+        """
+        if source not in self.positions or target not in self.positions:
+            return 0
+        return int(self.case_counts[self.positions[source], self.positions[target]])
+
+    def get_successors(self, source: str) -> pd.Series:
+        """Get the activities that directly follow source.
+
+        :param source: source activity, or process_start_str
+        :return: Series with the target activities as index and the number of
+        transitions as values, sorted by the number of transitions
+        """
+        if source not in self.positions:
+            return pd.Series(dtype=np.int64)
+        return self._nonzero_series(self.transition_counts[self.positions[source]])
+
+    def get_predecessors(self, target: str) -> pd.Series:
+        """Get the activities that target directly follows.
+
+        :param target: target activity, or process_end_str
+        :return: Series with the source activities as index and the number of
+        transitions as values, sorted by the number of transitions
+        """
+        if target not in self.positions:
+            return pd.Series(dtype=np.int64)
+        return self._nonzero_series(self.transition_counts[:, self.positions[target]].T)
+
+    def _nonzero_series(self, row: sparse.csr_matrix) -> pd.Series:
+        row = row.tocsr()
+        series = pd.Series(
+            row.data, index=[self.labels[i] for i in row.indices], dtype=np.int64
+        )
+        return series[series > 0].sort_values(ascending=False, kind="mergesort")
+
+    def select_cases(self, case_mask: np.ndarray) -> "TransitionMatrix":
+        """Get the matrix of a subset of the cases.
+
+        :param case_mask: boolean array with one entry per case of the sequences
+        :return: TransitionMatrix of the selected cases
+        """
+        return TransitionMatrix(
+            self.sequences.select_cases(case_mask),
+            process_start_str=self.process_start_str,
+            process_end_str=self.process_end_str,
+        )
+
+    def select_period(
+        self, start: Optional[Any] = None, end: Optional[Any] = None
+    ) -> "TransitionMatrix":
+        """Get the matrix of the cases that started in a period.
+
+        :param start: inclusive start of the period. If None, there is no lower
+        bound.
+        :param end: exclusive end of the period. If None, there is no upper bound.
+        :return: TransitionMatrix of the selected cases
+        """
+        return TransitionMatrix(
+            self.sequences.select_period(start, end),
+            process_start_str=self.process_start_str,
+            process_end_str=self.process_end_str,
+        )
+
+    def to_df(self) -> pd.DataFrame:
+        """Get the transitions that occur as a long DataFrame.
+
+        :return: DataFrame with the columns transition_start, transition_end,
+        case_count and transition_count
+        """
+        transitions = self.transition_counts.tocoo()
+        labels = np.array(self.labels, dtype=object)
+        case_counts = np.zeros(len(transitions.data), dtype=np.int64)
+        if len(transitions.data):
+            case_counts[:] = np.asarray(
+                self.case_counts[transitions.row, transitions.col]
+            ).ravel()
+        return pd.DataFrame(
+            {
+                "transition_start": labels[transitions.row],
+                "transition_end": labels[transitions.col],
+                "case_count": case_counts,
+                "transition_count": transitions.data,
+            }
+        )
+
+
+def get_transition_matrix(
+    process_config: ProcessConfig,
+    activity_table_str: str,
+    filters: Optional[List[PQLFilter]] = None,
+    chunksize: int = 10000,
+) -> TransitionMatrix:
+    """Get the shared TransitionMatrix of an activity table for a set of filters.
+    It is built from the shared event sequences (see event_sequence_registry).
+
+    :param process_config: the ProcessConfig object
+    :param activity_table_str: name of the activity table
+    :param filters: filters of the extraction
+    :param chunksize: chunksize for the query
+    :return: TransitionMatrix
+    """
+    return event_sequence_registry.get_derived(
+        "transition_matrix",
+        TransitionMatrix,
+        process_config,
+        activity_table_str,
+        filters,
+        chunksize,
+    )
+
+
+def compute_transition_durations(
+    sequences: EventSequences,
+    time_unit: str = "DAYS",
+    min_count: int = 1,
+    sort_by: str = "p90",
+) -> pd.DataFrame:
+    """Compute the duration distribution of every directly-follows transition of
+    the cases in a single pass over the events.
+
+    :param sequences: EventSequences of the cases
+    :param time_unit: unit of the durations (DAYS, HOURS, MINUTES or SECONDS)
+    :param min_count: minimum number of occurrences of a transition
+    :param sort_by: column by which the transitions are ranked (descending)
+    :return: DataFrame with the columns source_activity, target_activity, count,
+    case_count, mean, median, p90 and total, one row per transition
+    """
+    num_activities = len(sequences.activities)
+    is_transition = ~sequences.is_case_start[1:]
+    source_codes = sequences.activity_codes[:-1][is_transition]
+    target_codes = sequences.activity_codes[1:][is_transition]
+    case_positions = sequences.case_positions[1:][is_transition]
+    durations = (
+        np.diff(sequences.timestamps)[is_transition] / np.timedelta64(1, "s")
+    ) / TIME_UNIT_SECONDS[time_unit]
+    has_duration = ~np.isnan(durations)
+    pair_codes = (source_codes * num_activities + target_codes)[has_duration]
+    case_positions = case_positions[has_duration]
+    durations = durations[has_duration]
+
+    # Sort by transition and duration, so that each transition is a contiguous
+    # group in which the quantiles can be read off directly
+    order = np.lexsort((durations, pair_codes))
+    pair_codes = pair_codes[order]
+    case_positions = case_positions[order]
+    durations = durations[order]
+    unique_pairs, group_starts, counts = np.unique(
+        pair_codes, return_index=True, return_counts=True
+    )
+    case_counts = np.bincount(
+        np.unique(case_positions * num_activities**2 + pair_codes)
+        % (num_activities**2),
+        minlength=num_activities**2,
+    )[unique_pairs]
+    totals = np.add.reduceat(durations, group_starts) if len(durations) else np.zeros(0)
+
+    def group_quantile(q: float) -> np.ndarray:
+        positions = group_starts + q * (counts - 1)
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.ceil(positions).astype(np.int64)
+        return durations[lower] + (durations[upper] - durations[lower]) * (
+            positions - lower
+        )
+
+    activities = np.array(sequences.activities, dtype=object)
+    df = pd.DataFrame(
+        {
+            "source_activity": activities[unique_pairs // num_activities],
+            "target_activity": activities[unique_pairs % num_activities],
+            "count": counts,
+            "case_count": case_counts,
+            "mean": totals / counts,
+            "median": group_quantile(0.5),
+            "p90": group_quantile(0.9),
+            "total": totals,
+        }
+    )
+    df = df[df["count"] >= min_count]
+    return df.sort_values(sort_by, ascending=False, kind="mergesort").reset_index(
+        drop=True
+    )
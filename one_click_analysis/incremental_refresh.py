@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import pandas as pd
+from pyarrow import feather
+from pycelonis.celonis_api.pql import pql
+
+from one_click_analysis.feature_processing.feature_processor_new import (
+    get_df_with_filters,
+)
+from one_click_analysis.process_config.process_config import ProcessConfig
+
+DEFAULT_INCREMENTAL_DIR = Path.home() / ".cache" / "one_click_analysis" / "incremental"
+STATE_FILE_NAME = "state.json"
+
+
+@dataclass
+class IncrementalState:
+    """State of one incremental extraction of a processor"""
+
+    key: str
+    # Last event watermark of the stored data. None if nothing is stored yet.
+    watermark: Optional[pd.Timestamp]
+    # Latest last event time before the extraction. Becomes the new watermark.
+    new_watermark: Optional[pd.Timestamp]
+    # Filters that restrict the extraction to the cases after the watermark
+    filters: List[pql.PQLFilter]
+
+
+class IncrementalStore:
+    """Stores the extracted (not yet post processed) df_x and df_target of an
+    analysis together with the latest last event time (PU_LAST of the event time)
+    of the extracted cases. The next run then only extracts the cases whose last
+    event is at or after this watermark and merges them into the stored
+    DataFrames. A case that was still open in the previous run gets new events
+    until it is closed, so it is extracted once it is closed.
+
+    Cases are extracted again if they got new events, and then replace the stored
+    rows of the same case. lookback additionally extracts the cases whose last
+    event is up to lookback before the watermark, e.g. for events that are loaded
+    into the datamodel with a delay."""
+
+    def __init__(
+        self,
+        store_dir: Union[str, Path] = DEFAULT_INCREMENTAL_DIR,
+        lookback: Union[str, pd.Timedelta] = "0D",
+    ):
+        """
+        :param store_dir: directory in which the DataFrames are stored
+        :param lookback: time before the watermark from which cases are extracted
+        again. Only needed if events are loaded later than their timestamp.
+        """
+        self.store_dir = Path(store_dir)
+        self.lookback = pd.Timedelta(lookback)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def create_key(
+        dm_id: str,
+        activity_table_str: str,
+        processor_name: str,
+        queries: List[str],
+        filters: List[pql.PQLFilter],
+    ) -> str:
+        """Create the key of the stored data of an analysis.
+
+        :param dm_id: id of the datamodel
+        :param activity_table_str: name of the activity table
+        :param processor_name: name of the processor class
+        :param queries: PQL queries of the extracted attributes
+        :param filters: filters of the extraction without the watermark filter
+        :return: hex digest
+        """
+        key_dict = {
+            "datamodel": dm_id,
+            "activity_table": activity_table_str,
+            "processor": processor_name,
+            "queries": sorted(" ".join(q.split()) for q in queries),
+            "filters": sorted(" ".join(f.query.split()) for f in filters),
+            "watermark": "last_event",
+        }
+        key_str = json.dumps(key_dict, sort_keys=True)
+        return hashlib.sha256(key_str.encode("utf-8")).hexdigest()
+
+    def _dir(self, key: str) -> Path:
+        return self.store_dir / key
+
+    def get_watermark(self, key: str) -> Optional[pd.Timestamp]:
+        """Get the last event watermark of the stored data.
+
+        :param key: key from create_key
+        :return: watermark or None if no data is stored
+        """
+        state_path = self._dir(key) / STATE_FILE_NAME
+        if not state_path.exists():
+            return None
+        with open(state_path) as f:
+            return pd.Timestamp(json.load(f)["watermark"])
+
+    def begin(
+        self,
+        process_config: ProcessConfig,
+        activity_table_str: str,
+        key: str,
+        filters: List[pql.PQLFilter],
+        chunksize: int = 10000,
+    ) -> IncrementalState:
+        """Start an incremental extraction. The new watermark is queried before the
+        extraction, so cases that get events during the extraction are extracted
+        again in the next run.
+
+        :param process_config: ProcessConfig object
+        :param activity_table_str: name of the activity table
+        :param key: key from create_key
+        :param filters: filters of the extraction
+        :param chunksize: chunksize of the query
+        :return: IncrementalState
+        """
+        activity_table = process_config.table_dict[activity_table_str]
+        last_event_query = (
+            f'PU_LAST("{activity_table.case_table_str}", '
+            f'"{activity_table.table_str}"."{activity_table.eventtime_col_str}")'
+        )
+        query = pql.PQL()
+        query.add(pql.PQLColumn(name="watermark", query=f"MAX({last_event_query})"))
+        df = get_df_with_filters(process_config.dm, filters, query, chunksize)
+        new_watermark = df["watermark"].iloc[0] if len(df.index) else None
+        new_watermark = (
+            None if pd.isnull(new_watermark) else pd.Timestamp(new_watermark)
+        )
+
+        watermark = self.get_watermark(key)
+        watermark_filters = []
+        if watermark is not None:
+            start = (watermark - self.lookback).strftime("%Y-%m-%d %H:%M:%S")
+            watermark_filters.append(
+                pql.PQLFilter(f"{last_event_query} >= {{ts'{start}'}}")
+            )
+        return IncrementalState(
+            key=key,
+            watermark=watermark,
+            new_watermark=new_watermark,
+            filters=watermark_filters,
+        )
+
+    def merge(
+        self, state: IncrementalState, df_x: pd.DataFrame, df_target: pd.DataFrame
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Merge newly extracted DataFrames into the stored ones. Stored rows of
+        cases that were extracted again are replaced.
+
+        :param state: IncrementalState from begin
+        :param df_x: newly extracted df_x
+        :param df_target: newly extracted df_target
+        :return: merged df_x and df_target
+        """
+        if state.watermark is None:
+            return df_x, df_target
+        key_dir = self._dir(state.key)
+        merged = []
+        for name, df_new in [("df_x", df_x), ("df_target", df_target)]:
+            df_stored = feather.read_table(
+                key_dir / f"{name}.arrow", memory_map=False
+            ).to_pandas()
+            new_case_ids = df_new.index.get_level_values(0).unique()
+            df_stored = df_stored[
+                ~df_stored.index.get_level_values(0).isin(new_case_ids)
+            ]
+            merged.append(pd.concat([df_stored, df_new]))
+        return merged[0], merged[1]
+
+    def save(
+        self, state: IncrementalState, df_x: pd.DataFrame, df_target: pd.DataFrame
+    ):
+        """Store the merged DataFrames and the new watermark.
+
+        :param state: IncrementalState from begin
+        :param df_x: merged df_x
+        :param df_target: merged df_target
+        """
+        if state.new_watermark is None:
+            return
+        key_dir = self._dir(state.key)
+        key_dir.mkdir(parents=True, exist_ok=True)
+        # The state is replaced last, so the stored data is never newer than the
+        # watermark if a write fails
+        for name, df in [("df_x", df_x), ("df_target", df_target)]:
+            tmp_path = key_dir / f"{name}.{uuid.uuid4().hex}.tmp"
+            feather.write_feather(df, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, key_dir / f"{name}.arrow")
+        tmp_path = key_dir / f"{STATE_FILE_NAME}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"watermark": state.new_watermark.isoformat()}, f)
+        os.replace(tmp_path, key_dir / STATE_FILE_NAME)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Remove stored data, so that the next run extracts all cases again.
+
+        :param key: key of the data that is removed. If None, all data is removed.
+        """
+        target = self._dir(key) if key is not None else self.store_dir
+        shutil.rmtree(target, ignore_errors=True)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,227 @@
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+
+import pandas as pd
+from pycelonis.celonis_api.pql import pql
+
+from one_click_analysis.local_backend.pql_evaluator import EventLogView
+from one_click_analysis.local_backend.pql_evaluator import PQLEvaluator
+
+
+class LocalTable:
+    """Local stand-in for a pycelonis DatamodelTable"""
+
+    def __init__(self, name: str, df: pd.DataFrame):
+        self.name = name
+        self.id = name
+        self.df = df
+
+    @property
+    def columns(self) -> List[Dict[str, str]]:
+        """Columns in the same format as DatamodelTable.columns"""
+        return [{"name": c, "type": _column_type(self.df[c])} for c in self.df.columns]
+
+    def __repr__(self):
+        return f"<LocalTable, name {self.name}>"
+
+
+class LocalTableCollection(list):
+    """List of LocalTables with the find method of the pycelonis collections"""
+
+    def find(self, id_or_name: str) -> LocalTable:
+        for table in self:
+            if table.id == id_or_name or table.name == id_or_name:
+                return table
+        raise KeyError(f"No table with id or name {id_or_name} found.")
+
+
+class LocalDatamodel:
+    """Datamodel that evaluates PQL queries on a local event log instead of a
+    Celonis instance. It can be passed to ProcessConfig in place of a pycelonis
+    Datamodel. Only the PQL subset used by the attributes of this package is
+    supported.
+    """
+
+    def __init__(
+        self,
+        activity_df: pd.DataFrame,
+        caseid_col_str: str,
+        activity_col_str: str,
+        eventtime_col_str: str,
+        case_df: Optional[pd.DataFrame] = None,
+        case_caseid_col_str: Optional[str] = None,
+        sort_col_str: Optional[str] = None,
+        activity_table_str: str = "ACTIVITIES",
+        case_table_str: str = "CASES",
+        name: str = "local_datamodel",
+    ):
+        """
+        :param activity_df: DataFrame of the activity table
+        :param caseid_col_str: name of the case id column in the activity table
+        :param activity_col_str: name of the activity column
+        :param eventtime_col_str: name of the timestamp column
+        :param case_df: DataFrame of the case table. If None, a case table with the
+        distinct case ids of the activity table is created.
+        :param case_caseid_col_str: name of the case id column in the case table.
+        Defaults to caseid_col_str
+        :param sort_col_str: name of the sorting column of the activity table
+        :param activity_table_str: name of the activity table in PQL queries
+        :param case_table_str: name of the case table in PQL queries
+        :param name: name and id of the datamodel
+        """
+        self.name = name
+        self.id = name
+        self.caseid_col_str = caseid_col_str
+        self.activity_col_str = activity_col_str
+        self.eventtime_col_str = eventtime_col_str
+        self.sort_col_str = sort_col_str
+        self.activity_table_str = activity_table_str
+        self.case_table_str = case_table_str
+        self.case_caseid_col_str = case_caseid_col_str or caseid_col_str
+
+        activity_df = activity_df.copy()
+        activity_df[eventtime_col_str] = pd.to_datetime(activity_df[eventtime_col_str])
+        if case_df is None:
+            case_df = pd.DataFrame(
+                {self.case_caseid_col_str: activity_df[caseid_col_str].unique()}
+            )
+
+        self.tables = LocalTableCollection(
+            [
+                LocalTable(activity_table_str, activity_df),
+                LocalTable(case_table_str, case_df),
+            ]
+        )
+        self.data = {
+            "processConfigurations": [
+                {
+                    "activityTableId": activity_table_str,
+                    "caseTableId": case_table_str,
+                    "caseIdColumn": caseid_col_str,
+                    "activityColumn": activity_col_str,
+                    "timestampColumn": eventtime_col_str,
+                    "sortingColumn": sort_col_str,
+                }
+            ],
+            "foreignKeys": [
+                {
+                    "sourceTableId": case_table_str,
+                    "targetTableId": activity_table_str,
+                    "columns": [
+                        {
+                            "sourceColumnName": self.case_caseid_col_str,
+                            "targetColumnName": caseid_col_str,
+                        }
+                    ],
+                }
+            ],
+        }
+        self.event_log = self._create_event_log(activity_df, case_df)
+
+    @classmethod
+    def from_files(
+        cls,
+        activity_table_path: Union[str, Path],
+        caseid_col_str: str,
+        activity_col_str: str,
+        eventtime_col_str: str,
+        case_table_path: Optional[Union[str, Path]] = None,
+        **kwargs,
+    ) -> "LocalDatamodel":
+        """Create a LocalDatamodel from Parquet or CSV files.
+
+        :param activity_table_path: path to the activity table
+        :param caseid_col_str: name of the case id column in the activity table
+        :param activity_col_str: name of the activity column
+        :param eventtime_col_str: name of the timestamp column
+        :param case_table_path: path to the case table
+        :param kwargs: further arguments for LocalDatamodel
+        :return: LocalDatamodel
+        """
+        activity_df = _read_table(activity_table_path)
+        case_df = _read_table(case_table_path) if case_table_path else None
+        return cls(
+            activity_df=activity_df,
+            caseid_col_str=caseid_col_str,
+            activity_col_str=activity_col_str,
+            eventtime_col_str=eventtime_col_str,
+            case_df=case_df,
+            **kwargs,
+        )
+
+    def _create_event_log(
+        self, activity_df: pd.DataFrame, case_df: pd.DataFrame
+    ) -> EventLogView:
+        """Sort the events by case and event order and map them to the rows of
+        the case table."""
+        case_index = pd.Index(case_df[self.case_caseid_col_str])
+        case_codes = case_index.get_indexer(activity_df[self.caseid_col_str])
+        activity_df = activity_df.assign(_case_code=case_codes)
+        activity_df = activity_df[activity_df["_case_code"] >= 0]
+        sort_cols = ["_case_code", self.eventtime_col_str]
+        if self.sort_col_str:
+            sort_cols.append(self.sort_col_str)
+        activity_df = activity_df.sort_values(sort_cols, kind="mergesort")
+        case_codes = activity_df["_case_code"].to_numpy()
+        return EventLogView(activity_df.drop(columns="_case_code"), case_df, case_codes)
+
+    def get_data_frame(self, query: pql.PQL, chunksize: int = None, **kwargs):
+        """Evaluate a PQL query on the local event log. The signature mirrors
+        Datamodel.get_data_frame, chunksize is ignored.
+
+        :param query: PQL object
+        :param chunksize: ignored
+        :return: DataFrame with the query result
+        """
+        if isinstance(query, pql.PQLColumn):
+            query = pql.PQL(query)
+        log = self.event_log
+        for pql_filter in query.filters:
+            log = self._create_evaluator(log).evaluate_filter(pql_filter.query)
+        columns = [(c.name, c.query) for c in query.columns]
+        df = self._create_evaluator(log).evaluate_columns(columns)
+        if getattr(query, "distinct", False):
+            df = df.drop_duplicates(ignore_index=True)
+        limit = getattr(query, "limit", None)
+        if limit:
+            df = df.head(limit)
+        return df
+
+    def _create_evaluator(self, log: EventLogView) -> PQLEvaluator:
+        return PQLEvaluator(
+            log,
+            activity_table_str=self.activity_table_str,
+            case_table_str=self.case_table_str,
+            activity_col_str=self.activity_col_str,
+        )
+
+    def reload(self):
+        """Nothing to reload for a local datamodel"""
+
+    def __repr__(self):
+        return f"<LocalDatamodel, name {self.name}>"
+
+
+def _read_table(path: Union[str, Path]) -> pd.DataFrame:
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path)
+    raise ValueError(f"Only Parquet and CSV files are supported but got {path}")
+
+
+def _column_type(series: pd.Series) -> str:
+    """Celonis column type of a pandas Series"""
+    if pd.api.types.is_bool_dtype(series):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        return "FLOAT"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "DATETIME"
+    return "STRING"
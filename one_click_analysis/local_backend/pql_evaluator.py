@@ -0,0 +1,733 @@
+import dataclasses
+import operator
+from dataclasses import dataclass
+from typing import Any
+from typing import List
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from one_click_analysis.errors import PQLNotSupportedError
+from one_click_analysis.local_backend.pql_parser import BinaryOp
+from one_click_analysis.local_backend.pql_parser import Case
+from one_click_analysis.local_backend.pql_parser import ColumnRef
+from one_click_analysis.local_backend.pql_parser import Distinct
+from one_click_analysis.local_backend.pql_parser import FunctionCall
+from one_click_analysis.local_backend.pql_parser import InList
+from one_click_analysis.local_backend.pql_parser import IsNull
+from one_click_analysis.local_backend.pql_parser import Keyword
+from one_click_analysis.local_backend.pql_parser import Literal
+from one_click_analysis.local_backend.pql_parser import NodeList
+from one_click_analysis.local_backend.pql_parser import Occurrence
+from one_click_analysis.local_backend.pql_parser import PQLParser
+from one_click_analysis.local_backend.pql_parser import ProcessEquals
+from one_click_analysis.local_backend.pql_parser import Range
+from one_click_analysis.local_backend.pql_parser import TableRef
+from one_click_analysis.local_backend.pql_parser import UnaryOp
+
+# Levels a value can live on. Values of a lower level are broadcast to a higher
+# level when they are combined (e.g. a case column compared to an activity column).
+SCALAR = 0
+CASE = 1
+ACTIVITY = 2
+GROUP = 3
+
+AGGREGATIONS = ["COUNT", "SUM", "AVG", "MIN", "MAX", "MEDIAN", "COUNT_TABLE"]
+
+PU_AGGREGATIONS = {
+    "PU_SUM": "sum",
+    "PU_COUNT": "count",
+    "PU_COUNT_DISTINCT": "nunique",
+    "PU_MAX": "max",
+    "PU_MIN": "min",
+    "PU_AVG": "mean",
+    "PU_MEDIAN": "median",
+}
+
+TIME_UNITS = {
+    "DAYS": pd.Timedelta(days=1),
+    "HOURS": pd.Timedelta(hours=1),
+    "MINUTES": pd.Timedelta(minutes=1),
+    "SECONDS": pd.Timedelta(seconds=1),
+    "MILLIS": pd.Timedelta(milliseconds=1),
+    "MILLISECONDS": pd.Timedelta(milliseconds=1),
+}
+
+_BINARY_OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+}
+
+_COMPARISONS = ["=", "!=", "<", "<=", ">", ">="]
+
+
+@dataclass
+class Value:
+    """Result of evaluating a PQL expression. data is a pandas Series with a
+    RangeIndex for all levels except SCALAR where it is a python scalar."""
+
+    data: Any
+    level: int
+
+
+class EventLogView:
+    """Activity and case table of an event log after filters have been applied.
+    The events are sorted by case and event order, case_codes holds the position
+    of the case of each event in the case table."""
+
+    def __init__(
+        self, events: pd.DataFrame, cases: pd.DataFrame, case_codes: np.ndarray
+    ):
+        self.events = events.reset_index(drop=True)
+        self.cases = cases.reset_index(drop=True)
+        self.case_codes = np.asarray(case_codes, dtype=np.int64)
+        self.num_events = len(self.events)
+        self.num_cases = len(self.cases)
+        self.case_sizes = np.bincount(self.case_codes, minlength=self.num_cases)
+        self.case_starts = np.concatenate([[0], np.cumsum(self.case_sizes)])
+
+    def select_events(self, mask: np.ndarray) -> "EventLogView":
+        """Keep only the events where mask is True. Cases without remaining events
+        are removed as well.
+
+        :param mask: boolean array over the events
+        :return: filtered EventLogView
+        """
+        case_mask = np.bincount(self.case_codes[mask], minlength=self.num_cases) > 0
+        return self._subset(mask, case_mask)
+
+    def select_cases(self, mask: np.ndarray) -> "EventLogView":
+        """Keep only the cases where mask is True together with their events.
+
+        :param mask: boolean array over the cases
+        :return: filtered EventLogView
+        """
+        return self._subset(mask[self.case_codes], mask)
+
+    def _subset(self, event_mask: np.ndarray, case_mask: np.ndarray):
+        new_codes = np.cumsum(case_mask) - 1
+        return EventLogView(
+            self.events[event_mask],
+            self.cases[case_mask],
+            new_codes[self.case_codes[event_mask]],
+        )
+
+
+class PQLEvaluator:
+    """Evaluates parsed PQL expressions on an EventLogView with vectorized pandas
+    and NumPy operations."""
+
+    def __init__(
+        self,
+        log: EventLogView,
+        activity_table_str: str,
+        case_table_str: str,
+        activity_col_str: str,
+    ):
+        """
+        :param log: the (filtered) event log
+        :param activity_table_str: name of the activity table
+        :param case_table_str: name of the case table
+        :param activity_col_str: name of the activity column
+        """
+        self.log = log
+        self.activity_table_str = activity_table_str
+        self.case_table_str = case_table_str
+        self.activity_col_str = activity_col_str
+        # (level, group codes, number of groups) while evaluating aggregations
+        self._grouping = None
+
+    def evaluate(self, node) -> Value:
+        """Evaluate an expression tree.
+
+        :param node: root node from PQLParser.parse
+        :return: Value
+        """
+        method = getattr(self, "_eval_" + type(node).__name__, None)
+        if method is None:
+            raise PQLNotSupportedError(type(node).__name__)
+        return method(node)
+
+    def evaluate_columns(self, columns: List[Tuple[str, str]]) -> pd.DataFrame:
+        """Evaluate the columns of a PQL query into a DataFrame. If any column
+        contains an aggregation, the other columns are used as dimensions to group
+        by.
+
+        :param columns: list of (column name, PQL string)
+        :return: DataFrame with one column per input column
+        """
+        parsed = [(name, PQLParser.parse(query)) for name, query in columns]
+        distinct = any(isinstance(node, Distinct) for _, node in parsed)
+        parsed = [
+            (name, node.operand if isinstance(node, Distinct) else node)
+            for name, node in parsed
+        ]
+        is_aggregation = [_contains_aggregation(node) for _, node in parsed]
+
+        if any(is_aggregation):
+            values = self._evaluate_grouped(parsed, is_aggregation)
+        else:
+            values = {name: self.evaluate(node) for name, node in parsed}
+            level = max([v.level for v in values.values()] + [SCALAR])
+            values = {
+                name: self._as_series(v, level) if level != SCALAR else [v.data]
+                for name, v in values.items()
+            }
+
+        df = pd.DataFrame(values)
+        if distinct:
+            df = df.drop_duplicates(ignore_index=True)
+        return df
+
+    def evaluate_filter(self, query: str) -> EventLogView:
+        """Apply a PQL filter to the event log.
+
+        :param query: PQL string of the filter
+        :return: filtered EventLogView
+        """
+        value = self.evaluate(PQLParser.parse(query))
+        if value.level == SCALAR:
+            keep = bool(value.data) if value.data is not None else False
+            return self.log.select_cases(np.full(self.log.num_cases, keep))
+        mask = self._as_bool(value).to_numpy()
+        if value.level == ACTIVITY:
+            return self.log.select_events(mask)
+        if value.level == CASE:
+            return self.log.select_cases(mask)
+        raise PQLNotSupportedError("aggregation in FILTER")
+
+    def _evaluate_grouped(self, parsed, is_aggregation) -> dict:
+        dimensions = {
+            name: self.evaluate(node)
+            for (name, node), is_agg in zip(parsed, is_aggregation)
+            if not is_agg
+        }
+        values = {}
+        num_groups = 1
+        if dimensions:
+            level = max([v.level for v in dimensions.values()] + [CASE])
+            dim_series = {
+                name: self._as_series(v, level) for name, v in dimensions.items()
+            }
+            group_codes = (
+                pd.DataFrame(dim_series)
+                .groupby(list(dim_series.keys()), sort=False, dropna=False)
+                .ngroup()
+                .to_numpy()
+            )
+            _, first_rows = np.unique(group_codes, return_index=True)
+            num_groups = len(first_rows)
+            self._grouping = (level, group_codes, num_groups)
+            values.update(
+                {
+                    name: Value(s.take(first_rows).reset_index(drop=True), GROUP)
+                    for name, s in dim_series.items()
+                }
+            )
+        try:
+            for (name, node), is_agg in zip(parsed, is_aggregation):
+                if is_agg:
+                    value = self.evaluate(node)
+                    if value.level not in [GROUP, SCALAR]:
+                        raise PQLNotSupportedError(
+                            f"non-aggregated expression in aggregation column {name}"
+                        )
+                    values[name] = value
+        finally:
+            self._grouping = None
+
+        return {
+            name: pd.Series([values[name].data] * num_groups)
+            if values[name].level == SCALAR
+            else values[name].data
+            for name, _ in parsed
+        }
+
+    # Level helpers
+
+    def _broadcast_case(self, series: pd.Series) -> pd.Series:
+        """Broadcast case level values to the activity level"""
+        return series.take(self.log.case_codes).reset_index(drop=True)
+
+    def _level_length(self, level: int) -> int:
+        if level == ACTIVITY:
+            return self.log.num_events
+        if level == CASE:
+            return self.log.num_cases
+        if level == GROUP and self._grouping is not None:
+            return self._grouping[2]
+        return 1
+
+    def _to_level(self, value: Value, level: int) -> Value:
+        if value.level == level or value.level == SCALAR:
+            return value
+        if value.level == CASE and level == ACTIVITY:
+            return Value(self._broadcast_case(value.data), ACTIVITY)
+        raise PQLNotSupportedError(
+            "combination of values from different aggregation levels"
+        )
+
+    def _as_series(self, value: Value, level: int) -> pd.Series:
+        value = self._to_level(value, level)
+        if value.level == SCALAR:
+            return pd.Series([value.data] * self._level_length(level))
+        return value.data
+
+    def _align(self, values: List[Value]) -> Tuple[List[Value], int]:
+        level = max(v.level for v in values)
+        return [self._to_level(v, level) for v in values], level
+
+    def _as_bool(self, value: Value):
+        if value.level == SCALAR:
+            return bool(value.data) if value.data is not None else False
+        data = value.data
+        if data.dtype == bool:
+            return data
+        return data.fillna(0).astype(bool)
+
+    def _activity_series(self) -> pd.Series:
+        return self.log.events[self.activity_col_str]
+
+    def _per_case_any(self, mask: np.ndarray) -> np.ndarray:
+        """Whether mask is True for at least one event of each case"""
+        return np.bincount(self.log.case_codes[mask], minlength=self.log.num_cases) > 0
+
+    def _per_case_boundary(self, series: pd.Series, mask, last: bool) -> pd.Series:
+        """Value of series at the first (or last) event of each case for which mask
+        is True."""
+        codes = self.log.case_codes
+        positions = np.flatnonzero(mask)
+        masked_codes = codes[positions]
+        if len(positions) == 0:
+            selected = positions
+        elif last:
+            is_boundary = np.r_[masked_codes[1:] != masked_codes[:-1], True]
+            selected = positions[is_boundary]
+        else:
+            is_boundary = np.r_[True, masked_codes[1:] != masked_codes[:-1]]
+            selected = positions[is_boundary]
+        result = pd.Series(series.to_numpy()[selected], index=codes[selected])
+        return result.reindex(range(self.log.num_cases)).reset_index(drop=True)
+
+    # Expression nodes
+
+    def _eval_Literal(self, node: Literal) -> Value:
+        return Value(node.value, SCALAR)
+
+    def _eval_ColumnRef(self, node: ColumnRef) -> Value:
+        if node.table == self.activity_table_str:
+            frame, level = self.log.events, ACTIVITY
+        elif node.table == self.case_table_str:
+            frame, level = self.log.cases, CASE
+        else:
+            raise PQLNotSupportedError(f'table "{node.table}"')
+        if node.column not in frame.columns:
+            raise PQLNotSupportedError(f'column "{node.table}"."{node.column}"')
+        return Value(frame[node.column], level)
+
+    def _eval_Keyword(self, node: Keyword) -> Value:
+        raise PQLNotSupportedError(node.name)
+
+    def _eval_BinaryOp(self, node: BinaryOp) -> Value:
+        (left, right), level = self._align(
+            [self.evaluate(node.left), self.evaluate(node.right)]
+        )
+        if node.op in ["AND", "OR"]:
+            func = operator.and_ if node.op == "AND" else operator.or_
+            return Value(func(self._as_bool(left), self._as_bool(right)), level)
+        func = _BINARY_OPERATORS[node.op]
+        if level == SCALAR:
+            if left.data is None or right.data is None:
+                return Value(None, SCALAR)
+            return Value(func(left.data, right.data), SCALAR)
+        if _is_null_scalar(left) or _is_null_scalar(right):
+            # Operations with NULL are NULL and comparisons with NULL are never true
+            num_rows = self._level_length(level)
+            if node.op in _COMPARISONS:
+                return Value(pd.Series(np.zeros(num_rows, dtype=bool)), level)
+            return Value(pd.Series(np.full(num_rows, np.nan)), level)
+        result = func(left.data, right.data)
+        if node.op in _COMPARISONS:
+            # Comparisons with NULL are never true
+            result = result & _notna(left.data) & _notna(right.data)
+        return Value(result, level)
+
+    def _eval_UnaryOp(self, node: UnaryOp) -> Value:
+        value = self.evaluate(node.operand)
+        if node.op == "NOT":
+            if value.level == SCALAR:
+                return Value(not self._as_bool(value), SCALAR)
+            return Value(~self._as_bool(value), value.level)
+        if value.level == SCALAR:
+            return Value(None if value.data is None else -value.data, SCALAR)
+        return Value(-value.data, value.level)
+
+    def _eval_IsNull(self, node: IsNull) -> Value:
+        value = self.evaluate(node.operand)
+        if value.level == SCALAR:
+            return Value((value.data is None) != node.negated, SCALAR)
+        is_null = value.data.isna()
+        return Value(~is_null if node.negated else is_null, value.level)
+
+    def _eval_InList(self, node: InList) -> Value:
+        value = self.evaluate(node.operand)
+        candidates = []
+        for candidate in node.values:
+            candidate = self.evaluate(candidate)
+            if candidate.level != SCALAR:
+                raise PQLNotSupportedError("IN with non-constant values")
+            candidates.append(candidate.data)
+        if value.level == SCALAR:
+            return Value((value.data in candidates) != node.negated, SCALAR)
+        result = value.data.isin(candidates)
+        return Value(~result if node.negated else result, value.level)
+
+    def _eval_Case(self, node: Case) -> Value:
+        conditions = [self.evaluate(cond) for cond, _ in node.branches]
+        results = [self.evaluate(res) for _, res in node.branches]
+        default = (
+            self.evaluate(node.default)
+            if node.default is not None
+            else Value(None, SCALAR)
+        )
+        aligned, level = self._align(conditions + results + [default])
+        conditions = aligned[: len(conditions)]
+        results = aligned[len(conditions) : -1]
+        default = aligned[-1]
+        if level == SCALAR:
+            for condition, result in zip(conditions, results):
+                if self._as_bool(condition):
+                    return result
+            return default
+
+        if default.level == SCALAR and default.data is None:
+            output = pd.Series(np.nan, index=range(self._level_length(level)))
+        else:
+            output = self._as_series(default, level)
+        for condition, result in reversed(list(zip(conditions, results))):
+            condition = self._as_bool(Value(self._as_series(condition, level), level))
+            if result.level == SCALAR:
+                output = output.where(~condition, result.data)
+            else:
+                output = result.data.where(condition, output)
+        return Value(output, level)
+
+    def _eval_FunctionCall(self, node: FunctionCall) -> Value:
+        name = node.name
+        if name in AGGREGATIONS:
+            return self._eval_aggregation(node)
+        if name in PU_AGGREGATIONS or name in ["PU_FIRST", "PU_LAST"]:
+            return self._eval_pu(node)
+        if name in ["ACTIVITY_LEAD", "ACTIVITY_LAG"]:
+            return self._eval_activity_shift(node)
+        if name.startswith("INDEX_ACTIVITY_"):
+            return self._eval_index_activity(node)
+        if name.endswith("_BETWEEN") and name[: -len("_BETWEEN")] in TIME_UNITS:
+            return self._eval_between(node)
+        method = getattr(self, "_eval_function_" + name.lower(), None)
+        if method is None:
+            raise PQLNotSupportedError(name)
+        return method(node)
+
+    def _eval_function_coalesce(self, node: FunctionCall) -> Value:
+        values, level = self._align([self.evaluate(arg) for arg in node.args])
+        if level == SCALAR:
+            return next((v for v in values if v.data is not None), values[-1])
+        output = self._as_series(values[0], level)
+        for value in values[1:]:
+            output = output.where(output.notna(), value.data)
+        return Value(output, level)
+
+    def _eval_function_remap_timestamps(self, node: FunctionCall) -> Value:
+        value = self.evaluate(node.args[0])
+        unit = node.args[1]
+        if not isinstance(unit, Keyword) or unit.name not in TIME_UNITS:
+            raise PQLNotSupportedError(f"REMAP_TIMESTAMPS unit {unit}")
+        epoch = pd.Timestamp("1970-01-01")
+        if value.level == SCALAR:
+            if value.data is None:
+                return value
+            return Value(int((value.data - epoch) // TIME_UNITS[unit.name]), SCALAR)
+        # Number of full time units since the epoch, NULL stays NULL
+        result = (value.data - epoch) // TIME_UNITS[unit.name]
+        if result.notna().all():
+            result = result.astype(np.int64)
+        return Value(result, value.level)
+
+    def _eval_function_readable(self, node: FunctionCall) -> Value:
+        """Strings of the values. The conformance results of CONFORMANCE cannot be
+        computed locally, they have to be given as a column of readable strings."""
+        value = self.evaluate(node.args[0])
+        if value.level == SCALAR:
+            return Value(None if value.data is None else str(value.data), SCALAR)
+        data = value.data
+        return Value(data.where(data.isna(), data.astype(str)), value.level)
+
+    def _eval_function_calc_throughput(self, node: FunctionCall) -> Value:
+        boundaries = node.args[0]
+        if not isinstance(boundaries, Range):
+            raise PQLNotSupportedError("CALC_THROUGHPUT without range")
+        timestamps = self._as_series(self.evaluate(node.args[1]), ACTIVITY)
+        start = self._occurrence_values(boundaries.start, timestamps)
+        end = self._occurrence_values(boundaries.end, timestamps)
+        return Value(end - start, CASE)
+
+    def _occurrence_values(self, occurrence, timestamps: pd.Series) -> pd.Series:
+        if not isinstance(occurrence, Occurrence):
+            raise PQLNotSupportedError("CALC_THROUGHPUT range boundary")
+        all_events = np.ones(self.log.num_events, dtype=bool)
+        if occurrence.kind == "CASE_START" or (
+            occurrence.kind == "ALL_OCCURRENCE"
+            and occurrence.activity == "Process Start"
+        ):
+            return self._per_case_boundary(timestamps, all_events, last=False)
+        if occurrence.kind == "CASE_END" or (
+            occurrence.kind == "ALL_OCCURRENCE" and occurrence.activity == "Process End"
+        ):
+            return self._per_case_boundary(timestamps, all_events, last=True)
+        if occurrence.kind in ["FIRST_OCCURRENCE", "LAST_OCCURRENCE"]:
+            mask = (self._activity_series() == occurrence.activity).to_numpy()
+            return self._per_case_boundary(
+                timestamps, mask, last=occurrence.kind == "LAST_OCCURRENCE"
+            )
+        raise PQLNotSupportedError(f"{occurrence.kind}['{occurrence.activity}']")
+
+    def _eval_function_match_activities(self, node: FunctionCall) -> Value:
+        activities = self._activity_series()
+        result = np.ones(self.log.num_cases, dtype=bool)
+        for node_list in node.args:
+            if isinstance(node_list, ColumnRef):
+                activities = self._as_series(self.evaluate(node_list), ACTIVITY)
+                continue
+            if not isinstance(node_list, NodeList):
+                raise PQLNotSupportedError("MATCH_ACTIVITIES argument")
+            present = [
+                self._per_case_any((activities == act).to_numpy())
+                for act in node_list.activities
+            ]
+            if not present:
+                # An empty list matches every case
+                continue
+            present = np.vstack(present)
+            if node_list.kind == "NODE":
+                result &= present.all(axis=0)
+            elif node_list.kind == "NODE_ANY":
+                result &= present.any(axis=0)
+            elif node_list.kind == "EXCLUDING":
+                result &= ~present.any(axis=0)
+            elif node_list.kind == "EXCLUDING_ALL":
+                result &= ~present.all(axis=0)
+        return Value(pd.Series(result.astype(np.int64)), CASE)
+
+    def _eval_ProcessEquals(self, node: ProcessEquals) -> Value:
+        if node.column is not None:
+            activities = self._as_series(self.evaluate(node.column), ACTIVITY)
+        else:
+            activities = self._activity_series()
+        positions = np.arange(self.log.num_events)
+        mask = (activities == node.steps[0]).to_numpy()
+        for offset, step in enumerate(node.steps[1:], start=1):
+            shifted = self._shift_within_case(activities, offset)
+            mask &= (shifted == step).to_numpy()
+        if node.anchored_start:
+            mask &= positions == self.log.case_starts[self.log.case_codes]
+        if node.anchored_end:
+            last_positions = self.log.case_starts[self.log.case_codes + 1] - 1
+            mask &= positions + len(node.steps) - 1 == last_positions
+        result = self._per_case_any(mask)
+        return Value(pd.Series(result.astype(np.int64)), CASE)
+
+    def _eval_pu(self, node: FunctionCall) -> Value:
+        target = node.args[0]
+        if not isinstance(target, TableRef) or target.table != self.case_table_str:
+            raise PQLNotSupportedError(f"{node.name} with target table {target}")
+        series = self._as_series(self.evaluate(node.args[1]), ACTIVITY)
+        if len(node.args) > 2:
+            mask = self._as_bool(
+                self._to_level(self.evaluate(node.args[2]), ACTIVITY)
+            ).to_numpy()
+        else:
+            mask = np.ones(self.log.num_events, dtype=bool)
+
+        if node.name in ["PU_FIRST", "PU_LAST"]:
+            result = self._per_case_boundary(series, mask, last=node.name == "PU_LAST")
+            return Value(result, CASE)
+
+        grouped = series[mask].groupby(self.log.case_codes[mask])
+        result = grouped.agg(PU_AGGREGATIONS[node.name])
+        fill_value = 0 if node.name in ["PU_SUM", "PU_COUNT"] else None
+        result = result.reindex(range(self.log.num_cases), fill_value=fill_value)
+        return Value(result.reset_index(drop=True), CASE)
+
+    def _shift_within_case(self, series: pd.Series, offset: int) -> pd.Series:
+        """Shift values by offset rows within each case. Positive offsets look
+        ahead (ACTIVITY_LEAD), negative offsets look back (ACTIVITY_LAG)."""
+        num_events = self.log.num_events
+        codes = self.log.case_codes
+        if num_events == 0:
+            return series
+        indices = np.arange(num_events) + offset
+        valid = (indices >= 0) & (indices < num_events)
+        indices = np.clip(indices, 0, num_events - 1)
+        valid &= codes[indices] == codes
+        shifted = series.take(indices).reset_index(drop=True)
+        return shifted.where(valid)
+
+    def _eval_activity_shift(self, node: FunctionCall) -> Value:
+        series = self._as_series(self.evaluate(node.args[0]), ACTIVITY)
+        offset = self.evaluate(node.args[1]).data if len(node.args) > 1 else 1
+        if node.name == "ACTIVITY_LAG":
+            offset = -offset
+        return Value(self._shift_within_case(series, int(offset)), ACTIVITY)
+
+    def _eval_index_activity(self, node: FunctionCall) -> Value:
+        positions = np.arange(self.log.num_events)
+        codes = self.log.case_codes
+        if node.name == "INDEX_ACTIVITY_ORDER":
+            result = positions - self.log.case_starts[codes] + 1
+        elif node.name == "INDEX_ACTIVITY_ORDER_REVERSE":
+            result = self.log.case_starts[codes + 1] - positions
+        elif node.name == "INDEX_ACTIVITY_TYPE":
+            series = self._as_series(self.evaluate(node.args[0]), ACTIVITY)
+            result = (
+                pd.DataFrame({"case": codes, "value": series})
+                .groupby(["case", "value"], sort=False, dropna=False)
+                .cumcount()
+                .to_numpy()
+                + 1
+            )
+        else:
+            raise PQLNotSupportedError(node.name)
+        return Value(pd.Series(result), ACTIVITY)
+
+    def _eval_between(self, node: FunctionCall) -> Value:
+        unit = TIME_UNITS[node.name[: -len("_BETWEEN")]]
+        (start, end), level = self._align(
+            [self.evaluate(node.args[0]), self.evaluate(node.args[1])]
+        )
+        return Value((end.data - start.data) / unit, level)
+
+    def _eval_function_running_sum(self, node: FunctionCall) -> Value:
+        values = self._as_series(self.evaluate(node.args[0]), ACTIVITY).fillna(0)
+        values = values.to_numpy()
+        order_keys = [
+            self._as_series(self.evaluate(n), ACTIVITY) for n in node.order_by
+        ]
+        partition_keys = [
+            self._as_series(self.evaluate(n), ACTIVITY).to_numpy()
+            for n in node.partition_by
+        ]
+        if order_keys:
+            order = (
+                pd.DataFrame({i: key for i, key in enumerate(order_keys)})
+                .sort_values(by=list(range(len(order_keys))), kind="mergesort")
+                .index.to_numpy()
+            )
+        else:
+            order = np.arange(self.log.num_events)
+        sorted_values = pd.Series(values[order])
+        if partition_keys:
+            sorted_keys = [key[order] for key in partition_keys]
+            cumulated = sorted_values.groupby(
+                sorted_keys, sort=False, dropna=False
+            ).cumsum()
+        else:
+            cumulated = sorted_values.cumsum()
+        result = np.empty(len(order), dtype=cumulated.dtype)
+        result[order] = cumulated.to_numpy()
+        return Value(pd.Series(result), ACTIVITY)
+
+    def _eval_aggregation(self, node: FunctionCall) -> Value:
+        if node.name == "COUNT_TABLE":
+            return self._eval_count_table(node)
+        series, codes, num_groups = self._group_values(self.evaluate(node.args[0]))
+        grouped = series.groupby(codes)
+        if node.name == "COUNT":
+            result = grouped.nunique() if node.distinct else grouped.count()
+        else:
+            functions = {
+                "SUM": "sum",
+                "AVG": "mean",
+                "MIN": "min",
+                "MAX": "max",
+                "MEDIAN": "median",
+            }
+            result = grouped.agg(functions[node.name])
+        fill_value = 0 if node.name in ["COUNT", "SUM"] else None
+        result = result.reindex(range(num_groups), fill_value=fill_value)
+        return Value(result.reset_index(drop=True), GROUP)
+
+    def _group_values(self, value: Value) -> Tuple[pd.Series, np.ndarray, int]:
+        """Map a value to the group codes of the current aggregation"""
+        if self._grouping is None:
+            level = max(value.level, CASE)
+            series = self._as_series(value, level)
+            return series, np.zeros(len(series), dtype=np.int64), 1
+        level, group_codes, num_groups = self._grouping
+        if value.level == ACTIVITY and level == CASE:
+            return value.data, group_codes[self.log.case_codes], num_groups
+        return self._as_series(value, level), group_codes, num_groups
+
+    def _eval_count_table(self, node: FunctionCall) -> Value:
+        table = node.args[0]
+        if not isinstance(table, TableRef) or table.table not in [
+            self.activity_table_str,
+            self.case_table_str,
+        ]:
+            raise PQLNotSupportedError(f"COUNT_TABLE({table})")
+        is_case_table = table.table == self.case_table_str
+        if self._grouping is None:
+            count = self.log.num_cases if is_case_table else self.log.num_events
+            return Value(pd.Series([count]), GROUP)
+
+        level, group_codes, num_groups = self._grouping
+        if level == ACTIVITY and is_case_table:
+            result = (
+                pd.Series(self.log.case_codes)
+                .groupby(group_codes)
+                .nunique()
+                .reindex(range(num_groups), fill_value=0)
+                .to_numpy()
+            )
+        elif level == ACTIVITY or is_case_table:
+            result = np.bincount(group_codes, minlength=num_groups)
+        else:
+            result = np.bincount(
+                group_codes, weights=self.log.case_sizes, minlength=num_groups
+            ).astype(np.int64)
+        return Value(pd.Series(result), GROUP)
+
+
+def _notna(data):
+    if isinstance(data, pd.Series):
+        return data.notna()
+    return data is not None
+
+
+def _is_null_scalar(value: Value) -> bool:
+    return value.level == SCALAR and value.data is None
+
+
+def _contains_aggregation(node) -> bool:
+    """Check whether an expression tree contains a (non pull-up) aggregation"""
+    if isinstance(node, FunctionCall) and node.name in AGGREGATIONS:
+        return True
+    if isinstance(node, list):
+        return any(_contains_aggregation(n) for n in node)
+    if isinstance(node, tuple):
+        return any(_contains_aggregation(n) for n in node)
+    if dataclasses.is_dataclass(node):
+        return any(
+            _contains_aggregation(getattr(node, f.name))
+            for f in dataclasses.fields(node)
+        )
+    return False
@@ -0,0 +1,449 @@
+import re
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import pandas as pd
+
+from one_click_analysis.errors import PQLParseError
+
+
+@dataclass
+class Literal:
+    value: Any
+
+
+@dataclass
+class ColumnRef:
+    table: str
+    column: str
+
+
+@dataclass
+class TableRef:
+    table: str
+
+
+@dataclass
+class Keyword:
+    name: str
+
+
+@dataclass
+class BinaryOp:
+    op: str
+    left: Any
+    right: Any
+
+
+@dataclass
+class UnaryOp:
+    op: str
+    operand: Any
+
+
+@dataclass
+class IsNull:
+    operand: Any
+    negated: bool = False
+
+
+@dataclass
+class InList:
+    operand: Any
+    values: List[Any]
+    negated: bool = False
+
+
+@dataclass
+class Case:
+    branches: List[Tuple[Any, Any]]
+    default: Any = None
+
+
+@dataclass
+class FunctionCall:
+    name: str
+    args: List[Any]
+    order_by: List[Any] = field(default_factory=list)
+    partition_by: List[Any] = field(default_factory=list)
+    distinct: bool = False
+
+
+@dataclass
+class Distinct:
+    operand: Any
+
+
+@dataclass
+class Occurrence:
+    """ALL_OCCURRENCE / FIRST_OCCURRENCE / LAST_OCCURRENCE / CASE_START / CASE_END
+    used as the range boundaries of CALC_THROUGHPUT"""
+
+    kind: str
+    activity: Optional[str] = None
+
+
+@dataclass
+class Range:
+    start: Any
+    end: Any
+
+
+@dataclass
+class NodeList:
+    """Activity list of MATCH_ACTIVITIES, e.g. NODE_ANY ['A', 'B']"""
+
+    kind: str
+    activities: List[str]
+
+
+@dataclass
+class ProcessEquals:
+    column: Optional[ColumnRef]
+    steps: List[str]
+    anchored_start: bool = False
+    anchored_end: bool = False
+
+
+_TOKEN_REGEX = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |"(?P<ident>[^"]*)"
+    |'(?P<string>(?:[^']|'')*)'
+    |\{\s*(?:d|t|ts)\s*'(?P<date>[^']*)'\s*\}
+    |(?P<number>\d+\.\d*|\.\d+|\d+)
+    |(?P<op><=|>=|!=|<>|=|<|>|\+|-|\*|/)
+    |(?P<punct>[()\[\],.;])
+    |(?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    """,
+    re.VERBOSE,
+)
+
+_COMPARISON_OPS = ["=", "!=", "<>", "<", "<=", ">", ">="]
+_OCCURRENCE_KINDS = ["ALL_OCCURRENCE", "FIRST_OCCURRENCE", "LAST_OCCURRENCE"]
+
+
+@dataclass
+class Token:
+    kind: str
+    value: Any
+    position: int
+
+
+def tokenize(query: str) -> List[Token]:
+    """Split a PQL string into tokens. Whitespace inside quoted identifiers is
+    stripped because several attribute queries break identifiers across lines.
+
+    :param query: PQL string
+    :return: list of tokens
+    """
+    tokens = []
+    pos = 0
+    while pos < len(query):
+        match = _TOKEN_REGEX.match(query, pos)
+        if match is None:
+            raise PQLParseError(query, pos, f"unexpected character {query[pos]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "ident":
+            value = re.sub(r"\s+", " ", value).strip()
+        elif kind == "string":
+            value = value.replace("''", "'")
+        elif kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "name":
+            value = value.upper()
+        if kind != "ws":
+            tokens.append(Token(kind, value, pos))
+        pos = match.end()
+    return tokens
+
+
+class PQLParser:
+    """Recursive descent parser for the subset of PQL that is emitted by the
+    attribute classes and the query helpers of this package."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = tokenize(query)
+        self.pos = 0
+
+    @classmethod
+    def parse(cls, query: str):
+        """Parse a PQL column or filter string into an expression tree.
+
+        :param query: PQL string
+        :return: root node of the expression tree
+        """
+        parser = cls(query)
+        # Filters may be written as 'FILTER <expr>;'
+        if parser._peek_name("FILTER"):
+            parser.pos += 1
+        node = parser._parse_top_level()
+        while parser._peek_punct(";"):
+            parser.pos += 1
+        if parser.pos != len(parser.tokens):
+            parser._fail("unexpected trailing input")
+        return node
+
+    def _parse_top_level(self):
+        if self._peek_name("DISTINCT"):
+            self.pos += 1
+            return Distinct(self._parse_expression())
+        return self._parse_expression()
+
+    # Token helpers
+
+    def _current(self) -> Optional[Token]:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None
+
+    def _fail(self, reason: str):
+        token = self._current()
+        position = token.position if token is not None else len(self.query)
+        raise PQLParseError(self.query, position, reason)
+
+    def _peek(self, kind: str, value: Any = None, offset: int = 0) -> bool:
+        index = self.pos + offset
+        if index >= len(self.tokens):
+            return False
+        token = self.tokens[index]
+        return token.kind == kind and (value is None or token.value == value)
+
+    def _peek_name(self, value: str, offset: int = 0) -> bool:
+        return self._peek("name", value, offset)
+
+    def _peek_punct(self, value: str, offset: int = 0) -> bool:
+        return self._peek("punct", value, offset)
+
+    def _expect(self, kind: str, value: Any = None) -> Token:
+        if not self._peek(kind, value):
+            expected = value if value is not None else kind
+            self._fail(f"expected {expected!r}")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    # Grammar
+
+    def _parse_expression(self):
+        return self._parse_or()
+
+    def _parse_or(self):
+        node = self._parse_and()
+        while self._peek_name("OR"):
+            self.pos += 1
+            node = BinaryOp("OR", node, self._parse_and())
+        return node
+
+    def _parse_and(self):
+        node = self._parse_not()
+        while self._peek_name("AND"):
+            self.pos += 1
+            node = BinaryOp("AND", node, self._parse_not())
+        return node
+
+    def _parse_not(self):
+        if self._peek_name("NOT"):
+            self.pos += 1
+            return UnaryOp("NOT", self._parse_not())
+        return self._parse_comparison()
+
+    def _parse_comparison(self):
+        node = self._parse_additive()
+        token = self._current()
+        if token is not None and token.kind == "op" and token.value in _COMPARISON_OPS:
+            self.pos += 1
+            op = "!=" if token.value == "<>" else token.value
+            return BinaryOp(op, node, self._parse_additive())
+        if self._peek_name("IS"):
+            self.pos += 1
+            negated = False
+            if self._peek_name("NOT"):
+                self.pos += 1
+                negated = True
+            self._expect("name", "NULL")
+            return IsNull(node, negated)
+        negated = False
+        if self._peek_name("NOT") and self._peek_name("IN", 1):
+            self.pos += 1
+            negated = True
+        if self._peek_name("IN"):
+            self.pos += 1
+            self._expect("punct", "(")
+            values = [self._parse_expression()]
+            while self._peek_punct(","):
+                self.pos += 1
+                values.append(self._parse_expression())
+            self._expect("punct", ")")
+            return InList(node, values, negated)
+        return node
+
+    def _parse_additive(self):
+        node = self._parse_multiplicative()
+        while self._peek("op", "+") or self._peek("op", "-"):
+            op = self.tokens[self.pos].value
+            self.pos += 1
+            node = BinaryOp(op, node, self._parse_multiplicative())
+        return node
+
+    def _parse_multiplicative(self):
+        node = self._parse_unary()
+        while self._peek("op", "*") or self._peek("op", "/"):
+            op = self.tokens[self.pos].value
+            self.pos += 1
+            node = BinaryOp(op, node, self._parse_unary())
+        return node
+
+    def _parse_unary(self):
+        if self._peek("op", "-"):
+            self.pos += 1
+            return UnaryOp("-", self._parse_unary())
+        return self._parse_primary()
+
+    def _parse_primary(self):
+        token = self._current()
+        if token is None:
+            self._fail("unexpected end of query")
+        if token.kind in ["number", "string"]:
+            self.pos += 1
+            return Literal(token.value)
+        if token.kind == "date":
+            self.pos += 1
+            return Literal(_parse_date(token.value))
+        if token.kind == "punct" and token.value == "(":
+            self.pos += 1
+            node = self._parse_expression()
+            self._expect("punct", ")")
+            return node
+        if token.kind == "ident":
+            self.pos += 1
+            if self._peek_punct("."):
+                self.pos += 1
+                column = self._expect("ident").value
+                return ColumnRef(token.value, column)
+            return TableRef(token.value)
+        if token.kind == "name":
+            return self._parse_name()
+        self._fail(f"unexpected token {token.value!r}")
+
+    def _parse_name(self):
+        name = self.tokens[self.pos].value
+        if name == "NULL":
+            self.pos += 1
+            return Literal(None)
+        if name == "CASE":
+            return self._parse_case()
+        if name == "PROCESS":
+            return self._parse_process_equals()
+        if name in _OCCURRENCE_KINDS:
+            self.pos += 1
+            self._expect("punct", "[")
+            activity = self._expect("string").value
+            self._expect("punct", "]")
+            return Occurrence(name, activity)
+        if name in ["CASE_START", "CASE_END"]:
+            self.pos += 1
+            return Occurrence(name)
+        if name in ["NODE", "NODE_ANY", "EXCLUDING", "EXCLUDING_ALL"]:
+            return self._parse_node_list()
+        if self._peek_punct("(", 1):
+            return self._parse_function()
+        self.pos += 1
+        return Keyword(name)
+
+    def _parse_case(self):
+        self._expect("name", "CASE")
+        branches = []
+        default = None
+        while self._peek_name("WHEN"):
+            self.pos += 1
+            condition = self._parse_expression()
+            self._expect("name", "THEN")
+            branches.append((condition, self._parse_expression()))
+        if not branches:
+            self._fail("CASE without WHEN")
+        if self._peek_name("ELSE"):
+            self.pos += 1
+            default = self._parse_expression()
+        self._expect("name", "END")
+        return Case(branches, default)
+
+    def _parse_node_list(self):
+        kind = self._expect("name").value
+        self._expect("punct", "[")
+        activities = []
+        while not self._peek_punct("]"):
+            activities.append(self._expect("string").value)
+            if self._peek_punct(","):
+                self.pos += 1
+        self._expect("punct", "]")
+        return NodeList(kind, activities)
+
+    def _parse_process_equals(self):
+        self._expect("name", "PROCESS")
+        column = None
+        if self._peek_name("ON"):
+            self.pos += 1
+            column = self._parse_primary()
+        self._expect("name", "EQUALS")
+        anchored_start = False
+        anchored_end = False
+        if self._peek_name("START"):
+            self.pos += 1
+            anchored_start = True
+        steps = [self._expect("string").value]
+        while self._peek_name("TO"):
+            self.pos += 1
+            if self._peek_name("END"):
+                self.pos += 1
+                anchored_end = True
+                break
+            steps.append(self._expect("string").value)
+        return ProcessEquals(column, steps, anchored_start, anchored_end)
+
+    def _parse_function(self):
+        name = self._expect("name").value
+        self._expect("punct", "(")
+        call = FunctionCall(name, [])
+        if self._peek_name("DISTINCT"):
+            self.pos += 1
+            call.distinct = True
+        while not self._peek_punct(")"):
+            if self._peek_name("ORDER") and self._peek_name("BY", 1):
+                self.pos += 2
+                call.order_by = self._parse_parenthesized_list()
+            elif self._peek_name("PARTITION") and self._peek_name("BY", 1):
+                self.pos += 2
+                call.partition_by = self._parse_parenthesized_list()
+            else:
+                arg = self._parse_expression()
+                if self._peek_name("TO"):
+                    self.pos += 1
+                    arg = Range(arg, self._parse_expression())
+                call.args.append(arg)
+            if self._peek_punct(","):
+                self.pos += 1
+            elif not self._peek_punct(")"):
+                self._fail("expected ',' or ')'")
+        self._expect("punct", ")")
+        return call
+
+    def _parse_parenthesized_list(self) -> List[Any]:
+        self._expect("punct", "(")
+        nodes = [self._parse_expression()]
+        while self._peek_punct(","):
+            self.pos += 1
+            nodes.append(self._parse_expression())
+        self._expect("punct", ")")
+        return nodes
+
+
+def _parse_date(value: str):
+    """Parse the content of a PQL date literal like {d'2020-01-31'}"""
+    return pd.Timestamp(value)
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
+from dataclasses import fields
 from enum import Enum
+from typing import Callable
 from typing import Dict
 from typing import List
 from typing import Optional
@@ -11,6 +13,15 @@ from pycelonis.celonis_api.event_collection.data_model import Datamodel
 from pycelonis.celonis_api.event_collection.data_model import DatamodelTable
 from pycelonis.celonis_api.pql import pql
 
+from one_click_analysis.process_config.process_config_cache import (
+    datamodel_metadata_version,
+)
+from one_click_analysis.process_config.process_config_cache import (
+    ProcessConfigCache,
+)
+from one_click_analysis.query_cache import CachedDatamodel
+from one_click_analysis.query_cache import QueryCache
+
 
 class TableColumnType(Enum):
     STRING = "STRING"
@@ -38,12 +49,32 @@ class TableColumn:
     datatype: TableColumnType
 
 
+def create_columns(table: DatamodelTable) -> List[TableColumn]:
+    """Create list of the columns of a datamodel table as TableColumn objects
+
+    :param table: datamodel table
+    :return: List of TableColumn objects
+    """
+    return [TableColumn(c["name"], TableColumnType(c["type"])) for c in table.columns]
+
+
 @dataclass
 class BaseTable:
     dm: Datamodel
     table_str: str
     id: str
-    columns: List[TableColumn]
+    # Columns of the table. If None, they are loaded on first access of columns.
+    _columns: Optional[List[TableColumn]]
+    # Called with the table after its columns were loaded. Not a dataclass field.
+    _on_columns_loaded = None
+
+    @property
+    def columns(self) -> List[TableColumn]:
+        if self._columns is None:
+            self._columns = create_columns(self.dm.tables.find(self.id))
+            if self._on_columns_loaded is not None:
+                self._on_columns_loaded(self)
+        return self._columns
 
 
 @dataclass
@@ -84,20 +115,44 @@ class ProcessConfig:
         self,
         datamodel: Datamodel,
         global_filters: Optional[List[pql.PQLFilter]] = None,
+        query_cache: Optional[QueryCache] = None,
+        metadata_cache: Optional[ProcessConfigCache] = None,
+        data_version: Optional[str] = None,
     ):
         """Initialize ProcessConfig class
 
-        :param datamodel: Datamodel
+        :param datamodel: Datamodel. A LocalDatamodel can be passed instead to run
+        all queries on a local event log.
         :param global_filters: List of PQL filters that are used to get the
         activities.
+        :param query_cache: QueryCache in which the results of all queries to the
+        datamodel are persisted. If None, results are not cached.
+        :param metadata_cache: ProcessConfigCache in which the table metadata is
+        persisted. If None, the metadata is always requested from the datamodel.
+        :param data_version: string that changes when the datamodel is reloaded
+        (e.g. its reload timestamp). Used to invalidate the cached metadata.
         """
+        if query_cache is not None:
+            datamodel = CachedDatamodel(datamodel, query_cache)
         # create ProcessModel object
         self.dm = datamodel
         self.global_filters = global_filters
         self.activity_tables = []
         self.case_tables = []
         self.other_tables = []
-        self._set_tables()
+        # Lookup dictionaries of the datamodel and of the created tables
+        self._dm_tables_by_id = None
+        self._dm_tables_by_name = None
+        self._process_configs_by_activity_table_id = None
+        self._foreign_keys_by_table_ids = None
+        self._case_tables_by_id: Dict[str, CaseTable] = {}
+        self._column_partitions: Dict[
+            str, Tuple[List[TableColumn], List[TableColumn]]
+        ] = {}
+        if metadata_cache is None:
+            self._set_tables()
+        else:
+            self._set_tables_cached(metadata_cache, data_version)
         # Dictionary mapping table names to table objects
         self.table_dict = self._create_table_dict()
 
@@ -109,40 +164,160 @@ class ProcessConfig:
         table_dict = {t.table_str: t for t in tables}
         return table_dict
 
+    def _create_dm_indices(self):
+        """Create dictionaries for the lookups of tables, process configurations and
+        foreign keys of the datamodel. The first entry is kept for duplicate keys,
+        as in the linear searches these replace."""
+        self._dm_tables_by_id = {}
+        self._dm_tables_by_name = {}
+        for table in self.dm.tables:
+            self._dm_tables_by_id.setdefault(table.id, table)
+            self._dm_tables_by_name.setdefault(table.name, table)
+        self._process_configs_by_activity_table_id = {}
+        for config in self.dm.data["processConfigurations"]:
+            self._process_configs_by_activity_table_id.setdefault(
+                config["activityTableId"], config
+            )
+        self._foreign_keys_by_table_ids = {}
+        for foreign_key in self.dm.data["foreignKeys"]:
+            self._foreign_keys_by_table_ids.setdefault(
+                (foreign_key["sourceTableId"], foreign_key["targetTableId"]),
+                foreign_key,
+            )
+
+    def _find_dm_table(self, id_or_name: str) -> DatamodelTable:
+        """Find a table of the datamodel by its id or name like dm.tables.find"""
+        table = self._dm_tables_by_id.get(id_or_name)
+        if table is None:
+            table = self._dm_tables_by_name.get(id_or_name)
+        if table is None:
+            raise KeyError(f"No table with id or name {id_or_name} found.")
+        return table
+
     def _set_tables(self):
         """Set the table member variables
         :return:
         """
+        self._create_dm_indices()
 
         # Set other activity and case tables
         activity_table_ids = [
-            self.dm.data["processConfigurations"][i]["activityTableId"]
-            for i in range(len(self.dm.data["processConfigurations"]))
+            config["activityTableId"]
+            for config in self.dm.data["processConfigurations"]
         ]
+        activity_table_strs = set()
         for activity_table_id in activity_table_ids:
-            activity_table = self.dm.tables.find(activity_table_id)
+            activity_table = self._find_dm_table(activity_table_id)
             activity_table_str = activity_table.name
-            if activity_table_str in [t.table_str for t in self.activity_tables]:
+            if activity_table_str in activity_table_strs:
                 continue
+            activity_table_strs.add(activity_table_str)
             activity_table, case_table = self._set_activity_case_table(
                 activity_table_str
             )
             self.activity_tables.append(activity_table)
             if case_table is not None:
                 self.case_tables.append(case_table)
+                self._case_tables_by_id[case_table.id] = case_table
 
         # Set other tables
-        already_selected_table_ids = []
+        already_selected_table_ids = set()
         for case_table in self.case_tables:
-            already_selected_table_ids.append(case_table.id)
+            already_selected_table_ids.add(case_table.id)
         for activity_table in self.activity_tables:
-            already_selected_table_ids.append(activity_table.id)
+            already_selected_table_ids.add(activity_table.id)
 
         for table in self.dm.tables:
             if table.id not in already_selected_table_ids:
                 other_table = self._gen_other_table(table)
                 self.other_tables.append(other_table)
 
+    def _set_tables_cached(
+        self, metadata_cache: ProcessConfigCache, data_version: Optional[str]
+    ):
+        """Set the table member variables from the metadata cache. If the metadata
+        of the current version of the datamodel is not cached, it is requested
+        from the datamodel and stored in the cache.
+
+        :param metadata_cache: ProcessConfigCache
+        :param data_version: string that changes when the datamodel is reloaded
+        """
+        version = datamodel_metadata_version(self.dm, data_version)
+        metadata = metadata_cache.get(self.dm.id, version)
+        if metadata is not None:
+            self._set_tables_from_metadata(metadata)
+        else:
+            self._set_tables()
+            metadata_cache.put(self.dm.id, version, self._get_tables_metadata())
+        # Columns that are loaded lazily are added to the cached metadata
+        on_columns_loaded = self._create_metadata_writer(metadata_cache, version)
+        for table in self.activity_tables + self.case_tables + self.other_tables:
+            if table._columns is None:
+                table._on_columns_loaded = on_columns_loaded
+
+    def _create_metadata_writer(
+        self, metadata_cache: ProcessConfigCache, version: str
+    ) -> Callable[[BaseTable], None]:
+        """Create a function that stores the metadata of all tables in the
+        metadata cache.
+
+        :param metadata_cache: ProcessConfigCache
+        :param version: version from datamodel_metadata_version
+        :return: function that is called with the table whose columns were loaded
+        """
+
+        def write_metadata(table: BaseTable):
+            metadata_cache.put(self.dm.id, version, self._get_tables_metadata())
+
+        return write_metadata
+
+    def _get_tables_metadata(self) -> Dict[str, List[Dict]]:
+        """Get the metadata of all tables as json-serializable dictionary"""
+        metadata = {}
+        for key, tables in [
+            ("activity_tables", self.activity_tables),
+            ("case_tables", self.case_tables),
+            ("other_tables", self.other_tables),
+        ]:
+            metadata[key] = []
+            for table in tables:
+                table_dict = {
+                    f.name: getattr(table, f.name)
+                    for f in fields(table)
+                    if f.name not in ["dm", "_columns", "_process_model"]
+                }
+                # Columns that were not loaded yet are also loaded lazily from
+                # the cached metadata
+                table_dict["columns"] = None
+                if table._columns is not None:
+                    table_dict["columns"] = [
+                        [c.name, c.datatype.value] for c in table._columns
+                    ]
+                metadata[key].append(table_dict)
+        return metadata
+
+    def _set_tables_from_metadata(self, metadata: Dict[str, List[Dict]]):
+        """Set the table member variables from metadata created with
+        _get_tables_metadata"""
+        for key, table_class in [
+            ("activity_tables", ActivityTable),
+            ("case_tables", CaseTable),
+            ("other_tables", OtherTable),
+        ]:
+            tables = []
+            for table_dict in metadata[key]:
+                table_dict = dict(table_dict)
+                columns = table_dict.pop("columns")
+                if columns is not None:
+                    columns = [
+                        TableColumn(name, TableColumnType(datatype))
+                        for name, datatype in columns
+                    ]
+                table_dict["_columns"] = columns
+                tables.append(table_class(dm=self.dm, **table_dict))
+            setattr(self, key, tables)
+        self._case_tables_by_id = {t.id: t for t in self.case_tables}
+
     def _set_activity_case_table(
         self, activity_table_str: str
     ) -> Tuple[ActivityTable, CaseTable]:
@@ -151,14 +326,12 @@ class ProcessConfig:
         :param activity_table_str: name of the activity table
         :return: ActivityTable object and CaseTable object
         """
-        activity_table = self.dm.tables.find(activity_table_str)
+        activity_table = self._find_dm_table(activity_table_str)
         activity_table_id = activity_table.id
         # Get the correct process config from all configs
-        activity_table_process_config = [
-            el
-            for el in self.dm.data["processConfigurations"]
-            if el["activityTableId"] == activity_table_id
-        ][0]
+        activity_table_process_config = self._process_configs_by_activity_table_id[
+            activity_table_id
+        ]
         # activity_table_process_config = None
         # for config in activity_table_process_configs:
         #    if config.get("caseTableId") is not None:
@@ -180,7 +353,7 @@ class ProcessConfig:
             "timestampColumn"
         ]
         activity_table_sort_column = activity_table_process_config["sortingColumn"]
-        activity_table_columns = self._create_columns(activity_table)
+        activity_table_columns = create_columns(activity_table)
 
         if case_table_id:
             # Check if case table object already exists
@@ -190,7 +363,7 @@ class ProcessConfig:
                 case_table_obj = None
                 case_table_str = case_table_old.table_str
             else:
-                case_table = self.dm.tables.find(case_table_id)
+                case_table = self._find_dm_table(case_table_id)
                 case_table_obj = self._gen_case_table(
                     case_table=case_table,
                     activity_table_str=activity_table_str,
@@ -210,7 +383,7 @@ class ProcessConfig:
             id=activity_table_id,
             sort_col_str=activity_table_sort_column,
             case_table_str=case_table_str,
-            columns=activity_table_columns,
+            _columns=activity_table_columns,
         )
 
         return activity_table_obj, case_table_obj
@@ -278,10 +451,7 @@ class ProcessConfig:
         :return: CaseTable object if case table exists already in self.case_tables,
         else None
         """
-        for case_table in self.case_tables:
-            if case_table.id == case_table_id:
-                return case_table
-        return None
+        return self._case_tables_by_id.get(case_table_id)
 
     def _gen_case_table(
         self, case_table: DatamodelTable, activity_table_str, activity_table_id
@@ -295,14 +465,8 @@ class ProcessConfig:
         """
         case_table_str = case_table.name
         case_table_id = case_table.id
-        foreign_key_case_id = next(
-            (
-                item
-                for item in self.dm.data["foreignKeys"]
-                if item["sourceTableId"] == case_table_id
-                and item["targetTableId"] == activity_table_id
-            ),
-            None,
+        foreign_key_case_id = self._foreign_keys_by_table_ids.get(
+            (case_table_id, activity_table_id)
         )
         # It can be that the activity table and the associated case table are not
         # connected via a foreign key. Therefore, it can happen that
@@ -311,14 +475,14 @@ class ProcessConfig:
             case_case_id = foreign_key_case_id["columns"][0]["sourceColumnName"]
         else:
             case_case_id = None
-        case_table_columns = self._create_columns(case_table)
         case_table_obj = CaseTable(
             dm=self.dm,
             table_str=case_table_str,
             caseid_col_str=case_case_id,
             activity_tables_str=[activity_table_str],
             id=case_table_id,
-            columns=case_table_columns,
+            # Loaded on first access
+            _columns=None,
         )
         return case_table_obj
 
@@ -330,42 +494,12 @@ class ProcessConfig:
         """
         table_str = table.name
         table_id = table.id
-        table_columns = self._create_columns(table)
+        # The columns are loaded on first access
         other_table = OtherTable(
-            dm=self.dm, table_str=table_str, id=table_id, columns=table_columns
+            dm=self.dm, table_str=table_str, id=table_id, _columns=None
         )
         return other_table
 
-    def _create_columns(self, table: DatamodelTable) -> List[TableColumn]:
-        """Create list of the columns of the input table as TableColumn objects
-
-        :param table: input table
-        :return: List of TableColumn objects
-        """
-        cols = [
-            TableColumn(c["name"], self._gen_column_datatype(c["type"]))
-            for c in table.columns
-        ]
-        return cols
-
-    def _gen_column_datatype(self, datatype_str: str) -> TableColumnType:
-        """Generate the TableColumnType from the string of the 'type' value
-        of an entry from DatamodelTable.columns
-
-        :param datatype_str: 'type' value of an entry from DatamodelTable.columns
-        :return: TableColumnType
-        """
-        datatype_mapping = {
-            "STRING": TableColumnType.STRING,
-            "BOOLEAN": TableColumnType.BOOLEAN,
-            "INTEGER": TableColumnType.INTEGER,
-            "FLOAT": TableColumnType.FLOAT,
-            "DATETIME": TableColumnType.DATETIME,
-            "TIME": TableColumnType.TIME,
-            "DATE": TableColumnType.DATE,
-        }
-        return datatype_mapping[datatype_str]
-
     def get_activities(self, activity_table_str: str) -> List[str]:
         """Get all activities from an activity table. This is done usong a PQL query.
         TODO: If we use process model, can also get the activities from the process
@@ -385,6 +519,27 @@ class ProcessConfig:
         activities = df["Activity"].values.tolist()
         return activities
 
+    def _get_column_partitions(
+        self, table_str: str
+    ) -> Tuple[List[TableColumn], List[TableColumn]]:
+        """Get the categorical and numeric columns of a table. The partition is
+        computed once per table.
+
+        :param table_str: name of the table
+        :return: Tuple[categorical_columns, numerical_columns]
+        """
+        partitions = self._column_partitions.get(table_str)
+        if partitions is None:
+            table = self.table_dict[table_str]
+            categorical_types = TableColumnType.categorical_types()
+            numeric_types = TableColumnType.numeric_types()
+            partitions = (
+                [c for c in table.columns if c.datatype in categorical_types],
+                [c for c in table.columns if c.datatype in numeric_types],
+            )
+            self._column_partitions[table_str] = partitions
+        return partitions
+
     def get_categorical_numerical_column_names(
         self, table_str: str
     ) -> Tuple[List[str], List[str]]:
@@ -393,121 +548,39 @@ class ProcessConfig:
         :param table_str: name of the considered table
         :return: Tuple[categorical_columns, numerical_columns]
         """
-        # Get the table with table_str
-        table = [
-            t
-            for t in self.activity_tables + self.case_tables + self.other_tables
-            if t.table_str == table_str
-        ][0]
-
-        categorical_cols = [
-            c.name
-            for c in table.columns
-            if c.datatype in TableColumnType.categorical_types()
-        ]
-
-        numeric_cols = [
-            c.name
-            for c in table.columns
-            if c.datatype in TableColumnType.numeric_types()
-        ]
-
+        table = self.table_dict[table_str]
         # If the table is an activity table, need to remove some columns: Activity
         # column, sorting column
+        excluded_cols = set()
         if isinstance(table, ActivityTable):
-            if table.activity_col_str in categorical_cols:
-                categorical_cols.remove(table.activity_col_str)
-            if table.activity_col_str in numeric_cols:
-                numeric_cols.remove(table.activity_col_str)
-
-            if table.sort_col_str in categorical_cols:
-                categorical_cols.remove(table.sort_col_str)
-            if table.sort_col_str in numeric_cols:
-                numeric_cols.remove(table.sort_col_str)
-
-            if table.sort_col_str in categorical_cols:
-                categorical_cols.remove(table.sort_col_str)
-            if table.sort_col_str in numeric_cols:
-                numeric_cols.remove(table.sort_col_str)
+            excluded_cols = {table.activity_col_str, table.sort_col_str}
 
-        return categorical_cols, numeric_cols
+        categorical_cols, numeric_cols = self._get_column_partitions(table_str)
+        return (
+            [c.name for c in categorical_cols if c.name not in excluded_cols],
+            [c.name for c in numeric_cols if c.name not in excluded_cols],
+        )
 
     def get_categorical_numerical_columns(
         self, table_str: str
-    ) -> Tuple[List[str], List[str]]:
-        """Get the strings of the numerical and categorical columns of a table.
+    ) -> Tuple[List[TableColumn], List[TableColumn]]:
+        """Get the numerical and categorical columns of a table.
 
         :param table_str: name of the considered table
         :return: Tuple[categorical_columns, numerical_columns]
         """
-        # Get the table with table_str
-        table = [
-            t
-            for t in self.activity_tables + self.case_tables + self.other_tables
-            if t.table_str == table_str
-        ][0]
-
-        categorical_col_names = [
-            c.name
-            for c in table.columns
-            if c.datatype in TableColumnType.categorical_types()
-        ]
-
-        categorical_cols = [
-            c
-            for c in table.columns
-            if c.datatype in TableColumnType.categorical_types()
-        ]
-
-        numeric_col_names = [
-            c.name
-            for c in table.columns
-            if c.datatype in TableColumnType.numeric_types()
-        ]
-
-        numeric_cols = [
-            c for c in table.columns if c.datatype in TableColumnType.numeric_types()
-        ]
-
+        table = self.table_dict[table_str]
         # If the table is an activity table, need to remove some columns: Activity
-        # column, sorting column
+        # column, sorting column. The case id column is removed from all tables.
+        excluded_cols = {getattr(table, "caseid_col_str", None)}
         if isinstance(table, ActivityTable):
-            if table.activity_col_str in categorical_col_names:
-                col_to_remove = [
-                    col
-                    for col in categorical_cols
-                    if col.name == table.activity_col_str
-                ][0]
-                categorical_cols.remove(col_to_remove)
-            if table.activity_col_str in numeric_col_names:
-                col_to_remove = [
-                    col for col in numeric_cols if col.name == table.activity_col_str
-                ][0]
-                numeric_cols.remove(col_to_remove)
-
-            if table.sort_col_str in categorical_col_names:
-                col_to_remove = [
-                    col for col in categorical_cols if col.name == table.sort_col_str
-                ][0]
-                categorical_cols.remove(col_to_remove)
-            if table.sort_col_str in numeric_col_names:
-                col_to_remove = [
-                    col for col in numeric_cols if col.name == table.sort_col_str
-                ][0]
-                numeric_cols.remove(col_to_remove)
-
-        if table.caseid_col_str in categorical_col_names:
-            col_to_remove = [
-                col for col in categorical_cols if col.name == table.caseid_col_str
-            ][0]
-            categorical_cols.remove(col_to_remove)
-        if table.caseid_col_str in numeric_col_names:
-            col_to_remove = [
-                col for col in numeric_cols if col.name == table.caseid_col_str
-            ][0]
-            numeric_cols.remove(col_to_remove)
-
-        return categorical_cols, numeric_cols
+            excluded_cols.update([table.activity_col_str, table.sort_col_str])
+
+        categorical_cols, numeric_cols = self._get_column_partitions(table_str)
+        return (
+            [c for c in categorical_cols if c.name not in excluded_cols],
+            [c for c in numeric_cols if c.name not in excluded_cols],
+        )
 
     def get_case_level_tables(self, activity_table_str: str):
         """Get tables that are on the case level based on the selected activity table.
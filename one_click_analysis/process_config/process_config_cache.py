@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Union
+
+DEFAULT_METADATA_CACHE_DIR = (
+    Path.home() / ".cache" / "one_click_analysis" / "process_configs"
+)
+METADATA_FORMAT_VERSION = 1
+
+
+def datamodel_metadata_version(datamodel, data_version: Optional[str] = None) -> str:
+    """Create a string that changes when the datamodel changes. It is a hash of
+    dm.data (tables, process configurations and foreign keys) and of data_version.
+
+    :param datamodel: Datamodel, LocalDatamodel or CachedDatamodel
+    :param data_version: string that changes when the datamodel is reloaded. If
+    None and the datamodel is a CachedDatamodel, its data version is used.
+    :return: hex digest
+    """
+    if data_version is None:
+        data_version = getattr(datamodel, "data_version", None)
+    version_dict = {
+        "format_version": METADATA_FORMAT_VERSION,
+        "data": datamodel.data,
+        "data_version": data_version,
+    }
+    version_str = json.dumps(version_dict, sort_keys=True, default=str)
+    return hashlib.sha256(version_str.encode("utf-8")).hexdigest()
+
+
+class ProcessConfigCache:
+    """Persistent cache for the table metadata of a ProcessConfig. Creating a
+    ProcessConfig needs several requests per table of the datamodel. With the
+    cache, these are only made when the datamodel changed since the last
+    session."""
+
+    def __init__(self, cache_dir: Union[str, Path] = DEFAULT_METADATA_CACHE_DIR):
+        """
+        :param cache_dir: directory in which the metadata is stored
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, dm_id: str) -> Path:
+        dm_hash = hashlib.sha256(str(dm_id).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{dm_hash}.json"
+
+    def get(self, dm_id: str, version: str) -> Optional[Dict[str, Any]]:
+        """Get the cached metadata of a datamodel.
+
+        :param dm_id: id of the datamodel
+        :param version: version from datamodel_metadata_version
+        :return: metadata if it is cached for this version, else None
+        """
+        path = self._path(dm_id)
+        if not path.exists():
+            return None
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("version") != version:
+            return None
+        return entry["metadata"]
+
+    def put(self, dm_id: str, version: str, metadata: Dict[str, Any]):
+        """Store the metadata of a datamodel. Metadata of older versions of the
+        datamodel is replaced.
+
+        :param dm_id: id of the datamodel
+        :param version: version from datamodel_metadata_version
+        :param metadata: json-serializable metadata
+        """
+        path = self._path(dm_id)
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": version, "metadata": metadata}, f)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, dm_id: Optional[str] = None):
+        """Remove cached metadata.
+
+        :param dm_id: id of the datamodel whose metadata is removed. If None, the
+        whole cache is cleared.
+        """
+        paths = [self._path(dm_id)] if dm_id is not None else self.cache_dir.glob("*")
+        for path in paths:
+            path.unlink(missing_ok=True)
@@ -1,10 +1,14 @@
+from pathlib import Path
 from typing import List
 from typing import Optional
+from typing import Union
 
 from pycelonis import get_celonis
 from pycelonis.celonis_api.event_collection.data_model import Datamodel
 from pycelonis.celonis_api.event_collection.data_model import DatamodelTable
 
+from one_click_analysis.local_backend.local_datamodel import LocalDatamodel
+
 
 def get_dm(datamodel_name: str, celonis_login: Optional[dict] = None):
     """Get datamodel from Celonis
@@ -21,6 +25,35 @@ def get_dm(datamodel_name: str, celonis_login: Optional[dict] = None):
     return dm
 
 
+def get_local_dm(
+    activity_table_path: Union[str, Path],
+    caseid_col_str: str,
+    activity_col_str: str,
+    eventtime_col_str: str,
+    case_table_path: Optional[Union[str, Path]] = None,
+    **kwargs,
+) -> LocalDatamodel:
+    """Get datamodel that runs the PQL queries on local Parquet or CSV files
+    instead of Celonis
+
+    :param activity_table_path: path to the activity table
+    :param caseid_col_str: name of the case id column in the activity table
+    :param activity_col_str: name of the activity column
+    :param eventtime_col_str: name of the timestamp column
+    :param case_table_path: path to the case table
+    :param kwargs: further arguments for LocalDatamodel
+    :return: LocalDatamodel
+    """
+    return LocalDatamodel.from_files(
+        activity_table_path=activity_table_path,
+        caseid_col_str=caseid_col_str,
+        activity_col_str=activity_col_str,
+        eventtime_col_str=eventtime_col_str,
+        case_table_path=case_table_path,
+        **kwargs,
+    )
+
+
 def get_activity_tables(dm: Datamodel) -> List[DatamodelTable]:
     """Get activity tables as a list of DatamodelTable.
 
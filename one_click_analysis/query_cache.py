@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Union
+
+import pandas as pd
+from pycelonis.celonis_api.pql import pql
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "one_click_analysis" / "queries"
+
+
+def canonicalize_query(query: pql.PQL, **kwargs) -> Dict[str, Any]:
+    """Create a canonical representation of a PQL query. Whitespace is normalized
+    and filters are sorted as their order does not change the result.
+
+    :param query: PQL object
+    :param kwargs: keyword arguments of get_data_frame (e.g. chunksize)
+    :return: json-serializable dictionary
+    """
+    if isinstance(query, pql.PQLColumn):
+        query = pql.PQL(query)
+    columns = [[c.name, " ".join(c.query.split())] for c in query.columns]
+    filters = sorted(" ".join(f.query.split()) for f in query.filters)
+    return {
+        "columns": columns,
+        "filters": filters,
+        "distinct": getattr(query, "distinct", False),
+        "limit": getattr(query, "limit", None),
+        "offset": getattr(query, "offset", None),
+        "kwargs": {k: str(v) for k, v in sorted(kwargs.items())},
+    }
+
+
+class QueryCache:
+    """Persistent cache for results of PQL queries. Results are stored as Parquet
+    files in one directory per datamodel. If the cache grows above
+    max_size_bytes, the least recently used results are evicted."""
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = DEFAULT_CACHE_DIR,
+        max_size_bytes: int = 2 * 1024**3,
+    ):
+        """
+        :param cache_dir: directory in which the results are stored
+        :param max_size_bytes: maximum size of the cache on disk
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def create_key(self, dm_id: str, data_version: str, query: pql.PQL, **kwargs):
+        """Create the key of a query result.
+
+        :param dm_id: id of the datamodel
+        :param data_version: string that changes when the datamodel is reloaded
+        :param query: PQL object
+        :param kwargs: keyword arguments of get_data_frame (e.g. chunksize)
+        :return: hex digest
+        """
+        key_dict = {
+            "datamodel": dm_id,
+            "data_version": data_version,
+            "query": canonicalize_query(query, **kwargs),
+        }
+        key_str = json.dumps(key_dict, sort_keys=True, default=str)
+        return hashlib.sha256(key_str.encode("utf-8")).hexdigest()
+
+    def _dm_dir(self, dm_id: str) -> Path:
+        return self.cache_dir / hashlib.sha256(str(dm_id).encode("utf-8")).hexdigest()
+
+    def _path(self, dm_id: str, key: str) -> Path:
+        return self._dm_dir(dm_id) / f"{key}.parquet"
+
+    def get(self, dm_id: str, key: str) -> Optional[pd.DataFrame]:
+        """Get a cached result.
+
+        :param dm_id: id of the datamodel
+        :param key: key from create_key
+        :return: DataFrame if the result is cached, else None
+        """
+        path = self._path(dm_id, key)
+        if not path.exists():
+            return None
+        df = pd.read_parquet(path)
+        # Mark as recently used for the LRU eviction
+        os.utime(path)
+        return df
+
+    def put(self, dm_id: str, key: str, df: pd.DataFrame) -> bool:
+        """Store a result in the cache.
+
+        :param dm_id: id of the datamodel
+        :param key: key from create_key
+        :param df: the result
+        :return: True if the result could be stored, else False
+        """
+        path = self._path(dm_id, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique name as the same result may be stored by concurrent extractions
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            df.to_parquet(tmp_path)
+        except (ValueError, TypeError, NotImplementedError):
+            # Some object columns (e.g. mixed types) cannot be stored as Parquet
+            tmp_path.unlink(missing_ok=True)
+            return False
+        os.replace(tmp_path, path)
+        self._evict()
+        return True
+
+    def set_data_version(self, dm_id: str, data_version: str):
+        """Store the data version of a datamodel. If it differs from the stored
+        version, the datamodel was reloaded and its results are removed.
+
+        :param dm_id: id of the datamodel
+        :param data_version: string that changes when the datamodel is reloaded
+        """
+        version_path = self._dm_dir(dm_id) / "data_version.json"
+        if version_path.exists():
+            with open(version_path) as f:
+                if json.load(f) != data_version:
+                    self.invalidate(dm_id)
+        version_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(version_path, "w") as f:
+            json.dump(data_version, f)
+
+    def invalidate(self, dm_id: Optional[str] = None):
+        """Remove cached results.
+
+        :param dm_id: id of the datamodel whose results are removed. If None, the
+        whole cache is cleared.
+        """
+        target = self._dm_dir(dm_id) if dm_id is not None else self.cache_dir
+        shutil.rmtree(target, ignore_errors=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def size_bytes(self) -> int:
+        """Size of all cached results on disk"""
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*/*.parquet"))
+
+    def _evict(self):
+        """Remove least recently used results until the cache fits into
+        max_size_bytes"""
+        files = []
+        for path in self.cache_dir.glob("*/*.parquet"):
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                # Evicted by a concurrent extraction in the meantime
+                continue
+        total_size = sum(stat.st_size for _, stat in files)
+        if total_size <= self.max_size_bytes:
+            return
+        files.sort(key=lambda el: el[1].st_mtime)
+        for path, stat in files:
+            if total_size <= self.max_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= stat.st_size
+
+
+class CachedDatamodel:
+    """Wrapper around a Datamodel that answers get_data_frame from a QueryCache.
+    All other attributes are forwarded to the wrapped datamodel."""
+
+    def __init__(
+        self, datamodel, query_cache: QueryCache, data_version: Optional[str] = None
+    ):
+        """
+        :param datamodel: Datamodel or LocalDatamodel
+        :param query_cache: the QueryCache
+        :param data_version: string that changes when the datamodel is reloaded. If
+        None, a fingerprint of the activity and case tables is queried.
+        """
+        self.datamodel = datamodel
+        self.query_cache = query_cache
+        self._data_version = data_version
+
+    def __getattr__(self, item):
+        if item == "datamodel":
+            raise AttributeError(item)
+        return getattr(self.datamodel, item)
+
+    @property
+    def data_version(self) -> str:
+        if self._data_version is None:
+            self._data_version = self._query_data_fingerprint()
+            self.query_cache.set_data_version(self.datamodel.id, self._data_version)
+        return self._data_version
+
+    def _query_data_fingerprint(self) -> str:
+        """Query the number of rows and the latest timestamp of each activity table
+        and the number of rows of its case table. These change whenever new data
+        is loaded into the datamodel."""
+        query = pql.PQL()
+        for i, process_config in enumerate(
+            self.datamodel.data["processConfigurations"]
+        ):
+            activity_table = self.datamodel.tables.find(
+                process_config["activityTableId"]
+            )
+            query.add(
+                pql.PQLColumn(f'COUNT_TABLE("{activity_table.name}")', f"rows_{i}")
+            )
+            query.add(
+                pql.PQLColumn(
+                    f'MAX("{activity_table.name}".'
+                    f'"{process_config["timestampColumn"]}")',
+                    f"max_time_{i}",
+                )
+            )
+            if process_config.get("caseTableId"):
+                case_table = self.datamodel.tables.find(process_config["caseTableId"])
+                query.add(
+                    pql.PQLColumn(f'COUNT_TABLE("{case_table.name}")', f"case_rows_{i}")
+                )
+        df = self.datamodel.get_data_frame(query)
+        return json.dumps(df.astype(str).to_dict(orient="records"))
+
+    def get_data_frame(self, query: pql.PQL, **kwargs) -> pd.DataFrame:
+        """Get the result of a query from the cache or from the datamodel.
+
+        :param query: PQL object
+        :param kwargs: keyword arguments of Datamodel.get_data_frame
+        :return: DataFrame with the query result
+        """
+        key = self.query_cache.create_key(
+            self.datamodel.id, self.data_version, query, **kwargs
+        )
+        df = self.query_cache.get(self.datamodel.id, key)
+        if df is None:
+            df = self.datamodel.get_data_frame(query, **kwargs)
+            self.query_cache.put(self.datamodel.id, key, df)
+        return df
+
+    def reload(self, *args, **kwargs):
+        """Reload the datamodel and remove its cached results"""
+        result = self.datamodel.reload(*args, **kwargs)
+        self.query_cache.invalidate(self.datamodel.id)
+        self._data_version = None
+        return result
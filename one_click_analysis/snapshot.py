@@ -0,0 +1,244 @@
+import json
+import os
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from pyarrow import feather
+
+from one_click_analysis.errors import SnapshotVersionError
+from one_click_analysis.feature_processing.attributes.attribute import Attribute
+from one_click_analysis.feature_processing.attributes.attribute import (
+    AttributeDataType,
+)
+from one_click_analysis.feature_processing.attributes.attribute import AttributeType
+from one_click_analysis.feature_processing.attributes.feature import Feature
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE_NAME = "manifest.json"
+# Instance attributes of an Attribute that are not stored in a snapshot
+_UNSTORED_ATTRIBUTE_FIELDS = ["process_config", "query", "data_type", "attribute_type"]
+
+
+class SnapshotAttribute(Attribute):
+    """Attribute restored from a snapshot. It has the metadata of the original
+    attribute (names, data type, unit, activity, ...) but no process config and no
+    query, so it can only be used for displaying results."""
+
+    def __init__(
+        self,
+        attribute_class: str,
+        data_type: AttributeDataType,
+        attribute_type: AttributeType,
+        **kwargs,
+    ):
+        """
+        :param attribute_class: name of the class of the original attribute
+        :param data_type: data type of the original attribute
+        :param attribute_type: attribute type of the original attribute
+        :param kwargs: the other instance attributes of the original attribute
+        """
+        super().__init__(
+            process_config=None,
+            attribute_name=kwargs.pop("attribute_name"),
+            query=None,
+            data_type=data_type,
+            attribute_type=attribute_type,
+        )
+        self.attribute_class = attribute_class
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+    def _gen_query(self):
+        return None
+
+
+@dataclass
+class AnalysisSnapshot:
+    """Processed data of an analysis as needed by the GUI screens"""
+
+    df_x: pd.DataFrame
+    df_target: pd.DataFrame
+    features: List[Feature]
+    target_features: List[Feature]
+    attributes: List[Attribute]
+    # Other values of the processor (e.g. df_timestamp_column, num_cases)
+    properties: Dict[str, Any] = field(default_factory=dict)
+
+
+def save_snapshot(
+    path: Union[str, Path],
+    df_x: pd.DataFrame,
+    df_target: pd.DataFrame,
+    features: List[Feature],
+    target_features: List[Feature],
+    attributes: List[Attribute],
+    properties: Optional[Dict[str, Any]] = None,
+):
+    """Save the processed data of an analysis to a directory. The DataFrames are
+    stored as uncompressed Arrow IPC (Feather) files, so they can be memory-mapped
+    when loaded. Features, attributes and properties are stored in a JSON manifest.
+    The manifest is written last, so a snapshot without manifest is incomplete.
+
+    :param path: directory of the snapshot. Is created if it does not exist.
+    :param df_x: DataFrame with the features
+    :param df_target: DataFrame with the target features
+    :param features: features with their metrics
+    :param target_features: target features with their metrics
+    :param attributes: attributes used in the analysis
+    :param properties: other json-serializable values of the processor
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest_path = path / MANIFEST_FILE_NAME
+    # Mark the snapshot as incomplete while the frames are written
+    manifest_path.unlink(missing_ok=True)
+
+    frames = {}
+    for name, df in [("df_x", df_x), ("df_target", df_target)]:
+        # Feather has no sparse columns (see PostProcessor), so they are stored
+        # densely
+        df = df.assign(
+            **{
+                col: df[col].sparse.to_dense()
+                for col, dtype in df.dtypes.items()
+                if isinstance(dtype, pd.SparseDtype)
+            }
+        )
+        file_name = f"{name}.arrow"
+        feather.write_feather(df, path / file_name, compression="uncompressed")
+        frames[name] = file_name
+
+    # Attributes are stored once and referenced by their index, so that features
+    # of the same attribute share the attribute again after loading
+    attribute_indices: Dict[int, int] = {}
+    attribute_dicts = []
+    for attr in attributes + [f.attribute for f in features + target_features]:
+        if id(attr) not in attribute_indices:
+            attribute_indices[id(attr)] = len(attribute_dicts)
+            attribute_dicts.append(_attribute_to_dict(attr))
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created": datetime.now().isoformat(),
+        "frames": frames,
+        "attributes": attribute_dicts,
+        "used_attributes": [attribute_indices[id(attr)] for attr in attributes],
+        "features": [_feature_to_dict(f, attribute_indices) for f in features],
+        "target_features": [
+            _feature_to_dict(f, attribute_indices) for f in target_features
+        ],
+        "properties": properties or {},
+    }
+    tmp_path = path / f"{MANIFEST_FILE_NAME}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, default=_to_json_value, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def load_snapshot(path: Union[str, Path], memory_map: bool = True) -> AnalysisSnapshot:
+    """Load a snapshot saved with save_snapshot.
+
+    :param path: directory of the snapshot
+    :param memory_map: whether the Arrow files are memory-mapped instead of read
+    into memory
+    :return: AnalysisSnapshot
+    """
+    path = Path(path)
+    with open(path / MANIFEST_FILE_NAME) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotVersionError(
+            str(path), manifest.get("format_version"), SNAPSHOT_FORMAT_VERSION
+        )
+
+    frames = {
+        name: feather.read_table(path / file_name, memory_map=memory_map).to_pandas()
+        for name, file_name in manifest["frames"].items()
+    }
+    attributes = [_attribute_from_dict(d) for d in manifest["attributes"]]
+    return AnalysisSnapshot(
+        df_x=frames["df_x"],
+        df_target=frames["df_target"],
+        features=[_feature_from_dict(d, attributes) for d in manifest["features"]],
+        target_features=[
+            _feature_from_dict(d, attributes) for d in manifest["target_features"]
+        ],
+        attributes=[attributes[i] for i in manifest["used_attributes"]],
+        properties=manifest["properties"],
+    )
+
+
+def _attribute_to_dict(attr: Attribute) -> Dict[str, Any]:
+    values = {
+        name: value
+        for name, value in vars(attr).items()
+        if name not in _UNSTORED_ATTRIBUTE_FIELDS and _is_json_serializable(value)
+    }
+    # display_name and description are usually class attributes
+    values["display_name"] = attr.display_name
+    values["description"] = getattr(attr, "description", None)
+    return {
+        "attribute_class": getattr(attr, "attribute_class", type(attr).__name__),
+        "data_type": attr.data_type.value,
+        "attribute_type": attr.attribute_type.value,
+        "values": values,
+    }
+
+
+def _attribute_from_dict(d: Dict[str, Any]) -> SnapshotAttribute:
+    return SnapshotAttribute(
+        attribute_class=d["attribute_class"],
+        data_type=AttributeDataType(d["data_type"]),
+        attribute_type=AttributeType(d["attribute_type"]),
+        **d["values"],
+    )
+
+
+def _feature_to_dict(
+    feature: Feature, attribute_indices: Dict[int, int]
+) -> Dict[str, Any]:
+    return {
+        "df_column_name": feature.df_column_name,
+        "datatype": feature.datatype.value,
+        "attribute": attribute_indices[id(feature.attribute)],
+        "attribute_value": feature.attribute_value,
+        "unit": feature.unit,
+        "metrics": feature.metrics,
+    }
+
+
+def _feature_from_dict(d: Dict[str, Any], attributes: List[Attribute]) -> Feature:
+    return Feature(
+        df_column_name=d["df_column_name"],
+        datatype=AttributeDataType(d["datatype"]),
+        attribute=attributes[d["attribute"]],
+        attribute_value=d["attribute_value"],
+        unit=d["unit"],
+        metrics=d["metrics"],
+    )
+
+
+def _to_json_value(value):
+    """Convert numpy values for json.dump"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _is_json_serializable(value) -> bool:
+    try:
+        json.dumps(value, default=_to_json_value)
+    except (TypeError, ValueError):
+        return False
+    return True
@@ -1,4 +1,11 @@
+from typing import Dict
+from typing import List
+from typing import Tuple
+
 import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency
+from scipy.stats import t as t_dist
 
 from one_click_analysis.feature_processing.attributes.attribute import (
     AttributeDataType,
@@ -28,7 +35,7 @@ class StatisticsComputer:
             y_values = self.df_target[target_feature.df_column_name].values
 
             for feature in self.features:
-                x_values = self.df_x[feature.df_column_name].values
+                x_values = _dense_column(self.df_x[feature.df_column_name]).values
                 x_values_cleaned, y_values_cleaned = remove_outliers_IQR(
                     x_values, y_values, apply_on_binary=False
                 )
@@ -54,9 +61,9 @@ class StatisticsComputer:
         # Do this for both normal and target features
         for feature in self.features:
             if feature.datatype == AttributeDataType.CATEGORICAL:
-                indices_with_feature = np.where(self.df_x[feature.df_column_name] == 1)[
-                    0
-                ]
+                indices_with_feature = _rows_with_value(
+                    self.df_x[feature.df_column_name], 1
+                )
 
                 case_count = len(
                     set(
@@ -69,9 +76,9 @@ class StatisticsComputer:
 
         for tf in self.target_features:
             if tf.datatype == AttributeDataType.CATEGORICAL:
-                indices_with_feature = np.where(self.df_target[tf.df_column_name] == 1)[
-                    0
-                ]
+                indices_with_feature = _rows_with_value(
+                    self.df_target[tf.df_column_name], 1
+                )
                 case_count = len(
                     set(
                         self.df_target.iloc[
@@ -81,18 +88,367 @@ class StatisticsComputer:
                 )
                 tf.metrics["case_count"] = case_count
 
+    def influence_on_target(self):
+        for feature in self.features:
+            if feature.datatype == AttributeDataType.CATEGORICAL:
+                target_influences = {}
+                x_col = _dense_column(self.df_x[feature.df_column_name])
+                for target_feature in self.target_features:
+                    label_val_0 = self.df_target[x_col == 0][
+                        target_feature.df_column_name
+                    ].mean()
+                    label_val_1 = self.df_target[x_col == 1][
+                        target_feature.df_column_name
+                    ].mean()
+                    target_influences[target_feature.df_column_name] = (
+                        label_val_1 - label_val_0
+                    )
+                feature.metrics["target_influence"] = target_influences
+
+
+class _Moments:
+    """Count, means, sums of squared deviations and co-moment of two variables.
+    Moments of chunks are merged with the pairwise update formulas of Chan et al.,
+    which are numerically stable."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.c_xy = 0.0
+
+    def update(self, x: np.ndarray, y: np.ndarray):
+        n_b = len(x)
+        if n_b == 0:
+            return
+        mean_x_b = x.mean()
+        mean_y_b = y.mean()
+        m2_x_b = ((x - mean_x_b) ** 2).sum()
+        m2_y_b = ((y - mean_y_b) ** 2).sum()
+        c_xy_b = ((x - mean_x_b) * (y - mean_y_b)).sum()
+        n = self.n + n_b
+        delta_x = mean_x_b - self.mean_x
+        delta_y = mean_y_b - self.mean_y
+        factor = self.n * n_b / n
+        self.m2_x += m2_x_b + delta_x**2 * factor
+        self.m2_y += m2_y_b + delta_y**2 * factor
+        self.c_xy += c_xy_b + delta_x * delta_y * factor
+        self.mean_x += delta_x * n_b / n
+        self.mean_y += delta_y * n_b / n
+        self.n = n
+
+    @property
+    def corr(self) -> float:
+        denominator = np.sqrt(self.m2_x * self.m2_y)
+        if self.n < 2 or denominator == 0:
+            return np.nan
+        return self.c_xy / denominator
+
+
+class ChunkedStatisticsComputer:
+    """Computes the statistics of StatisticsComputer from DataFrame chunks (e.g.
+    from extract_dfs_chunked and ChunkedPostProcessor). All rows of a case have to
+    be in the same chunk.
+
+    The chunks are passed twice. fit_chunk collects the value counts of the
+    columns, from which finish_fit computes the same IQR outlier bounds as
+    remove_outliers_IQR. update then only keeps moments and counts of the rows
+    within the bounds."""
+
+    def __init__(self, features, target_features):
+        self.features = features
+        self.target_features = target_features
+        # column name -> value counts of the non-NaN values
+        self.x_value_counts: Dict[str, pd.Series] = {}
+        self.y_value_counts: Dict[str, pd.Series] = {}
+        # (feature column, target column) -> value counts of the feature values in
+        # the rows with a NaN target and of the target values in the rows with a
+        # NaN feature. These rows are not used for the quartiles.
+        self.excluded_x_counts: Dict[Tuple[str, str], pd.Series] = {}
+        self.excluded_y_counts: Dict[Tuple[str, str], pd.Series] = {}
+        # (feature column, target column) -> lower and upper bounds of the feature
+        # and the target
+        self.bounds: Dict[Tuple[str, str], Tuple[float, float, float, float]] = {}
+        # (feature column, target column) -> moments of the rows without outliers
+        self.moments: Dict[Tuple[str, str], _Moments] = {}
+        # (feature column, target column, group value) -> moments of the rows in
+        # which the categorical variable of the pair has the group value
+        self.group_moments: Dict[Tuple[str, str, int], _Moments] = {}
+        self.case_counts: Dict[str, int] = {}
+        # (feature column, target column) -> [sum, count] of the target for the
+        # feature values 0 and 1
+        self.influence_sums: Dict[Tuple[str, str], List[float]] = {}
+
+    def fit_chunk(self, df_x: pd.DataFrame, df_target: pd.DataFrame):
+        """Collect the value counts of a chunk
+
+        :param df_x: chunk of df_x
+        :param df_target: chunk of df_target
+        """
+        x_columns = {
+            f.df_column_name: _float_values(df_x[f.df_column_name])
+            for f in self.features
+        }
+        for target_feature in self.target_features:
+            y_name = target_feature.df_column_name
+            y_all = _float_values(df_target[y_name])
+            _add_counts(self.y_value_counts, y_name, y_all)
+            for x_name, x_all in x_columns.items():
+                key = (x_name, y_name)
+                _add_counts(self.excluded_x_counts, key, x_all[np.isnan(y_all)])
+                _add_counts(self.excluded_y_counts, key, y_all[np.isnan(x_all)])
+        for x_name, x_all in x_columns.items():
+            _add_counts(self.x_value_counts, x_name, x_all)
+
+    def finish_fit(self):
+        """Compute the outlier bounds after all chunks were passed to fit_chunk"""
+        for target_feature in self.target_features:
+            y_name = target_feature.df_column_name
+            y_counts = self.y_value_counts.get(y_name, pd.Series(dtype=float))
+            for feature in self.features:
+                x_name = feature.df_column_name
+                key = (x_name, y_name)
+                x_counts = self.x_value_counts.get(x_name, pd.Series(dtype=float))
+                # Binary columns are not checked for outliers (apply_on_binary is
+                # False in compute_correlations)
+                x_bounds = y_bounds = (-np.inf, np.inf)
+                if len(x_counts.index) >= 3:
+                    x_bounds = _iqr_bounds(
+                        _subtract_counts(x_counts, self.excluded_x_counts.get(key))
+                    )
+                if len(y_counts.index) >= 3:
+                    y_bounds = _iqr_bounds(
+                        _subtract_counts(y_counts, self.excluded_y_counts.get(key))
+                    )
+                self.bounds[key] = x_bounds + y_bounds
+
+    def update(self, df_x: pd.DataFrame, df_target: pd.DataFrame):
+        """Add a chunk after finish_fit
+
+        :param df_x: chunk of df_x
+        :param df_target: chunk of df_target
+        """
+        for target_feature in self.target_features:
+            y_all = _float_values(df_target[target_feature.df_column_name])
+            for feature in self.features:
+                key = (feature.df_column_name, target_feature.df_column_name)
+                x_all = _float_values(df_x[feature.df_column_name])
+                lower_x, upper_x, lower_y, upper_y = self.bounds[key]
+                # NaN values are not within any bounds
+                is_used = (
+                    (x_all >= lower_x)
+                    & (x_all <= upper_x)
+                    & (y_all >= lower_y)
+                    & (y_all <= upper_y)
+                )
+                x_values = x_all[is_used]
+                y_values = y_all[is_used]
+                self.moments.setdefault(key, _Moments()).update(x_values, y_values)
+                # Group by the categorical variable for the t-test / chi-square test
+                if feature.datatype == AttributeDataType.CATEGORICAL:
+                    group_values, other_values = x_values, y_values
+                else:
+                    group_values, other_values = y_values, x_values
+                for group in [0, 1]:
+                    in_group = group_values == group
+                    self.group_moments.setdefault(key + (group,), _Moments()).update(
+                        other_values[in_group], other_values[in_group]
+                    )
+                if feature.datatype == AttributeDataType.CATEGORICAL:
+                    sums = self.influence_sums.setdefault(key, [0.0, 0, 0.0, 0])
+                    y_non_nan = ~np.isnan(y_all)
+                    for i, group in enumerate([0, 1]):
+                        in_group = (x_all == group) & y_non_nan
+                        sums[2 * i] += y_all[in_group].sum()
+                        sums[2 * i + 1] += in_group.sum()
+
+        for feature in self.features:
+            if feature.datatype == AttributeDataType.CATEGORICAL:
+                self._update_case_count(df_x, feature)
+        for tf in self.target_features:
+            if tf.datatype == AttributeDataType.CATEGORICAL:
+                self._update_case_count(df_target, tf)
+
+    def _update_case_count(self, df: pd.DataFrame, feature):
+        case_ids = df.index.get_level_values(0)[
+            _float_values(df[feature.df_column_name]) == 1
+        ]
+        self.case_counts[feature.df_column_name] = (
+            self.case_counts.get(feature.df_column_name, 0) + case_ids.nunique()
+        )
+
+    def compute_all_statistics(self):
+        """computes all statistics inplace after all chunks were added"""
+        self.compute_correlations()
+        self.case_count_with_feature()
+        self.influence_on_target()
+
+    def compute_correlations(self):
+        """Compute correlations of the features with the target feature."""
+        for target_feature in self.target_features:
+            for feature in self.features:
+                key = (feature.df_column_name, target_feature.df_column_name)
+                moments = self.moments.get(key, _Moments())
+                feature.metrics.setdefault("correlations", {})[
+                    target_feature.df_column_name
+                ] = moments.corr
+                feature.metrics.setdefault("p_values", {})[
+                    target_feature.df_column_name
+                ] = self._compute_p_value(
+                    key,
+                    feature.attribute.data_type,
+                    target_feature.attribute.data_type,
+                )
+
+    def _compute_p_value(
+        self,
+        key: Tuple[str, str],
+        data_type_x: AttributeDataType,
+        data_type_y: AttributeDataType,
+    ) -> float:
+        """Same tests as compute_p_value, computed from the moments."""
+        if data_type_x == AttributeDataType.NUMERICAL == data_type_y:
+            return _pearson_p_value(self.moments.get(key, _Moments()))
+        group_0 = self.group_moments.get(key + (0,), _Moments())
+        group_1 = self.group_moments.get(key + (1,), _Moments())
+        if data_type_x == AttributeDataType.CATEGORICAL == data_type_y:
+            return _chisquare_p_value(group_0, group_1)
+        return _ttest_p_value(group_0, group_1)
+
+    def case_count_with_feature(self):
+        for feature in self.features + self.target_features:
+            if feature.datatype == AttributeDataType.CATEGORICAL:
+                feature.metrics["case_count"] = self.case_counts.get(
+                    feature.df_column_name, 0
+                )
+
     def influence_on_target(self):
         for feature in self.features:
             if feature.datatype == AttributeDataType.CATEGORICAL:
                 target_influences = {}
                 for target_feature in self.target_features:
-                    label_val_0 = self.df_target[
-                        self.df_x[feature.df_column_name] == 0
-                    ][target_feature.df_column_name].mean()
-                    label_val_1 = self.df_target[
-                        self.df_x[feature.df_column_name] == 1
-                    ][target_feature.df_column_name].mean()
+                    sum_0, count_0, sum_1, count_1 = self.influence_sums.get(
+                        (feature.df_column_name, target_feature.df_column_name),
+                        [0.0, 0, 0.0, 0],
+                    )
+                    label_val_0 = sum_0 / count_0 if count_0 else np.nan
+                    label_val_1 = sum_1 / count_1 if count_1 else np.nan
                     target_influences[target_feature.df_column_name] = (
                         label_val_1 - label_val_0
                     )
                 feature.metrics["target_influence"] = target_influences
+
+
+def _float_values(col: pd.Series) -> np.ndarray:
+    return _dense_column(col).to_numpy(dtype=float, na_value=np.nan)
+
+
+def _add_counts(counts: Dict, key, values: np.ndarray):
+    """Add the value counts of the non-NaN values to counts[key]"""
+    chunk_counts = pd.Series(values[~np.isnan(values)]).value_counts()
+    if key in counts:
+        chunk_counts = counts[key].add(chunk_counts, fill_value=0)
+    counts[key] = chunk_counts
+
+
+def _subtract_counts(counts: pd.Series, excluded_counts) -> pd.Series:
+    if excluded_counts is None:
+        return counts
+    counts = counts.sub(excluded_counts, fill_value=0)
+    return counts[counts > 0]
+
+
+def _iqr_bounds(counts: pd.Series) -> Tuple[float, float]:
+    """Bounds of the values that remove_outliers_IQR keeps.
+
+    :param counts: value counts of the values
+    :return: lower and upper bound
+    """
+    if len(counts.index) == 0:
+        return -np.inf, np.inf
+    counts = counts.sort_index()
+    values = counts.index.to_numpy(dtype=float)
+    cum_counts = np.cumsum(counts.to_numpy(dtype=np.int64))
+    q1 = _quantile(values, cum_counts, 0.25)
+    q3 = _quantile(values, cum_counts, 0.75)
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def _quantile(values: np.ndarray, cum_counts: np.ndarray, q: float) -> float:
+    """np.quantile with the default linear method of the values that occur as
+    often as given by the cumulative counts."""
+    n = cum_counts[-1]
+    index = (n - 1) * q
+    lower = int(np.floor(index))
+    t = index - lower
+    a = values[np.searchsorted(cum_counts, lower, side="right")]
+    b = values[np.searchsorted(cum_counts, min(lower + 1, n - 1), side="right")]
+    diff = b - a
+    # Same interpolation as numpy, which is exact at both ends
+    if t >= 0.5:
+        return b - diff * (1 - t)
+    return a + diff * t
+
+
+def _pearson_p_value(moments: _Moments) -> float:
+    """p value of scipy.stats.pearsonr"""
+    r = moments.corr
+    if moments.n < 2 or np.isnan(r):
+        return np.nan
+    if moments.n == 2:
+        return 1.0
+    if abs(r) >= 1:
+        return 0.0
+    df = moments.n - 2
+    t_stat = r * np.sqrt(df / (1 - r**2))
+    return 2 * t_dist.sf(abs(t_stat), df)
+
+
+def _ttest_p_value(group_0: _Moments, group_1: _Moments) -> float:
+    """p value of scipy.stats.ttest_ind for the values in group 0 and 1"""
+    if group_0.n < 1 or group_1.n < 1:
+        return 1
+    df = group_0.n + group_1.n - 2
+    if df < 1:
+        return np.nan
+    pooled_var = (group_0.m2_x + group_1.m2_x) / df
+    std_err = np.sqrt(pooled_var * (1 / group_0.n + 1 / group_1.n))
+    # Like ttest_ind, a zero standard error gives p = 0 for different means and NaN
+    # for equal means
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_stat = np.float64(group_0.mean_x - group_1.mean_x) / std_err
+    return 2 * t_dist.sf(abs(t_stat), df)
+
+
+def _chisquare_p_value(group_0: _Moments, group_1: _Moments) -> float:
+    """p value of chisquare_test. The groups contain the binary values of the
+    target for the feature values 0 and 1."""
+    table = []
+    for group in [group_0, group_1]:
+        num_1 = round(group.mean_x * group.n)
+        table.append([group.n - num_1, num_1])
+    if min(min(row) for row in table) == 0:
+        return 0
+    return chi2_contingency(table)[1]
+
+
+def _dense_column(col: pd.Series) -> pd.Series:
+    """Densify a sparse column (see PostProcessor). Only one column is densified at
+    a time, so df_x stays sparse."""
+    if isinstance(col.dtype, pd.SparseDtype):
+        return col.sparse.to_dense()
+    return col
+
+
+def _rows_with_value(col: pd.Series, value) -> np.ndarray:
+    """Get the positions of the rows of col with value. For sparse columns, only
+    the stored values are compared."""
+    if isinstance(col.dtype, pd.SparseDtype) and col.dtype.fill_value != value:
+        sparse_values = col.array
+        return sparse_values.sp_index.to_int_index().indices[
+            sparse_values.sp_values == value
+        ]
+    return np.where(col == value)[0]
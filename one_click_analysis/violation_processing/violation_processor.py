@@ -4,6 +4,7 @@ from typing import Optional
 import pandas as pd
 from pycelonis.celonis_api.pql import pql
 
+from one_click_analysis.extraction_scheduler import ExtractionScheduler
 from one_click_analysis.feature_processing.attributes.static_attributes import (
     CaseDurationAttribute,
 )
@@ -27,6 +28,7 @@ class ViolationProcessor:
         activity_table_str: str,
         filters: List[pql.PQLFilter],
         is_closed_query_str: str,
+        scheduler: Optional[ExtractionScheduler] = None,
     ):
         """
 
@@ -36,12 +38,15 @@ class ViolationProcessor:
         :param filters: The PQL queries that need to be applied without is_closed
         :param is_closed_query_str: is_closed query string
         filter.
+        :param scheduler: ExtractionScheduler that runs the violation and case
+        queries concurrently
         """
         self.conformance_query_str = conformance_query_str
         self.process_config = process_config
         self.activity_table_str = activity_table_str
         self.filters = filters
         self.is_closed_query_str = is_closed_query_str
+        self.scheduler = scheduler or ExtractionScheduler()
         self.timestamp_column = "Start activity time"
         self.violations_df = self._get_violations_df()
         self.violations = self._create_violations()
@@ -157,22 +162,71 @@ class ViolationProcessor:
         )
 
     def _get_violations_df(self) -> pd.DataFrame:
-        """Get the DataFrame with the columns 'case' and 'violations'
+        """Get the DataFrame with the columns 'case' and 'violations'. The
+        violations and the case level metrics are independent queries that are run
+        concurrently and joined on the case.
 
         :return: Dataframe with the violations
         """
+        df_violations, df_cases = self.scheduler.run(
+            self._get_violation_rows_df, self._get_case_metrics_df
+        )
+        df = df_violations.merge(df_cases, on="case", how="left")
+        return df[
+            [
+                "IS_CLOSED",
+                "case",
+                "violation",
+                "case duration",
+                self.timestamp_column,
+                "event count",
+            ]
+        ]
 
+    def _get_case_col_str(self) -> str:
         activitytable: ActivityTable = self.process_config.table_dict[
             self.activity_table_str
         ]
+        return f'"{activitytable.table_str}"."{activitytable.caseid_col_str}"'
 
+    def _get_case_table_case_col_str(self) -> Optional[str]:
+        """Get the case id column of the case table, whose rows are the cases. None
+        if the activity table has no case table."""
+        activitytable: ActivityTable = self.process_config.table_dict[
+            self.activity_table_str
+        ]
+        case_table = self.process_config.table_dict.get(activitytable.case_table_str)
+        if case_table is None or case_table.caseid_col_str is None:
+            return None
+        return f'"{case_table.table_str}"."{case_table.caseid_col_str}"'
+
+    def _get_violation_rows_df(self) -> pd.DataFrame:
+        """Get the DataFrame with the columns 'IS_CLOSED', 'case' and 'violation'
+
+        :return: Dataframe with one row per violation
+        """
         pql_query = pql.PQL()
         # is_closed
         pql_query.add(pql.PQLColumn(query=self.is_closed_query_str, name="IS_CLOSED"))
-        pql_cases_str = f'"{activitytable.table_str}"."{activitytable.caseid_col_str}"'
-        pql_query.add(pql.PQLColumn(query=pql_cases_str, name="case"))
+        pql_query.add(pql.PQLColumn(query=self._get_case_col_str(), name="case"))
         pql_violations_str = "READABLE(" + self.conformance_query_str + ")"
         pql_query.add(pql.PQLColumn(query=pql_violations_str, name="violation"))
+        # Add filters
+        pql_query.add(self.filters)
+        return self.process_config.dm.get_data_frame(pql_query)
+
+    def _get_case_metrics_df(self) -> pd.DataFrame:
+        """Get the case duration, start time and event count of the cases. The
+        metrics are queried next to the case table key, so that the query returns
+        one row per case.
+
+        :return: Dataframe with one row per case
+        """
+        case_col_str = self._get_case_table_case_col_str()
+        pql_query = pql.PQL()
+        pql_query.add(
+            pql.PQLColumn(query=case_col_str or self._get_case_col_str(), name="case")
+        )
         case_duration_attr = CaseDurationAttribute(
             process_config=self.process_config,
             activity_table_str=self.activity_table_str,
@@ -199,5 +253,7 @@ class ViolationProcessor:
         # Add filters
         pql_query.add(self.filters)
         df = self.process_config.dm.get_data_frame(pql_query)
-
+        if case_col_str is None:
+            # Without a case table, the query returns one row per event
+            df = df.drop_duplicates(subset="case", ignore_index=True)
         return df
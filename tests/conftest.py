@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+from one_click_analysis.feature_processing.event_sequences import (
+    build_event_sequences,
+)
+from one_click_analysis.local_backend.local_datamodel import LocalDatamodel
+from one_click_analysis.process_config.process_config import ProcessConfig
+
+ACTIVITY_TABLE = "ACTIVITIES"
+CASE_TABLE = "CASES"
+
+
+@pytest.fixture
+def activity_df():
+    """Event log of four cases. Case c4 is still open (see is_closed_query)."""
+    return pd.DataFrame(
+        {
+            "case": ["c1", "c1", "c1", "c2", "c2", "c3", "c3", "c3", "c3", "c4"],
+            "act": ["A", "B", "C", "A", "C", "A", "B", "B", "C", "A"],
+            "ts": pd.to_datetime(
+                [
+                    "2020-01-01",
+                    "2020-01-02",
+                    "2020-01-05",
+                    "2020-01-03",
+                    "2020-01-04",
+                    "2020-01-02",
+                    "2020-01-03",
+                    "2020-01-04",
+                    "2020-01-10",
+                    "2020-01-06",
+                ]
+            ),
+        }
+    )
+
+
+@pytest.fixture
+def case_df():
+    return pd.DataFrame(
+        {
+            "case": ["c1", "c2", "c3", "c4"],
+            "region": ["N", "S", "N", "S"],
+            "amount": [1.0, 2.0, 3.0, 4.0],
+        }
+    )
+
+
+@pytest.fixture
+def local_dm(activity_df, case_df):
+    return LocalDatamodel(
+        activity_df,
+        caseid_col_str="case",
+        activity_col_str="act",
+        eventtime_col_str="ts",
+        case_df=case_df,
+        activity_table_str=ACTIVITY_TABLE,
+        case_table_str=CASE_TABLE,
+    )
+
+
+@pytest.fixture
+def process_config(local_dm):
+    return ProcessConfig(local_dm)
+
+
+@pytest.fixture
+def sequences(activity_df):
+    """EventSequences of activity_df"""
+    return build_event_sequences(
+        pd.DataFrame(
+            {
+                "case_id": activity_df["case"],
+                "event_index": activity_df.groupby("case").cumcount(),
+                "activity": activity_df["act"],
+                "timestamp": activity_df["ts"],
+            }
+        )
+    )
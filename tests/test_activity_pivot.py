@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycelonis.celonis_api.pql.pql import PQL
+from pycelonis.celonis_api.pql.pql import PQLColumn
+from pycelonis.celonis_api.pql.pql import PQLFilter
+
+from one_click_analysis.feature_processing import feature_processor_new
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    ActivityOccurenceAttribute,
+)
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    StaticActivityCountAttribute,
+)
+
+
+def create_attributes(process_config, activities):
+    attributes = []
+    for activity in activities:
+        attributes.append(
+            ActivityOccurenceAttribute(process_config, "ACTIVITIES", activity)
+        )
+        attributes.append(
+            StaticActivityCountAttribute(process_config, "ACTIVITIES", activity)
+        )
+    return attributes
+
+
+def query_attributes(dm, attributes, filters=()):
+    """Query the attributes one PQL column each, as the extractor does"""
+    query = PQL()
+    query.add(PQLColumn(name="case_id", query='"CASES"."case"'))
+    for attr in attributes:
+        query.add(attr.pql_query)
+    for filter_query in filters:
+        query.add(PQLFilter(filter_query))
+    return dm.get_data_frame(query).set_index("case_id")
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [[], ['"ACTIVITIES"."act" != \'B\''], ['"CASES"."region" = \'N\'']],
+)
+def test_pivot_columns_match_pql_columns(process_config, local_dm, filters):
+    # D does not occur in the log, so its columns are all zero
+    attributes = create_attributes(process_config, ["A", "B", "C", "D"])
+    df_expected = query_attributes(local_dm, attributes, filters=filters)
+
+    df_activity_counts = feature_processor_new.extract_activity_counts(
+        process_config, "ACTIVITIES", filters=[PQLFilter(f) for f in filters]
+    )
+    df_x = pd.DataFrame(index=df_expected.index)
+    df_x = feature_processor_new.add_activity_pivot_columns(
+        df_x, df_activity_counts, attributes
+    )
+
+    assert list(df_x.columns) == list(df_expected.columns)
+    np.testing.assert_array_equal(
+        df_x.to_numpy(dtype=float), df_expected.to_numpy(dtype=float)
+    )
@@ -0,0 +1,84 @@
+import pytest
+from pycelonis.celonis_api.pql.pql import PQLFilter
+
+from one_click_analysis.configuration import activity_prefetcher
+from one_click_analysis.configuration.activity_prefetcher import ActivityPrefetcher
+from one_click_analysis.feature_processing import event_sequences
+from one_click_analysis.feature_processing.rework_profile import get_rework_profile
+
+
+@pytest.fixture
+def prefetchers(monkeypatch):
+    # The activities come from the process model, which needs a Celonis
+    # datamodel
+    monkeypatch.setattr(
+        activity_prefetcher,
+        "_fetch_activities",
+        lambda process_config, activity_table_str: ["A", "B", "C", "D"],
+    )
+    event_sequences.event_sequence_registry.clear()
+    yield (
+        ActivityPrefetcher(max_workers=1),
+        ActivityPrefetcher(max_workers=1, prefetch_event_sequences=True),
+    )
+    event_sequences.event_sequence_registry.clear()
+
+
+FILTERS = [
+    [],
+    [PQLFilter('"ACTIVITIES"."act" != \'B\'')],
+    [[PQLFilter('"CASES"."amount" > 1')]],
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_activity_counts(process_config, prefetchers, filters):
+    prefetcher, _ = prefetchers
+    counts = prefetcher.get_activity_counts(process_config, "ACTIVITIES", filters)
+    rework_profile = get_rework_profile(process_config, "ACTIVITIES", filters)
+    assert counts.number_cases == rework_profile.number_cases
+    df_profile = rework_profile.to_df().set_index("activity")
+    assert counts.case_counts == {
+        act: df_profile["case_count"].get(act, 0) for act in ["A", "B", "C", "D"]
+    }
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_counts_match_the_event_sequences(process_config, prefetchers, filters):
+    prefetcher, sequence_prefetcher = prefetchers
+    rework_counts = prefetcher.get_rework_case_counts(
+        process_config, "ACTIVITIES", filters
+    )
+    assert rework_counts == sequence_prefetcher.get_rework_case_counts(
+        process_config, "ACTIVITIES", filters
+    )
+    for source in ["A", "B", "D"]:
+        transition_counts = prefetcher.get_transition_case_counts(
+            process_config, "ACTIVITIES", filters, source
+        )
+        assert transition_counts == sequence_prefetcher.get_transition_case_counts(
+            process_config, "ACTIVITIES", filters, source
+        )
+    if not filters:
+        # c3: A B B C
+        assert rework_counts == {"A": 0, "B": 1, "C": 0, "D": 0}
+        assert transition_counts == {"A": 0, "B": 0, "C": 0, "D": 0}
+        assert prefetcher.get_transition_case_counts(
+            process_config, "ACTIVITIES", filters, "A"
+        ) == {"A": 0, "B": 2, "C": 1, "D": 0}
+
+
+def test_prefetch_without_event_sequences_uses_aggregate_queries(
+    process_config, prefetchers, monkeypatch
+):
+    prefetcher, _ = prefetchers
+    extracted = []
+    monkeypatch.setattr(
+        event_sequences,
+        "extract_event_sequences",
+        lambda *args, **kwargs: extracted.append(args),
+    )
+    prefetcher.prefetch(process_config, "ACTIVITIES", [])
+    prefetcher.get_rework_case_counts(process_config, "ACTIVITIES", [])
+    prefetcher.get_transition_case_counts(process_config, "ACTIVITIES", [], "A")
+    assert extracted == []
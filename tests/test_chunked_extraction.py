@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+from pycelonis.celonis_api.pql.pql import PQL
+from pycelonis.celonis_api.pql.pql import PQLColumn
+
+from one_click_analysis.feature_processing import feature_processor_new
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    WorkInProgressAttribute,
+)
+from one_click_analysis.local_backend.local_datamodel import LocalDatamodel
+from one_click_analysis.process_config.process_config import ProcessConfig
+
+
+def test_get_case_ids_is_not_sorted_locally(process_config):
+    case_ids = feature_processor_new.get_case_ids(process_config, "ACTIVITIES")
+    assert sorted(case_ids) == ["c1", "c2", "c3", "c4"]
+
+
+def test_pql_literal():
+    assert feature_processor_new._pql_literal(12) == "12"
+    assert feature_processor_new._pql_literal("it's") == "'it''s'"
+
+
+def test_chunks_cover_every_case_once(monkeypatch):
+    # Mixed-type case ids, which can't be sorted in Python
+    activity_df = pd.DataFrame(
+        {
+            "case": ["b", 10, "a", 2, "b", "c'd", 10],
+            "act": ["A", "A", "A", "A", "B", "A", "B"],
+            "ts": pd.date_range("2020-01-01", periods=7),
+        }
+    )
+    dm = LocalDatamodel(activity_df, "case", "act", "ts")
+    process_config = ProcessConfig(dm)
+
+    def extract_case_ids(process_config, activity_table_str, filters, **kwargs):
+        query = PQL()
+        query.add(PQLColumn(name="case_id", query='DISTINCT "ACTIVITIES"."case"'))
+        for f in filters:
+            query.add(f)
+        return dm.get_data_frame(query), None
+
+    monkeypatch.setattr(feature_processor_new, "extract_dfs", extract_case_ids)
+    chunks = list(
+        feature_processor_new.extract_dfs_chunked(
+            process_config=process_config,
+            activity_table_str="ACTIVITIES",
+            static_attributes=[],
+            dynamic_attributes=[],
+            is_closed_indicator=None,
+            target_variable=None,
+            filters=[],
+            case_chunk_size=2,
+        )
+    )
+    assert [len(df_x) for df_x, _ in chunks] == [2, 2, 1]
+    extracted = [case_id for df_x, _ in chunks for case_id in df_x["case_id"]]
+    assert sorted(extracted, key=str) == sorted(["b", 10, "a", 2, "c'd"], key=str)
+
+
+def test_cross_case_attributes_are_not_chunked(process_config):
+    attr = WorkInProgressAttribute(process_config, "ACTIVITIES", aggregation="AVG")
+    with pytest.raises(ValueError):
+        next(
+            feature_processor_new.extract_dfs_chunked(
+                process_config=process_config,
+                activity_table_str="ACTIVITIES",
+                static_attributes=[attr],
+                dynamic_attributes=[],
+                is_closed_indicator=None,
+                target_variable=None,
+                filters=[],
+            )
+        )
@@ -0,0 +1,324 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycelonis.celonis_api.pql.pql import PQL
+from pycelonis.celonis_api.pql.pql import PQLColumn
+
+from one_click_analysis.feature_processing import feature_processor_new
+from one_click_analysis.feature_processing.attributes.attribute import (
+    AttributeDataType,
+)
+from one_click_analysis.feature_processing.attributes.attribute import AttributeType
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    DummyAttribute,
+)
+from one_click_analysis.feature_processing.post_processing import (
+    ChunkedPostProcessor,
+)
+from one_click_analysis.feature_processing.post_processing import PostProcessor
+from one_click_analysis.feature_processing.processors.analysis_processors import (
+    CaseDurationProcessor,
+)
+from one_click_analysis.local_backend.local_datamodel import LocalDatamodel
+from one_click_analysis.process_config.process_config import ProcessConfig
+from one_click_analysis.statistics.statistics_computer import _quantile
+from one_click_analysis.statistics.statistics_computer import (
+    ChunkedStatisticsComputer,
+)
+from one_click_analysis.statistics.statistics_computer import StatisticsComputer
+
+
+def create_attribute(name, data_type, is_feature=True):
+    attr = DummyAttribute(
+        query="",
+        attribute_name=name,
+        attribute_type=AttributeType.OTHER,
+        process_config=None,
+        is_feature=is_feature,
+        is_class_feature=not is_feature,
+    )
+    attr.data_type = data_type
+    return attr
+
+
+def create_dfs(num_rows=300, seed=0):
+    """Rows of num_rows // 3 cases with categorical, binary and numeric columns
+    that contain NaN values and outliers"""
+    rng = np.random.default_rng(seed)
+    index = pd.MultiIndex.from_arrays(
+        [np.arange(num_rows) // 3, np.arange(num_rows)], names=["case", "row"]
+    )
+    first = rng.choice(["a", "b", "c", "d", "e", "f"], num_rows, p=[0.4] + [0.12] * 5)
+    amount = rng.normal(10, 2, num_rows)
+    amount[rng.choice(num_rows, 5, replace=False)] = 1000
+    amount[rng.choice(num_rows, 10, replace=False)] = np.nan
+    df_x = pd.DataFrame(
+        {
+            "first": pd.Series(first, index=index).where(rng.random(num_rows) > 0.05),
+            "second": rng.choice(["x", "y", "z"], num_rows, p=[0.9, 0.08, 0.02]),
+            "indicator": rng.integers(0, 2, num_rows),
+            "amount": amount,
+        },
+        index=index,
+    )
+    target = rng.exponential(5, num_rows).round(1)
+    target[rng.choice(num_rows, 5, replace=False)] = 500
+    target[rng.choice(num_rows, 10, replace=False)] = np.nan
+    df_target = pd.DataFrame({"target": target}, index=index)
+    attributes = [
+        create_attribute("first", AttributeDataType.CATEGORICAL),
+        create_attribute("second", AttributeDataType.CATEGORICAL),
+        create_attribute("indicator", AttributeDataType.CATEGORICAL),
+        create_attribute("amount", AttributeDataType.NUMERICAL),
+    ]
+    target_attribute = create_attribute(
+        "target", AttributeDataType.NUMERICAL, is_feature=False
+    )
+    return df_x, df_target, attributes, target_attribute
+
+
+def split_into_chunks(df_x, df_target, num_cases):
+    """Chunks of the rows of num_cases cases"""
+    case_ids = df_x.index.get_level_values(0)
+    chunk_ids = pd.factorize(case_ids)[0] // num_cases
+    return [
+        (df_x[chunk_ids == i].copy(), df_target[chunk_ids == i].copy())
+        for i in range(chunk_ids.max() + 1)
+    ]
+
+
+def get_metrics(features):
+    return {f.df_column_name: f.metrics for f in features}
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"sparse_features": True},
+        {"max_categories": 2, "other_bucket": True},
+        {"hash_width": 4},
+    ],
+)
+def test_chunked_post_processing_matches_post_processor(kwargs):
+    df_x, df_target, attributes, target_attribute = create_dfs()
+    kwargs = dict(min_counts_perc=0.02, max_counts_perc=0.98, **kwargs)
+    pp = PostProcessor(
+        df_x=df_x.copy(),
+        df_target=df_target.copy(),
+        attributes=attributes,
+        target_attributes=target_attribute,
+        **kwargs,
+    )
+    df_x_expected, df_target_expected, target_features, features = pp.process()
+
+    chunks = split_into_chunks(df_x, df_target, num_cases=7)
+    chunked_pp = ChunkedPostProcessor(
+        attributes=attributes, target_attributes=target_attribute, **kwargs
+    )
+    processed_chunks = list(chunked_pp.process_chunks(lambda: iter(chunks)))
+    df_x_chunked = pd.concat([df for df, _ in processed_chunks])
+    df_target_chunked = pd.concat([df for _, df in processed_chunks])
+
+    pd.testing.assert_frame_equal(df_x_chunked, df_x_expected)
+    pd.testing.assert_frame_equal(df_target_chunked, df_target_expected)
+    assert [f.df_column_name for f in chunked_pp.features] == [
+        f.df_column_name for f in features
+    ]
+    assert [f.attribute_value for f in chunked_pp.features] == [
+        f.attribute_value for f in features
+    ]
+    assert [f.df_column_name for f in chunked_pp.target_features] == [
+        f.df_column_name for f in target_features
+    ]
+
+
+def test_chunked_post_processing_with_a_categorical_target():
+    df_x = pd.DataFrame({"attr": list("aabbcabcaa")})
+    df_target = pd.DataFrame({"target": list("uuvvwuvwu") + [np.nan]})
+    attributes = [create_attribute("attr", AttributeDataType.CATEGORICAL)]
+    target_attribute = create_attribute(
+        "target", AttributeDataType.CATEGORICAL, is_feature=False
+    )
+    pp = PostProcessor(
+        df_x=df_x.copy(),
+        df_target=df_target.copy(),
+        attributes=attributes,
+        target_attributes=target_attribute,
+    )
+    _, df_target_expected, target_features, _ = pp.process()
+    chunked_pp = ChunkedPostProcessor(
+        attributes=attributes, target_attributes=target_attribute
+    )
+    chunks = split_into_chunks(df_x, df_target, num_cases=4)
+    processed_chunks = list(chunked_pp.process_chunks(lambda: iter(chunks)))
+
+    pd.testing.assert_frame_equal(
+        pd.concat([df for _, df in processed_chunks]), df_target_expected
+    )
+    assert [f.attribute_value for f in chunked_pp.target_features] == [
+        f.attribute_value for f in target_features
+    ]
+
+
+@pytest.mark.parametrize("sparse_features", [False, True])
+def test_chunked_statistics_match_statistics_computer(sparse_features):
+    df_x, df_target, attributes, target_attribute = create_dfs()
+    chunks = split_into_chunks(df_x, df_target, num_cases=11)
+    chunked_pp = ChunkedPostProcessor(
+        attributes=attributes,
+        target_attributes=target_attribute,
+        min_counts_perc=0.02,
+        max_counts_perc=0.98,
+        sparse_features=sparse_features,
+    )
+    processed_chunks = list(chunked_pp.process_chunks(lambda: iter(chunks)))
+    features = chunked_pp.features
+    target_features = chunked_pp.target_features
+
+    StatisticsComputer(
+        features=features,
+        target_features=target_features,
+        df_x=pd.concat([df for df, _ in processed_chunks]),
+        df_target=pd.concat([df for _, df in processed_chunks]),
+    ).compute_all_statistics()
+    expected_metrics = get_metrics(features)
+    for feature in features:
+        feature.metrics = {}
+
+    statistics_computer = ChunkedStatisticsComputer(features, target_features)
+    for df_x_chunk, df_target_chunk in processed_chunks:
+        statistics_computer.fit_chunk(df_x_chunk, df_target_chunk)
+    statistics_computer.finish_fit()
+    for df_x_chunk, df_target_chunk in processed_chunks:
+        statistics_computer.update(df_x_chunk, df_target_chunk)
+    statistics_computer.compute_all_statistics()
+    metrics = get_metrics(features)
+
+    # The outliers of amount and target are removed in both
+    assert metrics.keys() == expected_metrics.keys()
+    for name, feature_metrics in expected_metrics.items():
+        assert metrics[name].keys() == feature_metrics.keys()
+        for metric, value in feature_metrics.items():
+            if isinstance(value, dict):
+                value = value["target"]
+                chunked_value = metrics[name][metric]["target"]
+            else:
+                chunked_value = metrics[name][metric]
+            np.testing.assert_allclose(chunked_value, value, rtol=1e-9, err_msg=name)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [1.0, 2.0, 2.0, 3.0, 10.0],
+        [5.0, 1.0, 4.0, 4.0, 4.0, 2.5, -3.0, 8.0],
+        [0.1, 0.2, 0.7],
+        [7.0],
+    ],
+)
+def test_quantiles_from_value_counts(values):
+    counts = pd.Series(values).value_counts().sort_index()
+    cum_counts = np.cumsum(counts.to_numpy())
+    for q in [0.25, 0.75]:
+        assert _quantile(
+            counts.index.to_numpy(dtype=float), cum_counts, q
+        ) == np.quantile(values, q)
+
+
+def create_datamodel(num_cases=60, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(num_cases):
+        time = pd.Timestamp("2020-01-01") + pd.Timedelta(days=int(rng.integers(100)))
+        for activity in rng.choice(list("ABCDE"), rng.integers(1, 6)):
+            time += pd.Timedelta(hours=int(rng.integers(1, 200)))
+            rows.append((f"c{i}", activity, time))
+    case_df = pd.DataFrame(
+        {
+            "case": [f"c{i}" for i in range(num_cases)],
+            "region": rng.choice(list("NSEW"), num_cases),
+            "amount": rng.normal(10, 3, num_cases),
+        }
+    )
+    return LocalDatamodel(
+        pd.DataFrame(rows, columns=["case", "act", "ts"]),
+        caseid_col_str="case",
+        activity_col_str="act",
+        eventtime_col_str="ts",
+        case_df=case_df,
+        activity_table_str="ACTIVITIES",
+        case_table_str="CASES",
+    )
+
+
+def test_chunked_case_duration_processor(monkeypatch):
+    dm = create_datamodel()
+    # Number of cases of each extraction
+    extracted_case_counts = []
+
+    def extract_dfs(
+        process_config,
+        activity_table_str,
+        static_attributes,
+        dynamic_attributes,
+        is_closed_indicator,
+        target_variable,
+        filters,
+        **kwargs,
+    ):
+        query = PQL()
+        query.add(PQLColumn(name="case_id", query='"CASES"."case"'))
+        for attr in static_attributes:
+            query.add(attr.pql_query)
+        query.add(target_variable)
+        for pql_filter in filters:
+            query.add(pql_filter)
+        df = dm.get_data_frame(query).set_index("case_id")
+        extracted_case_counts.append(len(df.index))
+        return df.drop(columns=target_variable.name), df[[target_variable.name]]
+
+    monkeypatch.setattr(feature_processor_new, "extract_dfs", extract_dfs)
+    # The work in progress depends on the other cases, so it can't be chunked
+    descriptors = [
+        d
+        for d in CaseDurationProcessor.potential_static_attributes_descriptors
+        if not issubclass(
+            d.attribute_type, feature_processor_new.CROSS_CASE_ATTRIBUTE_TYPES
+        )
+    ]
+    processors = []
+    for case_chunk_size in [None, 7]:
+        processor = CaseDurationProcessor(
+            process_config=ProcessConfig(dm),
+            activity_table_str="ACTIVITIES",
+            used_static_attribute_descriptors=descriptors,
+            used_dynamic_attribute_descriptors=[],
+            considered_activity_table_cols=[],
+            considered_case_level_table_cols={"CASES": ["region", "amount"]},
+            is_closed_query=PQLColumn(name="is_closed", query="1"),
+            case_chunk_size=case_chunk_size,
+        )
+        processor.process()
+        processors.append(processor)
+    processor, chunked_processor = processors
+    # The first pass extracts all chunks, the second one extracts them again
+    assert extracted_case_counts == [60] + [7] * 8 + [4] + [7] * 8 + [4]
+
+    assert "CASES.region = N" in processor.df_x.columns
+    pd.testing.assert_frame_equal(
+        chunked_processor.df_x.sort_index(), processor.df_x.sort_index()
+    )
+    pd.testing.assert_frame_equal(
+        chunked_processor.df_target.sort_index(), processor.df_target.sort_index()
+    )
+    assert get_metrics(chunked_processor.features).keys() == (
+        get_metrics(processor.features).keys()
+    )
+    for feature, chunked_feature in zip(processor.features, chunked_processor.features):
+        for metric, value in feature.metrics.items():
+            chunked_value = chunked_feature.metrics[metric]
+            if isinstance(value, dict):
+                value = value["Case duration"]
+                chunked_value = chunked_value["Case duration"]
+            np.testing.assert_allclose(chunked_value, value, rtol=1e-9)
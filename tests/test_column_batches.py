@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from one_click_analysis.feature_processing import feature_processor_new
+
+
+def join_with_reindex(df_x, df_batches):
+    """Join the batches with reindex, the fallback of join_static_batches"""
+    df_batch = pd.concat(df_batches, axis=1, join="outer")
+    df_batch = df_batch.reindex(df_x.index.get_level_values(0))
+    df_batch.index = df_x.index
+    return pd.concat([df_x, df_batch], axis=1)
+
+
+def create_df_x(case_ids):
+    """df_x of the first batch with several rows per case as for dynamic
+    attributes"""
+    index = pd.MultiIndex.from_arrays(
+        [case_ids, list(range(len(case_ids)))], names=["case_id", "row"]
+    )
+    return pd.DataFrame({"x": np.arange(len(case_ids), dtype=float)}, index=index)
+
+
+@pytest.mark.parametrize(
+    "case_ids",
+    [
+        ["c1", "c1", "c2", "c3", "c3", "c4", "c5"],
+        # Not sorted, so the reindex fallback is used
+        ["c3", "c1", "c5", "c1", "c2"],
+    ],
+)
+def test_join_static_batches_matches_reindex(case_ids):
+    df_x = create_df_x(case_ids)
+    # c2 and c5 are missing in the first batch, c1 and c5 in the second, c6 is not
+    # in df_x
+    df_batches = [
+        pd.DataFrame(
+            {"a": [1.0, 3.0, 4.0, 6.0], "b": ["u", "w", None, "z"]},
+            index=pd.Index(["c1", "c3", "c4", "c6"], name="case_id"),
+        ),
+        pd.DataFrame(
+            {"c": [2, 3, 4]}, index=pd.Index(["c4", "c2", "c3"], name="case_id")
+        ),
+    ]
+    df_joined = feature_processor_new.join_static_batches(df_x, df_batches)
+    df_expected = join_with_reindex(df_x, df_batches)
+    pd.testing.assert_frame_equal(df_joined, df_expected)
+    assert df_joined.loc["c5", ["a", "b", "c"]].isna().all(axis=None)
+
+
+def test_join_static_batches_with_empty_batch():
+    df_x = create_df_x(["c1", "c2"])
+    df_batch = pd.DataFrame({"a": pd.Series([], dtype=float)})
+    df_joined = feature_processor_new.join_static_batches(df_x, [df_batch])
+    pd.testing.assert_frame_equal(df_joined, join_with_reindex(df_x, [df_batch]))
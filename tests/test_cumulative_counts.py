@@ -0,0 +1,61 @@
+import numpy as np
+from pycelonis.celonis_api.pql.pql import PQL
+from pycelonis.celonis_api.pql.pql import PQLColumn
+from pycelonis.celonis_api.pql.pql import PQLFilter
+
+from one_click_analysis.feature_processing import feature_processor_new
+
+
+def query_running_sums(dm, activities, filters=()):
+    """Query the running counts with RUNNING_SUM as in ActivityCountAttribute"""
+    query = PQL()
+    query.add(PQLColumn(name="case_id", query='"ACTIVITIES"."case"'))
+    query.add(
+        PQLColumn(name="event_index", query='INDEX_ACTIVITY_ORDER("ACTIVITIES"."act")')
+    )
+    for activity in activities:
+        query.add(
+            PQLColumn(
+                name=activity,
+                query=(
+                    'RUNNING_SUM(CASE WHEN "ACTIVITIES"."act" = '
+                    f"'{activity}' THEN 1 ELSE 0 END, "
+                    'PARTITION BY ("ACTIVITIES"."case"))'
+                ),
+            )
+        )
+    for filter_query in filters:
+        query.add(PQLFilter(filter_query))
+    return dm.get_data_frame(query).set_index(["case_id", "event_index"])
+
+
+def test_cumulative_counts_match_running_sum(process_config, local_dm):
+    df_sequences = feature_processor_new.extract_activity_sequences(
+        process_config, "ACTIVITIES"
+    )
+    df_counts = feature_processor_new.compute_cumulative_activity_counts(
+        df_sequences, activities=["A", "B", "C"]
+    )
+    df_expected = query_running_sums(local_dm, ["A", "B", "C"])
+    assert list(df_counts.index) == list(df_expected.index)
+    np.testing.assert_array_equal(df_counts.to_numpy(), df_expected.to_numpy())
+
+
+def test_cumulative_counts_with_key_activities(process_config, local_dm):
+    # With key activities, only their events are extracted, so RUNNING_SUM and
+    # the event index only run over these events
+    key_activities = ["A", "B"]
+    df_sequences = feature_processor_new.extract_activity_sequences(
+        process_config, "ACTIVITIES", key_activities=key_activities
+    )
+    assert set(df_sequences["activity"]) == set(key_activities)
+    df_counts = feature_processor_new.compute_cumulative_activity_counts(
+        df_sequences, activities=key_activities
+    )
+    df_expected = query_running_sums(
+        local_dm, key_activities, filters=["\"ACTIVITIES\".\"act\" IN ('A', 'B')"]
+    )
+    assert list(df_counts.index) == list(df_expected.index)
+    np.testing.assert_array_equal(df_counts.to_numpy(), df_expected.to_numpy())
+    # c3: A B B C
+    assert df_counts.loc["c3", "B"].tolist() == [0, 1, 2]
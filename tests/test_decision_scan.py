@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from one_click_analysis.feature_processing.decision_scan import (
+    compute_decision_distributions,
+)
+from one_click_analysis.feature_processing.decision_scan import scan_decision_points
+from one_click_analysis.feature_processing.event_sequences import (
+    build_event_sequences,
+)
+
+
+def create_sequences(cases):
+    """Build EventSequences from {case id: [activity, ...]}"""
+    rows = [
+        {
+            "case_id": case_id,
+            "event_index": i,
+            "activity": activity,
+            "timestamp": pd.Timestamp("2022-01-01") + pd.Timedelta(days=i),
+        }
+        for case_id, activities in cases.items()
+        for i, activity in enumerate(activities)
+    ]
+    return build_event_sequences(pd.DataFrame(rows))
+
+
+def get_counts(scan, source_activity):
+    df = scan.df_distributions
+    df = df[df["source_activity"] == source_activity]
+    return dict(zip(df["target_activity"], df["count"]))
+
+
+def test_scan_decision_points(sequences):
+    # c1: A B C, c2: A C, c3: A B B C, c4: A
+    scan = scan_decision_points(sequences)
+    assert scan.target_activities == {"A": ["B", "C"], "B": ["C", "B"]}
+    assert get_counts(scan, "A") == {"B": 2, "C": 1, None: 1}
+    # B is a target of itself, so every occurrence is a decision
+    assert get_counts(scan, "B") == {"B": 1, "C": 2}
+    df_points = scan.df_decision_points
+    assert df_points["source_activity"].tolist() == ["A", "B"]
+    assert df_points["count"].tolist() == [4, 3]
+    np.testing.assert_allclose(
+        df_points["entropy"], [1.5, -(2 / 3 * np.log2(2 / 3) + 1 / 3 * np.log2(1 / 3))]
+    )
+    shares = scan.df_distributions.groupby("source_activity")["share"].sum()
+    np.testing.assert_allclose(shares, 1.0)
+
+
+def test_repeated_source_without_target_counts_once():
+    sequences = create_sequences(
+        {"0": ["A", "X", "A", "B", "A", "C"], "1": ["A", "A"], "2": ["C", "A"]}
+    )
+    scan = compute_decision_distributions(sequences, {"A": ["B", "C"]})
+    # Case 0: A X A -> B, A -> C; case 1: A A without target; case 2: C A
+    # without target. Targets of other cases are not used.
+    assert get_counts(scan, "A") == {"B": 1, "C": 1, None: 2}
+
+
+def test_min_share_and_min_count(sequences):
+    # A -> C and B -> B have a third of the transitions of their source
+    scan = scan_decision_points(sequences, min_share=0.3)
+    assert list(scan.target_activities) == ["A", "B"]
+    scan = scan_decision_points(sequences, min_share=0.4)
+    assert scan.target_activities == {}
+    scan = scan_decision_points(sequences, min_count=4)
+    assert list(scan.target_activities) == ["A"]
+    scan = compute_decision_distributions(sequences, {"D": ["A", "B"]})
+    assert scan.df_decision_points.empty and scan.df_distributions.empty
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from one_click_analysis.feature_processing.attributes.attribute import (
+    AttributeDataType,
+)
+from one_click_analysis.feature_processing.attributes.attribute import AttributeType
+from one_click_analysis.feature_processing.attributes.feature import Feature
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    DummyAttribute,
+)
+from one_click_analysis.feature_processing.dtype_ingestion import compact_dtypes
+from one_click_analysis.feature_processing.post_processing import PostProcessor
+from one_click_analysis.feature_processing.post_processing import (
+    remove_nan_with_report,
+)
+from one_click_analysis.statistics.statistics_computer import StatisticsComputer
+
+
+def test_compact_dtypes():
+    df = pd.DataFrame(
+        {
+            "indicator": np.array([0, 1, 1, 0], dtype=np.int64),
+            "flag": [True, False, True, True],
+            "count": np.array([-3, 200, 7, 0], dtype=np.int64),
+            "integral_float": [1.0, 70000.0, 3.0, 4.0],
+            "float": [0.5, 0.25, 1.5, 2.0],
+            "float_nan": [0.5, np.nan, 1.5, 2.0],
+            "category": ["a", "b", "a", "a"],
+        }
+    )
+    df_compact, report = compact_dtypes(df)
+    assert df_compact["indicator"].dtype == np.uint8
+    assert df_compact["flag"].dtype == np.uint8
+    assert df_compact["count"].dtype == np.int16
+    assert df_compact["integral_float"].dtype == np.uint32
+    assert df_compact["float"].dtype == np.float32
+    assert df_compact["float_nan"].dtype == np.float32
+    assert isinstance(df_compact["category"].dtype, pd.CategoricalDtype)
+    assert report.conversions["count"] == ("int64", "int16")
+    assert report.after_bytes < report.before_bytes
+    # The values are unchanged and the input is not modified
+    pd.testing.assert_frame_equal(
+        df_compact.astype({"category": object}), df, check_dtype=False
+    )
+    assert df["count"].dtype == np.int64
+    assert df["category"].dtype == object
+
+
+def test_compact_dtypes_keeps_columns_that_would_change():
+    df = pd.DataFrame(
+        {
+            # Out of the float32 range
+            "large": [0.5, 1e300, 3.5, 4.5],
+            # Too many distinct values for a Categorical
+            "ids": ["a", "b", "c", "d"],
+            # Mixed types
+            "mixed": ["a", 1, "a", "a"],
+            "empty": [None, None, None, None],
+        }
+    )
+    df_compact, report = compact_dtypes(df)
+    assert report.conversions == {}
+    pd.testing.assert_frame_equal(df_compact, df)
+
+
+def test_compact_dtypes_give_the_same_statistics():
+    # Post processing, NaN removal and statistics on the compact frame give the
+    # same results as on the extracted frame
+    df_x = pd.DataFrame(
+        {
+            "activity": ["a", "b", "a", "c", "b", "a", "a", "b"],
+            "indicator": np.array([0, 1, 1, 0, 1, 0, 0, 1], dtype=np.int64),
+            "count": np.array([3, 0, 250, 7, 1, 2, 2, 9], dtype=np.int64),
+            "amount": [0.1, 2.7, np.nan, 1.3, 5.9, 0.4, 3.3, 1.1],
+        }
+    )
+    df_target = pd.DataFrame(
+        {"target": [1.5, 2.0, 3.5, 1.0, 8.0, 2.5, 4.0, 6.0]}, index=df_x.index
+    )
+    df_compact, _ = compact_dtypes(df_x)
+    assert df_compact["indicator"].dtype == np.uint8
+    assert df_compact["count"].dtype == np.uint8
+
+    metrics = [
+        compute_metrics(df, df_target.copy()) for df in [df_x.copy(), df_compact]
+    ]
+    assert metrics[0].keys() == metrics[1].keys()
+    for name, values in metrics[0].items():
+        np.testing.assert_allclose(metrics[1][name], values, rtol=1e-6)
+
+
+def compute_metrics(df_x, df_target):
+    attributes = [
+        DummyAttribute(
+            query="",
+            attribute_name=name,
+            attribute_type=AttributeType.OTHER,
+            process_config=None,
+            is_feature=True,
+        )
+        for name in df_x.columns
+    ]
+    pp = PostProcessor(
+        df_x=df_x,
+        df_target=df_target,
+        attributes=attributes,
+        target_attributes=[],
+    )
+    features = pp.process_feature_attributes(attributes)
+    target_features = [
+        Feature("target", AttributeDataType.NUMERICAL, attributes[0], unit="days")
+    ]
+    df_x, df_target, _ = remove_nan_with_report(
+        pp.df_x, df_target, features, target_features
+    )
+    StatisticsComputer(
+        features, target_features, df_x, df_target
+    ).compute_all_statistics()
+    metrics = {}
+    for feature in features:
+        for metric, value in feature.metrics.items():
+            if isinstance(value, dict):
+                value = value["target"]
+            metrics[(feature.df_column_name, metric)] = value
+    return metrics
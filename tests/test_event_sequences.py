@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from pycelonis.celonis_api.pql.pql import PQLFilter
+
+from one_click_analysis.configuration.activity_prefetcher import ActivityPrefetcher
+from one_click_analysis.feature_processing import event_sequences
+from one_click_analysis.feature_processing.event_sequences import (
+    build_event_sequences,
+)
+from one_click_analysis.feature_processing.event_sequences import create_filter_key
+from one_click_analysis.feature_processing.event_sequences import (
+    EventSequenceRegistry,
+)
+from one_click_analysis.feature_processing.transition_matrix import (
+    get_transition_matrix,
+)
+
+
+def test_build_event_sequences():
+    df_events = pd.DataFrame(
+        {
+            "case_id": ["b", "a", "b", "a", "a"],
+            "event_index": [1, 0, 0, 2, 1],
+            "activity": ["Y", "X", "X", "Z", None],
+            "timestamp": pd.to_datetime(
+                ["2020-01-03", "2020-01-01", "2020-01-02", "2020-01-04", "2020-01-02"]
+            ),
+        }
+    )
+    sequences = build_event_sequences(df_events)
+    assert sequences.activities == ["X", "Y", "Z"]
+    assert list(sequences.case_ids) == ["a", "b"]
+    np.testing.assert_array_equal(sequences.case_positions, [0, 0, 1, 1])
+    np.testing.assert_array_equal(sequences.activity_codes, [0, 2, 0, 1])
+    np.testing.assert_array_equal(sequences.is_case_start, [True, False, True, False])
+    np.testing.assert_array_equal(sequences.is_case_end, [False, True, False, True])
+    assert list(sequences.case_starts) == list(
+        pd.to_datetime(["2020-01-01", "2020-01-02"])
+    )
+
+    later_cases = sequences.select_period(start="2020-01-02")
+    assert list(later_cases.case_ids) == ["b"]
+    np.testing.assert_array_equal(later_cases.case_positions, [0, 0])
+    np.testing.assert_array_equal(later_cases.activity_codes, [0, 1])
+    assert later_cases.activities == sequences.activities
+
+
+def test_create_filter_key_ignores_order_nesting_and_whitespace():
+    key = create_filter_key([PQLFilter("a = 1"), [PQLFilter("b  =  2")], None])
+    assert key == create_filter_key([PQLFilter("b = 2"), PQLFilter(" a = 1")])
+
+
+def count_extractions(monkeypatch):
+    extracted_filters = []
+    extract = event_sequences.extract_event_sequences
+
+    def extract_event_sequences(process_config, activity_table_str, filters, *args):
+        extracted_filters.append(create_filter_key(filters))
+        return extract(process_config, activity_table_str, filters, *args)
+
+    monkeypatch.setattr(
+        event_sequences, "extract_event_sequences", extract_event_sequences
+    )
+    return extracted_filters
+
+
+def test_registry_keeps_the_most_recent_filter_sets(process_config, monkeypatch):
+    extracted_filters = count_extractions(monkeypatch)
+    registry = EventSequenceRegistry(max_filter_sets=2)
+    filters = [[PQLFilter(f'"CASES"."amount" > {i + 1}')] for i in range(3)]
+
+    first = registry.get_event_sequences(process_config, "ACTIVITIES", filters[0])
+    assert (
+        registry.get_derived(
+            "number_cases", lambda s: s.number_cases, process_config, "ACTIVITIES"
+        )
+        == 4
+    )
+    assert first.number_cases == 3
+    assert (
+        registry.get_event_sequences(process_config, "ACTIVITIES", filters[0]) is first
+    )
+    assert len(extracted_filters) == 2
+
+    registry.get_event_sequences(process_config, "ACTIVITIES", filters[1])
+    assert len(registry) == 2
+    # filters[0] was used less recently than the unfiltered set
+    registry.get_event_sequences(process_config, "ACTIVITIES", filters[0])
+    registry.get_event_sequences(process_config, "ACTIVITIES", filters[2])
+    assert len(registry) == 2
+    assert len(extracted_filters) == 4
+    registry.get_event_sequences(process_config, "ACTIVITIES", filters[0])
+    assert len(extracted_filters) == 4
+    registry.get_event_sequences(process_config, "ACTIVITIES")
+    assert len(extracted_filters) == 5
+
+    registry.evict(process_config, "ACTIVITIES", filters[0])
+    registry.get_event_sequences(process_config, "ACTIVITIES", filters[0])
+    assert len(extracted_filters) == 6
+
+
+def test_prefetcher_only_prefetches_event_sequences_on_request(
+    process_config, monkeypatch
+):
+    extracted_filters = count_extractions(monkeypatch)
+    event_sequences.event_sequence_registry.clear()
+    filters = [PQLFilter('"CASES"."amount" > 1')]
+
+    prefetcher = ActivityPrefetcher(max_workers=1)
+    prefetcher.prefetch(process_config, "ACTIVITIES", filters)
+    assert extracted_filters == []
+
+    prefetcher = ActivityPrefetcher(max_workers=1, prefetch_event_sequences=True)
+    prefetcher.prefetch(process_config, "ACTIVITIES", filters)
+    assert len(extracted_filters) == 1
+    matrix = prefetcher.get_transition_matrix(process_config, "ACTIVITIES", filters)
+    assert matrix is get_transition_matrix(process_config, "ACTIVITIES", filters)
+    assert len(extracted_filters) == 1
+
+    # A filter change removes the results of the previous filters
+    prefetcher.prefetch(process_config, "ACTIVITIES", [])
+    assert len(extracted_filters) == 2
+    assert len(event_sequences.event_sequence_registry) == 1
+    prefetcher.get_transition_matrix(process_config, "ACTIVITIES", filters)
+    assert len(extracted_filters) == 3
+    event_sequences.event_sequence_registry.clear()
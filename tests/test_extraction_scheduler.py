@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from one_click_analysis.extraction_scheduler import ExtractionScheduler
+
+
+def extraction_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("extraction")]
+
+
+def test_run_returns_results_in_order_of_calls():
+    scheduler = ExtractionScheduler(max_workers=3)
+
+    def call(i):
+        def extract():
+            # Later calls finish first
+            time.sleep(0.01 * (3 - i))
+            return i
+
+        return extract
+
+    assert scheduler.run(*[call(i) for i in range(3)]) == [0, 1, 2]
+
+
+def test_run_stops_its_threads():
+    scheduler = ExtractionScheduler(max_workers=2)
+    scheduler.run(threading.get_ident, threading.get_ident)
+    assert extraction_threads() == []
+
+
+def test_run_with_one_worker_uses_the_calling_thread():
+    scheduler = ExtractionScheduler(max_workers=1)
+    assert scheduler.run(threading.get_ident) == [threading.get_ident()]
+
+
+def test_run_raises_the_exception_of_a_failed_call():
+    def fail():
+        raise ValueError("query failed")
+
+    scheduler = ExtractionScheduler(max_workers=2)
+    with pytest.raises(ValueError, match="query failed"):
+        scheduler.run(lambda: 1, fail)
+
+
+def test_submit_until_shutdown():
+    with ExtractionScheduler(max_workers=2) as scheduler:
+        future = scheduler.submit(sum, [1, 2])
+        assert future.result() == 3
+    assert extraction_threads() == []
+
+
+def test_nested_runs_share_max_workers():
+    scheduler = ExtractionScheduler(max_workers=2)
+    lock = threading.Lock()
+    running = [0]
+    max_running = [0]
+
+    def query():
+        with lock:
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return 1
+
+    def extract():
+        # Like extract_dfs run inside a batch of the processor's scheduler
+        return sum(scheduler.run(query, query, query))
+
+    assert scheduler.run(extract, extract, query) == [3, 3, 1]
+    assert max_running[0] == 2
@@ -0,0 +1,71 @@
+import pandas as pd
+from pycelonis.celonis_api.pql.pql import PQL
+from pycelonis.celonis_api.pql.pql import PQLColumn
+from pycelonis.celonis_api.pql.pql import PQLFilter
+
+from one_click_analysis.incremental_refresh import IncrementalStore
+from one_click_analysis.local_backend.local_datamodel import LocalDatamodel
+from one_click_analysis.process_config.process_config import ProcessConfig
+
+IS_CLOSED_FILTER = PQLFilter('PU_LAST("CASES", "ACTIVITIES"."act") = \'C\'')
+
+
+def extract(process_config, filters):
+    """Extract one row per closed case, indexed by the case id"""
+    query = PQL()
+    query.add(PQLColumn(name="case", query='"CASES"."case"'))
+    query.add(PQLColumn(name="region", query='"CASES"."region"'))
+    for f in filters:
+        query.add(f)
+    df_x = process_config.dm.get_data_frame(query).set_index("case")
+    return df_x, pd.DataFrame({"target": 1.0}, index=df_x.index)
+
+
+def run(store, process_config, key):
+    state = store.begin(process_config, "ACTIVITIES", key, [IS_CLOSED_FILTER])
+    df_x, df_target = extract(process_config, [IS_CLOSED_FILTER] + state.filters)
+    extracted = sorted(df_x.index)
+    df_x, df_target = store.merge(state, df_x, df_target)
+    store.save(state, df_x, df_target)
+    return extracted, df_x
+
+
+def test_cases_that_close_later_are_extracted(tmp_path, activity_df, case_df):
+    store = IncrementalStore(tmp_path)
+    key = IncrementalStore.create_key("dm", "ACTIVITIES", "test", ["q"], [])
+    # c4 started before the latest closed case, but is still open
+    dm = LocalDatamodel(activity_df, "case", "act", "ts", case_df=case_df)
+    extracted, df_x = run(store, ProcessConfig(dm), key)
+    assert extracted == ["c1", "c2", "c3"]
+    assert store.get_watermark(key) == pd.Timestamp("2020-01-10")
+
+    closed_c4 = pd.DataFrame(
+        {"case": ["c4"], "act": ["C"], "ts": [pd.Timestamp("2020-01-12")]}
+    )
+    dm = LocalDatamodel(
+        pd.concat([activity_df, closed_c4]), "case", "act", "ts", case_df=case_df
+    )
+    extracted, df_x = run(store, ProcessConfig(dm), key)
+    # c3 has its last event at the watermark, so it is extracted again
+    assert extracted == ["c3", "c4"]
+    assert sorted(df_x.index) == ["c1", "c2", "c3", "c4"]
+    assert store.get_watermark(key) == pd.Timestamp("2020-01-12")
+
+
+def test_lookback(tmp_path, process_config):
+    store = IncrementalStore(tmp_path, lookback="5D12h")
+    key = IncrementalStore.create_key("dm", "ACTIVITIES", "test", ["q"], [])
+    run(store, process_config, key)
+    extracted, df_x = run(store, process_config, key)
+    # c1 (last event 2020-01-05) is within the lookback, c2 (2020-01-04) is not
+    assert extracted == ["c1", "c3"]
+    assert sorted(df_x.index) == ["c1", "c2", "c3"]
+
+
+def test_key_depends_on_queries_and_filters():
+    key = IncrementalStore.create_key("dm", "A", "P", ["q1", "q2"], [])
+    assert key == IncrementalStore.create_key("dm", "A", "P", ["q2", " q1"], [])
+    assert key != IncrementalStore.create_key("dm", "A", "P", ["q1"], [])
+    assert key != IncrementalStore.create_key(
+        "dm", "A", "P", ["q1", "q2"], [PQLFilter("x = 1")]
+    )
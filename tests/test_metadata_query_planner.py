@@ -0,0 +1,28 @@
+from one_click_analysis.feature_processing import feature_processor_new
+
+
+def test_metadata_planner_uses_aggregate_queries(process_config, monkeypatch):
+    # The metadata must not download the event log
+    monkeypatch.setattr(
+        feature_processor_new,
+        "get_df_with_filters",
+        _fail_on_event_queries(feature_processor_new.get_df_with_filters),
+    )
+    planner = feature_processor_new.MetadataQueryPlanner(process_config, "ACTIVITIES")
+    planner.request_number_cases()
+    planner.request_activities()
+    planner.execute()
+    assert planner.number_queries == 2
+    assert planner.get_number_cases() == 4
+    assert planner.get_valid_vals("ACTIVITIES", ["act"], min_vals=3) == {
+        "act": ["A", "C"]
+    }
+    assert planner.number_queries == 2
+
+
+def _fail_on_event_queries(get_df_with_filters):
+    def get_df(dm, filters, query, *args, **kwargs):
+        assert not any("INDEX_ACTIVITY_ORDER" in c.query for c in query.columns)
+        return get_df_with_filters(dm, filters, query, *args, **kwargs)
+
+    return get_df
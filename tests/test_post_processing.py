@@ -0,0 +1,288 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from one_click_analysis.feature_processing.attributes.attribute import (
+    AttributeDataType,
+)
+from one_click_analysis.feature_processing.attributes.attribute import AttributeType
+from one_click_analysis.feature_processing.attributes.feature import Feature
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    DummyAttribute,
+)
+from one_click_analysis.feature_processing.post_processing import (
+    _encode_categorical,
+)
+from one_click_analysis.feature_processing.post_processing import OTHER_VALUE
+from one_click_analysis.feature_processing.post_processing import PostProcessor
+from one_click_analysis.feature_processing.post_processing import (
+    remove_nan_with_report,
+)
+from one_click_analysis.statistics.statistics_computer import StatisticsComputer
+
+
+def create_attributes(df_x):
+    return [
+        DummyAttribute(
+            query="",
+            attribute_name=name,
+            attribute_type=AttributeType.OTHER,
+            process_config=None,
+            is_feature=True,
+        )
+        for name in df_x.columns
+    ]
+
+
+def post_process(df_x, **kwargs):
+    attributes = create_attributes(df_x)
+    pp = PostProcessor(
+        df_x=df_x.copy(),
+        df_target=pd.DataFrame({"target": np.zeros(len(df_x.index))}),
+        attributes=attributes,
+        target_attributes=[],
+        **kwargs,
+    )
+    features = pp.process_feature_attributes(attributes)
+    return pp.df_x, features
+
+
+def decode(codes, values):
+    return [values[code] if code >= 0 else None for code in codes]
+
+
+def test_max_categories_and_other_bucket():
+    col = pd.Series(["a"] * 4 + ["b"] * 3 + ["c"] * 2 + ["d", np.nan])
+    codes, values = _encode_categorical(col, 0, 11, max_categories=2)
+    assert values == ["a", "b"]
+    assert decode(codes, values) == ["a"] * 4 + ["b"] * 3 + [None] * 4
+
+    codes, values = _encode_categorical(col, 1, 11, max_categories=2, other_bucket=True)
+    assert values == ["a", "b", OTHER_VALUE]
+    # c exceeds max_categories and d occurs too rarely, NaN stays unencoded
+    assert decode(codes, values) == ["a"] * 4 + ["b"] * 3 + [OTHER_VALUE] * 3 + [None]
+
+
+def test_other_bucket_respects_count_thresholds():
+    col = pd.Series(["a"] * 5 + ["b", "c"])
+    codes, values = _encode_categorical(col, 2, 7, other_bucket=True)
+    # The other column would only have 2 ones
+    assert values == ["a"]
+
+
+def test_other_value_does_not_collide():
+    col = pd.Series(
+        ["x"] * 3 + [OTHER_VALUE] * 3 + [f"{OTHER_VALUE} (1)"] * 3 + ["y", "z"]
+    )
+    codes, values = _encode_categorical(col, 1, 11, other_bucket=True)
+    assert values == [OTHER_VALUE, f"{OTHER_VALUE} (1)", "x", f"{OTHER_VALUE} (2)"]
+    assert decode(codes, values)[-2:] == [f"{OTHER_VALUE} (2)"] * 2
+    assert decode(codes, values)[3:6] == [OTHER_VALUE] * 3
+
+    df_x, features = post_process(
+        pd.DataFrame({"attr": col}),
+        min_counts_perc=0.1,
+        max_counts_perc=1.0,
+        other_bucket=True,
+    )
+    assert df_x[f"attr = {OTHER_VALUE}"].sum() == 3
+    assert df_x[f"attr = {OTHER_VALUE} (2)"].sum() == 2
+    assert len(set(df_x.columns)) == len(df_x.columns) == len(features)
+
+
+def test_hash_width():
+    col = pd.Series([f"value {i}" for i in range(20)] * 2)
+    codes, values = _encode_categorical(col, 0, 41, hash_width=4)
+    assert values == [f"hash bucket {i}" for i in range(4)]
+    # Equal values get the same bucket, also in another column
+    np.testing.assert_array_equal(codes[:20], codes[20:])
+    other_codes, _ = _encode_categorical(col[::-1], 0, 41, hash_width=4)
+    np.testing.assert_array_equal(other_codes[::-1], codes)
+    assert set(codes) <= set(range(4))
+
+
+def test_bounded_post_processing():
+    df_x = pd.DataFrame({"attr": list("aaaabbbccd"), "num": np.arange(10)})
+    df_out, features = post_process(
+        df_x, max_counts_perc=1.0, max_categories=2, other_bucket=True
+    )
+    assert list(df_out.columns) == ["num", "attr = a", "attr = b", "attr = OTHER"]
+    assert [f.attribute_value for f in features] == ["a", "b", OTHER_VALUE, None]
+    np.testing.assert_array_equal(df_out["attr = OTHER"], [0] * 7 + [1] * 3)
+
+
+def encode_with_get_dummies(df_x, min_counts, max_counts):
+    """Encoding of the previous encoder, value by value with get_dummies"""
+    for col_name in df_x.columns:
+        if not df_x[col_name].dtype == object:
+            continue
+        counts = df_x[col_name].value_counts(dropna=False)[df_x[col_name]].values
+        df_x.loc[(counts <= min_counts) | (counts >= max_counts), col_name] = np.nan
+        df_cols = pd.get_dummies(
+            df_x[col_name], prefix=col_name, prefix_sep=" = ", dtype=np.uint8
+        )
+        df_x = pd.concat([df_x.drop(columns=col_name), df_cols], axis=1)
+    return df_x
+
+
+def create_categorical_df():
+    return pd.DataFrame(
+        {
+            "first": ["b", "a", "b", np.nan, "c", "b", "a", "a", "b", "d"],
+            "num": np.arange(10, dtype=float),
+            "second": ["x"] * 9 + ["y"],
+            "third": ["u", "v"] * 5,
+        }
+    )
+
+
+def test_single_pass_encoding():
+    df_x = create_categorical_df()
+    df_out, features = post_process(df_x, min_counts_perc=0.1, max_counts_perc=0.9)
+    # min_counts = 1 drops c, d and y, max_counts = 9 drops x
+    df_expected = encode_with_get_dummies(df_x.copy(), 1, 9)
+    pd.testing.assert_frame_equal(df_out, df_expected)
+    assert [f.df_column_name for f in features] == [
+        "first = a",
+        "first = b",
+        "num",
+        "third = u",
+        "third = v",
+    ]
+    assert [f.attribute_value for f in features] == ["a", "b", None, "u", "v"]
+    # Categorical columns (see compact_dtypes) give the same columns
+    df_categorical, _ = post_process(
+        df_x.astype({"first": "category", "third": "category"}),
+        min_counts_perc=0.1,
+        max_counts_perc=0.9,
+    )
+    pd.testing.assert_frame_equal(df_categorical, df_out)
+
+
+def test_sparse_features():
+    df_x = create_categorical_df()
+    df_x.index = pd.MultiIndex.from_arrays([np.arange(10) // 2, np.arange(10)])
+    df_dense, features_dense = post_process(
+        df_x, min_counts_perc=0.1, max_counts_perc=0.9
+    )
+    df_sparse, features_sparse = post_process(
+        df_x, min_counts_perc=0.1, max_counts_perc=0.9, sparse_features=True
+    )
+    one_hot_cols = ["first = a", "first = b", "third = u", "third = v"]
+    assert all(
+        df_sparse[col].dtype == pd.SparseDtype(np.uint8, np.uint8(0))
+        for col in one_hot_cols
+    )
+    pd.testing.assert_frame_equal(_to_dense(df_sparse), df_dense)
+
+    # Removing rows keeps the columns sparse uint8
+    df_target = pd.DataFrame(
+        {"target": [1.0, np.nan] + [float(i) for i in range(8)]}, index=df_x.index
+    )
+    target_attr = create_attributes(df_target)[0]
+    target_features = [
+        Feature("target", AttributeDataType.NUMERICAL, target_attr, unit="days")
+    ]
+    df_sparse, df_target_sparse, _ = remove_nan_with_report(
+        df_sparse, df_target.copy(), features_sparse, target_features
+    )
+    df_dense, df_target_dense, _ = remove_nan_with_report(
+        df_dense, df_target.copy(), features_dense, target_features
+    )
+    assert df_sparse["first = a"].dtype == pd.SparseDtype(np.uint8, np.uint8(0))
+    pd.testing.assert_frame_equal(_to_dense(df_sparse), df_dense)
+
+    # The statistics do not depend on the mode
+    for df, df_target, features in [
+        (df_sparse, df_target_sparse, features_sparse),
+        (df_dense, df_target_dense, features_dense),
+    ]:
+        StatisticsComputer(
+            features, target_features, df, df_target
+        ).compute_all_statistics()
+    for feature_sparse, feature_dense in zip(features_sparse, features_dense):
+        np.testing.assert_equal(feature_sparse.metrics, feature_dense.metrics)
+    # "first = b" in rows 0, 2, 5 and 8 of cases 0, 1, 2 and 4
+    assert features_sparse[1].metrics["case_count"] == 4
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"sparse_features": True},
+        {"hash_width": 3},
+        {"max_categories": 1, "other_bucket": True},
+    ],
+)
+def test_process_pool_encoding(kwargs):
+    df_x = create_categorical_df()
+    df_expected, features_expected = post_process(
+        df_x, min_counts_perc=0.1, max_counts_perc=0.9, **kwargs
+    )
+    df_out, features = post_process(
+        df_x, min_counts_perc=0.1, max_counts_perc=0.9, max_workers=2, **kwargs
+    )
+    pd.testing.assert_frame_equal(df_out, df_expected)
+    assert [f.df_column_name for f in features] == [
+        f.df_column_name for f in features_expected
+    ]
+
+
+def _to_dense(df):
+    return df.assign(
+        **{
+            col: df[col].sparse.to_dense()
+            for col, dtype in df.dtypes.items()
+            if isinstance(dtype, pd.SparseDtype)
+        }
+    )
+
+
+def test_remove_nan_with_report():
+    attributes = create_attributes(pd.DataFrame(columns=["attr", "target"]))
+    df_x = pd.DataFrame(
+        {
+            "mostly nan": [np.nan, np.nan, np.nan, 1.0, 2.0, 3.0],
+            "some nan": [1.0, np.nan, 3.0, 5.0, 100.0, 4.0],
+            "indicator": [1.0, np.nan, 0.0, 1.0, 0.0, 1.0],
+            "complete": np.arange(6),
+        }
+    )
+    df_target = pd.DataFrame({"target": [1.0, 2.0, np.nan, 4.0, 5.0, 6.0]})
+    datatypes = {
+        "mostly nan": AttributeDataType.NUMERICAL,
+        "some nan": AttributeDataType.NUMERICAL,
+        "indicator": AttributeDataType.CATEGORICAL,
+        "complete": AttributeDataType.NUMERICAL,
+    }
+    features = [
+        Feature(name, datatype, attributes[0]) for name, datatype in datatypes.items()
+    ]
+    target_features = [Feature("target", AttributeDataType.NUMERICAL, attributes[1])]
+
+    df_x_out, df_target_out, report = remove_nan_with_report(
+        df_x.copy(), df_target.copy(), features, target_features, th_remove_col=0.3
+    )
+    # The row with the NaN target is removed first, so 2 of the 5 remaining values
+    # of "mostly nan" are NaN
+    assert report.num_rows == 6
+    assert report.num_removed_rows == 1
+    assert report.removed_columns == ["mostly nan"]
+    assert [f.df_column_name for f in features] == ["some nan", "indicator", "complete"]
+    assert report.imputed_columns == {"some nan": 4.5, "indicator": 0}
+    pd.testing.assert_frame_equal(
+        df_x_out,
+        pd.DataFrame(
+            {
+                "some nan": [1.0, 4.5, 5.0, 100.0, 4.0],
+                "indicator": [1.0, 0.0, 1.0, 0.0, 1.0],
+                "complete": [0, 1, 3, 4, 5],
+            },
+            index=[0, 1, 3, 4, 5],
+        ),
+    )
+    assert df_target_out["target"].tolist() == [1.0, 2.0, 4.0, 5.0, 6.0]
+    assert str(report) == (
+        "NaN values: removed 1 of 6 rows, removed 1 columns, imputed 2 columns"
+    )
@@ -0,0 +1,270 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycelonis.celonis_api.pql.pql import PQL
+from pycelonis.celonis_api.pql.pql import PQLColumn
+from pycelonis.celonis_api.pql.pql import PQLFilter
+
+from one_click_analysis.errors import PQLNotSupportedError
+
+ACT = '"ACTIVITIES"."act"'
+TS = '"ACTIVITIES"."ts"'
+AMOUNT = '"CASES"."amount"'
+
+
+def query(dm, filters=(), **columns):
+    pql_query = PQL()
+    for name, column_query in columns.items():
+        pql_query.add(PQLColumn(name=name, query=column_query))
+    for filter_query in filters:
+        pql_query.add(PQLFilter(filter_query))
+    return dm.get_data_frame(pql_query)
+
+
+def column(dm, column_query, filters=()):
+    return query(dm, filters, value=column_query)["value"].tolist()
+
+
+def test_columns_and_event_order(local_dm):
+    df = query(local_dm, case='"CASES"."case"', act=ACT)
+    assert df["case"].tolist() == ["c1"] * 3 + ["c2"] * 2 + ["c3"] * 4 + ["c4"]
+    assert df["act"].tolist() == ["A", "B", "C", "A", "C", "A", "B", "B", "C", "A"]
+    assert column(local_dm, AMOUNT) == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_operators(local_dm):
+    assert column(local_dm, f"{AMOUNT} * 2 - 1") == [1.0, 3.0, 5.0, 7.0]
+    assert column(local_dm, f"-{AMOUNT} / 2") == [-0.5, -1.0, -1.5, -2.0]
+    assert column(local_dm, f"{AMOUNT} >= 2 AND NOT {AMOUNT} = 4") == [
+        False,
+        True,
+        True,
+        False,
+    ]
+    assert column(local_dm, "1 + 2 * 3") == [7]
+
+
+def test_null_propagation(local_dm):
+    assert np.isnan(column(local_dm, f"{AMOUNT} + NULL")).all()
+    assert np.isnan(column(local_dm, f"NULL * {AMOUNT}")).all()
+    assert column(local_dm, "1 + NULL") == [None]
+    assert column(local_dm, f"{AMOUNT} > NULL") == [False] * 4
+    assert column(local_dm, f"{AMOUNT} != NULL") == [False] * 4
+    assert column(local_dm, f"{AMOUNT} > 2 OR {AMOUNT} < NULL") == [
+        False,
+        False,
+        True,
+        True,
+    ]
+    assert column(local_dm, f"CASE WHEN {AMOUNT} > 2 THEN {AMOUNT} END IS NULL") == [
+        True,
+        True,
+        False,
+        False,
+    ]
+
+
+def test_predicates(local_dm):
+    assert column(local_dm, "\"CASES\".\"region\" IN ('N', 'X')") == [
+        True,
+        False,
+        True,
+        False,
+    ]
+    assert column(local_dm, '"CASES"."region" NOT IN (\'N\')') == [
+        False,
+        True,
+        False,
+        True,
+    ]
+    labels = column(
+        local_dm, f"CASE WHEN {AMOUNT} < 2 THEN 'low' WHEN {AMOUNT} < 4 THEN 'mid' END"
+    )
+    assert labels[:3] == ["low", "mid", "mid"] and pd.isna(labels[3])
+    assert column(local_dm, f"COALESCE(CASE WHEN {AMOUNT} > 2 THEN 1 END, 0)") == [
+        0,
+        0,
+        1,
+        1,
+    ]
+
+
+def test_remap_timestamps(activity_df):
+    from one_click_analysis.local_backend.local_datamodel import LocalDatamodel
+
+    activity_df = activity_df.copy()
+    activity_df.loc[0, "ts"] = pd.Timestamp("1969-12-31 18:00")
+    activity_df.loc[1, "ts"] = pd.Timestamp("2020-01-02 23:59")
+    dm = LocalDatamodel(activity_df, "case", "act", "ts")
+    days = pd.Series(column(dm, f"REMAP_TIMESTAMPS({TS}, DAYS)"))
+    assert days.dtype == np.int64
+    # Floored to full days, also before the epoch
+    assert days.tolist()[:2] == [-1, 18263]
+    hours = column(dm, f"REMAP_TIMESTAMPS({TS}, HOURS)")
+    assert hours[1] == 18263 * 24 + 23
+    assert column(dm, "REMAP_TIMESTAMPS({d '2020-01-02'}, DAYS)") == [18263]
+
+
+def test_readable(local_dm):
+    assert column(local_dm, f"READABLE({ACT})")[:3] == ["A", "B", "C"]
+    assert column(local_dm, f"READABLE(INDEX_ACTIVITY_ORDER({ACT}))")[:3] == [
+        "1",
+        "2",
+        "3",
+    ]
+    assert column(local_dm, "READABLE(NULL)") == [None]
+
+
+def test_pull_up_functions(local_dm):
+    pu = {name: f'{name}("CASES", {TS})' for name in ["PU_FIRST", "PU_LAST", "PU_MAX"]}
+    df = query(local_dm, **pu)
+    assert df["PU_FIRST"].dt.day.tolist() == [1, 3, 2, 6]
+    assert df["PU_LAST"].dt.day.tolist() == [5, 4, 10, 6]
+    assert df["PU_MAX"].equals(df["PU_LAST"])
+    assert column(local_dm, f'PU_COUNT("CASES", {ACT})') == [3, 2, 4, 1]
+    assert column(local_dm, f'PU_COUNT_DISTINCT("CASES", {ACT})') == [3, 2, 3, 1]
+    assert column(local_dm, f"PU_COUNT(\"CASES\", {ACT}, {ACT} = 'B')") == [1, 0, 2, 0]
+    assert column(local_dm, f'PU_SUM("CASES", INDEX_ACTIVITY_ORDER({ACT}))') == [
+        6,
+        3,
+        10,
+        1,
+    ]
+    assert column(local_dm, f"PU_LAST(\"CASES\", {ACT}, {ACT} != 'C')") == [
+        "B",
+        "A",
+        "B",
+        "A",
+    ]
+
+
+def test_activity_functions(local_dm):
+    df = query(
+        local_dm,
+        lag=f"ACTIVITY_LAG({ACT})",
+        lead=f"ACTIVITY_LEAD({ACT}, 2)",
+        order=f"INDEX_ACTIVITY_ORDER({ACT})",
+        reverse=f"INDEX_ACTIVITY_ORDER_REVERSE({ACT})",
+        type=f"INDEX_ACTIVITY_TYPE({ACT})",
+        running=(
+            f"RUNNING_SUM(CASE WHEN {ACT} = 'B' THEN 1 ELSE 0 END, "
+            'PARTITION BY ("ACTIVITIES"."case"))'
+        ),
+        days=f'DAYS_BETWEEN(PU_FIRST("CASES", {TS}), {TS})',
+    )
+    assert df["lag"].fillna("-").tolist()[:5] == ["-", "A", "B", "-", "A"]
+    assert df["lead"].fillna("-").tolist()[:5] == ["C", "-", "-", "-", "-"]
+    assert df["order"].tolist() == [1, 2, 3, 1, 2, 1, 2, 3, 4, 1]
+    assert df["reverse"].tolist() == [3, 2, 1, 2, 1, 4, 3, 2, 1, 1]
+    assert df["type"].tolist() == [1, 1, 1, 1, 1, 1, 1, 2, 1, 1]
+    assert df["running"].tolist() == [0, 1, 1, 0, 0, 0, 1, 2, 2, 0]
+    assert df["days"].tolist() == [0, 1, 4, 0, 1, 0, 1, 2, 8, 0]
+
+
+def test_running_sum_order_by(local_dm):
+    # Descending order through the negated activity index
+    assert column(
+        local_dm,
+        f"RUNNING_SUM(1, ORDER BY (-INDEX_ACTIVITY_ORDER({ACT})), "
+        'PARTITION BY ("ACTIVITIES"."case"))',
+    ) == [3, 2, 1, 2, 1, 4, 3, 2, 1, 1]
+
+
+def test_process_functions(local_dm):
+    throughput = column(
+        local_dm,
+        f"CALC_THROUGHPUT(CASE_START TO LAST_OCCURRENCE['B'], "
+        f"REMAP_TIMESTAMPS({TS}, DAYS))",
+    )
+    np.testing.assert_array_equal(throughput, [1, np.nan, 2, np.nan])
+    assert column(
+        local_dm,
+        "CALC_THROUGHPUT(ALL_OCCURRENCE['Process Start'] TO CASE_END, "
+        f"REMAP_TIMESTAMPS({TS}, DAYS))",
+    ) == [4, 1, 8, 0]
+    assert column(local_dm, "MATCH_ACTIVITIES(NODE ['A', 'B'])") == [1, 0, 1, 0]
+    assert column(local_dm, "MATCH_ACTIVITIES(EXCLUDING ['B'])") == [0, 1, 0, 1]
+    assert column(local_dm, "MATCH_ACTIVITIES(NODE_ANY ['B', 'C'])") == [1, 1, 1, 0]
+    assert column(local_dm, "MATCH_ACTIVITIES(EXCLUDING_ALL ['A', 'B'])") == [
+        0,
+        1,
+        0,
+        1,
+    ]
+    assert column(
+        local_dm, "CASE WHEN PROCESS EQUALS 'B' TO 'B' THEN 1 ELSE 0 END"
+    ) == [0, 0, 1, 0]
+    assert column(
+        local_dm, "CASE WHEN PROCESS EQUALS START 'A' TO 'C' THEN 1 ELSE 0 END"
+    ) == [0, 1, 0, 0]
+    assert column(
+        local_dm, "CASE WHEN PROCESS EQUALS 'B' TO 'C' TO END THEN 1 ELSE 0 END"
+    ) == [1, 0, 1, 0]
+
+
+def test_aggregations(local_dm):
+    df = query(
+        local_dm,
+        region='"CASES"."region"',
+        count=f"COUNT({ACT})",
+        distinct=f"COUNT(DISTINCT {ACT})",
+        sum=f"SUM({AMOUNT})",
+        avg=f"AVG({AMOUNT})",
+        min=f"MIN({AMOUNT})",
+        max=f"MAX({AMOUNT})",
+        median=f"MEDIAN({AMOUNT})",
+        cases='COUNT_TABLE("CASES")',
+        events='COUNT_TABLE("ACTIVITIES")',
+    )
+    assert df.to_dict("list") == {
+        "region": ["N", "S"],
+        "count": [7, 3],
+        "distinct": [3, 2],
+        "sum": [4.0, 6.0],
+        "avg": [2.0, 3.0],
+        "min": [1.0, 2.0],
+        "max": [3.0, 4.0],
+        "median": [2.0, 3.0],
+        "cases": [2, 2],
+        "events": [7, 3],
+    }
+    df = query(local_dm, act=ACT, cases='COUNT_TABLE("CASES")')
+    assert df.to_dict("list") == {"act": ["A", "B", "C"], "cases": [4, 2, 3]}
+    assert column(local_dm, 'COUNT_TABLE("ACTIVITIES")') == [10]
+
+
+def test_distinct_and_filters(local_dm):
+    assert column(local_dm, f"DISTINCT {ACT}") == ["A", "B", "C"]
+    # Event filters remove the events, case filters the cases with their events
+    assert column(
+        local_dm, f"INDEX_ACTIVITY_ORDER({ACT})", filters=[f"{ACT} != 'A'"]
+    ) == [1, 2, 1, 1, 2, 3]
+    assert column(local_dm, '"CASES"."case"', filters=[f"{ACT} = 'B'"]) == [
+        "c1",
+        "c3",
+    ]
+    assert column(
+        local_dm,
+        f'PU_COUNT("CASES", {ACT})',
+        filters=[f"{AMOUNT} > 1", '"CASES"."region" = \'N\''],
+    ) == [4]
+    assert column(local_dm, TS, filters=[f"{TS} >= {{d '2020-01-06'}}"]) == [
+        pd.Timestamp("2020-01-10"),
+        pd.Timestamp("2020-01-06"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "column_query",
+    [
+        '"OTHER"."col"',
+        '"ACTIVITIES"."missing"',
+        f"UNKNOWN_FUNCTION({ACT})",
+        f"CONFORMANCE({ACT})",
+        f"REMAP_TIMESTAMPS({TS}, WEEKS)",
+        f'PU_COUNT("ACTIVITIES", {ACT})',
+    ],
+)
+def test_not_supported(local_dm, column_query):
+    with pytest.raises(PQLNotSupportedError):
+        column(local_dm, column_query)
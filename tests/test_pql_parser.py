@@ -0,0 +1,174 @@
+import pandas as pd
+import pytest
+
+from one_click_analysis.errors import PQLParseError
+from one_click_analysis.local_backend.pql_parser import BinaryOp
+from one_click_analysis.local_backend.pql_parser import Case
+from one_click_analysis.local_backend.pql_parser import ColumnRef
+from one_click_analysis.local_backend.pql_parser import Distinct
+from one_click_analysis.local_backend.pql_parser import FunctionCall
+from one_click_analysis.local_backend.pql_parser import InList
+from one_click_analysis.local_backend.pql_parser import IsNull
+from one_click_analysis.local_backend.pql_parser import Keyword
+from one_click_analysis.local_backend.pql_parser import Literal
+from one_click_analysis.local_backend.pql_parser import NodeList
+from one_click_analysis.local_backend.pql_parser import Occurrence
+from one_click_analysis.local_backend.pql_parser import PQLParser
+from one_click_analysis.local_backend.pql_parser import ProcessEquals
+from one_click_analysis.local_backend.pql_parser import Range
+from one_click_analysis.local_backend.pql_parser import TableRef
+from one_click_analysis.local_backend.pql_parser import tokenize
+from one_click_analysis.local_backend.pql_parser import UnaryOp
+
+ACT = ColumnRef("ACTIVITIES", "act")
+
+
+def test_tokenize():
+    tokens = tokenize(
+        """  "ACTIVITIES"."ca
+        se" <> 'it''s' {ts '2020-01-01 10:00'} 1.5 .5 42 lower_name  """
+    )
+    assert [(t.kind, t.value) for t in tokens] == [
+        ("ident", "ACTIVITIES"),
+        ("punct", "."),
+        ("ident", "ca se"),
+        ("op", "<>"),
+        ("string", "it's"),
+        ("date", "2020-01-01 10:00"),
+        ("number", 1.5),
+        ("number", 0.5),
+        ("number", 42),
+        ("name", "LOWER_NAME"),
+    ]
+    assert tokens[0].position == 2
+
+
+def test_tokenize_unexpected_character():
+    with pytest.raises(PQLParseError, match="position 4"):
+        tokenize("1 + # 2")
+
+
+def test_parse_literals():
+    assert PQLParser.parse("NULL") == Literal(None)
+    assert PQLParser.parse("'a''b'") == Literal("a'b")
+    assert PQLParser.parse("{d '2020-01-31'}") == Literal(pd.Timestamp("2020-01-31"))
+    assert PQLParser.parse('"CASES"') == TableRef("CASES")
+    assert PQLParser.parse("DAYS") == Keyword("DAYS")
+
+
+def test_operator_precedence():
+    node = PQLParser.parse('NOT 1 + 2 * -3 = 4 AND "ACTIVITIES"."act" = \'A\' OR 1 = 1')
+    assert node == BinaryOp(
+        "OR",
+        BinaryOp(
+            "AND",
+            UnaryOp(
+                "NOT",
+                BinaryOp(
+                    "=",
+                    BinaryOp(
+                        "+",
+                        Literal(1),
+                        BinaryOp("*", Literal(2), UnaryOp("-", Literal(3))),
+                    ),
+                    Literal(4),
+                ),
+            ),
+            BinaryOp("=", ACT, Literal("A")),
+        ),
+        BinaryOp("=", Literal(1), Literal(1)),
+    )
+    # Left associativity and parentheses
+    assert PQLParser.parse("1 - 2 - 3") == BinaryOp(
+        "-", BinaryOp("-", Literal(1), Literal(2)), Literal(3)
+    )
+    assert PQLParser.parse("1 - (2 - 3)") == BinaryOp(
+        "-", Literal(1), BinaryOp("-", Literal(2), Literal(3))
+    )
+
+
+def test_parse_predicates():
+    assert PQLParser.parse("\"ACTIVITIES\".\"act\" NOT IN ('A', 'B')") == InList(
+        ACT, [Literal("A"), Literal("B")], negated=True
+    )
+    assert PQLParser.parse('"ACTIVITIES"."act" IS NOT NULL') == IsNull(
+        ACT, negated=True
+    )
+    assert PQLParser.parse("1 <> 2") == BinaryOp("!=", Literal(1), Literal(2))
+
+
+def test_parse_filter_and_distinct():
+    assert PQLParser.parse('FILTER "ACTIVITIES"."act" = \'A\';;') == BinaryOp(
+        "=", ACT, Literal("A")
+    )
+    assert PQLParser.parse('DISTINCT "ACTIVITIES"."act"') == Distinct(ACT)
+
+
+def test_parse_case():
+    node = PQLParser.parse("CASE WHEN 1 = 1 THEN 'a' WHEN NULL THEN 'b' END")
+    assert node == Case(
+        [
+            (BinaryOp("=", Literal(1), Literal(1)), Literal("a")),
+            (Literal(None), Literal("b")),
+        ]
+    )
+    assert PQLParser.parse("CASE WHEN 1 THEN 2 ELSE 3 END").default == Literal(3)
+
+
+def test_parse_functions():
+    node = PQLParser.parse(
+        'RUNNING_SUM(1, ORDER BY ("ACTIVITIES"."ts"), '
+        'PARTITION BY ("ACTIVITIES"."case"))'
+    )
+    assert node == FunctionCall(
+        "RUNNING_SUM",
+        [Literal(1)],
+        order_by=[ColumnRef("ACTIVITIES", "ts")],
+        partition_by=[ColumnRef("ACTIVITIES", "case")],
+    )
+    assert PQLParser.parse('COUNT(DISTINCT "ACTIVITIES"."act")') == FunctionCall(
+        "COUNT", [ACT], distinct=True
+    )
+    assert PQLParser.parse(
+        "CALC_THROUGHPUT(CASE_START TO FIRST_OCCURRENCE['B'], "
+        'REMAP_TIMESTAMPS("ACTIVITIES"."ts", DAYS))'
+    ) == FunctionCall(
+        "CALC_THROUGHPUT",
+        [
+            Range(Occurrence("CASE_START"), Occurrence("FIRST_OCCURRENCE", "B")),
+            FunctionCall(
+                "REMAP_TIMESTAMPS", [ColumnRef("ACTIVITIES", "ts"), Keyword("DAYS")]
+            ),
+        ],
+    )
+    assert PQLParser.parse(
+        "MATCH_ACTIVITIES(NODE ['A', 'B'], EXCLUDING ['C'])"
+    ) == FunctionCall(
+        "MATCH_ACTIVITIES", [NodeList("NODE", ["A", "B"]), NodeList("EXCLUDING", ["C"])]
+    )
+
+
+def test_parse_process_equals():
+    assert PQLParser.parse(
+        "PROCESS ON \"ACTIVITIES\".\"act\" EQUALS START 'A' TO 'B' TO END"
+    ) == ProcessEquals(ACT, ["A", "B"], anchored_start=True, anchored_end=True)
+    assert PQLParser.parse("PROCESS EQUALS 'A'") == ProcessEquals(None, ["A"])
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "",
+        "1 +",
+        "1 2",
+        "(1",
+        "CASE ELSE 1 END",
+        "CASE WHEN 1 THEN 2",
+        "COUNT(1 2)",
+        "\"ACTIVITIES\".'act'",
+        "1 IS 2",
+    ],
+)
+def test_parse_errors(query):
+    with pytest.raises(PQLParseError):
+        PQLParser.parse(query)
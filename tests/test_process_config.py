@@ -0,0 +1,137 @@
+from dataclasses import fields
+
+import pytest
+
+from one_click_analysis.process_config.process_config import create_columns
+from one_click_analysis.process_config.process_config import ProcessConfig
+from one_click_analysis.process_config.process_config import TableColumnType
+from one_click_analysis.process_config.process_config_cache import (
+    ProcessConfigCache,
+)
+
+
+class CountingDatamodel:
+    """Datamodel that counts the requests of its tables"""
+
+    def __init__(self, dm):
+        self._dm = dm
+        self.table_requests = 0
+
+    @property
+    def tables(self):
+        self.table_requests += 1
+        return self._dm.tables
+
+    def __getattr__(self, name):
+        return getattr(self._dm, name)
+
+
+def test_lazily_loaded_columns_are_cached(local_dm, tmp_path):
+    metadata_cache = ProcessConfigCache(tmp_path)
+    process_config = ProcessConfig(
+        CountingDatamodel(local_dm), metadata_cache=metadata_cache
+    )
+    # The columns of the case table are only loaded on first access
+    assert process_config.table_dict["CASES"]._columns is None
+    column_names = process_config.get_categorical_numerical_column_names("CASES")
+
+    dm = CountingDatamodel(local_dm)
+    process_config = ProcessConfig(dm, metadata_cache=metadata_cache)
+    assert process_config.table_dict["CASES"]._columns is not None
+    assert (
+        process_config.get_categorical_numerical_column_names("CASES") == column_names
+    )
+    assert dm.table_requests == 0
+
+
+def baseline_column_partitions(dm, table_str, excluded_cols):
+    """Partition the columns as before the indexed lookups: request the table
+    from the datamodel and filter its columns by type"""
+    table = dm.tables.find(table_str)
+    columns = create_columns(table)
+    return (
+        [
+            c
+            for c in columns
+            if c.datatype in TableColumnType.categorical_types()
+            and c.name not in excluded_cols
+        ],
+        [
+            c
+            for c in columns
+            if c.datatype in TableColumnType.numeric_types()
+            and c.name not in excluded_cols
+        ],
+    )
+
+
+def get_metadata(process_config):
+    return {
+        table_str: {
+            f.name: getattr(table, f.name)
+            for f in fields(table)
+            if f.name not in ["dm", "_process_model"]
+        }
+        for table_str, table in process_config.table_dict.items()
+    }
+
+
+def test_cache_hit_makes_no_table_requests(local_dm, tmp_path):
+    metadata_cache = ProcessConfigCache(tmp_path)
+    process_config = ProcessConfig(local_dm, metadata_cache=metadata_cache)
+
+    dm = CountingDatamodel(local_dm)
+    process_config_cached = ProcessConfig(dm, metadata_cache=metadata_cache)
+    assert dm.table_requests == 0
+    assert get_metadata(process_config_cached) == get_metadata(process_config)
+
+
+def test_data_version_invalidates_cache(local_dm, tmp_path):
+    metadata_cache = ProcessConfigCache(tmp_path)
+    ProcessConfig(local_dm, metadata_cache=metadata_cache, data_version="1")
+
+    dm = CountingDatamodel(local_dm)
+    ProcessConfig(dm, metadata_cache=metadata_cache, data_version="1")
+    assert dm.table_requests == 0
+
+    dm = CountingDatamodel(local_dm)
+    ProcessConfig(dm, metadata_cache=metadata_cache, data_version="2")
+    assert dm.table_requests > 0
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_column_partitions_match_baseline(local_dm, tmp_path, cached):
+    metadata_cache = ProcessConfigCache(tmp_path) if cached else None
+    if cached:
+        # Fill the cache, so that the tested ProcessConfig uses the cached columns
+        ProcessConfig(local_dm, metadata_cache=metadata_cache).table_dict[
+            "CASES"
+        ].columns
+    process_config = ProcessConfig(local_dm, metadata_cache=metadata_cache)
+
+    # Activity table: the activity and sorting columns are excluded, the case id
+    # column is only excluded from get_categorical_numerical_columns
+    activity_excluded = {"act", None}
+    categorical, numerical = baseline_column_partitions(
+        local_dm, "ACTIVITIES", activity_excluded
+    )
+    assert process_config.get_categorical_numerical_column_names("ACTIVITIES") == (
+        [c.name for c in categorical],
+        [c.name for c in numerical],
+    )
+    assert process_config.get_categorical_numerical_columns(
+        "ACTIVITIES"
+    ) == baseline_column_partitions(
+        local_dm, "ACTIVITIES", activity_excluded | {"case"}
+    )
+
+    categorical, numerical = baseline_column_partitions(local_dm, "CASES", set())
+    assert [c.name for c in categorical] == ["case", "region"]
+    assert [c.name for c in numerical] == ["amount"]
+    assert process_config.get_categorical_numerical_column_names("CASES") == (
+        ["case", "region"],
+        ["amount"],
+    )
+    assert process_config.get_categorical_numerical_columns(
+        "CASES"
+    ) == baseline_column_partitions(local_dm, "CASES", {"case"})
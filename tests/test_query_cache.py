@@ -0,0 +1,98 @@
+import os
+
+import pandas as pd
+from pycelonis.celonis_api.pql.pql import PQL
+from pycelonis.celonis_api.pql.pql import PQLColumn
+from pycelonis.celonis_api.pql.pql import PQLFilter
+
+from one_click_analysis.query_cache import CachedDatamodel
+from one_click_analysis.query_cache import QueryCache
+
+
+def create_query(column_query='"ACTIVITIES"."act"', filters=()):
+    query = PQL()
+    query.add(PQLColumn(name="act", query=column_query))
+    for filter_query in filters:
+        query.add(PQLFilter(filter_query))
+    return query
+
+
+def test_key_is_canonical(tmp_path):
+    cache = QueryCache(tmp_path)
+    key = cache.create_key(
+        "dm", "v1", create_query(filters=["1 = 1", '"CASES"."amount" > 1'])
+    )
+    # Whitespace and the order of the filters do not matter
+    assert key == cache.create_key(
+        "dm",
+        "v1",
+        create_query(
+            '\n "ACTIVITIES"."act" ', filters=['"CASES"."amount"  > 1', "1 = 1"]
+        ),
+    )
+    assert key != cache.create_key(
+        "dm", "v2", create_query(filters=["1 = 1", '"CASES"."amount" > 1'])
+    )
+    assert key != cache.create_key("dm", "v1", create_query(filters=["1 = 1"]))
+    assert key != cache.create_key(
+        "dm", "v1", create_query(filters=["1 = 1", '"CASES"."amount" > 1']), limit=1
+    )
+
+
+def test_cached_datamodel(tmp_path, local_dm, monkeypatch):
+    calls = []
+    get_data_frame = local_dm.get_data_frame
+
+    def count_calls(query, **kwargs):
+        calls.append(query)
+        return get_data_frame(query, **kwargs)
+
+    monkeypatch.setattr(local_dm, "get_data_frame", count_calls)
+    cache = QueryCache(tmp_path)
+    dm = CachedDatamodel(local_dm, cache)
+    df = dm.get_data_frame(create_query())
+    # The fingerprint query and the query itself
+    assert len(calls) == 2
+    pd.testing.assert_frame_equal(dm.get_data_frame(create_query()), df)
+    assert len(calls) == 2
+    # A new session with the same data uses the stored results
+    dm = CachedDatamodel(local_dm, cache)
+    pd.testing.assert_frame_equal(dm.get_data_frame(create_query()), df)
+    assert len(calls) == 3
+    # Other attributes are forwarded
+    assert dm.activity_table_str == "ACTIVITIES"
+
+
+def test_new_data_version_invalidates(tmp_path):
+    cache = QueryCache(tmp_path)
+    df = pd.DataFrame({"a": [1, 2]})
+    cache.set_data_version("dm", "v1")
+    cache.put("dm", "key", df)
+    cache.set_data_version("dm", "v1")
+    pd.testing.assert_frame_equal(cache.get("dm", "key"), df)
+    cache.set_data_version("dm", "v2")
+    assert cache.get("dm", "key") is None
+
+
+def test_eviction(tmp_path):
+    cache = QueryCache(tmp_path)
+    df = pd.DataFrame({"a": range(1000)})
+    cache.put("dm", "first", df)
+    cache.put("dm", "second", df)
+    file_size = cache.size_bytes // 2
+    # "first" was used most recently
+    for i, key in enumerate(["second", "first"]):
+        path = cache._path("dm", key)
+        os.utime(path, (i, i))
+    cache.max_size_bytes = 2 * file_size
+    assert cache.put("dm", "third", df)
+    assert cache.get("dm", "second") is None
+    assert cache.get("dm", "first") is not None
+    assert cache.get("dm", "third") is not None
+
+
+def test_unstorable_result(tmp_path):
+    cache = QueryCache(tmp_path)
+    assert not cache.put("dm", "key", pd.DataFrame({"a": ["x", 1]}))
+    assert cache.get("dm", "key") is None
+    assert list(tmp_path.glob("*/*.tmp")) == []
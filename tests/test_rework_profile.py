@@ -0,0 +1,49 @@
+import numpy as np
+from pycelonis.celonis_api.pql.pql import PQLFilter
+
+from one_click_analysis.feature_processing.event_sequences import (
+    event_sequence_registry,
+)
+from one_click_analysis.feature_processing.rework_profile import get_rework_profile
+from one_click_analysis.feature_processing.rework_profile import ReworkProfile
+
+
+def test_rework_profile(sequences):
+    # c1: A B C, c2: A C, c3: A B B C, c4: A
+    profile = ReworkProfile(sequences)
+    assert profile.number_cases == 4
+    np.testing.assert_array_equal(profile.occurrence_counts, [4, 3, 3])
+    np.testing.assert_array_equal(profile.case_counts, [4, 2, 3])
+    np.testing.assert_array_equal(profile.rework_case_counts, [0, 1, 0])
+    np.testing.assert_array_equal(profile.rework_counts, [0, 1, 0])
+    assert profile.get_rework_case_count("B") == 1
+    assert profile.get_rework_case_count("D") == 0
+
+    df = profile.to_df()
+    assert df["activity"].tolist() == ["B", "A", "C"]
+    assert df.iloc[0].to_dict() == {
+        "activity": "B",
+        "case_count": 2,
+        "rework_case_count": 1,
+        "rework_case_share": 0.25,
+        "rework_count": 1,
+        "mean_reworks": 1.0,
+    }
+    assert df["mean_reworks"].tolist()[1:] == [0.0, 0.0]
+
+    df_cases = profile.get_case_rework_df(["B", "D"])
+    assert df_cases.index.tolist() == ["c1", "c2", "c3", "c4"]
+    assert df_cases.to_dict("list") == {"B": [0, 0, 1, 0], "D": [0, 0, 0, 0]}
+    assert profile.get_case_rework_df().shape == (4, 3)
+
+
+def test_get_rework_profile(process_config):
+    event_sequence_registry.clear()
+    filters = [PQLFilter('"CASES"."region" = \'S\'')]
+    profile = get_rework_profile(process_config, "ACTIVITIES", filters)
+    assert profile is get_rework_profile(process_config, "ACTIVITIES", filters)
+    # c2: A C, c4: A
+    assert profile.number_cases == 2
+    assert profile.rework_case_counts.sum() == 0
+    np.testing.assert_array_equal(profile.case_counts, [2, 1])
+    event_sequence_registry.clear()
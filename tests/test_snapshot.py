@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from one_click_analysis import snapshot
+from one_click_analysis.errors import SnapshotVersionError
+from one_click_analysis.feature_processing.attributes.attribute import (
+    AttributeDataType,
+)
+from one_click_analysis.feature_processing.attributes.attribute import AttributeType
+from one_click_analysis.feature_processing.attributes.feature import Feature
+from one_click_analysis.feature_processing.attributes.static_attributes import (
+    DummyAttribute,
+)
+
+
+@pytest.fixture
+def analysis_data():
+    attr = DummyAttribute(
+        query='"CASES"."region"',
+        attribute_name="region",
+        attribute_type=AttributeType.CASE_COL,
+        process_config=None,
+        is_feature=True,
+    )
+    target_attr = DummyAttribute(
+        query="",
+        attribute_name="duration",
+        attribute_type=AttributeType.OTHER,
+        process_config=None,
+        is_class_feature=True,
+    )
+    df_x = pd.DataFrame(
+        {
+            "region = N": pd.arrays.SparseArray(
+                np.array([1, 0, 1], dtype=np.uint8), fill_value=np.uint8(0)
+            ),
+            "region = S": np.array([0, 1, 0], dtype=np.uint8),
+            "start": pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03"]),
+        }
+    )
+    df_target = pd.DataFrame({"duration": [1.5, np.nan, 3.0]})
+    features = [
+        Feature(
+            "region = N",
+            AttributeDataType.CATEGORICAL,
+            attr,
+            attribute_value="N",
+            metrics={"p_val": np.float64(0.5), "values": np.array([1, 2])},
+        ),
+        Feature("region = S", AttributeDataType.CATEGORICAL, attr, "S"),
+    ]
+    target_features = [
+        Feature("duration", AttributeDataType.NUMERICAL, target_attr, unit="days")
+    ]
+    return df_x, df_target, features, target_features, [attr]
+
+
+@pytest.mark.parametrize("memory_map", [True, False])
+def test_round_trip(tmp_path, analysis_data, memory_map):
+    df_x, df_target, features, target_features, attributes = analysis_data
+    snapshot.save_snapshot(
+        tmp_path,
+        df_x,
+        df_target,
+        features,
+        target_features,
+        attributes,
+        properties={"num_cases": 3},
+    )
+    loaded = snapshot.load_snapshot(tmp_path, memory_map=memory_map)
+
+    # Sparse columns are stored densely
+    df_x_dense = df_x.assign(**{"region = N": df_x["region = N"].sparse.to_dense()})
+    pd.testing.assert_frame_equal(loaded.df_x, df_x_dense)
+    pd.testing.assert_frame_equal(loaded.df_target, df_target)
+    assert loaded.properties == {"num_cases": 3}
+    assert [f.df_column_name for f in loaded.features] == ["region = N", "region = S"]
+    assert loaded.features[0].metrics == {"p_val": 0.5, "values": [1, 2]}
+    assert loaded.target_features[0].unit == "days"
+    # Features of the same attribute share the attribute again
+    assert loaded.features[0].attribute is loaded.features[1].attribute
+    assert loaded.attributes == [loaded.features[0].attribute]
+    attr = loaded.attributes[0]
+    assert attr.attribute_name == "region"
+    assert attr.attribute_class == "DummyAttribute"
+    assert attr.data_type == AttributeDataType.CATEGORICAL
+    assert attr.attribute_type == AttributeType.CASE_COL
+    assert attr.is_feature
+    assert attr.process_config is None and attr.query is None
+    # Saving does not change the input frame
+    assert isinstance(df_x["region = N"].dtype, pd.SparseDtype)
+
+
+def test_version_and_incomplete_snapshot(tmp_path, analysis_data):
+    snapshot.save_snapshot(tmp_path, *analysis_data)
+    manifest_path = tmp_path / snapshot.MANIFEST_FILE_NAME
+    manifest = json.loads(manifest_path.read_text())
+    manifest["format_version"] = snapshot.SNAPSHOT_FORMAT_VERSION + 1
+    manifest_path.write_text(json.dumps(manifest))
+    with pytest.raises(SnapshotVersionError):
+        snapshot.load_snapshot(tmp_path)
+
+    manifest_path.unlink()
+    with pytest.raises(FileNotFoundError):
+        snapshot.load_snapshot(tmp_path)
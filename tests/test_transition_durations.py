@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from one_click_analysis.feature_processing.event_sequences import (
+    build_event_sequences,
+)
+from one_click_analysis.feature_processing.transition_matrix import (
+    compute_transition_durations,
+)
+
+
+def create_sequences(cases):
+    """Build EventSequences from {case id: [(activity, day of the event), ...]}"""
+    rows = [
+        {
+            "case_id": case_id,
+            "event_index": i,
+            "activity": activity,
+            "timestamp": pd.Timestamp("2022-01-01") + pd.Timedelta(days=day),
+        }
+        for case_id, events in cases.items()
+        for i, (activity, day) in enumerate(events)
+    ]
+    return build_event_sequences(pd.DataFrame(rows))
+
+
+def get_row(df, source, target):
+    rows = df[(df["source_activity"] == source) & (df["target_activity"] == target)]
+    assert len(rows) == 1
+    return rows.iloc[0]
+
+
+def test_case_counts_follow_the_sorted_transitions():
+    # The transition of case 0 sorts after the ones of case 1
+    sequences = create_sequences(
+        {"0": [("C", 0), ("D", 1)], "1": [("A", 0), ("B", 1), ("A", 2), ("B", 5)]}
+    )
+    df = compute_transition_durations(sequences, min_count=1)
+    assert get_row(df, "A", "B")["count"] == 2
+    assert get_row(df, "A", "B")["case_count"] == 1
+    assert get_row(df, "B", "A")["case_count"] == 1
+    assert get_row(df, "C", "D")["case_count"] == 1
+
+
+def test_duration_statistics():
+    sequences = create_sequences(
+        {
+            "0": [("A", 0), ("B", 1)],
+            "1": [("A", 0), ("B", 2)],
+            "2": [("A", 0), ("B", 10), ("A", 11), ("B", 14)],
+        }
+    )
+    df = compute_transition_durations(sequences, time_unit="DAYS")
+    row = get_row(df, "A", "B")
+    durations = np.array([1, 2, 10, 3])
+    assert row["count"] == 4
+    assert row["case_count"] == 3
+    assert row["mean"] == pytest.approx(durations.mean())
+    assert row["median"] == pytest.approx(np.quantile(durations, 0.5))
+    assert row["p90"] == pytest.approx(np.quantile(durations, 0.9))
+    assert row["total"] == pytest.approx(durations.sum())
+    assert get_row(df, "B", "A")["total"] == pytest.approx(1)
+
+
+def test_min_count_and_sorting():
+    sequences = create_sequences(
+        {"0": [("A", 0), ("B", 1), ("C", 5)], "1": [("A", 0), ("B", 2)]}
+    )
+    df = compute_transition_durations(sequences, min_count=2, sort_by="mean")
+    assert list(zip(df["source_activity"], df["target_activity"])) == [("A", "B")]
+
+    df = compute_transition_durations(sequences, time_unit="HOURS", sort_by="p90")
+    assert list(df["p90"]) == sorted(df["p90"], reverse=True)
+    assert get_row(df, "B", "C")["mean"] == pytest.approx(4 * 24)
@@ -0,0 +1,48 @@
+import pytest
+
+from one_click_analysis.feature_processing.transition_matrix import PROCESS_END
+from one_click_analysis.feature_processing.transition_matrix import PROCESS_START
+from one_click_analysis.feature_processing.transition_matrix import (
+    TransitionMatrix,
+)
+
+
+def test_transition_counts(sequences):
+    # c1: A B C, c2: A C, c3: A B B C, c4: A
+    matrix = TransitionMatrix(sequences)
+    assert matrix.get_transition_count("A", "B") == 2
+    assert matrix.get_transition_count("B", "B") == 1
+    assert matrix.get_transition_count(PROCESS_START, "A") == 4
+    assert matrix.get_transition_count("A", PROCESS_END) == 1
+    assert matrix.get_transition_count("C", "A") == 0
+    assert matrix.get_transition_count("D", "A") == 0
+    assert matrix.get_case_count("B", "C") == 2
+    assert matrix.get_case_count("C", PROCESS_END) == 3
+
+
+def test_successors_and_predecessors(sequences):
+    matrix = TransitionMatrix(sequences)
+    assert matrix.get_successors("A").to_dict() == {"B": 2, "C": 1, PROCESS_END: 1}
+    assert list(matrix.get_successors("A").index[:1]) == ["B"]
+    assert matrix.get_predecessors("C").to_dict() == {"B": 2, "A": 1}
+    assert matrix.get_successors("D").empty
+
+
+def test_select_period(sequences):
+    matrix = TransitionMatrix(sequences).select_period(start="2020-01-02")
+    # Only c2, c3 and c4 started on or after 2020-01-02
+    assert matrix.number_cases == 3
+    assert matrix.get_transition_count("A", "B") == 1
+    assert matrix.activities == ["A", "B", "C"]
+
+
+def test_to_df(sequences):
+    df = TransitionMatrix(sequences).to_df()
+    row = df[(df["transition_start"] == "B") & (df["transition_end"] == "C")]
+    assert row[["case_count", "transition_count"]].values.tolist() == [[2, 2]]
+    assert df["transition_count"].sum() == len(sequences.activity_codes) + 4
+
+
+def test_labels_must_not_be_activities(sequences):
+    with pytest.raises(ValueError):
+        TransitionMatrix(sequences, process_start_str="A")